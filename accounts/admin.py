@@ -6,7 +6,7 @@ from django.urls import reverse
 from django.db.models import Count
 from .models import (
     CustomUser, LayerProfile, GroupLayer, SubsidiaryLayer, 
-    BranchLayer, AppUser, CSVTemplate
+    BranchLayer, AppUser, CSVTemplate, UserImportJob
 )
 
 @admin.register(CustomUser)
@@ -125,6 +125,13 @@ class CSVTemplateAdmin(admin.ModelAdmin):
     list_filter = ('template_type', 'updated_at')
     readonly_fields = ('updated_at',)
 
+@admin.register(UserImportJob)
+class UserImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'layer', 'status', 'processed_rows', 'total_rows', 'requested_by', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('layer__company_name', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at', 'locked_by', 'locked_until')
+
 # Customize admin site
 admin.site.site_header = 'ESG Platform Administration'
 admin.site.site_title = 'ESG Platform Admin'
@@ -0,0 +1,557 @@
+"""
+Bulk CSV imports into the company layer structure.
+"""
+
+import csv
+import io
+import logging
+import os
+import socket
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.mail import get_connection
+from django.core.validators import validate_email
+from django.db import connection, connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    AppUser, BranchLayer, CustomUser, GroupLayer, LayerProfile, LayerTypeChoices,
+    RoleChoices, SubsidiaryLayer, UserImportJob
+)
+from .services import bump_layer_access_version, send_email_to_user
+from .utils import add_layers_to_closure
+
+logger = logging.getLogger(__name__)
+
+# Overridden per key by settings.USER_IMPORTS
+DEFAULT_USER_IMPORT_SETTINGS = {
+    'ASYNC_THRESHOLD_ROWS': 200,  # Larger files are imported by the worker
+    'BATCH_SIZE': 500,  # Rows committed per transaction
+    'HASH_WORKERS': None,  # Password hashing processes, None for one per CPU
+    'PARALLEL_HASH_MIN': 16,  # Fewer new passwords are hashed in-process
+    'LEASE_SECONDS': 600,
+}
+
+
+LAYER_IMPORT_BATCH_SIZE = 500
+
+LAYER_CSV_COLUMNS = ['company_name', 'company_industry', 'shareholding_ratio', 'layer_type', 'company_location']
+
+
+def get_user_import_settings():
+    return {**DEFAULT_USER_IMPORT_SETTINGS, **getattr(settings, 'USER_IMPORTS', {})}
+
+
+class ImportValidationError(ValueError):
+    """A file that cannot be imported; errors lists the problems of each invalid row."""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def parse_user_csv(content):
+    """
+    Parse and validate a whole user CSV before anything is written.
+
+    Args:
+        content: Text of the uploaded file
+
+    Returns:
+        list: Row dicts with 'row' (line number), 'email', 'name', 'title' and 'role'
+
+    Raises:
+        ImportValidationError: If a required column is missing or any row is invalid
+    """
+    reader = csv.DictReader(io.StringIO(content))
+    missing = {'email', 'name'} - set(reader.fieldnames or [])
+    if missing:
+        raise ImportValidationError(f"Missing required column(s): {', '.join(sorted(missing))}.")
+
+    name_length = AppUser._meta.get_field('name').max_length
+    title_length = AppUser._meta.get_field('title').max_length
+
+    rows, errors = [], []
+    for record in reader:
+        email = (record.get('email') or '').strip()
+        name = (record.get('name') or '').strip()
+        title = (record.get('title') or '').strip() or 'Member'
+        role = (record.get('role') or '').strip().upper() or RoleChoices.OPERATION
+
+        problems = []
+        if not email or not name:
+            problems.append("Email and name are required fields in the CSV.")
+        if email:
+            try:
+                validate_email(email)
+                email = CustomUser.objects.normalize_email(email)
+            except ValidationError:
+                problems.append(f"Invalid email address: {email}")
+        if len(name) > name_length:
+            problems.append(f"Name must be at most {name_length} characters.")
+        if len(title) > title_length:
+            problems.append(f"Title must be at most {title_length} characters.")
+        if role not in RoleChoices.values:
+            problems.append(f"Invalid role: {role}")
+
+        if problems:
+            errors.append({'row': reader.line_num, 'email': email, 'errors': problems})
+        else:
+            rows.append({'row': reader.line_num, 'email': email, 'name': name, 'title': title, 'role': role})
+
+    if errors:
+        raise ImportValidationError(f"{len(errors)} row(s) are invalid; nothing was imported.", errors)
+    return rows
+
+
+def _hash_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def hash_passwords(passwords, config=None):
+    """
+    Hash passwords with the configured hasher.
+
+    PBKDF2 is CPU bound and holds the GIL, so larger batches are split
+    across a process pool instead of threads.
+
+    Returns:
+        list: Encoded passwords in the order given
+    """
+    config = config or get_user_import_settings()
+    passwords = list(passwords)
+    workers = min(config['HASH_WORKERS'] or os.cpu_count() or 1, len(passwords))
+    if workers < 2 or len(passwords) < config['PARALLEL_HASH_MIN']:
+        return _hash_passwords(passwords)
+
+    size = -(-len(passwords) // workers)
+    chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    with ProcessPoolExecutor(max_workers=len(chunks), initializer=django.setup) as executor:
+        return [hashed for chunk in executor.map(_hash_passwords, chunks) for hashed in chunk]
+
+
+def _send_credentials(credentials):
+    """Email generated passwords over one mail connection; returns the addresses sent to."""
+    sent = set()
+    try:
+        with get_connection() as mail:
+            for email, password in credentials.items():
+                if send_email_to_user(email, password, connection=mail):
+                    sent.add(email)
+    except Exception as e:
+        logger.error(f"Could not send import credentials: {str(e)}")
+    return sent
+
+
+def _import_user_batch(layer, rows, config):
+    """Import one batch of rows in a transaction; returns its report entries."""
+    # Passwords are hashed before the transaction opens, so it is only held
+    # for the lookups and inserts
+    emails = list(dict.fromkeys(row['email'] for row in rows))
+    existing = set(CustomUser.objects.filter(email__in=emails).values_list('email', flat=True))
+    credentials = {
+        email: CustomUser.objects.make_random_password() for email in emails if email not in existing
+    }
+    encoded = dict(zip(credentials, hash_passwords(credentials.values(), config)))
+
+    with transaction.atomic():
+        users = {
+            user.email: user
+            for user in CustomUser.objects.filter(email__in=emails).only('id', 'email')
+        }
+        members = set(
+            AppUser.objects.filter(layer=layer, user_id__in=[user.id for user in users.values()])
+            .values_list('user_id', flat=True)
+        )
+
+        # Users created since the lookup above are added, not created
+        for email in credentials.keys() & users.keys():
+            del credentials[email]
+        new_users = {}
+        for row in rows:
+            if row['email'] in credentials and row['email'] not in new_users:
+                new_users[row['email']] = CustomUser(
+                    email=row['email'], role=row['role'], is_active=True,
+                    password=encoded[row['email']], password_updated_at=None
+                )
+        CustomUser.objects.bulk_create(list(new_users.values()))
+        users.update(new_users)
+
+        entries, memberships = [], []
+        for row in rows:
+            user = users[row['email']]
+            entry = {'row': row['row'], 'email': row['email']}
+            if user.id in members:
+                entry.update(status='skipped', message='Already a member of this layer.')
+            else:
+                members.add(user.id)
+                entry['status'] = 'created' if row['email'] in credentials else 'added'
+                app_user = AppUser(user=user, layer=layer, name=row['name'], title=row['title'])
+                memberships.append((entry, app_user))
+            entries.append(entry)
+        AppUser.objects.bulk_create([app_user for _, app_user in memberships])
+        for entry, app_user in memberships:
+            entry['app_user_id'] = app_user.id
+
+    # bulk_create skips the post_save signals
+    bump_layer_access_version()
+
+    if credentials:
+        sent = _send_credentials(credentials)
+        for entry in entries:
+            if entry['status'] == 'created':
+                entry['email_sent'] = entry['email'] in sent
+    return entries
+
+
+def import_users(layer, rows, config=None, progress=None):
+    """
+    Import validated user rows into a layer.
+
+    Rows are imported in batches of BATCH_SIZE. Each batch hashes the new
+    users' passwords in parallel, then in one transaction resolves existing
+    users and memberships with two IN queries and inserts users and
+    memberships with bulk_create; credentials are emailed once the batch is
+    committed, and a failed email is reported instead of undoing the import.
+
+    Args:
+        layer: LayerProfile the users join
+        rows: Rows returned by parse_user_csv
+        config: Import settings, defaults to get_user_import_settings()
+        progress: Optional callable given the number of rows processed so far
+
+    Returns:
+        dict: Counts and a per-row report
+    """
+    config = config or get_user_import_settings()
+    entries = []
+    for start in range(0, len(rows), config['BATCH_SIZE']):
+        batch = rows[start:start + config['BATCH_SIZE']]
+        entries.extend(_import_user_batch(layer, batch, config))
+        if progress:
+            progress(start + len(batch))
+
+    statuses = [entry['status'] for entry in entries]
+    return {
+        'total_rows': len(rows),
+        'created_users': statuses.count('created'),
+        'added_members': statuses.count('created') + statuses.count('added'),
+        'skipped': statuses.count('skipped'),
+        'emails_failed': sum(1 for entry in entries if entry.get('email_sent') is False),
+        'rows': entries,
+    }
+
+
+def enqueue_user_import(layer, rows, user=None):
+    """
+    Queue validated rows for the process_user_imports worker.
+
+    Returns:
+        UserImportJob: The queued job
+    """
+    job = UserImportJob.objects.create(layer=layer, requested_by=user, rows=rows, total_rows=len(rows))
+    logger.info(f"Queued user import {job.id} of {len(rows)} rows into layer {layer.id}")
+    return job
+
+
+class UserImportWorker:
+    """
+    Runs queued user imports, recording progress after each batch.
+
+    Jobs are claimed with a lease so several worker processes can run side
+    by side. A job whose worker died is claimed again once its lease has
+    expired; rows the earlier run committed are then reported as skipped.
+    """
+
+    def __init__(self, worker_id=None, config=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.config = config or get_user_import_settings()
+
+    def run_once(self, limit=1):
+        """
+        Claim and run up to `limit` queued jobs.
+
+        Returns:
+            int: Number of jobs run
+        """
+        jobs = self.claim_jobs(limit)
+        for job in jobs:
+            self.run(job)
+        return len(jobs)
+
+    def claim_jobs(self, limit):
+        now = timezone.now()
+        expired = Q(status=UserImportJob.Status.RUNNING) & (Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+
+        with transaction.atomic():
+            due = UserImportJob.objects.filter(
+                Q(status=UserImportJob.Status.QUEUED) | expired
+            ).select_related('layer').order_by('created_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True, of=('self',))
+
+            claimed = list(due[:limit])
+            for job in claimed:
+                job.status = UserImportJob.Status.RUNNING
+                job.started_at = job.started_at or now
+                job.locked_by = self.worker_id
+                job.locked_until = self._lease()
+            UserImportJob.objects.bulk_update(claimed, ['status', 'started_at', 'locked_by', 'locked_until'])
+        return claimed
+
+    def run(self, job):
+        """Import the rows of a claimed job and record the outcome."""
+        def progress(processed):
+            job.processed_rows = processed
+            UserImportJob.objects.filter(pk=job.pk).update(
+                processed_rows=processed, locked_until=self._lease(), updated_at=timezone.now()
+            )
+
+        try:
+            report = import_users(job.layer, job.rows, self.config, progress)
+        except Exception as e:
+            logger.exception(f"User import {job.id} failed: {str(e)}")
+            self._finish(job, UserImportJob.Status.FAILED, error=f"Import failed: {str(e)}")
+            return
+        self._finish(job, UserImportJob.Status.SUCCEEDED, report=report)
+
+    def _lease(self):
+        return timezone.now() + timedelta(seconds=self.config['LEASE_SECONDS'])
+
+    def _finish(self, job, status, report=None, error=''):
+        job.status = status
+        job.report = report
+        job.last_error = error
+        job.finished_at = timezone.now()
+        job.locked_by = ''
+        job.locked_until = None
+        job.save()
+        logger.info(f"User import {job.id} finished with status {status}")
+
+
+def parse_layer_csv(content, require_creator=False):
+    """
+    Parse and validate a whole layer-structure CSV before anything is written.
+
+    SUBSIDIARY rows join their creator's group; a BRANCH row joins the
+    closest SUBSIDIARY row above it.
+
+    Args:
+        content: Text of the uploaded file
+        require_creator: Whether each row names its creator in creator_email
+
+    Returns:
+        list: Row dicts with the layer fields, 'row' (line number),
+              'creator_email' and, for branches, 'parent' (index of the subsidiary row)
+
+    Raises:
+        ImportValidationError: If a required column is missing or any row is invalid
+    """
+    reader = csv.DictReader(io.StringIO(content))
+    required = LAYER_CSV_COLUMNS + (['creator_email'] if require_creator else [])
+    missing = [column for column in required if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ImportValidationError(f"Missing required column(s): {', '.join(missing)}.")
+
+    rows, errors = [], []
+    last_subsidiary = None
+    for record in reader:
+        values = {column: (record.get(column) or '').strip() for column in required}
+        layer_type = values['layer_type'].upper()
+        problems = []
+
+        if not layer_type:
+            problems.append("Layer type is missing in the CSV row.")
+        elif layer_type not in (LayerTypeChoices.SUBSIDIARY, LayerTypeChoices.BRANCH):
+            problems.append(f"Invalid layer type: {layer_type}")
+        elif layer_type == LayerTypeChoices.BRANCH and last_subsidiary is None:
+            problems.append("Cannot create BRANCH without a preceding SUBSIDIARY layer.")
+        if require_creator and not values['creator_email']:
+            problems.append("Creator email is missing in the CSV row.")
+        if not values['company_name']:
+            problems.append("Company name is required.")
+        for column in ('company_name', 'company_industry', 'company_location'):
+            max_length = LayerProfile._meta.get_field(column).max_length
+            if len(values[column]) > max_length:
+                problems.append(f"{column} must be at most {max_length} characters.")
+        try:
+            ratio = Decimal(values['shareholding_ratio']).quantize(Decimal('0.01'))
+            if not 0 <= ratio <= 100:
+                raise InvalidOperation
+        except InvalidOperation:
+            problems.append("Shareholding ratio must be a number between 0 and 100.")
+
+        if problems:
+            errors.append({'row': reader.line_num, 'company_name': values['company_name'], 'errors': problems})
+        else:
+            rows.append({
+                'row': reader.line_num,
+                'company_name': values['company_name'],
+                'company_industry': values['company_industry'],
+                'shareholding_ratio': ratio,
+                'layer_type': layer_type,
+                'company_location': values['company_location'],
+                'creator_email': values.get('creator_email', ''),
+                'parent': last_subsidiary if layer_type == LayerTypeChoices.BRANCH else None,
+            })
+        if layer_type == LayerTypeChoices.SUBSIDIARY:
+            # Branches below an invalid subsidiary are rejected with the whole file
+            last_subsidiary = len(rows) - 1 if not problems else -1
+
+    if errors:
+        raise ImportValidationError(f"{len(errors)} row(s) are invalid; nothing was imported.", errors)
+    return rows
+
+
+def bulk_create_layers(model, layers, batch_size=LAYER_IMPORT_BATCH_SIZE):
+    """
+    Insert new SubsidiaryLayer or BranchLayer objects in batches.
+
+    bulk_create does not support multi-table inheritance, so the
+    LayerProfile rows are inserted first with bulk_create, which sets
+    their primary keys, and the child table rows are then inserted with
+    the same keys. Like bulk_create, no signals are sent.
+    """
+    profile_fields = [field.attname for field in LayerProfile._meta.concrete_fields]
+    profiles = LayerProfile.objects.bulk_create(
+        [LayerProfile(**{name: getattr(layer, name) for name in profile_fields}) for layer in layers],
+        batch_size=batch_size
+    )
+    for layer, profile in zip(layers, profiles):
+        for name in profile_fields:
+            setattr(layer, name, getattr(profile, name))
+        layer.pk = profile.pk
+        layer._state.adding = False
+        layer._state.db = profile._state.db
+
+    fields = model._meta.local_concrete_fields
+    db = router.db_for_write(model)
+    size = min(batch_size, connections[db].ops.bulk_batch_size(fields, layers) or batch_size)
+    for start in range(0, len(layers), size):
+        model._base_manager._insert(layers[start:start + size], fields=fields, using=db)
+    return layers
+
+
+def import_layer_structure(content, user, member_name=None, batch_size=LAYER_IMPORT_BATCH_SIZE):
+    """
+    Import subsidiaries and branches from a layer-structure CSV.
+
+    The whole file is validated first. Superusers name each row's creator
+    in creator_email, and creators are resolved with one query; other users
+    create every layer themselves. Subsidiaries join their creator's latest
+    group, branches the subsidiary above them. Layers are inserted level by
+    level with bulk_create_layers, the creators are added to every new
+    layer with one bulk_create, and the closure table and layer access
+    cache are updated as the signals would have.
+
+    Args:
+        content: Text of the uploaded file
+        user: Requesting user
+        member_name: Name of the creators' memberships, defaults to their email's local part
+        batch_size: Rows per insert statement
+
+    Returns:
+        dict: Counts and a per-row report
+
+    Raises:
+        ImportValidationError: If the file, a creator or a group cannot be resolved
+    """
+    rows = parse_layer_csv(content, require_creator=user.is_superuser)
+
+    # Creators and their latest group, one query each
+    if user.is_superuser:
+        creators = {
+            creator.email: creator
+            for creator in CustomUser.objects.filter(email__in={row['creator_email'] for row in rows})
+        }
+    else:
+        creators = {'': user}
+    groups = {}
+    for creator_id, group_id in GroupLayer.objects.filter(
+        app_users__user__in=creators.values(), app_users__user__role=RoleChoices.CREATOR
+    ).values_list('app_users__user_id', 'id'):
+        groups[creator_id] = max(group_id, groups.get(creator_id, group_id))
+
+    if not user.is_superuser and user.id not in groups:
+        raise ImportValidationError("No GROUP layer found for this user. Cannot import SUBSIDIARY or BRANCH layers.")
+
+    errors = []
+    for row in rows:
+        creator = creators.get(row['creator_email'])
+        if creator is None:
+            errors.append({'row': row['row'], 'company_name': row['company_name'],
+                           'errors': [f"Creator with email {row['creator_email']} not found."]})
+        elif row['layer_type'] == LayerTypeChoices.SUBSIDIARY and creator.id not in groups:
+            errors.append({'row': row['row'], 'company_name': row['company_name'],
+                           'errors': [f"No GROUP layer found for creator {creator.email}."]})
+    if errors:
+        raise ImportValidationError(f"{len(errors)} row(s) are invalid; nothing was imported.", errors)
+
+    def build(model, row, **parent):
+        return model(
+            company_name=row['company_name'],
+            company_industry=row['company_industry'],
+            shareholding_ratio=row['shareholding_ratio'],
+            layer_type=row['layer_type'],
+            company_location=row['company_location'],
+            created_by_admin=creators[row['creator_email']],
+            **parent
+        )
+
+    with transaction.atomic():
+        layers = {}
+        subsidiaries = [
+            (index, build(SubsidiaryLayer, row, group_layer_id=groups[creators[row['creator_email']].id]))
+            for index, row in enumerate(rows) if row['layer_type'] == LayerTypeChoices.SUBSIDIARY
+        ]
+        bulk_create_layers(SubsidiaryLayer, [layer for _, layer in subsidiaries], batch_size)
+        layers.update(subsidiaries)
+
+        branches = [
+            (index, build(BranchLayer, row, subsidiary_layer=layers[row['parent']]))
+            for index, row in enumerate(rows) if row['layer_type'] == LayerTypeChoices.BRANCH
+        ]
+        bulk_create_layers(BranchLayer, [layer for _, layer in branches], batch_size)
+        layers.update(branches)
+
+        AppUser.objects.bulk_create([
+            AppUser(
+                user=layer.created_by_admin,
+                name=member_name or layer.created_by_admin.email.split("@")[0],
+                layer=layer,
+                title="CEO"
+            )
+            for layer in layers.values()
+        ], batch_size=batch_size)
+
+        # Parents first, as add_layers_to_closure requires
+        add_layers_to_closure([layer for _, layer in subsidiaries + branches])
+    bump_layer_access_version()
+
+    created = defaultdict(int)
+    for layer in layers.values():
+        created[layer.layer_type] += 1
+    return {
+        'total_rows': len(rows),
+        'created_subsidiaries': created[LayerTypeChoices.SUBSIDIARY],
+        'created_branches': created[LayerTypeChoices.BRANCH],
+        'rows': [
+            {
+                'row': row['row'],
+                'company_name': row['company_name'],
+                'layer_type': row['layer_type'],
+                'layer_id': layers[index].pk,
+                'parent_id': (layers[index].group_layer_id if row['layer_type'] == LayerTypeChoices.SUBSIDIARY
+                              else layers[index].subsidiary_layer_id),
+            }
+            for index, row in enumerate(rows)
+        ],
+    }
@@ -0,0 +1,94 @@
+import json
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.imports import import_layer_structure, parse_layer_csv
+from accounts.models import (
+    AppUser, BranchLayer, CustomUser, GroupLayer, LayerTypeChoices, RoleChoices, SubsidiaryLayer
+)
+
+
+def build_structure_csv(subsidiaries, branches):
+    """Layer-structure CSV with the given number of subsidiaries, each followed by its branches"""
+    lines = ['company_name,company_industry,shareholding_ratio,layer_type,company_location']
+    for sub in range(subsidiaries):
+        lines.append(f'Subsidiary {sub},Retail,60,SUBSIDIARY,Hong Kong')
+        lines.extend(f'Branch {sub}-{branch},Retail,50,BRANCH,Hong Kong' for branch in range(branches))
+    return '\n'.join(lines)
+
+
+def import_row_by_row(content, user, group):
+    """The previous import: a create() and save() per layer and a membership per row"""
+    last_subsidiary = None
+    for row in parse_layer_csv(content):
+        fields = {
+            'company_name': row['company_name'],
+            'company_industry': row['company_industry'],
+            'shareholding_ratio': float(row['shareholding_ratio']),
+            'company_location': row['company_location'],
+        }
+        if row['layer_type'] == LayerTypeChoices.SUBSIDIARY:
+            layer = last_subsidiary = SubsidiaryLayer.objects.create(
+                group_layer=group, layer_type=LayerTypeChoices.SUBSIDIARY, **fields
+            )
+        else:
+            layer = BranchLayer.objects.create(
+                subsidiary_layer=last_subsidiary, layer_type=LayerTypeChoices.BRANCH, **fields
+            )
+        layer.created_by_admin = user
+        layer.save()
+        AppUser.objects.create(user=user, name=user.email.split("@")[0], layer=layer, title="CEO")
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the bulk layer-structure import against row-by-row creation (all writes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subsidiaries', type=int, default=20, help='Subsidiaries in the generated file')
+        parser.add_argument('--branches', type=int, default=100, help='Branches per subsidiary')
+        parser.add_argument('--format', choices=['pretty', 'json'], default='pretty', help='Output format')
+
+    def handle(self, *args, **options):
+        if options['subsidiaries'] < 1 or options['branches'] < 0:
+            raise CommandError('--subsidiaries must be at least 1 and --branches at least 0')
+
+        content = build_structure_csv(options['subsidiaries'], options['branches'])
+        layers = options['subsidiaries'] * (options['branches'] + 1)
+
+        results = {'layers': layers}
+        for name in ('row_by_row', 'bulk'):
+            with transaction.atomic():
+                user = CustomUser.objects.create_user(
+                    email=f'benchmark-{uuid.uuid4().hex}@example.com', password=uuid.uuid4().hex,
+                    role=RoleChoices.CREATOR
+                )
+                group = GroupLayer.objects.create(
+                    company_name='Benchmark Group', company_industry='Retail',
+                    company_location='Hong Kong', layer_type=LayerTypeChoices.GROUP
+                )
+                AppUser.objects.create(user=user, layer=group, name='Benchmark')
+
+                started = time.perf_counter()
+                if name == 'bulk':
+                    import_layer_structure(content, user)
+                else:
+                    import_row_by_row(content, user, group)
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+
+            results[f'{name}_seconds'] = round(elapsed, 3)
+            results[f'{name}_layers_per_second'] = round(layers / elapsed, 1) if elapsed else None
+
+        if results['bulk_seconds']:
+            results['speedup'] = round(results['row_by_row_seconds'] / results['bulk_seconds'], 2)
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{layers} layers: row-by-row {results['row_by_row_seconds']}s "
+            f"({results['row_by_row_layers_per_second']}/s), bulk {results['bulk_seconds']}s "
+            f"({results['bulk_layers_per_second']}/s), speedup={results.get('speedup')}x"
+        )
@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from accounts.imports import UserImportWorker
+
+
+class Command(BaseCommand):
+    help = 'Run the user import worker: import queued user CSV files in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run queued jobs until none is left, then exit')
+        parser.add_argument('--batch-size', type=int, default=1, help='Jobs claimed per iteration')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when no job is queued')
+        parser.add_argument('--worker-id', help='Name recorded on claimed jobs (default: host:pid)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        worker = UserImportWorker(worker_id=options['worker_id'])
+        self.stdout.write(f'User import worker {worker.worker_id} started')
+
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                count = worker.run_once(options['batch_size'])
+                processed += count
+                if options['once'] and not count:
+                    break
+                if not count:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping user import worker')
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {processed} user import jobs'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from accounts.models import LayerClosure
+from accounts.utils import rebuild_layer_closure
+
+class Command(BaseCommand):
+    help = 'Rebuild the layer ancestor/descendant closure table from the company hierarchy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per statement')
+
+    def handle(self, *args, **options):
+        before = LayerClosure.objects.count()
+        written = rebuild_layer_closure(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt layer closure: {before} rows replaced with {written}')
+        )
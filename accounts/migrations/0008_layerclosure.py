@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_layer_closure(apps, schema_editor):
+    """Populate the closure table from the existing hierarchy"""
+    LayerProfile = apps.get_model('accounts', 'LayerProfile')
+    SubsidiaryLayer = apps.get_model('accounts', 'SubsidiaryLayer')
+    BranchLayer = apps.get_model('accounts', 'BranchLayer')
+    LayerClosure = apps.get_model('accounts', 'LayerClosure')
+
+    parents = {layer_id: None for layer_id in LayerProfile.objects.values_list('id', flat=True)}
+    parents.update(SubsidiaryLayer.objects.values_list('layerprofile_ptr_id', 'group_layer_id'))
+    parents.update(BranchLayer.objects.values_list('layerprofile_ptr_id', 'subsidiary_layer_id'))
+
+    rows = []
+    for layer_id in parents:
+        ancestor_id, depth = layer_id, 0
+        while ancestor_id is not None:
+            rows.append(LayerClosure(ancestor_id=ancestor_id, descendant_id=layer_id, depth=depth))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    LayerClosure.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_add_metricschemaregistry_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LayerClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='accounts.layerprofile')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='accounts.layerprofile')),
+            ],
+            options={
+                'verbose_name': 'Layer Closure',
+                'verbose_name_plural': 'Layer Closures',
+                'indexes': [models.Index(fields=['descendant', 'ancestor'], name='accounts_la_descend_5006c0_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(backfill_layer_closure, migrations.RunPython.noop),
+    ]
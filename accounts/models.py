@@ -208,6 +208,26 @@ class BranchLayer(LayerProfile):
         verbose_name = "Branch"
         verbose_name_plural = "Branches"
 
+class LayerClosure(models.Model):
+    """
+    Ancestor/descendant pairs of the company hierarchy, including each
+    layer paired with itself at depth 0. Kept in sync by signals.
+    """
+    ancestor = models.ForeignKey(LayerProfile, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(LayerProfile, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ("ancestor", "descendant")
+        indexes = [
+            models.Index(fields=['descendant', 'ancestor']),
+        ]
+        verbose_name = "Layer Closure"
+        verbose_name_plural = "Layer Closures"
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
 class AppUser(models.Model):
     """
     Extended user profile with company layer association
@@ -225,6 +245,62 @@ class AppUser(models.Model):
     def __str__(self):
         return f"{self.name} - {self.layer.company_name}"
 
+class UserImportJob(models.Model):
+    """
+    A queued import of a large user CSV into one layer.
+
+    The file is validated when it is uploaded; its rows are stored here and
+    imported in batches by the process_user_imports worker command, which
+    records progress after each batch.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        RUNNING = 'RUNNING', 'Running'
+        SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+        FAILED = 'FAILED', 'Failed'
+
+    ACTIVE_STATUSES = [Status.QUEUED, Status.RUNNING]
+
+    layer = models.ForeignKey(LayerProfile, on_delete=models.CASCADE, related_name='user_import_jobs')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='user_import_jobs')
+
+    rows = models.JSONField(default=list, help_text="Validated rows of the uploaded file")
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Lease held by the worker running the import")
+
+    report = models.JSONField(null=True, blank=True, help_text="Per-row outcome of the import")
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"User import {self.id} into layer {self.layer_id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.SUCCEEDED, self.Status.FAILED)
+
+    @property
+    def progress_percentage(self):
+        if not self.total_rows:
+            return 100.0 if self.is_finished else 0.0
+        return round(self.processed_rows / self.total_rows * 100, 1)
+
 class CSVTemplate(models.Model):
     """
     Model for managing CSV import templates
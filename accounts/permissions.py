@@ -8,6 +8,7 @@ from .models import (
     BranchLayer,
     CustomUser
 )
+from .services import LayerAccessResolver, get_layer_access
 
 class BakerTillyAccessMixin:
     """
@@ -95,26 +96,17 @@ class IsCreator(BakerTillyAccessMixin, BasePermission):
         return super().has_permission(request, view) or request.user.role == RoleChoices.CREATOR
 
     def has_object_permission(self, request, view, obj):
-        creator_layers = self.get_creator_layers(request.user)
+        creator_layer_ids = get_layer_access(request).member_subtree_layer_ids
         if hasattr(obj, 'layer'):
-            return obj.layer in creator_layers
-        return obj in creator_layers
+            return obj.layer_id in creator_layer_ids
+        return obj.pk in creator_layer_ids
 
     @staticmethod
     def get_creator_layers(user):
         """Get all layers that the creator has access to"""
-        layers = []
-        for app_user in user.app_users.all():
-            layers.append(app_user.layer)
-            # If it's a group layer, add subsidiaries and branches
-            if app_user.layer.layer_type == 'GROUP':
-                layers.extend(app_user.layer.subsidiaries.all())
-                for subsidiary in app_user.layer.subsidiaries.all():
-                    layers.extend(subsidiary.branches.all())
-            # If it's a subsidiary layer, add branches
-            elif app_user.layer.layer_type == 'SUBSIDIARY':
-                layers.extend(app_user.layer.branches.all())
-        return layers
+        return LayerProfile.objects.filter(
+            id__in=LayerAccessResolver(user).member_subtree_layer_ids
+        )
 
 class CanManageAppUsers(BakerTillyAccessMixin, BasePermission):
     """
@@ -3,6 +3,7 @@
 from .models import (
     CustomUserSerializer,
     AppUserSerializer,
+    UserImportJobSerializer,
     LayerProfileSerializer,
     GroupLayerSerializer,
     SubsidiaryLayerSerializer,
@@ -18,6 +19,7 @@ from .auth import (
 __all__ = [
     'CustomUserSerializer',
     'AppUserSerializer',
+    'UserImportJobSerializer',
     'LayerProfileSerializer',
     'GroupLayerSerializer',
     'SubsidiaryLayerSerializer',
@@ -2,7 +2,7 @@ import pytz
 from rest_framework import serializers
 from django.utils import timezone
 from django.db.models import Count
-from ..models import CustomUser, AppUser, LayerProfile, GroupLayer, SubsidiaryLayer, BranchLayer, RoleChoices
+from ..models import CustomUser, AppUser, LayerProfile, GroupLayer, SubsidiaryLayer, BranchLayer, RoleChoices, UserImportJob
 from ..utils import validate_password
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -103,6 +103,18 @@ class AppUserSerializer(serializers.ModelSerializer):
 
         return instance
 
+class UserImportJobSerializer(serializers.ModelSerializer):
+    """Serializer for the status and report of a queued user import"""
+    progress_percentage = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = UserImportJob
+        fields = [
+            'id', 'layer', 'status', 'total_rows', 'processed_rows', 'progress_percentage',
+            'report', 'last_error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
 class LayerProfileSerializer(serializers.ModelSerializer):
     """
     Base serializer for company layer hierarchy with optimized queries
@@ -181,6 +193,9 @@ class LayerProfileSerializer(serializers.ModelSerializer):
 
     def get_parent_id(self, obj):
         """Get the ID of the parent layer"""
+        # Annotated by LayerTree
+        if hasattr(obj, 'parent_layer_id'):
+            return obj.parent_layer_id
         try:
             if obj.layer_type == 'SUBSIDIARY' and hasattr(obj, 'subsidiarylayer'):
                 return obj.subsidiarylayer.group_layer_id
@@ -1,15 +1,19 @@
 import re
+import time
+from collections import defaultdict
+from django.core.cache import cache
 from django.core.mail import EmailMessage, send_mail
 from rest_framework import serializers
 from django.conf import settings
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
 
-from .models import RoleChoices, LayerTypeChoices, GroupLayer, SubsidiaryLayer, LayerProfile, BranchLayer, AppUser, CustomUser
+from .models import RoleChoices, LayerTypeChoices, LayerProfile, AppUser, CustomUser, LayerClosure
 from .utils import (
     validate_password,
     generate_otp_code,
-    get_all_lower_layers,
     get_creator_layers,
     get_parent_layer
 )
@@ -22,58 +26,105 @@ COMMON_PASSWORDS = {
     "welcome", "admin"
 }
 
-def get_flat_sorted_layers(accessible_layers):
+class LayerTree:
     """
-    Convert hierarchical layer structure to flat sorted list
+    In-memory company hierarchy over a set of layers.
+
+    The layers are read with their parent ids in a single query; flat,
+    nested and ancestor views are then built without further queries.
+    Only layers in the given set are part of the tree, so a layer whose
+    parent is outside the set has no parent node.
     """
-    flat_list = []
-    group_qs = accessible_layers.filter(layer_type=LayerTypeChoices.GROUP)
-    
-    if group_qs.exists():
-        group_ids = group_qs.values_list('id', flat=True)
-        groups = GroupLayer.objects.filter(id__in=group_ids).order_by('created_at')
+
+    def __init__(self, layers):
+        """
+        Args:
+            layers: LayerProfile queryset, e.g. get_accessible_layers(user)
+        """
+        self.layers = {}
+        self.children = defaultdict(list)
+        queryset = layers.select_related('created_by_admin').annotate(
+            parent_layer_id=Coalesce('subsidiarylayer__group_layer_id', 'branchlayer__subsidiary_layer_id')
+        ).order_by('created_at', 'id')
+        for layer in queryset:
+            self.layers[layer.id] = layer
+            self.children[layer.parent_layer_id].append(layer)
+
+    def __contains__(self, layer):
+        return getattr(layer, 'pk', layer) in self.layers
+
+    def __len__(self):
+        return len(self.layers)
+
+    def get(self, layer_id):
+        """The layer with the given id, or None if it is not in the tree."""
+        return self.layers.get(layer_id)
+
+    def get_parent(self, layer):
+        """The parent of a layer, or None if it has none in the tree."""
+        return self.layers.get(getattr(layer, 'parent_layer_id', None))
+
+    def get_children(self, layer, layer_type=None):
+        """Children of a layer in creation order, optionally of one layer type."""
+        children = self.children.get(getattr(layer, 'pk', layer), [])
+        if layer_type:
+            children = [child for child in children if child.layer_type == layer_type]
+        return children
+
+    def get_groups(self):
+        """Group layers in creation order."""
+        return [layer for layer in self.layers.values() if layer.layer_type == LayerTypeChoices.GROUP]
+
+    def get_ancestors(self, layer):
+        """
+        Ancestors of a layer from the top down, stopping at the first
+        ancestor that is not in the tree.
+        """
+        ancestors = []
+        parent = self.get_parent(layer)
+        while parent is not None:
+            ancestors.insert(0, parent)
+            parent = self.get_parent(parent)
+        return ancestors
+
+    def flat_sorted(self):
+        """
+        Layers as groups, each followed by its subsidiaries and their
+        branches. If the tree has no group, all layers in creation order.
+        """
+        groups = self.get_groups()
+        if not groups:
+            return list(self.layers.values())
+
+        flat_list = []
         for group in groups:
-            group_serialized = LayerProfileSerializer(group).data
-            flat_list.append(group_serialized)
-            
-            subsidiary_ids = accessible_layers.filter(
-                layer_type=LayerTypeChoices.SUBSIDIARY
-            ).values_list('id', flat=True)
-            subsidiaries = SubsidiaryLayer.objects.filter(
-                group_layer=group,
-                id__in=subsidiary_ids
-            ).order_by('created_at')
-            
-            for subsidiary in subsidiaries:
-                subsidiary_serialized = LayerProfileSerializer(subsidiary).data
-                flat_list.append(subsidiary_serialized)
-                
-                branch_ids = accessible_layers.filter(
-                    layer_type=LayerTypeChoices.BRANCH
-                ).values_list('id', flat=True)
-                branches = BranchLayer.objects.filter(
-                    subsidiary_layer=subsidiary,
-                    id__in=branch_ids
-                ).order_by('created_at')
-                
-                for branch in branches:
-                    branch_serialized = LayerProfileSerializer(branch).data
-                    flat_list.append(branch_serialized)
+            flat_list.append(group)
+            for subsidiary in self.get_children(group, LayerTypeChoices.SUBSIDIARY):
+                flat_list.append(subsidiary)
+                flat_list.extend(self.get_children(subsidiary, LayerTypeChoices.BRANCH))
         return flat_list
-    
-    # If no GROUP layer, just serialize all accessible layers
-    return LayerProfileSerializer(
-        accessible_layers.order_by('created_at'), 
-        many=True
-    ).data
 
-def send_email_to_user(email, password):
+    def nested(self, layer):
+        """A layer and its descendants as {'layer': ..., 'children': [...]}."""
+        return {
+            'layer': layer,
+            'children': [self.nested(child) for child in self.get_children(layer)],
+        }
+
+def get_flat_sorted_layers(accessible_layers):
+    """
+    Convert hierarchical layer structure to flat sorted list
+    """
+    return LayerProfileSerializer(LayerTree(accessible_layers).flat_sorted(), many=True).data
+
+def send_email_to_user(email, password, connection=None):
     """
     Send an email to the user with their generated password.
 
     Args:
         email (str): The user's email address.
         password (str): The generated password for the user.
+        connection: Optional mail connection shared by several sends.
 
     Returns:
         bool: True if the email is sent successfully, False otherwise.
@@ -100,6 +151,7 @@ def send_email_to_user(email, password):
             message,
             settings.DEFAULT_FROM_EMAIL,
             [email],
+            connection=connection,
         )
         result = email_message.send(fail_silently=False)
         print(f"Email send result: {result}")
@@ -141,9 +193,16 @@ def send_otp_via_email(email, otp_code):
         print(f"Traceback: {traceback.format_exc()}")
         raise  # Re-raise the exception to maintain original behavior
 
+def _first_app_user_layer_id(user):
+    """Subquery for the layer of the user's first AppUser membership."""
+    return Subquery(
+        AppUser.objects.filter(user=user).order_by('id').values('layer_id')[:1]
+    )
+
 def has_layer_access(user, layer):
     """
     Check if the user has access to a specific layer or its sub-layers.
+    Resolved with a single EXISTS query against the layer closure table.
     
     Args:
         user: CustomUser instance
@@ -152,12 +211,24 @@ def has_layer_access(user, layer):
     Returns:
         bool: True if user has access to the layer
     """
+    layer_id = getattr(layer, 'pk', layer)
+    
     if user.role == RoleChoices.MANAGEMENT:
-        return layer in get_all_lower_layers(user.app_users.first().layer)
+        return LayerClosure.objects.filter(
+            descendant_id=layer_id,
+            ancestor_id=_first_app_user_layer_id(user)
+        ).exists()
     elif user.role == RoleChoices.OPERATION:
-        return layer == user.app_users.first().layer
+        return AppUser.objects.filter(
+            id=Subquery(AppUser.objects.filter(user=user).order_by('id').values('id')[:1]),
+            layer_id=layer_id
+        ).exists()
     elif user.role == RoleChoices.CREATOR:
-        return layer in get_creator_layers(user)
+        return LayerClosure.objects.filter(
+            descendant_id=layer_id,
+            ancestor__grouplayer__isnull=False,
+            ancestor__app_users__user=user
+        ).exists()
     return False
 
 def get_accessible_layers(user):
@@ -169,7 +240,9 @@ def get_accessible_layers(user):
         return LayerProfile.objects.all()
 
     if user.role == RoleChoices.MANAGEMENT:
-        return get_all_lower_layers(user.app_users.first().layer)
+        return LayerProfile.objects.filter(
+            ancestor_links__ancestor_id=_first_app_user_layer_id(user)
+        )
 
     elif user.role == RoleChoices.OPERATION:
         return LayerProfile.objects.filter(
@@ -200,4 +273,114 @@ def is_creator_on_layer(user, layer):
         layer=layer,
         user=user,
         user__role=RoleChoices.CREATOR
-    ).exists() 
\ No newline at end of file
+    ).exists() 
+
+LAYER_ACCESS_VERSION_KEY = 'layer_access:version'
+
+def get_layer_access_version():
+    """Current version of the cached layer access sets."""
+    return cache.get_or_set(LAYER_ACCESS_VERSION_KEY, time.time_ns, None)
+
+def bump_layer_access_version():
+    """
+    Invalidate every cached layer access set by moving to a new version.
+    Called when AppUser or layer rows change.
+    """
+    try:
+        cache.incr(LAYER_ACCESS_VERSION_KEY)
+    except ValueError:
+        # Key expired or never set; start from a value no old entry can use
+        cache.set(LAYER_ACCESS_VERSION_KEY, time.time_ns(), None)
+
+class LayerAccessResolver:
+    """
+    Resolves which layers a user can access, computing each layer id set at
+    most once. Use get_layer_access(request) in views so the resolver is
+    shared by every check made while handling a request.
+
+    When settings.LAYER_ACCESS_CACHE_TIMEOUT is set, the sets are also kept
+    in Django's cache under a version key that is bumped whenever AppUser or
+    layer rows change.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._sets = {}
+        self._version = None
+
+    @property
+    def is_admin(self):
+        """Staff, superusers and Baker Tilly admins can access every layer."""
+        return bool(
+            self.user.is_staff or self.user.is_superuser or
+            getattr(self.user, 'is_baker_tilly_admin', False)
+        )
+
+    @property
+    def member_layer_ids(self):
+        """Ids of the layers the user is directly assigned to."""
+        return self._get('member', lambda: AppUser.objects.filter(
+            user=self.user
+        ).values_list('layer_id', flat=True))
+
+    @property
+    def member_subtree_layer_ids(self):
+        """Ids of the user's layers and every layer below them."""
+        return self._get('subtree', lambda: LayerClosure.objects.filter(
+            ancestor__app_users__user=self.user
+        ).values_list('descendant_id', flat=True))
+
+    @property
+    def accessible_layer_ids(self):
+        """Ids of the layers accessible under the user's role."""
+        return self._get('role', lambda: get_accessible_layers(self.user).values_list('id', flat=True))
+
+    def can_access_layer(self, layer):
+        """
+        Check whether the user is an admin or assigned to the layer.
+
+        Args:
+            layer: LayerProfile instance or layer id
+        """
+        if self.is_admin:
+            return True
+        layer_id = getattr(layer, 'pk', layer)
+        try:
+            return int(layer_id) in self.member_layer_ids
+        except (TypeError, ValueError):
+            return False
+
+    def filter_accessible(self, layer_ids):
+        """Return the subset of layer_ids the user can access."""
+        if self.is_admin:
+            return set(layer_ids)
+        return set(layer_ids) & self.member_layer_ids
+
+    def _get(self, name, query):
+        if name in self._sets:
+            return self._sets[name]
+
+        timeout = getattr(settings, 'LAYER_ACCESS_CACHE_TIMEOUT', 0)
+        key = None
+        if timeout and self.user.pk is not None:
+            if self._version is None:
+                self._version = get_layer_access_version()
+            key = f'layer_access:{self._version}:{self.user.pk}:{name}'
+            cached = cache.get(key)
+            if cached is not None:
+                self._sets[name] = cached
+                return cached
+
+        ids = frozenset(query())
+        if key:
+            cache.set(key, ids, timeout)
+        self._sets[name] = ids
+        return ids
+
+def get_layer_access(request):
+    """Get the LayerAccessResolver for this request's user, memoised on the request."""
+    resolver = getattr(request, '_layer_access', None)
+    if resolver is None or resolver.user != request.user:
+        resolver = LayerAccessResolver(request.user)
+        request._layer_access = resolver
+    return resolver
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.db import transaction
-from .models import AppUser, CustomUser
+from .models import AppUser, CustomUser, LayerProfile, GroupLayer, SubsidiaryLayer, BranchLayer
+from .utils import sync_layer_closure
+from .services import bump_layer_access_version
 
 @receiver(post_delete, sender=AppUser)
 def cleanup_orphaned_custom_user(sender, instance, **kwargs):
@@ -17,4 +19,34 @@ def cleanup_orphaned_custom_user(sender, instance, **kwargs):
             custom_user.delete()
     except CustomUser.DoesNotExist:
         # CustomUser was already deleted
-        pass 
\ No newline at end of file
+        pass
+
+@receiver(post_save, sender=LayerProfile)
+@receiver(post_save, sender=GroupLayer)
+@receiver(post_save, sender=SubsidiaryLayer)
+@receiver(post_save, sender=BranchLayer)
+def update_layer_closure(sender, instance, created, **kwargs):
+    """
+    Signal handler to keep the LayerClosure table in sync when a layer is
+    created or moved under a different parent. Rows for deleted layers are
+    removed by the foreign key cascade.
+    """
+    # A base LayerProfile row carries no parent link; a subsidiary or branch
+    # saved through it has not moved and must keep its ancestors
+    if sender is LayerProfile and not created:
+        return
+    sync_layer_closure(instance, created=created)
+
+@receiver(post_save, sender=AppUser)
+@receiver(post_delete, sender=AppUser)
+@receiver(post_save, sender=LayerProfile)
+@receiver(post_delete, sender=LayerProfile)
+@receiver(post_save, sender=GroupLayer)
+@receiver(post_save, sender=SubsidiaryLayer)
+@receiver(post_save, sender=BranchLayer)
+def invalidate_layer_access_cache(sender, **kwargs):
+    """
+    Signal handler to invalidate cached layer access sets when memberships
+    or the layer hierarchy change.
+    """
+    bump_layer_access_version()
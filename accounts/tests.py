@@ -1,3 +1,539 @@
-from django.test import TestCase
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import csv
+import gzip
+from io import StringIO
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import (
+    CustomUser, AppUser, LayerProfile, GroupLayer, SubsidiaryLayer, BranchLayer, LayerClosure, RoleChoices,
+    UserImportJob
+)
+from .imports import bulk_create_layers, get_user_import_settings, hash_passwords
+from .permissions import IsCreator
+from .services import has_layer_access, get_accessible_layers, LayerAccessResolver, LayerTree
+
+
+def closure_pairs():
+    return set(LayerClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+
+class LayerClosureTest(TestCase):
+    """Tests for the layer closure table and closure-based access checks"""
+
+    def setUp(self):
+        layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **layer_fields)
+        self.other_group = GroupLayer.objects.create(company_name='Other', layer_type='GROUP', **layer_fields)
+        self.subsidiary = SubsidiaryLayer.objects.create(
+            company_name='Sub', layer_type='SUBSIDIARY', group_layer=self.group, **layer_fields
+        )
+        self.branch = BranchLayer.objects.create(
+            company_name='Branch', layer_type='BRANCH', subsidiary_layer=self.subsidiary, **layer_fields
+        )
+
+    def _user(self, email, role, layer):
+        user = CustomUser.objects.create_user(email=email, password='TestPass123!', role=role)
+        AppUser.objects.create(user=user, layer=layer, name=email)
+        return user
+
+    def test_closure_rows_created_with_layers(self):
+        self.assertEqual(closure_pairs(), {
+            (self.group.id, self.group.id, 0),
+            (self.other_group.id, self.other_group.id, 0),
+            (self.subsidiary.id, self.subsidiary.id, 0),
+            (self.group.id, self.subsidiary.id, 1),
+            (self.branch.id, self.branch.id, 0),
+            (self.subsidiary.id, self.branch.id, 1),
+            (self.group.id, self.branch.id, 2),
+        })
+
+    def test_reparent_moves_subtree(self):
+        self.subsidiary.group_layer = self.other_group
+        self.subsidiary.save()
+
+        ancestors = set(
+            LayerClosure.objects.filter(descendant=self.branch).values_list('ancestor_id', flat=True)
+        )
+        self.assertEqual(ancestors, {self.branch.id, self.subsidiary.id, self.other_group.id})
+
+    def test_saving_base_profile_keeps_ancestors(self):
+        before = closure_pairs()
+
+        LayerProfile.objects.get(pk=self.branch.pk).save()
+
+        self.assertEqual(closure_pairs(), before)
+
+    def test_delete_removes_rows(self):
+        self.branch.delete()
+        self.assertFalse(LayerClosure.objects.filter(descendant_id=self.branch.id).exists())
+
+    def test_rebuild_command_matches_signals(self):
+        expected = closure_pairs()
+        LayerClosure.objects.all().delete()
+
+        call_command('rebuild_layer_closure', stdout=StringIO())
+
+        self.assertEqual(closure_pairs(), expected)
+
+    def test_access_checks_use_single_query(self):
+        management = self._user('manager@test.com', RoleChoices.MANAGEMENT, self.subsidiary)
+        creator = self._user('creator@test.com', RoleChoices.CREATOR, self.group)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(has_layer_access(management, self.branch))
+        with self.assertNumQueries(1):
+            self.assertFalse(has_layer_access(management, self.group))
+        with self.assertNumQueries(1):
+            self.assertTrue(has_layer_access(creator, self.branch))
+        self.assertFalse(has_layer_access(creator, self.other_group))
+
+        self.assertEqual(
+            set(get_accessible_layers(management).values_list('id', flat=True)),
+            {self.subsidiary.id, self.branch.id}
+        )
+        self.assertEqual(
+            set(get_accessible_layers(creator).values_list('id', flat=True)),
+            {self.group.id, self.subsidiary.id, self.branch.id}
+        )
+
+
+class LayerAccessResolverTest(TestCase):
+    """Tests for memoised and cached layer access checks"""
+
+    def setUp(self):
+        layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **layer_fields)
+        self.subsidiary = SubsidiaryLayer.objects.create(
+            company_name='Sub', layer_type='SUBSIDIARY', group_layer=self.group, **layer_fields
+        )
+        self.branch = BranchLayer.objects.create(
+            company_name='Branch', layer_type='BRANCH', subsidiary_layer=self.subsidiary, **layer_fields
+        )
+        self.user = CustomUser.objects.create_user(
+            email='creator@test.com', password='TestPass123!', role=RoleChoices.CREATOR
+        )
+        AppUser.objects.create(user=self.user, layer=self.subsidiary, name='Creator')
+        cache.clear()
+
+    def test_membership_is_loaded_once(self):
+        access = LayerAccessResolver(self.user)
+        with self.assertNumQueries(1):
+            self.assertTrue(access.can_access_layer(self.subsidiary))
+            self.assertTrue(access.can_access_layer(str(self.subsidiary.id)))
+            self.assertFalse(access.can_access_layer(self.group.id))
+            self.assertEqual(access.filter_accessible([self.group.id, self.subsidiary.id]), {self.subsidiary.id})
+
+    def test_creator_layers_include_subtree(self):
+        self.assertEqual(
+            set(IsCreator.get_creator_layers(self.user).values_list('id', flat=True)),
+            {self.subsidiary.id, self.branch.id}
+        )
+
+    @override_settings(LAYER_ACCESS_CACHE_TIMEOUT=60)
+    def test_cache_is_shared_and_invalidated(self):
+        self.assertFalse(LayerAccessResolver(self.user).can_access_layer(self.group))
+
+        # A new resolver (i.e. the next request) reads the cached set
+        with self.assertNumQueries(0):
+            self.assertFalse(LayerAccessResolver(self.user).can_access_layer(self.group))
+
+        AppUser.objects.create(user=self.user, layer=self.group, name='Creator')
+
+        self.assertTrue(LayerAccessResolver(self.user).can_access_layer(self.group))
+
+
+class LayerTreeTest(TestCase):
+    """Tests for the in-memory layer tree and the endpoints built on it"""
+
+    def setUp(self):
+        self.layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **self.layer_fields)
+        self.other_group = GroupLayer.objects.create(
+            company_name='Other', layer_type='GROUP', **self.layer_fields
+        )
+        self.subsidiary = self._subsidiary('Sub B')
+        self.branch = self._branch('Branch', self.subsidiary)
+        self.second_subsidiary = self._subsidiary('Sub A')
+        self.admin = CustomUser.objects.create_user(
+            email='admin@test.com', password='TestPass123!', is_active=True, is_baker_tilly_admin=True
+        )
+        self.manager = CustomUser.objects.create_user(
+            email='manager@test.com', password='TestPass123!', is_active=True, role=RoleChoices.MANAGEMENT
+        )
+        AppUser.objects.create(user=self.manager, layer=self.subsidiary, name='Manager')
+        self.client = APIClient()
+        cache.clear()
+
+    def _subsidiary(self, name):
+        return SubsidiaryLayer.objects.create(
+            company_name=name, layer_type='SUBSIDIARY', group_layer=self.group, **self.layer_fields
+        )
+
+    def _branch(self, name, subsidiary):
+        return BranchLayer.objects.create(
+            company_name=name, layer_type='BRANCH', subsidiary_layer=subsidiary, **self.layer_fields
+        )
+
+    def _grow(self):
+        for index in range(5):
+            subsidiary = self._subsidiary(f'Grown {index}')
+            for branch_index in range(10):
+                self._branch(f'Grown {index}.{branch_index}', subsidiary)
+
+    def _count_queries(self, url, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_tree_views(self):
+        with self.assertNumQueries(1):
+            tree = LayerTree(get_accessible_layers(self.admin))
+
+        self.assertEqual(
+            [layer.company_name for layer in tree.flat_sorted()],
+            ['Group', 'Sub B', 'Branch', 'Sub A', 'Other']
+        )
+        self.assertEqual(tree.get_ancestors(tree.get(self.branch.id)), [tree.get(self.group.id), tree.get(self.subsidiary.id)])
+        nested = tree.nested(tree.get(self.group.id))
+        self.assertEqual(
+            [(child['layer'].id, [grandchild['layer'].id for grandchild in child['children']])
+             for child in nested['children']],
+            [(self.subsidiary.id, [self.branch.id]), (self.second_subsidiary.id, [])]
+        )
+
+        # The manager's subsidiary has no parent in their tree
+        tree = LayerTree(get_accessible_layers(self.manager))
+        self.assertEqual([layer.id for layer in tree.flat_sorted()], [self.subsidiary.id, self.branch.id])
+        self.assertEqual(tree.get_ancestors(tree.get(self.branch.id)), [tree.get(self.subsidiary.id)])
+
+    def test_layer_list_uses_constant_queries(self):
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('layer-profile-list')
+        response = self.client.get(url)
+        self.assertEqual(
+            [(layer['company_name'], layer['parent_id']) for layer in response.data],
+            [('Group', None), ('Sub B', self.group.id), ('Branch', self.subsidiary.id),
+             ('Sub A', self.group.id), ('Other', None)]
+        )
+
+        few = self._count_queries(url)
+        self._grow()
+        self.assertEqual(self._count_queries(url), few)
+
+    def test_structure_uses_constant_queries(self):
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('client-structure', args=[self.group.id])
+        response = self.client.get(url)
+        self.assertEqual(response.data['group']['company_name'], 'Group')
+        self.assertEqual(
+            [(sub['subsidiary']['company_name'], [branch['company_name'] for branch in sub['branches']])
+             for sub in response.data['subsidiaries']],
+            [('Sub B', ['Branch']), ('Sub A', [])]
+        )
+        self.assertEqual(self.client.get(reverse('client-structure', args=[self.branch.id])).status_code, 404)
+
+        few = self._count_queries(url)
+        self._grow()
+        self.assertEqual(self._count_queries(url), few)
+
+    def test_available_layers(self):
+        from data_management.models import Template, TemplateAssignment
+
+        assignment = TemplateAssignment.objects.create(
+            template=Template.objects.create(name='Annual'), layer=self.branch,
+            reporting_period_start='2024-01-01', reporting_period_end='2024-12-31'
+        )
+        url = reverse('metric-submission-available-layers')
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(url, {'assignment_id': assignment.id})
+        self.assertEqual(
+            [(layer['name'], layer['parent'] and layer['parent']['name']) for layer in response.data],
+            [('Group', None), ('Sub B', 'Group'), ('Branch', 'Sub B')]
+        )
+
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get(url)
+        self.assertEqual(
+            [(layer['name'], layer['parent'] and layer['parent']['name']) for layer in response.data],
+            [('Sub B', None), ('Branch', 'Sub B')]
+        )
+
+        self.client.force_authenticate(user=self.admin)
+        few = self._count_queries(url)
+        self._grow()
+        self.assertEqual(self._count_queries(url), few)
+
+
+class CSVExportTest(TestCase):
+    """Tests for the streamed layer and user CSV exports"""
+
+    def setUp(self):
+        layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **layer_fields)
+        other_group = GroupLayer.objects.create(company_name='Other', layer_type='GROUP', **layer_fields)
+        self.first = SubsidiaryLayer.objects.create(
+            company_name='Sub 1', layer_type='SUBSIDIARY', group_layer=self.group, **layer_fields
+        )
+        self.second = SubsidiaryLayer.objects.create(
+            company_name='Sub 2', layer_type='SUBSIDIARY', group_layer=self.group, **layer_fields
+        )
+        not_member = SubsidiaryLayer.objects.create(
+            company_name='Sub 3', layer_type='SUBSIDIARY', group_layer=self.group, **layer_fields
+        )
+        branch = BranchLayer.objects.create(
+            company_name='Branch 1', layer_type='BRANCH', subsidiary_layer=self.first, **layer_fields
+        )
+        orphan = BranchLayer.objects.create(
+            company_name='Branch 3', layer_type='BRANCH', subsidiary_layer=not_member, **layer_fields
+        )
+        # A later branch of the first subsidiary is still listed under it
+        late_branch = BranchLayer.objects.create(
+            company_name='Branch 1b', layer_type='BRANCH', subsidiary_layer=self.first, **layer_fields
+        )
+        self.user = CustomUser.objects.create_user(
+            email='creator@test.com', password='TestPass123!', is_active=True, role=RoleChoices.CREATOR
+        )
+        for layer in (late_branch, self.group, self.second, self.first, branch, orphan):
+            AppUser.objects.create(user=self.user, layer=layer, name='Creator', title='Owner')
+        other = CustomUser.objects.create_user(email='other@test.com', password='TestPass123!')
+        AppUser.objects.create(user=other, layer=other_group, name='Other')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _rows(self, response):
+        content = b''.join(response.streaming_content)
+        if response['Content-Type'] == 'application/gzip':
+            content = gzip.decompress(content)
+        return list(csv.reader(content.decode('utf-8').splitlines()))
+
+    def test_layer_export_streams_hierarchy(self):
+        # The filename's group, then every row from one ordered query
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('layer-profile-export-csv'))
+            rows = self._rows(response)
+
+        self.assertTrue(response.streaming)
+        self.assertIn('Group_Company_Structure.csv', response['Content-Disposition'])
+        self.assertEqual(rows[0][:4], ['company_name', 'company_industry', 'shareholding_ratio', 'layer_type'])
+        self.assertEqual(
+            [(row[0], row[3]) for row in rows[1:]],
+            [('Group', 'GROUP'), ('Sub 1', 'SUBSIDIARY'), ('Branch 1', 'BRANCH'),
+             ('Branch 1b', 'BRANCH'), ('Sub 2', 'SUBSIDIARY')]
+        )
+        self.assertTrue(rows[1][5].endswith('HKT'))
+
+        response = self.client.get(reverse('layer-profile-export-csv'), {'compress': 'gzip'})
+        self.assertIn('Group_Company_Structure.csv.gz', response['Content-Disposition'])
+        self.assertEqual(self._rows(response), rows)
+
+    def test_user_export_reads_users_in_one_query(self):
+        for index in range(5):
+            user = CustomUser.objects.create_user(email=f'user{index}@test.com', password='TestPass123!')
+            AppUser.objects.create(user=user, layer=self.second, name=f'User {index}', title='Staff')
+
+        url = reverse('app-user-export-csv', args=[self.second.id])
+        # The layer, then the users with their accounts
+        with self.assertNumQueries(2):
+            rows = self._rows(self.client.get(url))
+
+        self.assertEqual(rows[0], ['email', 'name', 'title', 'role'])
+        self.assertEqual(rows[1], ['creator@test.com', 'Creator', 'Owner', 'CREATOR'])
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(self._rows(self.client.get(url, {'compress': 'gzip'})), rows)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTest(TestCase):
+    """Tests for the staged user CSV import and its background jobs"""
+
+    def setUp(self):
+        layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **layer_fields)
+        other_group = GroupLayer.objects.create(company_name='Other', layer_type='GROUP', **layer_fields)
+        self.user = CustomUser.objects.create_user(
+            email='creator@test.com', password='TestPass123!', is_active=True, role=RoleChoices.CREATOR
+        )
+        AppUser.objects.create(user=self.user, layer=self.group, name='Creator')
+        outsider = CustomUser.objects.create_user(email='outsider@test.com', password='TestPass123!')
+        AppUser.objects.create(user=outsider, layer=other_group, name='Outsider')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('app-user-import-csv', args=[self.group.id])
+
+    def _upload(self, lines):
+        content = '\n'.join(['email,name,title,role'] + lines).encode('utf-8')
+        return self.client.post(self.url, {'file': SimpleUploadedFile('users.csv', content)}, format='multipart')
+
+    def test_small_file_is_imported_in_request(self):
+        response = self._upload([
+            'new@test.com,New User,Analyst,management',
+            'outsider@test.com,Outsider,,',
+            'creator@test.com,Creator,,',
+            'new@test.com,New Again,,',
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        report = response.data['report']
+        self.assertEqual(
+            [(entry['row'], entry['status']) for entry in report['rows']],
+            [(2, 'created'), (3, 'added'), (4, 'skipped'), (5, 'skipped')]
+        )
+        self.assertEqual((report['created_users'], report['added_members'], report['emails_failed']), (1, 2, 0))
+        self.assertEqual(
+            [(row['name'], row['title'], row['role']) for row in response.data['created_users']],
+            [('New User', 'Analyst', 'MANAGEMENT'), ('Outsider', 'Member', 'OPERATION')]
+        )
+
+        # The emailed password logs the new user in
+        new_user = CustomUser.objects.get(email='new@test.com')
+        self.assertTrue(new_user.is_active)
+        self.assertIsNone(new_user.password_updated_at)
+        [message] = mail.outbox
+        password = message.body.split('Password: ')[1].split()[0]
+        self.assertTrue(new_user.check_password(password))
+        self.assertEqual(AppUser.objects.filter(layer=self.group).count(), 3)
+
+    def test_invalid_rows_reject_the_whole_file(self):
+        response = self._upload([
+            'valid@test.com,Valid,,',
+            'not-an-email,Bad Email,,',
+            'noname@test.com,,,',
+            'role@test.com,Bad Role,,OWNER',
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 5])
+        self.assertFalse(CustomUser.objects.filter(email='valid@test.com').exists())
+
+    def test_large_file_is_queued_for_the_worker(self):
+        config = {'ASYNC_THRESHOLD_ROWS': 2, 'BATCH_SIZE': 2}
+        with self.settings(USER_IMPORTS=config):
+            response = self._upload([f'user{index}@test.com,User {index},,' for index in range(5)])
+            self.assertEqual(response.status_code, 202)
+            self.assertFalse(CustomUser.objects.filter(email='user0@test.com').exists())
+
+            call_command('process_user_imports', '--once', stdout=StringIO())
+
+        job = UserImportJob.objects.get(id=response.data['job_id'])
+        self.assertEqual(job.status, UserImportJob.Status.SUCCEEDED)
+        self.assertEqual((job.processed_rows, job.progress_percentage), (5, 100.0))
+        self.assertEqual(len(mail.outbox), 5)
+
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.status_code, 200)
+        self.assertEqual(status_response.data['report']['created_users'], 5)
+
+    def test_passwords_hashed_across_processes(self):
+        config = {**get_user_import_settings(), 'HASH_WORKERS': 2, 'PARALLEL_HASH_MIN': 1}
+        passwords = ['first', 'second', 'third']
+
+        encoded = hash_passwords(passwords, config)
+
+        self.assertEqual(len(encoded), 3)
+        for password, hashed in zip(passwords, encoded):
+            user = CustomUser(email=f'{password}@test.com', password=hashed)
+            self.assertTrue(user.check_password(password))
+
+
+class LayerImportTest(TestCase):
+    """Tests for the bulk layer-structure CSV import"""
+
+    def setUp(self):
+        self.layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **self.layer_fields)
+        self.user = CustomUser.objects.create_user(
+            email='creator@test.com', password='TestPass123!', is_active=True, role=RoleChoices.CREATOR
+        )
+        AppUser.objects.create(user=self.user, layer=self.group, name='Creator')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _upload(self, lines, header='company_name,company_industry,shareholding_ratio,layer_type,company_location'):
+        content = '\n'.join([header] + lines).encode('utf-8')
+        return self.client.post(
+            reverse('layer-profile-import-csv'),
+            {'file': SimpleUploadedFile('layers.csv', content)},
+            format='multipart'
+        )
+
+    def _structure(self, subsidiaries, branches):
+        lines = []
+        for sub in range(subsidiaries):
+            lines.append(f'Sub {sub},Retail,60,SUBSIDIARY,Hong Kong')
+            lines.extend(f'Branch {sub}-{branch},Retail,50.5,BRANCH,Hong Kong' for branch in range(branches))
+        return lines
+
+    def test_structure_is_inserted_in_bulk(self):
+        with CaptureQueriesContext(connection) as small:
+            response = self._upload(self._structure(1, 1))
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as large:
+            response = self._upload(self._structure(3, 4))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(large), len(small))
+
+        report = response.data['report']
+        self.assertEqual((report['created_subsidiaries'], report['created_branches']), (3, 12))
+        first_sub, first_branch = report['rows'][:2]
+        self.assertEqual(first_sub['parent_id'], self.group.id)
+        self.assertEqual(first_branch['parent_id'], first_sub['layer_id'])
+
+        branch = BranchLayer.objects.get(id=first_branch['layer_id'])
+        self.assertEqual((branch.company_name, branch.shareholding_ratio), ('Branch 0-0', 50.5))
+        self.assertEqual(branch.subsidiary_layer.group_layer_id, self.group.id)
+        self.assertEqual(branch.created_by_admin, self.user)
+        self.assertEqual(AppUser.objects.get(user=self.user, layer=branch).title, 'CEO')
+        self.assertTrue(has_layer_access(self.user, branch.id))
+
+        # The closure rows match a rebuild from the parent links
+        pairs = closure_pairs()
+        call_command('rebuild_layer_closure', stdout=StringIO())
+        self.assertEqual(closure_pairs(), pairs)
+
+    def test_superuser_names_creators(self):
+        admin = CustomUser.objects.create_superuser(email='admin@test.com', password='TestPass123!')
+        self.client.force_authenticate(user=admin)
+        header = 'company_name,company_industry,shareholding_ratio,layer_type,company_location,creator_email'
+
+        response = self._upload(['Sub,Retail,60,SUBSIDIARY,HK,missing@test.com'], header=header)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+
+        response = self._upload(['Sub,Retail,60,SUBSIDIARY,HK,creator@test.com'], header=header)
+        self.assertEqual(response.status_code, 201)
+        subsidiary = SubsidiaryLayer.objects.get(company_name='Sub')
+        self.assertEqual((subsidiary.group_layer_id, subsidiary.created_by_admin_id), (self.group.id, self.user.id))
+
+    def test_invalid_rows_reject_the_whole_file(self):
+        response = self._upload([
+            'Orphan,Retail,50,BRANCH,HK',
+            'Sub,Retail,60,SUBSIDIARY,HK',
+            'Bad Ratio,Retail,abc,BRANCH,HK',
+            'Group,Retail,100,GROUP,HK',
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 4, 5])
+        self.assertFalse(SubsidiaryLayer.objects.exists())
+
+    def test_bulk_create_layers_sets_child_rows(self):
+        subsidiary = SubsidiaryLayer(
+            company_name='Bulk', layer_type='SUBSIDIARY', group_layer=self.group, **self.layer_fields
+        )
+
+        bulk_create_layers(SubsidiaryLayer, [subsidiary])
+
+        self.assertIsNotNone(subsidiary.pk)
+        stored = SubsidiaryLayer.objects.get(pk=subsidiary.pk)
+        self.assertEqual((stored.company_name, stored.group_layer_id), ('Bulk', self.group.id))
+        self.assertEqual(stored.created_at, subsidiary.created_at)
@@ -1,7 +1,9 @@
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 import random, string
-from .models import LayerTypeChoices, LayerProfile, GroupLayer, SubsidiaryLayer, BranchLayer
+from collections import defaultdict
+from django.db import transaction
+from .models import LayerProfile, GroupLayer, SubsidiaryLayer, BranchLayer, LayerClosure
 
 def validate_password(password, user=None):
     """
@@ -56,30 +58,15 @@ def get_all_lower_layers(layer):
     Fetch the current layer and all lower layers (subsidiary and branch layers)
     under a given layer.
     """
-    layers = [layer.id]
-
-    if layer.layer_type == LayerTypeChoices.GROUP:
-        subsidiary_ids = SubsidiaryLayer.objects.filter(group_layer=layer).values_list('id', flat=True)
-        branch_ids = BranchLayer.objects.filter(subsidiary_layer__id__in=subsidiary_ids).values_list('id', flat=True)
-        layers.extend(subsidiary_ids)
-        layers.extend(branch_ids)
-
-    elif layer.layer_type == LayerTypeChoices.SUBSIDIARY:
-        branch_ids = BranchLayer.objects.filter(subsidiary_layer=layer).values_list('id', flat=True)
-        layers.extend(branch_ids)
-
-    return LayerProfile.objects.filter(id__in=layers)
+    return LayerProfile.objects.filter(ancestor_links__ancestor=layer)
 
 def get_creator_layers(user):
     """
     Fetch all layers associated with the creator's GROUP layer.
     """
-    group_ids = GroupLayer.objects.filter(app_users__user=user).values_list('id', flat=True)
-    subsidiary_ids = SubsidiaryLayer.objects.filter(group_layer__id__in=group_ids).values_list('id', flat=True)
-    branch_ids = BranchLayer.objects.filter(subsidiary_layer__id__in=subsidiary_ids).values_list('id', flat=True)
-
+    group_ids = GroupLayer.objects.filter(app_users__user=user).values('id')
     return LayerProfile.objects.filter(
-        id__in=list(group_ids) + list(subsidiary_ids) + list(branch_ids)
+        id__in=LayerClosure.objects.filter(ancestor_id__in=group_ids).values('descendant_id')
     )
 
 def get_parent_layer(layer):
@@ -88,4 +75,113 @@ def get_parent_layer(layer):
         return layer.group_layer
     elif isinstance(layer, BranchLayer):
         return layer.subsidiary_layer
-    return None 
\ No newline at end of file
+    return None
+
+def get_parent_layer_id(layer):
+    """Return the parent layer id of a given layer without loading the parent."""
+    if isinstance(layer, SubsidiaryLayer):
+        return layer.group_layer_id
+    elif isinstance(layer, BranchLayer):
+        return layer.subsidiary_layer_id
+    return None
+
+def add_layers_to_closure(layers):
+    """
+    Insert closure rows for newly created layers.
+
+    Layers must be ordered parents first when a batch contains both a parent
+    and its children. Existing rows are left untouched.
+    """
+    parent_ids = {get_parent_layer_id(layer) for layer in layers} - {None}
+
+    # layer id -> [(ancestor id, depth)], including the layer itself at depth 0
+    links = defaultdict(list)
+    for ancestor_id, descendant_id, depth in LayerClosure.objects.filter(
+        descendant_id__in=parent_ids
+    ).values_list('ancestor_id', 'descendant_id', 'depth'):
+        links[descendant_id].append((ancestor_id, depth))
+
+    rows = []
+    for layer in layers:
+        layer_links = [(layer.pk, 0)]
+        parent_id = get_parent_layer_id(layer)
+        if parent_id is not None:
+            layer_links.extend((ancestor_id, depth + 1) for ancestor_id, depth in links[parent_id])
+        links[layer.pk] = layer_links
+        rows.extend(
+            LayerClosure(ancestor_id=ancestor_id, descendant_id=layer.pk, depth=depth)
+            for ancestor_id, depth in layer_links
+        )
+
+    LayerClosure.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+@transaction.atomic
+def move_layer_in_closure(layer):
+    """
+    Re-attach a layer's subtree under its current parent after a reparent.
+    """
+    subtree = dict(
+        LayerClosure.objects.filter(ancestor=layer).values_list('descendant_id', 'depth')
+    )
+    if not subtree:
+        return add_layers_to_closure([layer])
+
+    # Drop links from the old ancestors into the subtree
+    LayerClosure.objects.filter(descendant_id__in=subtree).exclude(ancestor_id__in=subtree).delete()
+
+    parent_id = get_parent_layer_id(layer)
+    if parent_id is None:
+        return 0
+
+    new_ancestors = LayerClosure.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth')
+    rows = [
+        LayerClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + 1 + depth)
+        for ancestor_id, ancestor_depth in new_ancestors
+        for descendant_id, depth in subtree.items()
+    ]
+    LayerClosure.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+def sync_layer_closure(layer, created=False):
+    """Keep the closure table in step with a saved layer."""
+    if created:
+        return add_layers_to_closure([layer])
+
+    parent_id = get_parent_layer_id(layer)
+    current_parent_id = LayerClosure.objects.filter(
+        descendant=layer, depth=1
+    ).values_list('ancestor_id', flat=True).first()
+    has_self_link = current_parent_id is not None or LayerClosure.objects.filter(
+        ancestor=layer, descendant=layer
+    ).exists()
+
+    if not has_self_link:
+        return add_layers_to_closure([layer])
+    if current_parent_id != parent_id:
+        return move_layer_in_closure(layer)
+    return 0
+
+@transaction.atomic
+def rebuild_layer_closure(batch_size=5000):
+    """
+    Rebuild the whole closure table from the group/subsidiary/branch parent links.
+
+    Returns:
+        int: Number of closure rows written
+    """
+    parents = {layer_id: None for layer_id in LayerProfile.objects.values_list('id', flat=True)}
+    parents.update(SubsidiaryLayer.objects.values_list('id', 'group_layer_id'))
+    parents.update(BranchLayer.objects.values_list('id', 'subsidiary_layer_id'))
+
+    rows = []
+    for layer_id in parents:
+        ancestor_id, depth = layer_id, 0
+        # Walk up the (at most three level) hierarchy in memory
+        while ancestor_id is not None:
+            rows.append(LayerClosure(ancestor_id=ancestor_id, descendant_id=layer_id, depth=depth))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+
+    LayerClosure.objects.all().delete()
+    LayerClosure.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
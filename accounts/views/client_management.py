@@ -2,11 +2,14 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import transaction
-from django.db.models import Count, Sum
+from django.db.models import Count, Prefetch, Sum
 from ..permissions import BakerTillyAdmin
 from ..models import CustomUser, AppUser, GroupLayer, SubsidiaryLayer, BranchLayer, RoleChoices
-from ..serializers.models import GroupLayerSerializer, AppUserSerializer, SubsidiaryLayerSerializer, BranchLayerSerializer
-from ..services import send_email_to_user
+from ..serializers.models import (
+    GroupLayerSerializer, AppUserSerializer, LayerProfileSerializer
+)
+from ..services import LayerTree, send_email_to_user
+from ..utils import get_all_lower_layers
 
 class ClientSetupView(APIView):
     """
@@ -276,16 +279,33 @@ class ClientStructureView(APIView):
     def get(self, request, group_id):
         """Get complete structure of a client company"""
         try:
-            group = GroupLayer.objects.get(id=group_id)
+            # The whole structure with its users in a fixed number of queries
+            tree = LayerTree(get_all_lower_layers(group_id).prefetch_related(
+                Prefetch(
+                    'app_users',
+                    queryset=AppUser.objects.select_related('user'),
+                    to_attr='prefetched_app_users'
+                )
+            ))
+            group = tree.get(int(group_id))
+            if group is None or group.layer_type != 'GROUP':
+                raise GroupLayer.DoesNotExist
             structure = {
                 'group': GroupLayerSerializer(group).data,
                 'subsidiaries': []
             }
             
-            for subsidiary in group.subsidiarylayer_set.all():
+            # Tree layers are LayerProfile rows; their parent ids come from the tree
+            for subsidiary in tree.get_children(group, 'SUBSIDIARY'):
                 sub_data = {
-                    'subsidiary': SubsidiaryLayerSerializer(subsidiary).data,
-                    'branches': BranchLayerSerializer(subsidiary.branchlayer_set.all(), many=True).data
+                    'subsidiary': {
+                        **LayerProfileSerializer(subsidiary).data,
+                        'group_id': subsidiary.parent_layer_id
+                    },
+                    'branches': [
+                        {**LayerProfileSerializer(branch).data, 'subsidiary_id': branch.parent_layer_id}
+                        for branch in tree.get_children(subsidiary, 'BRANCH')
+                    ]
                 }
                 structure['subsidiaries'].append(sub_data)
                 
@@ -6,8 +6,7 @@ from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_cookie
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
-from django.http import HttpResponse
-import csv, io, json, pytz
+import csv, io, json
 
 from rest_framework import status
 from rest_framework.viewsets import ViewSet
@@ -16,7 +15,8 @@ from rest_framework.parsers import MultiPartParser, JSONParser
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError, PermissionDenied
-from django.db.models import Count, Prefetch
+from django.db.models import Case, Count, F, Prefetch, Value, When
+from django.db.models.functions import Coalesce
 
 from ..models import (
     LayerProfile, GroupLayer, SubsidiaryLayer, BranchLayer,
@@ -26,6 +26,7 @@ from ..serializers import (
     GroupLayerSerializer, SubsidiaryLayerSerializer,
     BranchLayerSerializer, AppUserSerializer
 )
+from ..imports import ImportValidationError, import_layer_structure
 from ..services import (
     get_accessible_layers, is_creator_on_layer, has_permission_to_manage_users,
     get_parent_layer, get_flat_sorted_layers, send_email_to_user
@@ -501,66 +502,60 @@ class LayerProfileViewSet(ViewSet, CSVExportMixin, ErrorHandlingMixin):
 
     @action(detail=False, methods=['get'], url_path='export-csv')
     def export_csv(self, request):
-        """Export all layers as a CSV file"""
+        """
+        Export the user's layers as a CSV file, streamed as each group is followed
+        by its subsidiaries and their branches. Add ?compress=gzip for a gzip file.
+        """
         try:
-            group_layers = GroupLayer.objects.filter(app_users__user=request.user)
-            subsidiary_layers = SubsidiaryLayer.objects.filter(app_users__user=request.user)
-            branch_layers = BranchLayer.objects.filter(app_users__user=request.user)
-            
-            hkt_tz = pytz.timezone('Asia/Hong_Kong')
-            response = HttpResponse(content_type="text/csv")
-
-            if group_layers.exists():
-                group = group_layers.first()
-                filename = f"{group.company_name}_Company_Structure.csv"
-            else:
-                filename = "Company_Structure.csv"
-            
-            response["Content-Disposition"] = f'attachment; filename="{filename}"'
-            response["Access-Control-Expose-Headers"] = "Content-Disposition"
-
-            writer = csv.writer(response)
-            writer.writerow([
-                "company_name", "company_industry", "shareholding_ratio", 
-                "layer_type", "company_location", "created_at"
-            ])
-
-            for group in group_layers:
-                group_hkt = group.created_at.astimezone(hkt_tz).strftime('%Y-%m-%d %H:%M') + "HKT"
-                writer.writerow([
-                    group.company_name,
-                    group.company_industry,
-                    group.shareholding_ratio,
-                    LayerTypeChoices.GROUP,
-                    group.company_location,
-                    group_hkt,
-                ])
-
-                subs_for_group = subsidiary_layers.filter(group_layer=group)
-                for subsidiary in subs_for_group:
-                    subsidiary_hkt = subsidiary.created_at.astimezone(hkt_tz).strftime('%Y-%m-%d %H:%M') + "HKT"
-                    writer.writerow([
-                        subsidiary.company_name,
-                        subsidiary.company_industry,
-                        subsidiary.shareholding_ratio,
-                        LayerTypeChoices.SUBSIDIARY,
-                        subsidiary.company_location,
-                        subsidiary_hkt,
-                    ])
-
-                    branches_for_subsidiary = branch_layers.filter(subsidiary_layer=subsidiary)
-                    for branch in branches_for_subsidiary:
-                        branch_hkt = branch.created_at.astimezone(hkt_tz).strftime('%Y-%m-%d %H:%M') + "HKT"
-                        writer.writerow([
-                            branch.company_name,
-                            branch.company_industry,
-                            branch.shareholding_ratio,
-                            LayerTypeChoices.BRANCH,
-                            branch.company_location,
-                            branch_hkt,
-                        ])
-
-            return response
+            group = GroupLayer.objects.filter(
+                app_users__user=request.user
+            ).order_by('pk').values_list('company_name', flat=True).first()
+            filename = f"{group}_Company_Structure.csv" if group else "Company_Structure.csv"
+
+            # One ordered query: each group, then each subsidiary followed by its branches
+            layers = LayerProfile.objects.filter(app_users__user=request.user).annotate(
+                group_key=Coalesce(
+                    'subsidiarylayer__group_layer_id',
+                    'branchlayer__subsidiary_layer__group_layer_id',
+                    'id'
+                ),
+                subsidiary_key=Coalesce(
+                    'branchlayer__subsidiary_layer_id',
+                    Case(When(layer_type=LayerTypeChoices.SUBSIDIARY, then=F('id'))),
+                    Value(0)
+                ),
+                depth=Case(
+                    When(layer_type=LayerTypeChoices.GROUP, then=Value(0)),
+                    When(layer_type=LayerTypeChoices.SUBSIDIARY, then=Value(1)),
+                    default=Value(2)
+                ),
+                parent_layer_id=Coalesce('subsidiarylayer__group_layer_id', 'branchlayer__subsidiary_layer_id'),
+            ).order_by('group_key', 'subsidiary_key', 'depth', 'id').distinct()
+
+            def rows():
+                # A subsidiary or branch is listed under a parent the user also belongs to
+                exported_ids = set()
+                for layer in layers.iterator(chunk_size=2000):
+                    if layer.layer_type != LayerTypeChoices.GROUP and layer.parent_layer_id not in exported_ids:
+                        continue
+                    if layer.layer_type != LayerTypeChoices.BRANCH:
+                        exported_ids.add(layer.id)
+                    yield [
+                        layer.company_name,
+                        layer.company_industry,
+                        layer.shareholding_ratio,
+                        layer.layer_type,
+                        layer.company_location,
+                        self.format_datetime_hkt(layer.created_at),
+                    ]
+
+            return self.get_streaming_csv_response(
+                filename,
+                ["company_name", "company_industry", "shareholding_ratio",
+                 "layer_type", "company_location", "created_at"],
+                rows(),
+                compress=self.wants_compressed_export(request)
+            )
         except Exception as e:
             return self.handle_unknown_error(e)
 
@@ -572,75 +567,17 @@ class LayerProfileViewSet(ViewSet, CSVExportMixin, ErrorHandlingMixin):
             if not file:
                 return self.handle_validation_error("No file provided.")
 
-            decoded_file = file.read().decode("utf-8").splitlines()
-            reader = csv.DictReader(decoded_file)
-
-            last_group_layer = None
-            last_subsidiary_layer = None
-
-            if request.user.is_superuser:
-                with transaction.atomic():
-                    for row in reader:
-                        layer_type = row.get("layer_type")
-                        creator_email = row.get("creator_email")
-
-                        if not layer_type:
-                            raise ValueError("Layer type is missing in the CSV row.")
-                        if not creator_email:
-                            raise ValueError("Creator email is missing in the CSV row.")
-
-                        creator_user = CustomUser.objects.filter(email=creator_email).first()
-                        if not creator_user:
-                            raise ValueError(f"Creator with email {creator_email} not found.")
-
-                        layer = self._create_layer_from_csv(
-                            row, layer_type, creator_user, 
-                            last_group_layer, last_subsidiary_layer
-                        )
-                        
-                        if layer_type == "SUBSIDIARY":
-                            last_subsidiary_layer = layer
-                        
-                        AppUser.objects.create(
-                            user=creator_user,
-                            name=request.data.get("name", creator_user.email.split("@")[0]),
-                            layer=layer,
-                            title="CEO"
-                        )
-            else:
-                last_group_layer = GroupLayer.objects.filter(
-                    app_users__user=request.user, 
-                    app_users__user__role=RoleChoices.CREATOR
-                ).order_by('-id').first()
-
-                if not last_group_layer:
-                    return self.handle_validation_error(
-                        "No GROUP layer found for this user. Cannot import SUBSIDIARY or BRANCH layers."
-                    )
-
-                with transaction.atomic():
-                    for row in reader:
-                        layer_type = row.get("layer_type")
-                        if not layer_type:
-                            raise ValueError("Layer type is missing in the CSV row.")
-
-                        layer = self._create_layer_from_csv(
-                            row, layer_type, request.user, 
-                            last_group_layer, last_subsidiary_layer
-                        )
-                        
-                        if layer_type == "SUBSIDIARY":
-                            last_subsidiary_layer = layer
-
-                        AppUser.objects.create(
-                            user=request.user,
-                            name=request.data.get("name", request.user.email.split("@")[0]),
-                            layer=layer,
-                            title="CEO"
-                        )
+            try:
+                report = import_layer_structure(
+                    file.read().decode("utf-8"),
+                    request.user,
+                    member_name=request.data.get("name"),
+                )
+            except ImportValidationError as e:
+                return Response({"error": str(e), "errors": e.errors}, status=status.HTTP_400_BAD_REQUEST)
 
             return Response(
-                {"message": "Layers imported successfully."}, 
+                {"message": "Layers imported successfully.", "report": report},
                 status=status.HTTP_201_CREATED
             )
 
@@ -649,54 +586,6 @@ class LayerProfileViewSet(ViewSet, CSVExportMixin, ErrorHandlingMixin):
         except Exception as e:
             return self.handle_unknown_error(e)
 
-    def _create_layer_from_csv(self, row, layer_type, user, last_group_layer, last_subsidiary_layer):
-        """Helper method to create a layer from CSV data"""
-        if layer_type == "SUBSIDIARY":
-            if not last_group_layer:
-                last_group_layer = GroupLayer.objects.filter(
-                    app_users__user=user,
-                    app_users__user__role=RoleChoices.CREATOR
-                ).order_by('-id').first()
-
-            if not last_group_layer:
-                raise ValueError(f"No GROUP layer found for creator {user.email}.")
-
-            subsidiary = SubsidiaryLayer.objects.create(
-                company_name=row["company_name"],
-                company_industry=row["company_industry"],
-                shareholding_ratio=float(row["shareholding_ratio"]),
-                group_layer=last_group_layer,
-                layer_type=LayerTypeChoices.SUBSIDIARY,
-                company_location=row["company_location"]
-            )
-            
-            # Set the creator
-            subsidiary.created_by_admin = user
-            subsidiary.save()
-            
-            return subsidiary
-
-        elif layer_type == "BRANCH":
-            if not last_subsidiary_layer:
-                raise ValueError("Cannot create BRANCH without a preceding SUBSIDIARY layer.")
-
-            branch = BranchLayer.objects.create(
-                company_name=row["company_name"],
-                company_industry=row["company_industry"],
-                shareholding_ratio=float(row["shareholding_ratio"]),
-                subsidiary_layer=last_subsidiary_layer,
-                layer_type=LayerTypeChoices.BRANCH,
-                company_location=row["company_location"]
-            )
-            
-            # Set the creator
-            branch.created_by_admin = user
-            branch.save()
-            
-            return branch
-        else:
-            raise ValueError(f"Invalid layer type: {layer_type}")
-
     @action(detail=False, methods=['get'], url_path='download-example')
     def download_example(self, request):
         """Download CSV template for layer import"""
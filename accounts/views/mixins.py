@@ -1,9 +1,25 @@
 import csv
-from django.http import HttpResponse
+import zlib
+from django.http import HttpResponse, StreamingHttpResponse
 import pytz
 from rest_framework.response import Response
 from rest_framework import status
 
+class Echo:
+    """File-like object that hands back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+def gzip_chunks(chunks):
+    """Compress a stream of text chunks into a gzip stream"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
 class CSVExportMixin:
     """Mixin for CSV export functionality"""
     
@@ -14,6 +30,32 @@ class CSVExportMixin:
         response["Access-Control-Expose-Headers"] = "Content-Disposition"
         return response
 
+    def get_streaming_csv_response(self, filename, header, rows, compress=False):
+        """
+        Returns a StreamingHttpResponse writing the header and rows as they are produced,
+        so large exports start immediately and use constant memory.
+        With compress, the CSV is sent as a gzip file named filename.gz.
+        """
+        writer = csv.writer(Echo())
+
+        def lines():
+            yield writer.writerow(header)
+            for row in rows:
+                yield writer.writerow(row)
+
+        if compress:
+            response = StreamingHttpResponse(gzip_chunks(lines()), content_type="application/gzip")
+            filename = f"{filename}.gz"
+        else:
+            response = StreamingHttpResponse(lines(), content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        response["Access-Control-Expose-Headers"] = "Content-Disposition"
+        return response
+
+    def wants_compressed_export(self, request):
+        """True if the export should be gzip-compressed (?compress=gzip)"""
+        return request.query_params.get("compress", "").lower() == "gzip"
+
     def format_datetime_hkt(self, datetime_obj):
         """Formats datetime to HKT timezone"""
         hkt_tz = pytz.timezone('Asia/Hong_Kong')
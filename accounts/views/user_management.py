@@ -1,5 +1,6 @@
 from django.db import transaction
 from django.utils import timezone
+from django.urls import reverse
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from rest_framework import status
@@ -12,8 +13,11 @@ import json
 import csv
 import io
 
-from ..models import AppUser, LayerProfile, CustomUser, CSVTemplate, RoleChoices, GroupLayer, BranchLayer
-from ..serializers import AppUserSerializer
+from ..models import AppUser, LayerProfile, CustomUser, CSVTemplate, RoleChoices, GroupLayer, BranchLayer, UserImportJob
+from ..serializers import AppUserSerializer, UserImportJobSerializer
+from ..imports import (
+    ImportValidationError, enqueue_user_import, get_user_import_settings, import_users, parse_user_csv
+)
 from ..services import send_email_to_user, generate_otp_code, send_otp_via_email
 from ..permissions import CanManageAppUsers
 from .mixins import CSVExportMixin, ErrorHandlingMixin
@@ -203,36 +207,38 @@ class AppUserViewSet(ModelViewSet, CSVExportMixin, ErrorHandlingMixin):
             if not file:
                 return self.handle_validation_error("No file provided.")
 
-            decoded_file = file.read().decode("utf-8").splitlines()
-            reader = csv.DictReader(decoded_file)
-
-            with transaction.atomic():
-                created_users = []
-                for row in reader:
-                    email = row.get("email")
-                    name = row.get("name")
-                    title = row.get("title", "Member")
-                    role = row.get("role", "OPERATION")
-
-                    if not email or not name:
-                        raise ValueError("Email and name are required fields in the CSV.")
-
-                    user = self._get_or_create_user(email, role)
-                    if AppUser.objects.filter(user=user, layer=layer).exists():
-                        continue
-
-                    app_user = AppUser.objects.create(
-                        user=user,
-                        name=name,
-                        title=title,
-                        layer=layer,
-                    )
-                    created_users.append(app_user)
+            try:
+                rows = parse_user_csv(file.read().decode("utf-8"))
+            except ImportValidationError as e:
+                return Response({"error": str(e), "errors": e.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Large files are imported by the process_user_imports worker
+            config = get_user_import_settings()
+            if len(rows) > config['ASYNC_THRESHOLD_ROWS']:
+                job = enqueue_user_import(layer, rows, user=request.user)
+                return Response(
+                    {
+                        "message": "User import queued.",
+                        "job_id": job.id,
+                        "status": job.status,
+                        "total_rows": job.total_rows,
+                        "status_url": request.build_absolute_uri(
+                            reverse("app-user-import-job", args=[layer.id, job.id])
+                        ),
+                    },
+                    status=status.HTTP_202_ACCEPTED,
+                )
+
+            report = import_users(layer, rows, config)
+            created_users = AppUser.objects.filter(
+                id__in=[entry["app_user_id"] for entry in report["rows"] if "app_user_id" in entry]
+            ).select_related("user").order_by("id")
 
             return Response(
                 {
                     "message": "Users imported successfully.",
                     "created_users": self.get_serializer(created_users, many=True).data,
+                    "report": report,
                 },
                 status=status.HTTP_201_CREATED,
             )
@@ -242,26 +248,44 @@ class AppUserViewSet(ModelViewSet, CSVExportMixin, ErrorHandlingMixin):
         except Exception as e:
             return self.handle_unknown_error(e)
 
+    @action(detail=True, methods=["get"], url_path=r"import-jobs/(?P<job_id>\d+)", url_name="import-job")
+    def import_job(self, request, pk=None, job_id=None):
+        """Progress and per-row report of a queued user import"""
+        try:
+            layer = LayerProfile.objects.get(id=pk)
+            self.check_object_permissions(request, layer)
+
+            try:
+                job = UserImportJob.objects.get(id=job_id, layer=layer)
+            except UserImportJob.DoesNotExist:
+                return self.handle_not_found_error("Import job not found for this layer.")
+
+            return Response(UserImportJobSerializer(job).data)
+
+        except LayerProfile.DoesNotExist:
+            return self.handle_not_found_error("Layer not found.")
+        except Exception as e:
+            return self.handle_unknown_error(e)
+
     @action(detail=True, methods=['get'], url_path='export-csv')
     def export_csv(self, request, pk=None):
-        """Export users to CSV file"""
+        """Export users to CSV file, streamed; add ?compress=gzip for a gzip file"""
         try:
             layer = LayerProfile.objects.get(id=pk)
-            app_users = AppUser.objects.filter(layer=layer)
+            app_users = AppUser.objects.filter(layer=layer).select_related('user').only(
+                'name', 'title', 'user__email', 'user__role'
+            ).order_by('id')
 
-            response = self.get_csv_response(f"{layer.company_name}_User_Accounts.csv")
-            writer = csv.writer(response)
-            writer.writerow(["email", "name", "title", "role"])
-
-            for app_user in app_users:
-                writer.writerow([
-                    app_user.user.email,
-                    app_user.name,
-                    app_user.title,
-                    app_user.user.role
-                ])
-
-            return response
+            rows = (
+                [app_user.user.email, app_user.name, app_user.title, app_user.user.role]
+                for app_user in app_users.iterator(chunk_size=2000)
+            )
+            return self.get_streaming_csv_response(
+                f"{layer.company_name}_User_Accounts.csv",
+                ["email", "name", "title", "role"],
+                rows,
+                compress=self.wants_compressed_export(request)
+            )
 
         except LayerProfile.DoesNotExist:
             return self.handle_not_found_error("Layer not found.")
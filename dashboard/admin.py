@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import GroupDashboardSummary, GroupMetricTotal
 
-# Register your models here.
+@admin.register(GroupDashboardSummary)
+class GroupDashboardSummaryAdmin(admin.ModelAdmin):
+    list_display = ('group', 'reporting_year', 'assignment_count', 'submitted_count', 'verified_count',
+                    'submission_count', 'evidenced_submission_count', 'updated_at')
+    list_filter = ('reporting_year',)
+    search_fields = ('group__company_name',)
+    list_select_related = ('group',)
+
+@admin.register(GroupMetricTotal)
+class GroupMetricTotalAdmin(admin.ModelAdmin):
+    list_display = ('group', 'metric', 'reporting_year', 'total_value', 'equity_value', 'unit', 'updated_at')
+    list_filter = ('reporting_year',)
+    search_fields = ('group__company_name', 'metric__name')
+    list_select_related = ('group', 'metric')
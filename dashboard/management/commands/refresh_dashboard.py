@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from dashboard.services import rebuild_dashboards
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed dashboard tables of every group'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group-id', type=int, action='append', dest='group_ids',
+                            help='Only refresh this group (can be repeated)')
+
+    def handle(self, *args, **options):
+        written = rebuild_dashboards(group_ids=options['group_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed dashboards: {written} rows written'))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0008_layerclosure'),
+        ('data_management', '0036_esg_metric_fact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupDashboardSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reporting_year', models.PositiveIntegerField(help_text="Year the assignment's reporting period ends")),
+                ('assignment_count', models.PositiveIntegerField(default=0)),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('in_progress_count', models.PositiveIntegerField(default=0)),
+                ('submitted_count', models.PositiveIntegerField(default=0)),
+                ('verified_count', models.PositiveIntegerField(default=0)),
+                ('rejected_count', models.PositiveIntegerField(default=0)),
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('evidenced_submission_count', models.PositiveIntegerField(default=0, help_text='Submissions with at least one evidence file')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_summaries', to='accounts.grouplayer')),
+            ],
+            options={
+                'verbose_name': 'Group Dashboard Summary',
+                'verbose_name_plural': 'Group Dashboard Summaries',
+                'unique_together': {('group', 'reporting_year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupMetricTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reporting_year', models.PositiveIntegerField()),
+                ('unit', models.CharField(blank=True, default='', max_length=50)),
+                ('total_value', models.FloatField(default=0)),
+                ('equity_value', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_metric_totals', to='accounts.grouplayer')),
+                ('metric', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_totals', to='data_management.esgmetric')),
+            ],
+            options={
+                'verbose_name': 'Group Metric Total',
+                'verbose_name_plural': 'Group Metric Totals',
+                'unique_together': {('group', 'metric', 'reporting_year')},
+            },
+        ),
+    ]
@@ -1,3 +1,69 @@
 from django.db import models
+from accounts.models import GroupLayer
+from data_management.models import ESGMetric
 
-# Create your models here.
+
+class GroupDashboardSummary(models.Model):
+    """
+    Assignment progress and evidence coverage of a group and every layer
+    below it for one reporting year. Rows are maintained by
+    dashboard.services as assignments, submissions and evidence change.
+    """
+    group = models.ForeignKey(GroupLayer, on_delete=models.CASCADE, related_name='dashboard_summaries')
+    reporting_year = models.PositiveIntegerField(help_text="Year the assignment's reporting period ends")
+
+    assignment_count = models.PositiveIntegerField(default=0)
+    pending_count = models.PositiveIntegerField(default=0)
+    in_progress_count = models.PositiveIntegerField(default=0)
+    submitted_count = models.PositiveIntegerField(default=0)
+    verified_count = models.PositiveIntegerField(default=0)
+    rejected_count = models.PositiveIntegerField(default=0)
+
+    submission_count = models.PositiveIntegerField(default=0)
+    evidenced_submission_count = models.PositiveIntegerField(default=0,
+                                                             help_text="Submissions with at least one evidence file")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['group', 'reporting_year']
+        verbose_name = "Group Dashboard Summary"
+        verbose_name_plural = "Group Dashboard Summaries"
+
+    def __str__(self):
+        return f"{self.group_id} {self.reporting_year}"
+
+    @property
+    def completion_percentage(self):
+        """Share of assignments submitted or verified."""
+        if not self.assignment_count:
+            return 0.0
+        return round((self.submitted_count + self.verified_count) * 100 / self.assignment_count, 1)
+
+    @property
+    def evidence_coverage(self):
+        """Share of submissions backed by evidence."""
+        if not self.submission_count:
+            return 0.0
+        return round(self.evidenced_submission_count * 100 / self.submission_count, 1)
+
+
+class GroupMetricTotal(models.Model):
+    """
+    Yearly total of a metric across a group, summed over the periods of the
+    group's consolidated values.
+    """
+    group = models.ForeignKey(GroupLayer, on_delete=models.CASCADE, related_name='dashboard_metric_totals')
+    metric = models.ForeignKey(ESGMetric, on_delete=models.CASCADE, related_name='dashboard_totals')
+    reporting_year = models.PositiveIntegerField()
+    unit = models.CharField(max_length=50, blank=True, default='')
+    total_value = models.FloatField(default=0)
+    equity_value = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['group', 'metric', 'reporting_year']
+        verbose_name = "Group Metric Total"
+        verbose_name_plural = "Group Metric Totals"
+
+    def __str__(self):
+        return f"{self.metric_id} @ {self.group_id} {self.reporting_year}: {self.total_value}"
@@ -0,0 +1,302 @@
+"""
+Precomputed per-group dashboard aggregates.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Q, Sum
+
+from accounts.models import GroupLayer, LayerClosure, LayerTypeChoices
+from data_management.models import (
+    ConsolidatedMetricValue, ESGMetricEvidence, ESGMetricSubmission, TemplateAssignment
+)
+from data_management.services.consolidation import flush_consolidation_refreshes
+from .models import GroupDashboardSummary, GroupMetricTotal
+
+logger = logging.getLogger(__name__)
+
+# Assignment status -> GroupDashboardSummary counter
+STATUS_FIELDS = {
+    'PENDING': 'pending_count',
+    'IN_PROGRESS': 'in_progress_count',
+    'SUBMITTED': 'submitted_count',
+    'VERIFIED': 'verified_count',
+    'REJECTED': 'rejected_count',
+}
+
+
+def get_group_ids(layer_ids):
+    """Ids of the groups the given layers belong to, read in one query."""
+    layer_ids = {layer_id for layer_id in layer_ids if layer_id is not None}
+    if not layer_ids:
+        return set()
+    return set(
+        LayerClosure.objects.filter(
+            descendant_id__in=layer_ids,
+            ancestor__layer_type=LayerTypeChoices.GROUP
+        ).values_list('ancestor_id', flat=True)
+    )
+
+
+def _replace_rows(model, scope, rows, unique_fields, update_fields):
+    """
+    Upsert the recomputed rows of a scope and delete its rows that were not
+    recomputed, instead of deleting and re-inserting the whole scope.
+    """
+    model.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields
+    )
+    live = {tuple(getattr(row, field) for field in unique_fields) for row in rows}
+    stale = [pk for pk, *key in scope.values_list('pk', *unique_fields) if tuple(key) not in live]
+    if stale:
+        model.objects.filter(pk__in=stale).delete()
+
+
+def refresh_group_dashboards(group_ids, years=None):
+    """
+    Recompute the dashboard rows of the given groups, for every reporting
+    year or only the given years.
+
+    All groups are recomputed together with a fixed number of grouped
+    queries, however many layers, assignments or submissions sit below them.
+    The group rows are locked for the refresh, so concurrent refreshes of a
+    group run one after the other.
+
+    Args:
+        group_ids: Iterable of GroupLayer ids
+        years: Optional iterable of reporting years to limit the refresh to
+
+    Returns:
+        int: Number of dashboard rows written
+    """
+    group_ids = set(group_ids)
+    years = set(years) if years is not None else None
+    if not group_ids or years == set():
+        return 0
+
+    with transaction.atomic():
+        group_ids = set(
+            GroupLayer.objects.select_for_update().filter(
+                pk__in=group_ids
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+
+        # Every layer of the groups -> its group
+        group_of = dict(
+            LayerClosure.objects.filter(ancestor_id__in=group_ids).values_list('descendant_id', 'ancestor_id')
+        )
+        layer_ids = list(group_of)
+
+        assignments = TemplateAssignment.objects.filter(layer_id__in=layer_ids)
+        # Submissions without a layer belong to their assignment's layer
+        submissions = ESGMetricSubmission.objects.filter(
+            Q(layer_id__in=layer_ids) | Q(layer__isnull=True, assignment__layer_id__in=layer_ids)
+        )
+        # Group totals come from the group layer's consolidated values
+        totals = ConsolidatedMetricValue.objects.filter(layer_id__in=group_ids)
+        summary_scope = GroupDashboardSummary.objects.filter(group_id__in=group_ids)
+        total_scope = GroupMetricTotal.objects.filter(group_id__in=group_ids)
+        if years is not None:
+            assignments = assignments.filter(reporting_period_end__year__in=years)
+            submissions = submissions.filter(assignment__reporting_period_end__year__in=years)
+            totals = totals.filter(reporting_year__in=years)
+            summary_scope = summary_scope.filter(reporting_year__in=years)
+            total_scope = total_scope.filter(reporting_year__in=years)
+
+        # (group_id, reporting_year) -> summary field values
+        summaries = defaultdict(lambda: defaultdict(int))
+
+        for layer_id, year, status, count in assignments.values_list(
+            'layer_id', 'reporting_period_end__year', 'status'
+        ).annotate(count=Count('id')):
+            summary = summaries[group_of[layer_id], year]
+            summary['assignment_count'] += count
+            if status in STATUS_FIELDS:
+                summary[STATUS_FIELDS[status]] += count
+
+        for layer_id, assignment_layer_id, year, count, evidenced in submissions.alias(
+            has_evidence=Exists(ESGMetricEvidence.objects.filter(submission_id=OuterRef('pk')))
+        ).values_list(
+            'layer_id', 'assignment__layer_id', 'assignment__reporting_period_end__year'
+        ).annotate(
+            count=Count('id'),
+            evidenced=Count('id', filter=Q(has_evidence=True))
+        ):
+            summary = summaries[group_of[layer_id or assignment_layer_id], year]
+            summary['submission_count'] += count
+            summary['evidenced_submission_count'] += evidenced
+
+        summary_rows = [
+            GroupDashboardSummary(group_id=group_id, reporting_year=year, **values)
+            for (group_id, year), values in summaries.items()
+        ]
+        metric_totals = [
+            GroupMetricTotal(
+                group_id=group_id, metric_id=metric_id, reporting_year=year,
+                unit=unit or '', total_value=total or 0, equity_value=equity or 0
+            )
+            for group_id, metric_id, year, unit, total, equity in totals.values_list(
+                'layer_id', 'metric_id', 'reporting_year'
+            ).annotate(unit=Max('unit'), total=Sum('total_value'), equity=Sum('equity_value'))
+        ]
+
+        _replace_rows(
+            GroupDashboardSummary, summary_scope, summary_rows, ['group_id', 'reporting_year'],
+            ['assignment_count', 'submission_count', 'evidenced_submission_count', 'updated_at']
+            + list(STATUS_FIELDS.values())
+        )
+        _replace_rows(
+            GroupMetricTotal, total_scope, metric_totals, ['group_id', 'metric_id', 'reporting_year'],
+            ['unit', 'total_value', 'equity_value', 'updated_at']
+        )
+    return len(summary_rows) + len(metric_totals)
+
+
+def refresh_dashboards_for_layers(layer_ids, years=None):
+    """Refresh the dashboards of the groups the given layers belong to."""
+    return refresh_group_dashboards(get_group_ids(layer_ids), years)
+
+
+# Changes recorded during the current transaction, refreshed once it commits
+_pending = threading.local()
+
+
+def schedule_dashboard_refresh(layer_years=(), submission_ids=()):
+    """
+    Refresh the dashboards affected by a change once the current
+    transaction commits (immediately outside a transaction).
+
+    Changes recorded during one transaction are refreshed together, so a
+    request saving many rows refreshes each group and year once.
+
+    Args:
+        layer_years: (layer_id, reporting_year) pairs that changed
+        submission_ids: Ids of submissions whose layer and year are read at commit
+    """
+    pending = getattr(_pending, 'changes', None)
+    if pending is None:
+        pending = _pending.changes = (set(), set())
+    pending[0].update((layer_id, year) for layer_id, year in layer_years if layer_id is not None)
+    pending[1].update(submission_id for submission_id in submission_ids if submission_id is not None)
+    # Registered for every change: a rolled-back transaction drops its
+    # callbacks, and later callbacks of a transaction find nothing to flush.
+    # The dashboards are derived data, so a failed refresh is only logged.
+    transaction.on_commit(flush_dashboard_refreshes, robust=True)
+
+
+def flush_dashboard_refreshes():
+    """
+    Refresh the groups and years of the changes recorded so far.
+
+    Returns:
+        int: Number of dashboard rows written
+    """
+    pending = getattr(_pending, 'changes', None)
+    _pending.changes = None
+    if not pending:
+        return 0
+    # Group totals are read from the consolidated values, which may be
+    # queued behind this callback by a later save of the same transaction
+    flush_consolidation_refreshes()
+
+    layer_years, submission_ids = pending
+    if submission_ids:
+        for layer_id, assignment_layer_id, year in ESGMetricSubmission.objects.filter(
+            pk__in=submission_ids
+        ).values_list('layer_id', 'assignment__layer_id', 'assignment__reporting_period_end__year'):
+            layer_years.update({(layer_id or assignment_layer_id, year), (assignment_layer_id, year)})
+    if not layer_years:
+        return 0
+
+    # layer id -> the groups above it
+    groups_of = defaultdict(set)
+    for descendant_id, group_id in LayerClosure.objects.filter(
+        descendant_id__in={layer_id for layer_id, _ in layer_years},
+        ancestor__layer_type=LayerTypeChoices.GROUP
+    ).values_list('descendant_id', 'ancestor_id'):
+        groups_of[descendant_id].add(group_id)
+
+    group_ids_by_year = defaultdict(set)
+    for layer_id, year in layer_years:
+        group_ids_by_year[year] |= groups_of[layer_id]
+    return sum(
+        refresh_group_dashboards(group_ids, [year])
+        for year, group_ids in group_ids_by_year.items()
+    )
+
+
+def rebuild_dashboards(group_ids=None):
+    """
+    Recompute the dashboard rows of every group, or of the given groups.
+
+    Returns:
+        int: Number of dashboard rows written
+    """
+    if not group_ids:
+        group_ids = GroupLayer.objects.values_list('pk', flat=True)
+    return refresh_group_dashboards(group_ids)
+
+
+def get_group_dashboard(group, reporting_year=None):
+    """
+    Dashboard payload of a group, read from the precomputed tables.
+
+    Args:
+        group: GroupLayer or LayerProfile of a group
+        reporting_year: Optional reporting year
+
+    Returns:
+        dict: The group and a list of per-year progress, evidence and metric totals
+    """
+    summaries = GroupDashboardSummary.objects.filter(group_id=group.pk)
+    totals = GroupMetricTotal.objects.filter(group_id=group.pk)
+    if reporting_year:
+        summaries = summaries.filter(reporting_year=reporting_year)
+        totals = totals.filter(reporting_year=reporting_year)
+
+    years = {}
+    updated_at = None
+    for summary in summaries:
+        years[summary.reporting_year] = {
+            'reporting_year': summary.reporting_year,
+            'assignments': {
+                'total': summary.assignment_count,
+                'pending': summary.pending_count,
+                'in_progress': summary.in_progress_count,
+                'submitted': summary.submitted_count,
+                'verified': summary.verified_count,
+                'rejected': summary.rejected_count,
+                'completion_percentage': summary.completion_percentage,
+            },
+            'evidence': {
+                'submissions': summary.submission_count,
+                'with_evidence': summary.evidenced_submission_count,
+                'coverage_percentage': summary.evidence_coverage,
+            },
+            'metrics': [],
+        }
+        updated_at = max(updated_at, summary.updated_at) if updated_at else summary.updated_at
+
+    for row in totals.order_by('metric_id').values(
+        'reporting_year', 'metric_id', 'metric__name', 'unit', 'total_value', 'equity_value'
+    ):
+        year = years.get(row['reporting_year'])
+        if year is None:
+            continue
+        year['metrics'].append({
+            'metric_id': row['metric_id'],
+            'metric_name': row['metric__name'],
+            'unit': row['unit'],
+            'total_value': row['total_value'],
+            'equity_value': row['equity_value'],
+        })
+
+    return {
+        'group_id': group.pk,
+        'group_name': group.company_name,
+        'updated_at': updated_at,
+        'years': [years[year] for year in sorted(years, reverse=True)],
+    }
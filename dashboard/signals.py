@@ -0,0 +1,75 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from data_management.models import TemplateAssignment, ESGMetricSubmission, ESGMetricEvidence
+from data_management.services.consolidation import get_reporting_year
+from data_management.dispatch import submissions_bulk_changed
+from .services import schedule_dashboard_refresh
+
+@receiver(post_save, sender=TemplateAssignment)
+@receiver(post_delete, sender=TemplateAssignment)
+def refresh_assignment_dashboard(sender, instance, raw=False, **kwargs):
+    """
+    Signal handler to recount assignment progress for the group and
+    reporting year of an assignment once the transaction commits.
+    """
+    if not raw:
+        schedule_dashboard_refresh([(instance.layer_id, get_reporting_year(instance))])
+
+@receiver(post_save, sender=ESGMetricSubmission)
+@receiver(post_delete, sender=ESGMetricSubmission)
+def refresh_submission_dashboard(sender, instance, raw=False, **kwargs):
+    """
+    Signal handler to refresh the dashboard of a submission's group and
+    reporting year once the transaction commits, after the consolidated
+    values it reads. data_management's handlers run first and leave the
+    layers and years the submission counted towards before the save in
+    _previous_consolidation_keys. Bulk writes refresh through the
+    submissions_bulk_changed signal.
+    """
+    if raw:
+        return
+    layer_years = {
+        (layer_id, year) for layer_id, _, year in getattr(instance, '_previous_consolidation_keys', ())
+    }
+    try:
+        assignment = instance.assignment
+    except TemplateAssignment.DoesNotExist:
+        # Deleted together with its assignment, which refreshes its own year
+        assignment = None
+    if assignment is not None:
+        year = get_reporting_year(assignment)
+        layer_years.update({(instance.layer_id, year), (assignment.layer_id, year)})
+    schedule_dashboard_refresh(layer_years)
+
+@receiver(post_init, sender=ESGMetricEvidence)
+def remember_evidence_submission(sender, instance, **kwargs):
+    """
+    Signal handler to remember the submission an evidence file was loaded
+    with, so saves that leave it unchanged (such as OCR updates) skip the
+    dashboard refresh.
+    """
+    # Read from __dict__ so a deferred field is not fetched
+    instance._dashboard_submission_id = instance.__dict__.get('submission_id')
+
+@receiver(post_save, sender=ESGMetricEvidence)
+@receiver(post_delete, sender=ESGMetricEvidence)
+def refresh_evidence_dashboard(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Signal handler to recount evidence coverage when evidence is attached
+    to or detached from a submission, or removed while attached.
+    """
+    if raw:
+        return
+    previous_id = instance._dashboard_submission_id
+    if kwargs['signal'] is post_save and not created and previous_id == instance.submission_id:
+        return
+    instance._dashboard_submission_id = instance.submission_id
+    schedule_dashboard_refresh(submission_ids={previous_id, instance.submission_id})
+
+@receiver(submissions_bulk_changed)
+def refresh_bulk_write_dashboard(sender, layer_years=(), submission_ids=(), **kwargs):
+    """
+    Signal handler to refresh the dashboards affected by data_management's
+    bulk writes, which send no per-row signals, once the transaction commits.
+    """
+    schedule_dashboard_refresh(layer_years, submission_ids)
@@ -1,3 +1,165 @@
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, GroupLayer, SubsidiaryLayer, BranchLayer, AppUser, RoleChoices
+from data_management.models import (
+    ESGFormCategory, ESGForm, ESGMetric, Template, TemplateAssignment,
+    ESGMetricSubmission, ESGMetricEvidence
+)
+from .models import GroupDashboardSummary, GroupMetricTotal
+
+
+class GroupDashboardTest(TestCase):
+    """Tests for the precomputed group dashboard tables and endpoint"""
+
+    def setUp(self):
+        layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **layer_fields)
+        self.subsidiary = SubsidiaryLayer.objects.create(
+            company_name='Sub', layer_type='SUBSIDIARY', group_layer=self.group,
+            shareholding_ratio=60, **layer_fields
+        )
+        self.branch = BranchLayer.objects.create(
+            company_name='Branch', layer_type='BRANCH', subsidiary_layer=self.subsidiary,
+            shareholding_ratio=50, **layer_fields
+        )
+        self.other_group = GroupLayer.objects.create(company_name='Other', layer_type='GROUP', **layer_fields)
+        self.user = CustomUser.objects.create_user(
+            email='manager@test.com', password='TestPass123!', is_active=True, role=RoleChoices.MANAGEMENT
+        )
+        AppUser.objects.create(user=self.user, layer=self.group, name='Manager')
+
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        self.template = Template.objects.create(name='Annual')
+        self.assignment = self._assign(self.group)
+        self.metric = ESGMetric.objects.create(form=form, name='Electricity', requires_time_reporting=True)
+
+    def _assign(self, layer, status='PENDING'):
+        return TemplateAssignment.objects.create(
+            template=self.template, layer=layer, status=status,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+
+    def _submit(self, layer, values, assignment=None):
+        return ESGMetricSubmission.objects.create(
+            assignment=assignment or self.assignment, metric=self.metric, layer=layer,
+            data={'periods': {period: {'value': value, 'unit': 'kWh'} for period, value in values.items()}}
+        )
+
+    def _summary(self, group=None):
+        return GroupDashboardSummary.objects.get(group=group or self.group, reporting_year=2024)
+
+    def _populate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._assign(self.branch, status='SUBMITTED')
+            self.branch_submission = self._submit(self.branch, {'01/2024': 100, '02/2024': 100})
+            self._submit(self.subsidiary, {'01/2024': 10})
+            ESGMetricEvidence.objects.create(
+                submission=self.branch_submission, layer=self.branch, file='esg_evidence/bill.pdf',
+                filename='bill.pdf', file_type='application/pdf'
+            )
+
+    def test_signals_keep_summary_current(self):
+        self._populate()
+
+        summary = self._summary()
+        self.assertEqual((summary.assignment_count, summary.pending_count, summary.submitted_count), (2, 1, 1))
+        self.assertEqual(summary.completion_percentage, 50.0)
+        self.assertEqual((summary.submission_count, summary.evidenced_submission_count), (2, 1))
+        self.assertEqual(summary.evidence_coverage, 50.0)
+        total = GroupMetricTotal.objects.get(group=self.group, metric=self.metric, reporting_year=2024)
+        self.assertEqual((total.total_value, total.equity_value, total.unit), (210, 66, 'kWh'))
+        self.assertFalse(GroupDashboardSummary.objects.filter(group=self.other_group).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch_submission.delete()
+        summary = self._summary()
+        self.assertEqual((summary.submission_count, summary.evidenced_submission_count), (1, 0))
+        self.assertEqual(GroupMetricTotal.objects.get(group=self.group).total_value, 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assignment.status = 'VERIFIED'
+            self.assignment.save()
+        self.assertEqual(self._summary().verified_count, 1)
+
+    def test_refresh_runs_on_commit_and_updates_rows_in_place(self):
+        self._populate()
+        summary_id = self._summary().id
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self._submit(self.branch, {'03/2024': 5})
+        self.assertEqual(self._summary().submission_count, 2)
+        for callback in callbacks:
+            callback()
+
+        summary = self._summary()
+        self.assertEqual((summary.id, summary.submission_count), (summary_id, 3))
+
+    def test_evidence_saves_without_submission_change_skip_refresh(self):
+        self._populate()
+        evidence = ESGMetricEvidence.objects.get(submission=self.branch_submission)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            evidence.is_processed_by_ocr = True
+            evidence.save()
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            evidence.submission = None
+            evidence.save()
+        self.assertEqual(self._summary().evidenced_submission_count, 0)
+
+    def test_batch_submit_refreshes_dashboard(self):
+        self._populate()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('metric-submission-batch-submit'), {
+                'assignment_id': self.assignment.id,
+                'submissions': [{'metric_id': self.metric.id, 'data': {'periods': {'03/2024': {'value': 5}}}}]
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._summary().submission_count, 3)
+        self.assertEqual(GroupMetricTotal.objects.get(group=self.group).total_value, 215)
+
+    def test_refresh_command_matches_signals(self):
+        self._populate()
+        fields = ('group_id', 'reporting_year', 'assignment_count', 'submitted_count',
+                  'submission_count', 'evidenced_submission_count')
+        expected = set(GroupDashboardSummary.objects.values_list(*fields))
+        GroupDashboardSummary.objects.all().delete()
+        GroupMetricTotal.objects.all().delete()
+
+        call_command('refresh_dashboard', stdout=StringIO())
+
+        self.assertEqual(set(GroupDashboardSummary.objects.values_list(*fields)), expected)
+        self.assertEqual(GroupMetricTotal.objects.get(group=self.group).total_value, 210)
+
+    def test_endpoint_serves_precomputed_payload(self):
+        self._populate()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with self.assertNumQueries(4):
+            response = client.get(reverse('group-dashboard', args=[self.group.id]))
+
+        self.assertEqual(response.status_code, 200)
+        [year] = response.data['years']
+        self.assertEqual(year['reporting_year'], 2024)
+        self.assertEqual(year['assignments']['total'], 2)
+        self.assertEqual(year['evidence']['coverage_percentage'], 50.0)
+        self.assertEqual(
+            [(metric['metric_name'], metric['total_value']) for metric in year['metrics']],
+            [('Electricity', 210)]
+        )
 
-# Create your tests here.
+        response = client.get(reverse('group-dashboard', args=[self.other_group.id]))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import GroupDashboardView
+
+urlpatterns = [
+    path('dashboard/<int:group_id>/', GroupDashboardView.as_view(), name='group-dashboard'),
+]
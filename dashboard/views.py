@@ -1,3 +1,35 @@
-from django.shortcuts import render
+from rest_framework import views, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from accounts.models import GroupLayer
+from accounts.services import get_layer_access
+from .services import get_group_dashboard
+
+
+class GroupDashboardView(views.APIView):
+    """
+    Dashboard of a group: assignment progress, evidence coverage and metric
+    totals per reporting year, read from the precomputed dashboard tables.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, group_id):
+        """
+        Query parameters:
+            year: Optional reporting year
+        """
+        access = get_layer_access(request)
+        if not (access.is_admin or group_id in access.accessible_layer_ids):
+            return Response({'error': 'You do not have access to this group'}, status=status.HTTP_403_FORBIDDEN)
+
+        group = GroupLayer.objects.filter(pk=group_id).first()
+        if group is None:
+            return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            year = int(request.query_params['year']) if request.query_params.get('year') else None
+        except ValueError:
+            return Response({'error': 'year must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(get_group_dashboard(group, year))
@@ -11,7 +11,8 @@ from .models.templates import (
     ESGMetricSubmission, ESGMetricEvidence
 )
 from .models import (
-    MetricSchemaRegistry, ESGMetricBatchSubmission
+    MetricSchemaRegistry, ESGMetricBatchSubmission, OCRJob, OCRResultCache,
+    ConsolidatedMetricValue, ESGMetricFact
 )
 
 class JSONEditorWidget(widgets.Textarea):
@@ -153,6 +154,34 @@ class ESGMetricEvidenceAdmin(admin.ModelAdmin):
         models.JSONField: {'widget': JSONEditorWidget},
     }
 
+@admin.register(OCRJob)
+class OCRJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'evidence', 'analyzer_id', 'status', 'attempts', 'next_attempt_at', 'finished_at')
+    list_filter = ('status', 'analyzer_id')
+    search_fields = ('evidence__filename', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at', 'locked_by', 'locked_until')
+
+@admin.register(OCRResultCache)
+class OCRResultCacheAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'analyzer_id', 'api_version', 'hit_count', 'created_at', 'last_hit_at')
+    list_filter = ('analyzer_id', 'api_version')
+    search_fields = ('content_hash',)
+    readonly_fields = ('created_at', 'last_hit_at', 'hit_count')
+
+@admin.register(ConsolidatedMetricValue)
+class ConsolidatedMetricValueAdmin(admin.ModelAdmin):
+    list_display = ('layer', 'metric', 'reporting_year', 'period', 'total_value', 'equity_value', 'unit', 'updated_at')
+    list_filter = ('reporting_year',)
+    search_fields = ('layer__company_name', 'metric__name')
+    list_select_related = ('layer', 'metric')
+
+@admin.register(ESGMetricFact)
+class ESGMetricFactAdmin(admin.ModelAdmin):
+    list_display = ('submission', 'layer', 'metric', 'period_start', 'period_end', 'region', 'value', 'unit')
+    list_filter = ('region', 'period_start')
+    search_fields = ('layer__company_name', 'metric__name', 'period_label')
+    list_select_related = ('submission__metric', 'submission__layer', 'layer', 'metric')
+
 @admin.register(MetricSchemaRegistry)
 class MetricSchemaRegistryAdmin(admin.ModelAdmin):
     list_display = ('name', 'version', 'created_by', 'created_at', 'is_active', 'metrics_count')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DataManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'data_management'
+
+    def ready(self):
+        """Import signals when app is ready"""
+        import data_management.signals  # noqa
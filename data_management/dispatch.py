@@ -0,0 +1,10 @@
+"""
+Signals data_management sends for apps built on top of it.
+"""
+
+from django.dispatch import Signal
+
+# Sent after bulk writes that skip the per-row model signals, with the
+# layer_years ((layer_id, reporting_year) pairs) and/or submission_ids
+# they changed
+submissions_bulk_changed = Signal()
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from data_management.models import ESGMetric, ESGMetricSubmission
+from data_management.services.primary_values import PRIMARY_VALUE_FIELDS, extract_primary_values
+
+
+class Command(BaseCommand):
+    help = 'Fill primary_value, primary_unit and total_value of stored submissions from their data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched and written per batch')
+        parser.add_argument('--metric-id', type=int, action='append', dest='metric_ids',
+                            help='Only backfill submissions of this metric (repeatable)')
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only fill submissions that were never extracted')
+        parser.add_argument('--dry-run', action='store_true', help='Report changes without saving them')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        queryset = ESGMetricSubmission.objects.all()
+        if options['metric_ids']:
+            queryset = queryset.filter(metric_id__in=options['metric_ids'])
+        if options['missing_only']:
+            queryset = queryset.filter(primary_unit__isnull=True)
+
+        metrics = ESGMetric.objects.select_related('schema_registry').in_bulk()
+        rows = queryset.order_by('id').values_list('id', 'metric_id', 'data', *PRIMARY_VALUE_FIELDS).iterator(
+            chunk_size=chunk_size
+        )
+
+        scanned = 0
+        to_update = []
+        changed = 0
+        for submission_id, metric_id, data, *current in rows:
+            scanned += 1
+            values = extract_primary_values(data, metrics[metric_id])
+            if [values[field] for field in PRIMARY_VALUE_FIELDS] == current:
+                continue
+            to_update.append(ESGMetricSubmission(id=submission_id, **values))
+            if len(to_update) >= chunk_size:
+                changed += self._write(to_update, options['dry_run'])
+                to_update = []
+        changed += self._write(to_update, options['dry_run'])
+
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {changed} of {scanned} submissions'))
+
+    def _write(self, to_update, dry_run):
+        if to_update and not dry_run:
+            with transaction.atomic():
+                ESGMetricSubmission.objects.bulk_update(to_update, PRIMARY_VALUE_FIELDS)
+        return len(to_update)
@@ -0,0 +1,92 @@
+import copy
+import importlib
+import json
+import pkgutil
+import timeit
+from django.core.management.base import BaseCommand, CommandError
+from data_management import json_schemas
+from data_management.services.calculations.plans import CalculationPlan
+from data_management.services.calculations.utils import apply_schema_calculations_interpreted
+
+
+def get_bundled_schemas():
+    """Collect the schema dicts defined in the data_management.json_schemas modules"""
+    schemas = {}
+    for module_info in pkgutil.iter_modules(json_schemas.__path__):
+        module = importlib.import_module(f'{json_schemas.__name__}.{module_info.name}')
+        for attr_name in dir(module):
+            schema = getattr(module, attr_name)
+            if attr_name.isupper() and 'SCHEMA' in attr_name and isinstance(schema, dict):
+                schemas[schema.get('type', attr_name.lower())] = schema
+    return schemas
+
+
+def build_sample_data(schema):
+    """Build submission data from a schema template's defaults, with every period valued"""
+    data = {}
+    properties = schema.get('template', {}).get('properties', {})
+    for field, definition in properties.items():
+        if 'default' in definition:
+            data[field] = copy.deepcopy(definition['default'])
+
+    periods = data.get('periods')
+    entries = periods.values() if isinstance(periods, dict) else periods or []
+    for i, entry in enumerate(entries):
+        if isinstance(entry, dict) and 'value' in entry:
+            entry['value'] = 100.5 + i
+    return data
+
+
+class Command(BaseCommand):
+    help = 'Benchmark compiled calculation plans against the interpreted calculations for all bundled schemas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Calculations per schema and implementation')
+        parser.add_argument('--format', choices=['pretty', 'json'], default='pretty', help='Output format')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if iterations < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        results = []
+        for schema_type, schema in sorted(get_bundled_schemas().items()):
+            sample = build_sample_data(schema)
+            plan = CalculationPlan(schema_type, schema)
+
+            def run_interpreted(data):
+                return apply_schema_calculations_interpreted(data, schema_type, metadata=schema)
+
+            def run_compiled(data):
+                if plan.requires_calculation is False or not plan.has_calculations:
+                    return data
+                return plan.apply(data)
+
+            if run_interpreted(copy.deepcopy(sample)) != run_compiled(copy.deepcopy(sample)):
+                raise CommandError(f'Compiled plan result differs for schema {schema_type}')
+
+            # Time only the calculation; copies are prepared up front
+            copies = [copy.deepcopy(sample) for _ in range(iterations)]
+            interpreted_time = timeit.timeit(lambda: run_interpreted(copies.pop()), number=iterations)
+            copies = [copy.deepcopy(sample) for _ in range(iterations)]
+            compiled_time = timeit.timeit(lambda: run_compiled(copies.pop()), number=iterations)
+
+            results.append({
+                'schema': schema_type,
+                'calculations': sum(len(stage.calculations) for stage in plan.stages),
+                'interpreted_us': round(interpreted_time / iterations * 1e6, 2),
+                'compiled_us': round(compiled_time / iterations * 1e6, 2),
+                'speedup': round(interpreted_time / compiled_time, 2) if compiled_time else None,
+            })
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for row in results:
+            self.stdout.write(
+                f"{row['schema']:<20} calcs={row['calculations']} "
+                f"interpreted={row['interpreted_us']}us compiled={row['compiled_us']}us "
+                f"speedup={row['speedup']}x"
+            )
+        self.stdout.write(self.style.SUCCESS('Compiled plans match interpreted results for all schemas'))
@@ -0,0 +1,81 @@
+import json
+import timeit
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from data_management.models import MetricSchemaRegistry
+from data_management.services.schema_validation import (
+    SchemaValidationError, invalidate_schema_validators, validate_against_registry
+)
+from data_management.management.commands.benchmark_calculations import build_sample_data, get_bundled_schemas
+
+
+def _outcome(validate):
+    """Error message of a validation, or None if the data is valid"""
+    try:
+        validate()
+    except SchemaValidationError as e:
+        return str(e)
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark cached schema validators against jsonschema.validate for all bundled schema templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Validations per schema and implementation')
+        parser.add_argument('--format', choices=['pretty', 'json'], default='pretty', help='Output format')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if iterations < 1:
+            raise CommandError('--iterations must be at least 1')
+        try:
+            import jsonschema
+        except ImportError:
+            raise CommandError('jsonschema is not installed')
+
+        results = []
+        now = timezone.now()
+        for index, (schema_type, schema) in enumerate(sorted(get_bundled_schemas().items()), start=1):
+            # The template is the JSON Schema of the submission data
+            template = schema.get('template')
+            if not template:
+                continue
+            sample = build_sample_data(schema)
+            # Unsaved registry rows with placeholder ids, so nothing is written
+            registry = MetricSchemaRegistry(id=-index, name=schema_type, schema=template, updated_at=now)
+
+            def run_uncached():
+                jsonschema.validate(instance=sample, schema=template)
+
+            def run_cached():
+                validate_against_registry(sample, registry)
+
+            invalid = {'periods': 'not a list'}
+            for data in (sample, invalid):
+                uncached = _outcome(lambda: jsonschema.validate(instance=data, schema=template))
+                cached = _outcome(lambda: validate_against_registry(data, registry))
+                if uncached != cached:
+                    raise CommandError(f'Cached validator reports a different result for schema {schema_type}')
+
+            uncached_time = timeit.timeit(run_uncached, number=iterations)
+            cached_time = timeit.timeit(run_cached, number=iterations)
+            invalidate_schema_validators(registry.id)
+
+            results.append({
+                'schema': schema_type,
+                'uncached_us': round(uncached_time / iterations * 1e6, 2),
+                'cached_us': round(cached_time / iterations * 1e6, 2),
+                'speedup': round(uncached_time / cached_time, 2) if cached_time else None,
+            })
+
+        if options['format'] == 'json':
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        for row in results:
+            self.stdout.write(
+                f"{row['schema']:<20} validate={row['uncached_us']}us cached={row['cached_us']}us "
+                f"speedup={row['speedup']}x"
+            )
+        self.stdout.write(self.style.SUCCESS('Cached validators report the same errors for all schemas'))
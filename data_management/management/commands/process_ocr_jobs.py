@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from data_management.services.ocr_jobs import OCRJobWorker
+
+
+class Command(BaseCommand):
+    help = 'Run the OCR job worker: start queued analyses and poll running ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the currently due jobs once and exit')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per iteration')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when no job is due')
+        parser.add_argument('--worker-id', help='Name recorded on claimed jobs (default: host:pid)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        worker = OCRJobWorker(worker_id=options['worker_id'])
+        self.stdout.write(f'OCR worker {worker.worker_id} started')
+
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                count = worker.run_once(options['batch_size'])
+                processed += count
+                if options['once']:
+                    break
+                if not count:
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping OCR worker')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} OCR job steps'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from data_management.models import ConsolidatedMetricValue
+from data_management.services.consolidation import rebuild_consolidated_values
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the consolidated metric values of every layer from the submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metric-id', type=int, action='append', dest='metric_ids',
+                            help='Only rebuild this metric (can be repeated)')
+
+    def handle(self, *args, **options):
+        before = ConsolidatedMetricValue.objects.count()
+        written = rebuild_consolidated_values(metric_ids=options['metric_ids'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt consolidated values: {before} rows replaced with {written}')
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from data_management.services.facts import rebuild_facts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the flattened metric fact table from the stored submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched and inserted per batch')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        scanned, written = rebuild_facts(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt metric facts: {written} rows from {scanned} submissions'))
@@ -0,0 +1,177 @@
+import copy
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from data_management.models import ESGMetricSubmission
+from data_management.services.calculations import validate_and_update_totals
+from data_management.services.consolidation import consolidation_key, refresh_consolidated_values
+from data_management.services.facts import refresh_facts
+from data_management.services.primary_values import PRIMARY_VALUE_FIELDS, populate_primary_values
+from data_management.dispatch import submissions_bulk_changed
+
+
+def _init_worker():
+    """Make sure Django is configured in pool workers started with 'spawn'"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def recalculate_row(row):
+    """
+    Recalculate one submission's data.
+
+    Args:
+        row: (submission_id, data, schema_type) tuple
+
+    Returns:
+        tuple: (submission_id, new_data or None if unchanged, error or None)
+    """
+    submission_id, data, schema_type = row
+    if not data or not isinstance(data, dict):
+        return submission_id, None, None
+    try:
+        updated = validate_and_update_totals(copy.deepcopy(data), schema_type)
+    except Exception as e:
+        return submission_id, None, str(e)
+    if updated == data:
+        return submission_id, None, None
+    return submission_id, updated, None
+
+
+def diff_data(old, new):
+    """Top-level keys whose values differ between two data dicts"""
+    changes = {}
+    for key in sorted(set(old) | set(new)):
+        if old.get(key) != new.get(key):
+            changes[key] = {'old': old.get(key), 'new': new.get(key)}
+    return changes
+
+
+class Command(BaseCommand):
+    help = 'Re-derive calculated fields (e.g. total_consumption) for stored metric submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', action='append', dest='schemas', default=[],
+                            help='Schema registry name to recalculate (repeatable, default: all)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched and written per batch')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Worker processes for calculations (0 = run in this process)')
+        parser.add_argument('--dry-run', action='store_true', help='Report changes without saving them')
+        parser.add_argument('--diff', action='store_true', help='Print the changed fields of each updated row')
+        parser.add_argument('--max-diffs', type=int, default=50, help='Maximum number of row diffs to print')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        dry_run = options['dry_run']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        if workers < 0:
+            raise CommandError('--workers cannot be negative')
+
+        queryset = ESGMetricSubmission.objects.filter(metric__schema_registry__isnull=False)
+        if options['schemas']:
+            queryset = queryset.filter(metric__schema_registry__name__in=options['schemas'])
+
+        # Ordered by schema so each chunk is mostly one schema type; only the needed columns are loaded
+        rows = queryset.order_by('metric__schema_registry__name', 'id').values_list(
+            'id', 'data', 'metric__schema_registry__name'
+        ).iterator(chunk_size=chunk_size)
+
+        stats = {}
+        diffs_printed = 0
+        executor = None
+        if workers:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(),
+                initializer=_init_worker
+            )
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: no changes will be saved'))
+
+        try:
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    diffs_printed = self._process_chunk(chunk, executor, stats, options, diffs_printed)
+                    chunk = []
+            if chunk:
+                diffs_printed = self._process_chunk(chunk, executor, stats, options, diffs_printed)
+        finally:
+            if executor:
+                executor.shutdown()
+
+        if options['diff'] and diffs_printed >= options['max_diffs']:
+            self.stdout.write(f"(diff output truncated at {options['max_diffs']} rows)")
+
+        for schema_type, counts in sorted(stats.items()):
+            self.stdout.write(
+                f"{schema_type}: scanned={counts['scanned']} changed={counts['changed']} "
+                f"errors={counts['errors']}"
+            )
+        total_changed = sum(counts['changed'] for counts in stats.values())
+        verb = 'Would update' if dry_run else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total_changed} submissions'))
+
+    def _process_chunk(self, chunk, executor, stats, options, diffs_printed):
+        """Recalculate one chunk and write the changed rows back with bulk_update"""
+        if executor:
+            results = executor.map(recalculate_row, chunk, chunksize=max(1, len(chunk) // 32))
+        else:
+            results = map(recalculate_row, chunk)
+
+        originals = {row[0]: row for row in chunk}
+        to_update = []
+        now = timezone.now()
+
+        for submission_id, new_data, error in results:
+            _, old_data, schema_type = originals[submission_id]
+            counts = stats.setdefault(schema_type, {'scanned': 0, 'changed': 0, 'errors': 0})
+            counts['scanned'] += 1
+
+            if error:
+                counts['errors'] += 1
+                self.stderr.write(f"Submission {submission_id} ({schema_type}): {error}")
+                continue
+            if new_data is None:
+                continue
+
+            counts['changed'] += 1
+            to_update.append(ESGMetricSubmission(id=submission_id, data=new_data, updated_at=now))
+
+            if options['diff'] and diffs_printed < options['max_diffs']:
+                diffs_printed += 1
+                self.stdout.write(
+                    f"Submission {submission_id} ({schema_type}): "
+                    f"{json.dumps(diff_data(old_data, new_data), default=str)}"
+                )
+
+        if to_update and not options['dry_run']:
+            # Totals changed, so the extracted value columns and facts are refreshed too
+            submissions = ESGMetricSubmission.objects.select_related(
+                'assignment', 'metric__schema_registry'
+            ).defer('data').in_bulk([s.id for s in to_update])
+            for updated in to_update:
+                submission = submissions.get(updated.id)
+                if submission is not None:
+                    submission.data, submission.updated_at = updated.data, updated.updated_at
+                    populate_primary_values(submission, submission.metric)
+            submissions = list(submissions.values())
+            with transaction.atomic():
+                ESGMetricSubmission.objects.bulk_update(submissions, ['data', 'updated_at'] + PRIMARY_VALUE_FIELDS)
+                refresh_facts(submissions)
+                keys = {consolidation_key(submission) for submission in submissions}
+                refresh_consolidated_values(keys)
+                submissions_bulk_changed.send(
+                    sender=ESGMetricSubmission, layer_years={(layer_id, year) for layer_id, _, year in keys}
+                )
+
+        return diffs_printed
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0032_ocrjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='esgmetricevidence',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='SHA-256 of the file contents, used to reuse OCR results for duplicate uploads', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='OCRResultCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 of the analyzed file', max_length=64)),
+                ('analyzer_id', models.CharField(max_length=255)),
+                ('api_version', models.CharField(max_length=50)),
+                ('result', models.JSONField(help_text='Raw result of the analyze operation')),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'OCR Result Cache Entry',
+                'verbose_name_plural': 'OCR Result Cache',
+                'unique_together': {('content_hash', 'analyzer_id', 'api_version')},
+            },
+        ),
+    ]
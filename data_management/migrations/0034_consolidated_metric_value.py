@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_layerclosure'),
+        ('data_management', '0033_ocr_result_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsolidatedMetricValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reporting_year', models.PositiveIntegerField(help_text="Year the assignment's reporting period ends")),
+                ('period', models.CharField(blank=True, default='', help_text='Period label from the submission data; blank for single-value metrics', max_length=50)),
+                ('unit', models.CharField(blank=True, default='', max_length=50)),
+                ('own_value', models.FloatField(default=0)),
+                ('total_value', models.FloatField(default=0)),
+                ('equity_value', models.FloatField(default=0)),
+                ('submission_count', models.PositiveIntegerField(default=0, help_text="Submissions in the layer's subtree with a value")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('layer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consolidated_values', to='accounts.layerprofile')),
+                ('metric', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consolidated_values', to='data_management.esgmetric')),
+            ],
+            options={
+                'verbose_name': 'Consolidated Metric Value',
+                'verbose_name_plural': 'Consolidated Metric Values',
+                'indexes': [models.Index(fields=['metric', 'reporting_year'], name='data_manage_metric__d121d8_idx')],
+                'unique_together': {('layer', 'metric', 'reporting_year', 'period')},
+            },
+        ),
+    ]
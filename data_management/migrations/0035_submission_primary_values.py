@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0034_consolidated_metric_value'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='esgmetricsubmission',
+            name='primary_unit',
+            field=models.CharField(blank=True, help_text='Unit of the primary value; null until extracted', max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='esgmetricsubmission',
+            name='primary_value',
+            field=models.FloatField(blank=True, help_text="Numeric value at the metric's primary_path", null=True),
+        ),
+        migrations.AddField(
+            model_name='esgmetricsubmission',
+            name='total_value',
+            field=models.FloatField(blank=True, help_text='Calculated total of the data, e.g. the sum of all periods', null=True),
+        ),
+    ]
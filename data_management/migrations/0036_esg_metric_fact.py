@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_layerclosure'),
+        ('data_management', '0035_submission_primary_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ESGMetricFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_label', models.CharField(blank=True, default='', help_text='Period as written in the data; blank for single-value metrics', max_length=50)),
+                ('period_start', models.DateField(help_text='Start of the period, or of the reporting period if unrecognised')),
+                ('period_end', models.DateField()),
+                ('region', models.CharField(blank=True, default='', max_length=10)),
+                ('value', models.FloatField()),
+                ('unit', models.CharField(blank=True, default='', max_length=50)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facts', to='data_management.templateassignment')),
+                ('layer', models.ForeignKey(blank=True, help_text="The submission's layer, or its assignment's layer", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='metric_facts', to='accounts.layerprofile')),
+                ('metric', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facts', to='data_management.esgmetric')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facts', to='data_management.esgmetricsubmission')),
+            ],
+            options={
+                'verbose_name': 'Metric Fact',
+                'verbose_name_plural': 'Metric Facts',
+                'indexes': [models.Index(fields=['metric', 'period_start'], name='data_manage_metric__653fff_idx'), models.Index(fields=['layer', 'metric', 'period_start'], name='data_manage_layer_i_29f364_idx'), models.Index(fields=['period_start', 'period_end'], name='data_manage_period__15e4f6_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_layerclosure'),
+        ('data_management', '0036_esg_metric_fact'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='esgmetricevidence',
+            index=models.Index(fields=['uploaded_at', 'id'], name='data_manage_uploade_29ea3f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='esgmetricsubmission',
+            index=models.Index(fields=['submitted_at', 'id'], name='data_manage_submitt_2ce5d4_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0037_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='esgformcategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='esgmetric',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='templateformselection',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -5,6 +5,9 @@ from .templates import (
     MetricSchemaRegistry, ESGMetricBatchSubmission
 )
 from .esg import BoundaryItem, EmissionFactor, ESGData, DataEditLog
+from .ocr import OCRJob, OCRResultCache
+from .consolidation import ConsolidatedMetricValue
+from .facts import ESGMetricFact
 
 __all__ = [
     'Template',
@@ -21,4 +24,8 @@ __all__ = [
     'DataEditLog',
     'MetricSchemaRegistry',
     'ESGMetricBatchSubmission',
+    'OCRJob',
+    'OCRResultCache',
+    'ConsolidatedMetricValue',
+    'ESGMetricFact',
 ] 
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Materialised consolidation of metric values over the company hierarchy.
+"""
+
+from django.db import models
+from accounts.models import LayerProfile
+from .templates import ESGMetric
+
+
+class ConsolidatedMetricValue(models.Model):
+    """
+    Consolidated value of a metric for one layer, reporting year and period.
+
+    own_value covers the layer's own submissions, total_value adds every
+    layer below it in full, and equity_value adds each child's equity_value
+    weighted by the child's shareholding_ratio. Rows are maintained by
+    services.consolidation as submissions change.
+    """
+    layer = models.ForeignKey(LayerProfile, on_delete=models.CASCADE, related_name='consolidated_values')
+    metric = models.ForeignKey(ESGMetric, on_delete=models.CASCADE, related_name='consolidated_values')
+    reporting_year = models.PositiveIntegerField(help_text="Year the assignment's reporting period ends")
+    period = models.CharField(max_length=50, blank=True, default='',
+                              help_text="Period label from the submission data; blank for single-value metrics")
+    unit = models.CharField(max_length=50, blank=True, default='')
+    own_value = models.FloatField(default=0)
+    total_value = models.FloatField(default=0)
+    equity_value = models.FloatField(default=0)
+    submission_count = models.PositiveIntegerField(default=0,
+                                                   help_text="Submissions in the layer's subtree with a value")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['layer', 'metric', 'reporting_year', 'period']
+        indexes = [
+            models.Index(fields=['metric', 'reporting_year']),
+        ]
+        verbose_name = "Consolidated Metric Value"
+        verbose_name_plural = "Consolidated Metric Values"
+
+    def __str__(self):
+        period = f" {self.period}" if self.period else ""
+        return f"{self.metric_id} @ {self.layer_id} {self.reporting_year}{period}: {self.total_value}"
@@ -0,0 +1,42 @@
+"""
+Flattened period values of metric submissions.
+"""
+
+from django.db import models
+from accounts.models import LayerProfile
+from .templates import ESGMetric, ESGMetricSubmission, TemplateAssignment
+
+
+class ESGMetricFact(models.Model):
+    """
+    One value of a submission: a period, and a region where the data is
+    split by region. Rows are derived from ESGMetricSubmission.data by
+    services.facts whenever a submission is written, so time-series and
+    cross-layer queries can filter and aggregate in SQL.
+    """
+    submission = models.ForeignKey(ESGMetricSubmission, on_delete=models.CASCADE, related_name='facts')
+    assignment = models.ForeignKey(TemplateAssignment, on_delete=models.CASCADE, related_name='facts')
+    layer = models.ForeignKey(LayerProfile, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='metric_facts',
+                              help_text="The submission's layer, or its assignment's layer")
+    metric = models.ForeignKey(ESGMetric, on_delete=models.CASCADE, related_name='facts')
+    period_label = models.CharField(max_length=50, blank=True, default='',
+                                    help_text="Period as written in the data; blank for single-value metrics")
+    period_start = models.DateField(help_text="Start of the period, or of the reporting period if unrecognised")
+    period_end = models.DateField()
+    region = models.CharField(max_length=10, blank=True, default='')
+    value = models.FloatField()
+    unit = models.CharField(max_length=50, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['metric', 'period_start']),
+            models.Index(fields=['layer', 'metric', 'period_start']),
+            models.Index(fields=['period_start', 'period_end']),
+        ]
+        verbose_name = "Metric Fact"
+        verbose_name_plural = "Metric Facts"
+
+    def __str__(self):
+        region = f" {self.region}" if self.region else ""
+        return f"{self.metric_id} @ {self.layer_id} {self.period_start}{region}: {self.value} {self.unit}"
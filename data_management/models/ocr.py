@@ -0,0 +1,83 @@
+"""
+Models for queued OCR processing of evidence files.
+"""
+
+from django.db import models
+from accounts.models import CustomUser
+from .templates import ESGMetricEvidence
+
+
+class OCRJob(models.Model):
+    """
+    A queued OCR analysis of one evidence file.
+
+    Jobs are created by the process_ocr endpoint and advanced by the
+    process_ocr_jobs worker command. A RUNNING job has been submitted to
+    Content Understanding and is polled at next_attempt_at until it finishes.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        RUNNING = 'RUNNING', 'Running'
+        SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+        FAILED = 'FAILED', 'Failed'
+
+    ACTIVE_STATUSES = [Status.QUEUED, Status.RUNNING]
+
+    evidence = models.ForeignKey(ESGMetricEvidence, on_delete=models.CASCADE, related_name='ocr_jobs')
+    analyzer_id = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='ocr_jobs')
+
+    attempts = models.PositiveIntegerField(default=0, help_text="Number of times analysis was started")
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(help_text="When a worker should next start or poll this job")
+    operation_location = models.TextField(blank=True, help_text="Result URL of the running analysis")
+
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Lease held by the worker processing a step")
+
+    result = models.JSONField(null=True, blank=True, help_text="Summary returned by the bill analyzer")
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['analyzer_id', 'status']),
+        ]
+
+    def __str__(self):
+        return f"OCR job {self.id} for evidence {self.evidence_id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.SUCCEEDED, self.Status.FAILED)
+
+
+class OCRResultCache(models.Model):
+    """
+    Content Understanding result for a file's contents, reused when the
+    same bill is uploaded again for another layer or submission.
+    """
+    content_hash = models.CharField(max_length=64, help_text="SHA-256 of the analyzed file")
+    analyzer_id = models.CharField(max_length=255)
+    api_version = models.CharField(max_length=50)
+    result = models.JSONField(help_text="Raw result of the analyze operation")
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['content_hash', 'analyzer_id', 'api_version']
+        verbose_name = "OCR Result Cache Entry"
+        verbose_name_plural = "OCR Result Cache"
+
+    def __str__(self):
+        return f"{self.analyzer_id} result for {self.content_hash[:12]}"
@@ -8,6 +8,7 @@ class ESGFormCategory(models.Model):
     code = models.CharField(max_length=20, unique=True)  # e.g., 'environmental', 'social'
     icon = models.CharField(max_length=50, blank=True)  # e.g., 'leaf', 'users'
     order = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order']
@@ -77,6 +78,7 @@ class ESGMetric(models.Model):
         null=True,
         help_text="Custom analyzer ID for OCR processing of this metric's evidence"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['form', 'order']
@@ -115,6 +117,7 @@ class TemplateFormSelection(models.Model):
     is_completed = models.BooleanField(default=False)  # Track if this form is completed
     completed_at = models.DateTimeField(null=True, blank=True)  # When the form was completed
     completed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='completed_forms')  # Who completed the form
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['template', 'order']
@@ -182,6 +185,14 @@ class ESGMetricSubmission(models.Model):
         help_text="The layer this submission's data represents"
     )
     
+    # Extracted from data on save (services.primary_values) for SQL-side aggregation
+    primary_value = models.FloatField(null=True, blank=True,
+                                      help_text="Numeric value at the metric's primary_path")
+    primary_unit = models.CharField(max_length=50, null=True, blank=True,
+                                    help_text="Unit of the primary value; null until extracted")
+    total_value = models.FloatField(null=True, blank=True,
+                                    help_text="Calculated total of the data, e.g. the sum of all periods")
+    
     # Fields for supporting multiple submissions for the same metric/layer
     submission_identifier = models.CharField(
         max_length=255, 
@@ -202,7 +213,9 @@ class ESGMetricSubmission(models.Model):
             # Add index for the new identifier field
             models.Index(fields=['submission_identifier']),
             # Add composite index for faster lookups 
-            models.Index(fields=['assignment', 'metric', 'layer', 'submission_identifier'])
+            models.Index(fields=['assignment', 'metric', 'layer', 'submission_identifier']),
+            # Keyset pagination order of submission listings
+            models.Index(fields=['submitted_at', 'id']),
         ]
 
     def __str__(self):
@@ -271,6 +284,8 @@ class ESGMetricEvidence(models.Model):
     period = models.DateField(null=True, blank=True, help_text="User-selected reporting period")
     ocr_period = models.DateField(null=True, blank=True, help_text="Reporting period extracted by OCR")
     ocr_data = models.JSONField(null=True, blank=True, help_text="Raw data extracted by OCR")
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True,
+                                    help_text="SHA-256 of the file contents, used to reuse OCR results for duplicate uploads")
     extracted_data = models.JSONField(null=True, blank=True, help_text="Structured data extracted by OCR")
     was_manually_edited = models.BooleanField(default=False, help_text="Whether the OCR result was manually edited")
     edited_at = models.DateTimeField(null=True, blank=True, help_text="When the OCR result was edited")
@@ -286,6 +301,12 @@ class ESGMetricEvidence(models.Model):
         help_text="Indicates this evidence supports multiple periods or values across different paths"
     )
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order of evidence listings
+            models.Index(fields=['uploaded_at', 'id']),
+        ]
+
     def __str__(self):
         if self.submission:
             return f"Evidence for {self.submission.metric.name}"
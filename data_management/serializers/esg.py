@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from accounts.models import CustomUser, LayerProfile
 from ..models import BoundaryItem, EmissionFactor, ESGData, DataEditLog
@@ -5,6 +6,9 @@ from ..models.templates import (
     ESGMetricSubmission, ESGMetricEvidence, ESGMetric, 
     MetricSchemaRegistry, ESGMetricBatchSubmission
 )
+from ..models.ocr import OCRJob
+from ..services.primary_values import get_primary_unit
+from ..services.schema_validation import SchemaValidationError, validate_against_registry
 
 class BoundaryItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -88,6 +92,28 @@ class ESGMetricEvidenceSerializer(serializers.ModelSerializer):
             return obj.layer.company_name
         return None
 
+class ESGMetricEvidenceListSerializer(ESGMetricEvidenceSerializer):
+    """
+    Read serializer for evidence listings. Querysets passed through
+    setup_eager_loading are serialized without further queries per row.
+    """
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('uploaded_by', 'edited_by', 'layer')
+
+class OCRJobSerializer(serializers.ModelSerializer):
+    """Serializer for the status of a queued OCR job"""
+    
+    class Meta:
+        model = OCRJob
+        fields = [
+            'id', 'evidence', 'analyzer_id', 'status', 'attempts', 'max_attempts',
+            'next_attempt_at', 'result', 'last_error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
 class ESGMetricSubmissionSerializer(serializers.ModelSerializer):
     """Serializer for ESG metric submissions"""
     evidence = ESGMetricEvidenceSerializer(many=True, read_only=True)
@@ -116,12 +142,12 @@ class ESGMetricSubmissionSerializer(serializers.ModelSerializer):
             'submitted_at', 'updated_at', 'notes', 'is_verified',
             'verified_by', 'verified_by_name', 'verified_at', 
             'verification_notes', 'evidence', 'layer_id', 'layer_name',
-            'submission_identifier', 'data_source'
+            'submission_identifier', 'primary_value', 'total_value'
         ]
         read_only_fields = [
             'submitted_by', 'submitted_at', 'updated_at', 
             'is_verified', 'verified_by', 'verified_at', 'layer_name',
-            'batch_id'
+            'batch_id', 'primary_value', 'total_value'
         ]
     
     def get_metric_name(self, obj):
@@ -130,52 +156,13 @@ class ESGMetricSubmissionSerializer(serializers.ModelSerializer):
     def get_metric_unit(self, obj):
         """Get the unit for this metric from the JSON data structure
         
-        If the metric has a primary_path, attempt to use that to find the unit.
-        Otherwise, look for a unit in the "_metadata.primary_measurement" field.
-        If none of these paths yield a unit, return None.
+        Uses the primary_unit column extracted when the submission was saved,
+        and walks the JSON (see services.primary_values.get_primary_unit) only
+        for rows that were never extracted.
         """
-        # If the metric submission has data
-        if obj.data and isinstance(obj.data, dict):
-            # First check if there's a primary path specified
-            if obj.metric.primary_path:
-                # Split the path into components
-                path_parts = obj.metric.primary_path.split('.')
-                # Try to navigate to the unit along the same path
-                current = obj.data
-                for i, part in enumerate(path_parts):
-                    if part in current:
-                        current = current[part]
-                        # If we're at the leaf node value object, look for unit
-                        if i == len(path_parts) - 1 and isinstance(current, dict) and 'unit' in current:
-                            return current['unit']
-                        # If the last part was 'value', try to get the unit from the parent
-                        elif part == 'value' and i == len(path_parts) - 1:
-                            # Go back one level to the parent object
-                            parent_path = '.'.join(path_parts[:-1])
-                            parent = obj.data
-                            for pp in parent_path.split('.'):
-                                if pp in parent:
-                                    parent = parent[pp]
-                                else:
-                                    parent = None
-                                    break
-                            if parent and isinstance(parent, dict) and 'unit' in parent:
-                                return parent['unit']
-                    else:
-                        break
-            
-            # Next check for _metadata.primary_measurement
-            if '_metadata' in obj.data and 'primary_measurement' in obj.data['_metadata']:
-                primary = obj.data['_metadata']['primary_measurement']
-                if 'unit' in primary:
-                    return primary['unit']
-            
-            # As a fallback, look for a root level unit
-            if 'unit' in obj.data:
-                return obj.data['unit']
-                
-        # Return None if no unit found
-        return None
+        if obj.primary_unit is not None:
+            return obj.primary_unit or None
+        return get_primary_unit(obj.data, obj.metric.primary_path)
     
     def get_submitted_by_name(self, obj):
         if obj.submitted_by:
@@ -213,12 +200,11 @@ class ESGMetricSubmissionSerializer(serializers.ModelSerializer):
             
         if schema:
             try:
-                from jsonschema import validate, ValidationError as JsonSchemaError
-                validate(instance=json_data, schema=schema)
+                validate_against_registry(json_data, metric.schema_registry)
             except ImportError:
                 # If jsonschema is not available, perform basic validation
                 pass
-            except JsonSchemaError as e:
+            except SchemaValidationError as e:
                 raise serializers.ValidationError(f"JSON data validation error: {str(e)}")
         
         # Check for duplicate submissions with the same layer and identifier
@@ -247,6 +233,24 @@ class ESGMetricSubmissionSerializer(serializers.ModelSerializer):
         
         return data
 
+class ESGMetricSubmissionListSerializer(ESGMetricSubmissionSerializer):
+    """
+    Read serializer for submission listings. Querysets passed through
+    setup_eager_loading load the metric, users, layer and evidence of every
+    row in a fixed number of queries.
+    """
+    evidence = ESGMetricEvidenceListSerializer(many=True, read_only=True)
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related(
+            'metric', 'submitted_by', 'verified_by', 'layer'
+        ).prefetch_related(
+            Prefetch('evidence', queryset=ESGMetricEvidenceListSerializer.setup_eager_loading(
+                ESGMetricEvidence.objects.order_by('id')
+            ))
+        )
+
 class ESGMetricSubmissionCreateSerializer(ESGMetricSubmissionSerializer):
     """Serializer for creating ESG metric submissions with batch support"""
     class Meta(ESGMetricSubmissionSerializer.Meta):
@@ -314,49 +318,62 @@ class ESGMetricBatchSubmissionSerializer(serializers.Serializer):
             
             if 'data' not in submission:
                 raise serializers.ValidationError(f"Submission at index {i} is missing 'data'")
-                
+        
+        # Look up every referenced submission and metric with one query each
+        update_ids = [s['update_id'] for s in submissions if 'update_id' in s]
+        existing_update_ids = {
+            str(pk) for pk in ESGMetricSubmission.objects.filter(
+                id__in=update_ids
+            ).values_list('id', flat=True)
+        } if update_ids else set()
+        existing_metric_ids = {
+            str(pk) for pk in ESGMetric.objects.filter(
+                id__in=[s['metric_id'] for s in submissions]
+            ).values_list('id', flat=True)
+        } if submissions else set()
+        
+        for i, submission in enumerate(submissions):
             # For update operations, validate the update_id exists
-            if 'update_id' in submission:
-                from ..models.templates import ESGMetricSubmission
-                try:
-                    ESGMetricSubmission.objects.get(id=submission['update_id'])
-                except ESGMetricSubmission.DoesNotExist:
-                    raise serializers.ValidationError(
-                        f"Submission at index {i} references non-existent update_id: {submission['update_id']}"
-                    )
+            if 'update_id' in submission and str(submission['update_id']) not in existing_update_ids:
+                raise serializers.ValidationError(
+                    f"Submission at index {i} references non-existent update_id: {submission['update_id']}"
+                )
             
             # Validate metric existence
             metric_id = submission.get('metric_id')
-            from ..models import ESGMetric
-            try:
-                ESGMetric.objects.get(id=metric_id)
-            except ESGMetric.DoesNotExist:
+            if str(metric_id) not in existing_metric_ids:
                 raise serializers.ValidationError(f"Metric with ID {metric_id} does not exist")
-            
-            # Check for duplicate submissions with the same layer
+        
+        # Check for duplicate submissions with the same layer
+        # Only check for duplicates if:
+        # 1. It's not an update operation (no update_id)
+        # 2. We're not forcing a new submission
+        # 3. We have an identifier
+        candidates = []
+        for submission in submissions:
             layer_id = submission.get('layer_id', data.get('layer_id'))
             submission_identifier = submission.get('submission_identifier', data.get('submission_identifier', ''))
             force_new = submission.get('force_new_submission', data.get('force_new_submission', False))
-            
-            # Only check for duplicates if:
-            # 1. It's not an update operation (no update_id)
-            # 2. We're not forcing a new submission
-            # 3. We have an identifier
             if 'update_id' not in submission and not force_new and submission_identifier and layer_id:
-                from ..models.templates import ESGMetricSubmission
-                try:
-                    existing = ESGMetricSubmission.objects.get(
-                        assignment_id=data['assignment_id'],
-                        metric_id=submission['metric_id'],
-                        layer_id=layer_id,
-                        submission_identifier=submission_identifier
-                    )
-                    
+                candidates.append((submission, str(layer_id), submission_identifier))
+        
+        if candidates:
+            existing = ESGMetricSubmission.objects.filter(
+                assignment_id=data['assignment_id'],
+                metric_id__in=[c[0]['metric_id'] for c in candidates],
+                layer_id__in=[c[1] for c in candidates],
+                submission_identifier__in=[c[2] for c in candidates]
+            ).order_by('id').values_list('id', 'metric_id', 'layer_id', 'submission_identifier')
+            existing_by_key = {}
+            for pk, metric_id, layer_id, identifier in existing:
+                existing_by_key.setdefault((str(metric_id), str(layer_id), identifier), pk)
+            
+            for submission, layer_id, submission_identifier in candidates:
+                key = (str(submission['metric_id']), layer_id, submission_identifier)
+                if key in existing_by_key:
                     # If we found a submission with this identifier, add the update_id
                     # to automatically update it instead of creating a duplicate
-                    submission['update_id'] = existing.id
-                except ESGMetricSubmission.DoesNotExist:
-                    pass
+                    submission['update_id'] = existing_by_key[key]
         
         return data
 
@@ -3,7 +3,11 @@ Data management service modules.
 """
 
 from .evidence import attach_evidence_to_submissions
+from .completion import AssignmentCompletion, build_completion_matrix, update_assignment_completion
 
 __all__ = [
     'attach_evidence_to_submissions',
+    'AssignmentCompletion',
+    'build_completion_matrix',
+    'update_assignment_completion',
 ]
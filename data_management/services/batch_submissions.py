@@ -0,0 +1,266 @@
+"""
+Bulk write pipeline for batch metric submissions.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import LayerProfile
+from accounts.services import LayerAccessResolver
+from ..models.templates import ESGMetric, ESGMetricSubmission
+from ..dispatch import submissions_bulk_changed
+from .calculations import validate_and_update_totals
+from .consolidation import consolidation_key, refresh_consolidated_values
+from .facts import refresh_facts
+from .primary_values import PRIMARY_VALUE_FIELDS, populate_primary_values
+
+logger = logging.getLogger(__name__)
+
+# Fields written back for submissions that already exist
+BATCH_UPDATE_FIELDS = [
+    'data', 'notes', 'batch_submission', 'submission_identifier',
+    'layer', 'submitted_at', 'updated_at'
+] + PRIMARY_VALUE_FIELDS
+
+
+def _as_id(value):
+    """Normalise an id from the JSON payload so it can key the prefetched dicts."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def apply_batch_submissions(assignment, submissions_data, user, batch, default_layer,
+                            submission_identifier='', update_timestamp=False,
+                            force_new_submission=False, access=None):
+    """
+    Resolve and write a batch of submission rows with a fixed number of queries.
+
+    Every referenced metric, layer and existing submission is prefetched with
+    IN queries, each row is resolved to an insert or an update in memory (in
+    payload order, so later rows see the effect of earlier ones), and the
+    result is written with one bulk_create and one bulk_update. Metric facts
+    and consolidated values of the affected layers are refreshed afterwards.
+
+    Args:
+        assignment: TemplateAssignment the rows belong to
+        submissions_data: List of row dicts (metric_id, data, notes, layer_id, ...)
+        user: Submitting user
+        batch: ESGMetricBatchSubmission to link rows to
+        default_layer: Layer used when a row has no layer_id
+        submission_identifier: Default identifier for rows without one
+        update_timestamp: Refresh submitted_at on updated rows
+        force_new_submission: Default for rows without force_new_submission
+        access: LayerAccessResolver for the user (a new one is created if omitted)
+
+    Returns:
+        tuple: (created_submissions, updated_submissions, failed_submissions)
+    """
+    created_submissions = []
+    updated_submissions = []
+    failed_submissions = []
+
+    if not submissions_data:
+        return created_submissions, updated_submissions, failed_submissions
+
+    # 1. Prefetch metrics, layers and explicitly referenced submissions
+    metric_ids = {_as_id(row.get('metric_id')) for row in submissions_data}
+    metrics = ESGMetric.objects.select_related('schema_registry').in_bulk(
+        [m for m in metric_ids if m is not None]
+    )
+
+    row_layer_ids = {_as_id(row.get('layer_id')) for row in submissions_data if row.get('layer_id')}
+    layers = LayerProfile.objects.in_bulk(row_layer_ids) if row_layer_ids else {}
+    access = access or LayerAccessResolver(user)
+    accessible_layer_ids = access.filter_accessible(layers) if layers else set()
+
+    update_ids = {_as_id(row['update_id']) for row in submissions_data if 'update_id' in row}
+    # The data column is always overwritten, so it is not loaded
+    instances = ESGMetricSubmission.objects.defer('data').in_bulk(update_ids) if update_ids else {}
+
+    # 2. Prefetch existing (metric, layer, identifier) rows of this assignment
+    target_layer_ids = {layer.id for layer in layers.values()}
+    if default_layer:
+        target_layer_ids.add(default_layer.id)
+    layer_filter = Q(layer_id__in=target_layer_ids)
+    if not default_layer:
+        layer_filter |= Q(layer__isnull=True)
+    existing = ESGMetricSubmission.objects.filter(
+        layer_filter, assignment=assignment, metric_id__in=list(metrics)
+    ).defer('data').order_by('id')
+
+    # Lookup key -> this assignment's submissions under it, as the baseline
+    # only ever matched rows with assignment=assignment
+    index = defaultdict(list)
+
+    def _key(submission):
+        return (submission.metric_id, submission.layer_id, submission.submission_identifier)
+
+    def _index(submission, previous_key=None):
+        if submission in index.get(previous_key, ()):
+            index[previous_key].remove(submission)
+        if submission.assignment_id == assignment.id and submission not in index[_key(submission)]:
+            index[_key(submission)].append(submission)
+
+    def _lookup(key):
+        # The lowest id wins, as .first() did before; rows created in this batch come last
+        return min(index.get(key, ()), key=lambda s: (s.pk is None, s.pk or 0), default=None)
+
+    for submission in existing:
+        submission = instances.setdefault(submission.id, submission)
+        _index(submission)
+    for submission in list(instances.values()):
+        _index(submission)
+
+    # 3. Resolve every row in memory
+    now = timezone.now()
+    to_create = []
+    to_update = {}
+    stale_keys = set()
+
+    def _consolidation_key(submission):
+        if submission.assignment_id == assignment.id:
+            submission.assignment = assignment
+        return consolidation_key(submission)
+
+    def _new_submission(metric, data, notes, layer, sub_identifier):
+        submission = ESGMetricSubmission(
+            assignment=assignment,
+            metric=metric,
+            data=data,
+            notes=notes,
+            submitted_by=user,
+            layer=layer,
+            batch_submission=batch,
+            submission_identifier=sub_identifier
+        )
+        to_create.append(submission)
+        created_submissions.append(submission)
+        _index(submission)
+        return submission
+
+    def _mark_updated(submission):
+        updated_submissions.append(submission)
+        # Rows created earlier in this batch are inserted in their final state
+        if submission.pk:
+            submission.updated_at = now
+            to_update[submission.pk] = submission
+
+    for sub_data in submissions_data:
+        metric_id = sub_data.get('metric_id')
+        data = sub_data.get('data')
+        notes = sub_data.get('notes', '')
+        sub_identifier = sub_data.get('submission_identifier', submission_identifier)
+        sub_force_new = sub_data.get('force_new_submission', force_new_submission)
+
+        # Validate metric exists
+        metric = metrics.get(_as_id(metric_id))
+        if metric is None:
+            failed_submissions.append({
+                'metric_id': metric_id,
+                'error': f'Metric with ID {metric_id} not found'
+            })
+            continue
+
+        # Calculate and validate totals
+        if data and isinstance(data, dict):
+            try:
+                data = validate_and_update_totals(data, metric)
+            except Exception as e:
+                # Log error but continue with original data
+                logger.warning(f"Calculation error for metric {metric_id}: {e}")
+                failed_submissions.append({
+                    'metric_id': metric_id,
+                    'error': f'Calculation error: {str(e)}'
+                })
+
+        # Get layer for this submission (submission-specific or default)
+        layer = default_layer
+        submission_layer_id = sub_data.get('layer_id')
+        if submission_layer_id:
+            layer = layers.get(_as_id(submission_layer_id))
+            if layer is None:
+                failed_submissions.append({
+                    'metric_id': metric_id,
+                    'error': f'Layer with ID {submission_layer_id} not found'
+                })
+                continue
+            if layer.id not in accessible_layer_ids:
+                failed_submissions.append({
+                    'metric_id': metric_id,
+                    'error': f'No access to layer with ID {submission_layer_id}'
+                })
+                continue
+
+        # Handle updates if an explicit update_id was provided
+        if 'update_id' in sub_data:
+            submission = instances.get(_as_id(sub_data['update_id']))
+            if submission is None:
+                # If submission no longer exists, create a new one
+                _new_submission(metric, data, notes, layer, sub_identifier)
+                continue
+
+            previous_key = _key(submission)
+            submission.data = data
+            submission.notes = notes
+            submission.batch_submission = batch
+            if sub_identifier:
+                submission.submission_identifier = sub_identifier
+            if update_timestamp:
+                submission.submitted_at = now
+            if layer:
+                # The previous layer's consolidated values change too
+                stale_keys.add(_consolidation_key(submission))
+                submission.layer = layer
+            _index(submission, previous_key)
+            _mark_updated(submission)
+            continue
+
+        # If force_new_submission is True, always create a new submission
+        if sub_force_new:
+            _new_submission(metric, data, notes, layer, sub_identifier)
+            continue
+
+        # Match by identifier, or any identifier-less row for the same metric/layer
+        layer_id = layer.id if layer else None
+        existing_submission = _lookup((metric.id, layer_id, sub_identifier or ''))
+
+        if existing_submission:
+            existing_submission.data = data
+            existing_submission.notes = notes
+            existing_submission.batch_submission = batch
+            if sub_identifier:
+                existing_submission.submission_identifier = sub_identifier
+            if update_timestamp:
+                existing_submission.submitted_at = now
+            _mark_updated(existing_submission)
+        else:
+            _new_submission(metric, data, notes, layer, sub_identifier)
+
+    # 4. Write everything in two statements
+    for submission in to_create + list(to_update.values()):
+        populate_primary_values(submission, metrics.get(submission.metric_id))
+    if to_create:
+        ESGMetricSubmission.objects.bulk_create(to_create)
+    if to_update:
+        ESGMetricSubmission.objects.bulk_update(list(to_update.values()), BATCH_UPDATE_FIELDS)
+
+    # Bulk writes skip the submission signals, so refresh derived tables here
+    written = created_submissions + updated_submissions
+    for submission in written:
+        if submission.metric_id in metrics:
+            submission.metric = metrics[submission.metric_id]
+        if submission.assignment_id == assignment.id:
+            submission.assignment = assignment
+    refresh_facts(written)
+    stale_keys |= {_consolidation_key(submission) for submission in written}
+    refresh_consolidated_values(stale_keys)
+    submissions_bulk_changed.send(
+        sender=ESGMetricSubmission, layer_years={(layer_id, year) for layer_id, _, year in stale_keys}
+    )
+
+    return created_submissions, updated_submissions, failed_submissions
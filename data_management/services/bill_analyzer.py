@@ -1,4 +1,3 @@
-import os
 import json
 import logging
 import requests
@@ -8,9 +7,10 @@ from datetime import datetime
 from django.conf import settings
 from django.utils import timezone
 from data_management.models import ESGMetricEvidence, ESGMetric
+from .ocr_cache import get_cached_ocr_result, store_ocr_result
 from typing import Callable, Dict, Any, List
-from tempfile import NamedTemporaryFile
 from copy import deepcopy
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +68,9 @@ class UtilityBillAnalyzer:
         """
         Process an evidence file with OCR and extract relevant utility data.
         
+        Blocks until the analysis finishes; web requests should queue an
+        OCRJob instead (see services.ocr_jobs).
+        
         Args:
             evidence: An ESGMetricEvidence object to process
             
@@ -76,54 +79,21 @@ class UtilityBillAnalyzer:
                   and result contains either the extracted data or an error message
         """
         try:
-            # Prepare file for processing - handle both local files and Azure Blob Storage
-            temp_file = None
-            file_path = None
+            analyzer_id = self.resolve_analyzer_id(evidence)
             
-            try:
-                if hasattr(settings, 'USE_AZURE_STORAGE') and settings.USE_AZURE_STORAGE:
-                    # For Azure Blob Storage, download to a temporary file
-                    temp_file = NamedTemporaryFile(delete=False, suffix=os.path.splitext(evidence.filename)[1])
-                    temp_file.write(evidence.file.read())
-                    temp_file.close()
-                    file_path = temp_file.name
-                    logger.info(f"Downloaded blob to temporary file: {file_path}")
-                else:
-                    # For local storage, use the file path directly
-                    file_path = evidence.file.path
-                    logger.info(f"Using local file path: {file_path}")
-                
-                # Determine analyzer ID
-                analyzer_id = self.default_analyzer_id
-                
-                # For evidence with a submission, use the metric's analyzer
-                if evidence.submission and evidence.submission.metric and evidence.submission.metric.ocr_analyzer_id:
-                    analyzer_id = evidence.submission.metric.ocr_analyzer_id
-                    logger.info(f"Using metric-specific analyzer: {analyzer_id}")
-                # For standalone evidence, check if metric_id was stored in ocr_data
-                elif evidence.ocr_data and 'intended_metric_id' in evidence.ocr_data:
-                    try:
-                        metric_id = evidence.ocr_data.get('intended_metric_id')
-                        if metric_id:
-                            metric = ESGMetric.objects.get(id=metric_id)
-                            if metric.ocr_analyzer_id:
-                                analyzer_id = metric.ocr_analyzer_id
-                                logger.info(f"Using standalone metric analyzer: {analyzer_id}")
-                    except ESGMetric.DoesNotExist:
-                        logger.warning(f"Intended metric {metric_id} not found, using default analyzer")
-                
-                # Create Azure Content Understanding client
-                client = AzureContentUnderstandingClient(
-                    self.endpoint,
-                    self.api_version,
-                    subscription_key=self.subscription_key
-                )
+            # The same bill may have been analyzed before
+            cached = self.get_cached_result(evidence, analyzer_id)
+            if cached is not None:
+                return self.apply_result(evidence, cached)
+            
+            with self.evidence_source(evidence) as file_location:
+                client = self.get_client()
                 
                 # Begin analysis with the appropriate analyzer
                 try:
                     metric_name = evidence.submission.metric.name if evidence.submission else "standalone file"
                     logger.info(f"Using analyzer ID: {analyzer_id} for: {metric_name}")
-                    response = client.begin_analyze(analyzer_id, file_path)
+                    response = client.begin_analyze(analyzer_id, file_location)
                     logger.info(f"Analysis started for evidence {evidence.id}, operation URL: {response.headers.get('operation-location')}")
                     
                     # Poll until completion
@@ -134,107 +104,9 @@ class UtilityBillAnalyzer:
                     )
                 except Exception as e:
                     logger.exception(f"Error during OCR processing: {str(e)}")
-                    evidence.is_processed_by_ocr = True  # Mark as processed even if failed
-                    evidence.save()
-                    return False, {
-                        "error": f"OCR processing failed: {str(e)}"
-                    }
+                    return self.mark_failed(evidence, f"OCR processing failed: {str(e)}")
                 
-                if result.get("status") != "Succeeded" or "result" not in result:
-                    evidence.is_processed_by_ocr = True
-                    evidence.ocr_data = result  # Store the raw result anyway
-                    evidence.save()
-                    return False, {
-                        "error": "OCR processing did not succeed"
-                    }
-                
-                # Extract data from result
-                try:
-                    fields = result["result"]["contents"][0]["fields"]
-                    
-                    # Store the complete OCR data, but preserve any existing metadata
-                    existing_metadata = evidence.ocr_data or {}
-                    if isinstance(existing_metadata, dict) and 'intended_metric_id' in existing_metadata:
-                        # Keep the intended_metric_id in the result
-                        result['intended_metric_id'] = existing_metadata['intended_metric_id']
-                    
-                    evidence.ocr_data = result
-                    evidence.is_processed_by_ocr = True
-                    
-                    # Extract consumption data - simplified now that we use custom analyzers
-                    extracted_data = self._extract_data_from_analyzer(fields)
-                    
-                    if not extracted_data:
-                        evidence.save()
-                        return False, {
-                            "error": "Could not extract relevant data from document"
-                        }
-                    
-                    # Update the evidence record with extracted data
-                    # For simplicity, we'll use the first period if multiple periods were found
-                    if "periods" in extracted_data and extracted_data["periods"]:
-                        # Store all periods in ocr_data for reference
-                        evidence.ocr_data['additional_periods'] = []
-                        
-                        # Sort periods by date, most recent first
-                        periods = sorted(
-                            extracted_data["periods"],
-                            key=lambda p: p.get("period") or datetime.min,
-                            reverse=True
-                        )
-                        
-                        # Use the most recent period as the primary
-                        first_period = periods[0]
-                        evidence.extracted_value = first_period.get("consumption")
-                        evidence.ocr_period = first_period.get("period")  # Store OCR period in new field
-                        
-                        # Store all other periods in additional_periods
-                        if len(periods) > 1:
-                            # Format additional periods for storage
-                            for period in periods[1:]:
-                                # Format the date as MM/YYYY if it's a datetime object
-                                if isinstance(period.get("period"), datetime):
-                                    period_date = period["period"].strftime("%m/%Y")
-                                else:
-                                    # Use the original period_str which should already be in MM/YYYY format
-                                    period_date = period.get("period_str", "")
-                                
-                                evidence.ocr_data['additional_periods'].append({
-                                    "period": period_date,
-                                    "consumption": period.get("consumption")
-                                })
-                    else:
-                        # Use single period data if available
-                        evidence.extracted_value = extracted_data.get("value")
-                        evidence.ocr_period = extracted_data.get("period")  # Store OCR period in new field
-                    
-                    evidence.save()
-                    
-                    # Return success with additional periods if available
-                    additional_periods = evidence.ocr_data.get('additional_periods', [])
-                    
-                    return True, {
-                        "extracted_value": evidence.extracted_value,
-                        "period": evidence.ocr_period,
-                        "additional_periods": additional_periods
-                    }
-                    
-                except Exception as e:
-                    logger.exception(f"Error extracting data from OCR result: {str(e)}")
-                    evidence.is_processed_by_ocr = True
-                    evidence.ocr_data = result
-                    evidence.save()
-                    return False, {
-                        "error": f"Error extracting data from OCR result: {str(e)}"
-                    }
-            finally:
-                # Clean up temporary file if we created one
-                if temp_file and os.path.exists(temp_file.name):
-                    try:
-                        os.unlink(temp_file.name)
-                        logger.info(f"Deleted temporary file: {temp_file.name}")
-                    except Exception as e:
-                        logger.warning(f"Failed to delete temporary file {temp_file.name}: {str(e)}")
+                return self.apply_result(evidence, result, analyzer_id=analyzer_id)
             
         except Exception as e:
             logger.exception(f"Error processing evidence {evidence.id}: {str(e)}")
@@ -242,6 +114,194 @@ class UtilityBillAnalyzer:
                 "error": f"Error processing evidence: {str(e)}"
             }
     
+    def process_evidence_many(self, evidence_ids, max_concurrency=8, **client_options):
+        """
+        Process many evidence files concurrently on one asyncio event loop.
+        See services.ocr_async.process_evidence_many.
+        
+        Returns:
+            dict: evidence_id -> (success, result) as returned by process_evidence
+        """
+        from .ocr_async import process_evidence_many
+        return process_evidence_many(
+            evidence_ids, analyzer=self, max_concurrency=max_concurrency, **client_options
+        )
+    
+    def get_client(self, request_timeout=None):
+        """Create an Azure Content Understanding client with this analyzer's credentials."""
+        return AzureContentUnderstandingClient(
+            self.endpoint,
+            self.api_version,
+            subscription_key=self.subscription_key,
+            request_timeout=request_timeout
+        )
+    
+    def resolve_analyzer_id(self, evidence):
+        """
+        Determine the analyzer to use for an evidence file.
+        
+        Uses the submission metric's analyzer, then the analyzer of the metric
+        stored as intended_metric_id in ocr_data, then the default analyzer.
+        """
+        # For evidence with a submission, use the metric's analyzer
+        if evidence.submission and evidence.submission.metric and evidence.submission.metric.ocr_analyzer_id:
+            analyzer_id = evidence.submission.metric.ocr_analyzer_id
+            logger.info(f"Using metric-specific analyzer: {analyzer_id}")
+            return analyzer_id
+        
+        # For standalone evidence, check if metric_id was stored in ocr_data
+        if evidence.ocr_data and 'intended_metric_id' in evidence.ocr_data:
+            metric_id = evidence.ocr_data.get('intended_metric_id')
+            try:
+                if metric_id:
+                    metric = ESGMetric.objects.get(id=metric_id)
+                    if metric.ocr_analyzer_id:
+                        logger.info(f"Using standalone metric analyzer: {metric.ocr_analyzer_id}")
+                        return metric.ocr_analyzer_id
+            except ESGMetric.DoesNotExist:
+                logger.warning(f"Intended metric {metric_id} not found, using default analyzer")
+        
+        return self.default_analyzer_id
+    
+    @contextmanager
+    def evidence_source(self, evidence):
+        """
+        Yield what begin_analyze should send for an evidence file, without
+        buffering the file in memory:
+        
+        - the local path, for storages with local files
+        - the file's absolute (e.g. SAS-signed blob) URL, for remote storages,
+          unless settings.OCR_SUBMIT_FILE_URLS is False
+        - otherwise an open handle on the stored file, which is streamed
+        """
+        try:
+            path = evidence.file.path
+        except NotImplementedError:
+            path = None
+        if path:
+            logger.info(f"Using local file path: {path}")
+            yield path
+            return
+        
+        if getattr(settings, 'OCR_SUBMIT_FILE_URLS', True):
+            file_url = evidence.file.url
+            if file_url.startswith(('https://', 'http://')):
+                logger.info(f"Submitting storage URL for evidence {evidence.id}")
+                yield file_url
+                return
+        
+        logger.info(f"Streaming evidence {evidence.id} from storage")
+        with evidence.file.open('rb') as handle:
+            yield handle
+    
+    def mark_failed(self, evidence, error, result=None):
+        """Mark the evidence as processed after a failed analysis."""
+        evidence.is_processed_by_ocr = True  # Mark as processed even if failed
+        if result is not None:
+            evidence.ocr_data = result  # Store the raw result anyway
+        evidence.save()
+        return False, {"error": error}
+    
+    def get_cached_result(self, evidence, analyzer_id):
+        """Stored analyze result for this file's contents, analyzer and API version, or None."""
+        return get_cached_ocr_result(evidence, analyzer_id, self.api_version)
+    
+    def apply_result(self, evidence, result, analyzer_id=None):
+        """
+        Store a finished Content Understanding result on the evidence record.
+        
+        Args:
+            evidence: The ESGMetricEvidence that was analyzed
+            result: The JSON body of the completed analyze operation
+            analyzer_id: Analyzer that produced a fresh result; when given, a
+                successful result is added to the OCR result cache
+            
+        Returns:
+            tuple: (success: bool, result: dict) as returned by process_evidence
+        """
+        if result.get("status") != "Succeeded" or "result" not in result:
+            return self.mark_failed(evidence, "OCR processing did not succeed", result)
+        
+        raw_result = deepcopy(result) if analyzer_id else None
+        
+        # Extract data from result
+        try:
+            fields = result["result"]["contents"][0]["fields"]
+            
+            # Store the complete OCR data, but preserve any existing metadata
+            existing_metadata = evidence.ocr_data or {}
+            if isinstance(existing_metadata, dict) and 'intended_metric_id' in existing_metadata:
+                # Keep the intended_metric_id in the result
+                result['intended_metric_id'] = existing_metadata['intended_metric_id']
+            
+            evidence.ocr_data = result
+            evidence.is_processed_by_ocr = True
+            
+            # Extract consumption data - simplified now that we use custom analyzers
+            extracted_data = self._extract_data_from_analyzer(fields)
+            
+            if not extracted_data:
+                evidence.save()
+                return False, {
+                    "error": "Could not extract relevant data from document"
+                }
+            
+            # Update the evidence record with extracted data
+            # For simplicity, we'll use the first period if multiple periods were found
+            if "periods" in extracted_data and extracted_data["periods"]:
+                # Store all periods in ocr_data for reference
+                evidence.ocr_data['additional_periods'] = []
+                
+                # Sort periods by date, most recent first
+                periods = sorted(
+                    extracted_data["periods"],
+                    key=lambda p: p.get("period") or datetime.min,
+                    reverse=True
+                )
+                
+                # Use the most recent period as the primary
+                first_period = periods[0]
+                evidence.extracted_value = first_period.get("consumption")
+                evidence.ocr_period = first_period.get("period")  # Store OCR period in new field
+                
+                # Store all other periods in additional_periods
+                if len(periods) > 1:
+                    # Format additional periods for storage
+                    for period in periods[1:]:
+                        # Format the date as MM/YYYY if it's a datetime object
+                        if isinstance(period.get("period"), datetime):
+                            period_date = period["period"].strftime("%m/%Y")
+                        else:
+                            # Use the original period_str which should already be in MM/YYYY format
+                            period_date = period.get("period_str", "")
+                        
+                        evidence.ocr_data['additional_periods'].append({
+                            "period": period_date,
+                            "consumption": period.get("consumption")
+                        })
+            else:
+                # Use single period data if available
+                evidence.extracted_value = extracted_data.get("value")
+                evidence.ocr_period = extracted_data.get("period")  # Store OCR period in new field
+            
+            evidence.save()
+            
+            if raw_result is not None:
+                store_ocr_result(evidence, analyzer_id, self.api_version, raw_result)
+            
+            # Return success with additional periods if available
+            additional_periods = evidence.ocr_data.get('additional_periods', [])
+            
+            return True, {
+                "extracted_value": evidence.extracted_value,
+                "period": evidence.ocr_period,
+                "additional_periods": additional_periods
+            }
+            
+        except Exception as e:
+            logger.exception(f"Error extracting data from OCR result: {str(e)}")
+            return self.mark_failed(evidence, f"Error extracting data from OCR result: {str(e)}", result)
+    
     def _extract_data_from_analyzer(self, fields):
         """
         Extract relevant data from the Content Understanding API fields.
@@ -516,6 +576,7 @@ class AzureContentUnderstandingClient:
         subscription_key: str | None = None,
         token_provider: Callable[[], str] | None = None,
         x_ms_useragent: str = "esg-platform",
+        request_timeout: float | None = None,
     ) -> None:
         if not subscription_key and token_provider is None:
             raise ValueError(
@@ -528,19 +589,25 @@ class AzureContentUnderstandingClient:
 
         self._endpoint: str = endpoint.rstrip("/")
         self._api_version: str = api_version
+        self._request_timeout: float | None = request_timeout
         self._logger: logging.Logger = logging.getLogger(__name__)
         self._logger.setLevel(logging.INFO)
         self._headers: dict[str, str] = self._get_headers(
             subscription_key, token_provider and token_provider(), x_ms_useragent
         )
 
-    def begin_analyze(self, analyzer_id: str, file_location: str):
+    def begin_analyze(self, analyzer_id: str, file_location):
         """
         Begins the analysis of a file or URL using the specified analyzer.
 
+        Files are streamed to the service in blocks rather than read into
+        memory, and URLs are sent as {"url": ...} so the service fetches
+        the document itself.
+
         Args:
             analyzer_id (str): The ID of the analyzer to use.
-            file_location (str): The path to the file or the URL to analyze.
+            file_location: The path to the file, the URL to analyze, or an
+                open binary file object.
 
         Returns:
             Response: The response from the analysis request.
@@ -549,38 +616,46 @@ class AzureContentUnderstandingClient:
             ValueError: If the file location is not a valid path or URL.
             HTTPError: If the HTTP request returned an unsuccessful status code.
         """
-        import os
         from pathlib import Path
         
+        url = self._get_analyze_url(self._endpoint, self._api_version, analyzer_id)
+        self._logger.info(f"POST request to: {url}")
+        
+        if hasattr(file_location, "read"):
+            self._logger.info(f"Analyzing stream {getattr(file_location, 'name', '')} with analyzer: {analyzer_id}")
+            # Rewind in case the stream is being sent again after a retry
+            if hasattr(file_location, "seek"):
+                file_location.seek(0)
+            return self._post_file(url, file_location)
+        
+        self._logger.info(f"Analyzing file {file_location} with analyzer: {analyzer_id}")
         if Path(file_location).exists():
             with open(file_location, "rb") as file:
-                data = file.read()
-            headers = {"Content-Type": "application/octet-stream"}
+                return self._post_file(url, file)
         elif "https://" in file_location or "http://" in file_location:
-            data = {"url": file_location}
             headers = {"Content-Type": "application/json"}
-        else:
-            raise ValueError("File location must be a valid path or URL.")
-
-        headers.update(self._headers)
-        url = self._get_analyze_url(self._endpoint, self._api_version, analyzer_id)
-        
-        self._logger.info(f"Analyzing file {file_location} with analyzer: {analyzer_id}")
-        self._logger.info(f"POST request to: {url}")
-        
-        if isinstance(data, dict):
+            headers.update(self._headers)
             response = requests.post(
                 url=url,
                 headers=headers,
-                json=data,
+                json={"url": file_location},
+                timeout=self._request_timeout,
             )
+            response.raise_for_status()
+            return response
         else:
-            response = requests.post(
-                url=url,
-                headers=headers,
-                data=data,
-            )
+            raise ValueError("File location must be a valid path or URL.")
 
+    def _post_file(self, url: str, file) -> requests.Response:
+        """POST a binary file object; requests sends it in blocks with its Content-Length."""
+        headers = {"Content-Type": "application/octet-stream"}
+        headers.update(self._headers)
+        response = requests.post(
+            url=url,
+            headers=headers,
+            data=file,
+            timeout=self._request_timeout,
+        )
         response.raise_for_status()
         return response
 
@@ -608,9 +683,7 @@ class AzureContentUnderstandingClient:
                     f"Operation timed out after {timeout_seconds:.2f} seconds."
                 )
 
-            response = requests.get(operation_location, headers=self._headers)
-            response.raise_for_status()
-            result = response.json()
+            result = self.get_result(operation_location)
             status = result.get("status", "").lower()
             if status == "succeeded":
                 self._logger.info(
@@ -618,7 +691,7 @@ class AzureContentUnderstandingClient:
                 )
                 return result
             elif status == "failed":
-                self._logger.error(f"Analysis failed. Reason: {response.json()}")
+                self._logger.error(f"Analysis failed. Reason: {result}")
                 raise RuntimeError(f"Analysis failed: {result}")
             else:
                 self._logger.info(
@@ -626,6 +699,26 @@ class AzureContentUnderstandingClient:
                 )
             time.sleep(polling_interval_seconds)
 
+    def get_result(self, operation_location: str) -> dict[str, Any]:
+        """
+        Fetches the current state of an analyze operation once, without waiting.
+
+        Raises:
+            HTTPError: If the HTTP request returned an unsuccessful status code.
+        """
+        return self.get_result_response(operation_location).json()
+
+    def get_result_response(self, operation_location: str) -> requests.Response:
+        """
+        Like get_result, but returns the HTTP response so callers can read
+        headers such as Retry-After.
+        """
+        response = requests.get(
+            operation_location, headers=self._headers, timeout=self._request_timeout
+        )
+        response.raise_for_status()
+        return response
+
     def _get_analyze_url(self, endpoint: str, api_version: str, analyzer_id: str):
         return f"{endpoint}/contentunderstanding/analyzers/{analyzer_id}:analyze?api-version={api_version}"
 
@@ -77,14 +77,14 @@ def validate_and_update_totals(data, schema_type=None):
         return CALCULATION_HANDLERS[schema_type](data)
     
     # If handler not found, use calculation metadata approach
-    from .utils import apply_schema_calculations, get_calculation_metadata
+    from .utils import apply_schema_calculations
+    from .plans import get_calculation_plan
     
-    # Get schema metadata to determine if calculation is needed
-    metadata = get_calculation_metadata(schema_type)
-    requires_calculation = metadata.get('requires_calculation', False)
+    # Get the compiled plan to determine if calculation is needed
+    plan = get_calculation_plan(schema_type)
     
     # Skip calculation if explicitly marked as not requiring it
-    if requires_calculation is False:
+    if plan.requires_calculation is False:
         logger.info(f"Schema {schema_type} is marked as not requiring calculations")
         return data
         
@@ -0,0 +1,338 @@
+"""
+Precompiled calculation plans for schema calculated_fields.
+"""
+
+import logging
+import re
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Same expression grammar as utils.evaluate_calculation
+CALCULATION_PATTERN = re.compile(r'(\w+)\(([^)]+)\)')
+
+# (schema name, schema version) -> CalculationPlan
+_PLAN_CACHE = {}
+_PLAN_CACHE_LOCK = threading.Lock()
+
+
+def tokenize_path(path_expr):
+    """
+    Split a path expression like 'periods[*].value' into segments once.
+
+    Uses the same normalisation as utils.resolve_calculation_path, so
+    '[*]' and '.*' are equivalent wildcards.
+    """
+    return tuple(path_expr.replace('[*]', '.*').split('.'))
+
+
+def _unit_tokens(calculation):
+    """
+    Derive the unit path tokens exactly as apply_schema_calculations did.
+
+    The legacy code replaced '.value' with '.unit' in the whole calculation
+    expression and passed it through get_preferred_unit; the same string
+    transformations are applied here so the preferred unit is unchanged.
+    """
+    unit_expr = calculation.replace('.value', '.unit')
+    base_path = '.'.join(unit_expr.split('.')[:-1])
+    return tokenize_path(f"{base_path}.unit")
+
+
+def _paths_overlap(a, b):
+    """True if two token paths can address the same node (wildcards match anything)."""
+    for x, y in zip(a, b):
+        if x != y and x != '*' and y != '*':
+            return False
+    return True
+
+
+def _numeric_values(values):
+    numeric_values = []
+    for val in values:
+        if isinstance(val, dict) and 'value' in val:
+            # Extract the value if it's in a value/unit structure
+            if val['value'] is not None and isinstance(val['value'], (int, float)):
+                numeric_values.append(val['value'])
+        elif isinstance(val, (int, float)):
+            numeric_values.append(val)
+    return numeric_values
+
+
+def _sum(values):
+    return sum(values) if values else 0
+
+
+def _avg(values):
+    return sum(values) / len(values) if values else 0
+
+
+def _max(values):
+    return max(values) if values else 0
+
+
+def _min(values):
+    return min(values) if values else 0
+
+
+AGGREGATE_FUNCTIONS = {
+    'sum': _sum,
+    'avg': _avg,
+    'average': _avg,
+    'max': _max,
+    'min': _min,
+    'count': len,
+}
+
+
+class CompiledCalculation:
+    """A single calculated_fields entry with its paths and function resolved."""
+
+    def __init__(self, path, calculation, dependency_paths):
+        self.path = path
+        self.calculation = calculation
+        self.target = tuple(path.split('.'))
+        self.dependencies = [tokenize_path(dep) for dep in dependency_paths]
+
+        match = CALCULATION_PATTERN.match(calculation)
+        if match:
+            func_name, arg_path = match.groups()
+            self.func_name = func_name
+            self.func = AGGREGATE_FUNCTIONS.get(func_name)
+            self.argument = tokenize_path(arg_path)
+        else:
+            self.func_name = None
+            self.func = None
+            self.argument = None
+
+        self.unit_path = _unit_tokens(calculation) if '.value' in calculation else None
+
+    @property
+    def read_paths(self):
+        paths = list(self.dependencies)
+        if self.argument:
+            paths.append(self.argument)
+        if self.unit_path:
+            paths.append(self.unit_path)
+        return paths
+
+    def evaluate(self, resolved):
+        """
+        Compute the result from already-resolved path values.
+
+        Args:
+            resolved: Dict of token path -> list of resolved values
+
+        Returns:
+            tuple: (applies, result, preferred_unit)
+        """
+        if self.dependencies and not any(
+            any(v is not None for v in resolved[dep]) for dep in self.dependencies
+        ):
+            logger.warning(f"Skipping calculation for {self.path} - dependencies not present")
+            return False, None, None
+
+        preferred_unit = None
+        if self.unit_path:
+            unit_counts = defaultdict(int)
+            for unit in resolved[self.unit_path]:
+                if isinstance(unit, str):
+                    unit_counts[unit] += 1
+            if unit_counts:
+                preferred_unit = max(unit_counts.items(), key=lambda x: x[1])[0]
+
+        if self.argument is None:
+            logger.warning(f"Invalid calculation expression: {self.calculation}")
+            return True, None, preferred_unit
+        if self.func is None:
+            logger.warning(f"Unknown calculation function: {self.func_name}")
+            return True, None, preferred_unit
+
+        return True, self.func(_numeric_values(resolved[self.argument])), preferred_unit
+
+    def write(self, data, value, preferred_unit=None):
+        """Set the result at the target path, preserving value/unit structures."""
+        current = data
+        for part in self.target[:-1]:
+            if part not in current:
+                current[part] = {}
+            current = current[part]
+
+        last_part = self.target[-1]
+        if isinstance(current.get(last_part), dict) and 'value' in current[last_part]:
+            # Update value but preserve the unit
+            current_unit = current[last_part].get('unit')
+            current[last_part]['value'] = value
+            if not current_unit and preferred_unit:
+                current[last_part]['unit'] = preferred_unit
+        else:
+            current[last_part] = value
+        return data
+
+
+def _build_trie(paths):
+    """Merge token paths into a trie so they can be resolved in one walk."""
+    root = {'children': {}, 'ends': []}
+    for path in paths:
+        node = root
+        for token in path:
+            node = node['children'].setdefault(token, {'children': {}, 'ends': []})
+        node['ends'].append(path)
+    return root
+
+
+def _walk(current, node, resolved):
+    for path in node['ends']:
+        resolved[path].append(current)
+    for token, child in node['children'].items():
+        if token == '*':
+            if isinstance(current, dict):
+                for value in current.values():
+                    _walk(value, child, resolved)
+            elif isinstance(current, list):
+                for item in current:
+                    _walk(item, child, resolved)
+        elif isinstance(current, dict) and token in current:
+            _walk(current[token], child, resolved)
+
+
+class CalculationStage:
+    """Calculations whose inputs are independent of each other's outputs."""
+
+    def __init__(self):
+        self.calculations = []
+        self.paths = []
+        self.trie = None
+
+    def conflicts_with(self, calc):
+        return any(
+            _paths_overlap(read, earlier.target)
+            for earlier in self.calculations
+            for read in calc.read_paths
+        )
+
+    def add(self, calc):
+        self.calculations.append(calc)
+        for path in calc.read_paths:
+            if path not in self.paths:
+                self.paths.append(path)
+
+    def finalize(self):
+        self.trie = _build_trie(self.paths)
+
+    def apply(self, data):
+        resolved = {path: [] for path in self.paths}
+        _walk(data, self.trie, resolved)
+        for calc in self.calculations:
+            applies, result, preferred_unit = calc.evaluate(resolved)
+            if applies and result is not None:
+                data = calc.write(data, result, preferred_unit)
+        return data
+
+
+class CalculationPlan:
+    """
+    Compiled form of a schema's calculated_fields.
+
+    Paths are tokenised and aggregate functions resolved at build time; at
+    evaluation time every path a stage needs is resolved in a single walk of
+    the data. A new stage only starts when a calculation reads a path an
+    earlier one writes, which keeps the sequential semantics of
+    apply_schema_calculations.
+    """
+
+    def __init__(self, schema_type, metadata):
+        self.schema_type = schema_type
+        self.requires_calculation = metadata.get('requires_calculation', False)
+        self.stages = []
+
+        for calc in metadata.get('calculated_fields', []):
+            path = calc.get('path')
+            calculation = calc.get('calculation')
+            if not path or not calculation:
+                continue
+
+            compiled = CompiledCalculation(path, calculation, calc.get('dependency_paths', []))
+            if not self.stages or self.stages[-1].conflicts_with(compiled):
+                self.stages.append(CalculationStage())
+            self.stages[-1].add(compiled)
+
+        for stage in self.stages:
+            stage.finalize()
+
+    @property
+    def has_calculations(self):
+        return bool(self.stages)
+
+    def apply(self, data):
+        """
+        Apply every calculation to the data in place.
+
+        Args:
+            data (dict): The submission data
+
+        Returns:
+            dict: The data with calculated fields set
+        """
+        if not data or not isinstance(data, dict):
+            return data
+        for stage in self.stages:
+            data = stage.apply(data)
+        return data
+
+
+def _plan_key(schema_type):
+    """Cache key for a schema: its name plus the version of its definition."""
+    from ...json_schemas import SCHEMA_TEMPLATES
+
+    if isinstance(schema_type, str):
+        schema = SCHEMA_TEMPLATES.get(schema_type) or {}
+        return (schema_type, schema.get('schema_version'))
+
+    registry = getattr(schema_type, 'schema_registry', None)
+    if registry is None:
+        return None
+    if getattr(registry, 'name', None):
+        return _plan_key(registry.name)
+    return (f'registry:{registry.pk}', getattr(registry, 'version', None))
+
+
+def get_calculation_plan(schema_type):
+    """
+    Get the cached calculation plan for a schema, compiling it on first use.
+
+    Args:
+        schema_type: Schema type identifier or ESGMetric with schema_registry
+
+    Returns:
+        CalculationPlan: The compiled plan (empty if the schema has no calculations)
+    """
+    from .utils import get_calculation_metadata
+
+    key = _plan_key(schema_type)
+    if key is not None:
+        plan = _PLAN_CACHE.get(key)
+        if plan is not None:
+            return plan
+
+    plan = CalculationPlan(key[0] if key else None, get_calculation_metadata(schema_type))
+    if key is not None:
+        with _PLAN_CACHE_LOCK:
+            _PLAN_CACHE[key] = plan
+        logger.info(f"Compiled calculation plan for {key[0]} (version {key[1]})")
+    return plan
+
+
+def invalidate_calculation_plans(*schema_names):
+    """
+    Drop cached plans for the given schema names, or all plans if none are given.
+
+    Called when a MetricSchemaRegistry row is saved or deleted.
+    """
+    with _PLAN_CACHE_LOCK:
+        if not schema_names:
+            _PLAN_CACHE.clear()
+            return
+        for key in [k for k in _PLAN_CACHE if k[0] in schema_names]:
+            del _PLAN_CACHE[key]
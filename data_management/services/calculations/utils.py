@@ -213,11 +213,38 @@ def get_preferred_unit(data, path_expr):
 def apply_schema_calculations(data, schema_type):
     """
     Apply all calculations defined in a schema to the data.
+    Uses the cached, precompiled calculation plan for the schema.
     
     Args:
         data (dict): The data to process
         schema_type (str): Schema type identifier
         
+    Returns:
+        dict: The data with all calculations applied
+    """
+    from .plans import get_calculation_plan
+    
+    if not data or not isinstance(data, dict):
+        return data
+    
+    plan = get_calculation_plan(schema_type)
+    
+    # Early return if schema explicitly states no calculations required
+    if plan.requires_calculation is False or not plan.has_calculations:
+        return data
+    
+    return plan.apply(data)
+
+def apply_schema_calculations_interpreted(data, schema_type, metadata=None):
+    """
+    Apply all calculations defined in a schema by interpreting each expression.
+    Reference implementation kept for comparing against compiled plans.
+    
+    Args:
+        data (dict): The data to process
+        schema_type (str): Schema type identifier
+        metadata (dict, optional): Calculation metadata to use instead of a lookup
+        
     Returns:
         dict: The data with all calculations applied
     """
@@ -226,7 +253,8 @@ def apply_schema_calculations(data, schema_type):
     
     logger.info(f"Applying schema calculations for schema_type: {schema_type}")
     
-    metadata = get_calculation_metadata(schema_type)
+    if metadata is None:
+        metadata = get_calculation_metadata(schema_type)
     calculation_metadata = metadata.get('calculated_fields', [])
     requires_calculation = metadata.get('requires_calculation', False)
     
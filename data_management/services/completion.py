@@ -0,0 +1,335 @@
+"""
+Set-based completion checks for template assignments.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.db.models import Count
+from django.utils import timezone
+
+from ..models.templates import (
+    ESGMetric, ESGMetricSubmission, TemplateFormSelection
+)
+
+logger = logging.getLogger(__name__)
+
+# Submissions expected per reporting period of a time-based metric
+REQUIRED_SUBMISSIONS_BY_FREQUENCY = {
+    'monthly': 12,
+    'quarterly': 4,
+    'annual': 1,
+}
+
+
+def required_submission_count(requires_time_reporting, reporting_frequency):
+    """Number of submissions a metric needs before it counts as complete."""
+    if not requires_time_reporting or not reporting_frequency:
+        return 1
+    return REQUIRED_SUBMISSIONS_BY_FREQUENCY.get(reporting_frequency, 1)
+
+
+def submission_data_has_value(data, requires_time_reporting):
+    """
+    Classify a submission's JSON data as complete or not.
+
+    Time-based metrics need a non-empty 'periods' dict with at least one
+    period entry carrying a 'value'; regular metrics need a top-level 'value'.
+
+    Args:
+        data: The submission's JSON data
+        requires_time_reporting: Whether the metric is time-based
+
+    Returns:
+        bool: True if the data counts towards completion
+    """
+    if not data or not isinstance(data, dict):
+        return False
+
+    if requires_time_reporting:
+        periods = data.get('periods')
+        if not isinstance(periods, dict) or not periods:
+            return False
+        return any(
+            isinstance(period_data, dict) and 'value' in period_data
+            for period_data in periods.values()
+        )
+
+    return 'value' in data
+
+
+class AssignmentCompletion:
+    """
+    Completion state of a template assignment computed in memory.
+
+    Loads the required metrics and every submission of the assignment with a
+    fixed number of queries, classifies each submission once, and derives
+    metric, form and assignment completion from the resulting id sets.
+    """
+
+    def __init__(self, assignment):
+        self.assignment = assignment
+
+        # One query: required metrics across all selected forms
+        self.required_metrics = list(
+            ESGMetric.objects.filter(
+                form__in=assignment.template.selected_forms.all(),
+                is_required=True
+            ).select_related('form')
+        )
+        metric_flags = {
+            metric.id: metric.requires_time_reporting
+            for metric in self.required_metrics
+        }
+
+        # One query: all submissions, classified once each
+        self.submitted_metric_ids = set()
+        self.complete_metric_ids = set()
+        # form_id -> (submitted_at, submitted_by_id) of the most recent submission
+        self.latest_submitter_by_form = {}
+
+        rows = ESGMetricSubmission.objects.filter(
+            assignment=assignment
+        ).values_list(
+            'metric_id', 'metric__form_id', 'data', 'submitted_by_id', 'submitted_at'
+        )
+        for metric_id, form_id, data, submitted_by_id, submitted_at in rows:
+            latest = self.latest_submitter_by_form.get(form_id)
+            if latest is None or (submitted_at and latest[0] and submitted_at > latest[0]):
+                self.latest_submitter_by_form[form_id] = (submitted_at, submitted_by_id)
+
+            if metric_id not in metric_flags:
+                continue
+            self.submitted_metric_ids.add(metric_id)
+            if metric_id not in self.complete_metric_ids and submission_data_has_value(
+                data, metric_flags[metric_id]
+            ):
+                self.complete_metric_ids.add(metric_id)
+
+        self.incomplete_form_ids = {
+            metric.form_id for metric in self.required_metrics
+            if metric.id not in self.complete_metric_ids
+        }
+
+    @property
+    def is_complete(self):
+        """True if every required metric has a valued submission."""
+        return not self.incomplete_form_ids
+
+    def is_form_complete(self, form_id):
+        """True if every required metric of the given form has a valued submission."""
+        return form_id not in self.incomplete_form_ids
+
+    def get_missing_metrics(self):
+        """
+        Describe incomplete required metrics in the submit_template error format.
+
+        Returns:
+            tuple: (missing_metrics, incomplete_time_based_metrics) lists
+        """
+        missing_metrics = []
+        incomplete_time_based = []
+
+        for metric in self.required_metrics:
+            if metric.id in self.complete_metric_ids:
+                continue
+
+            if metric.requires_time_reporting:
+                if metric.id not in self.submitted_metric_ids:
+                    incomplete_time_based.append({
+                        'id': metric.id,
+                        'name': metric.name,
+                        'form': metric.form.name,
+                        'reporting_frequency': metric.reporting_frequency,
+                        'submitted_count': 0,
+                        'required_count': 1  # At least one submission with periods
+                    })
+                else:
+                    incomplete_time_based.append({
+                        'id': metric.id,
+                        'name': metric.name,
+                        'form': metric.form.name,
+                        'reporting_frequency': metric.reporting_frequency,
+                        'issue': 'Missing or incomplete periods data in JSON'
+                    })
+            else:
+                missing_metrics.append({
+                    'id': metric.id,
+                    'name': metric.name,
+                    'form': metric.form.name
+                })
+
+        return missing_metrics, incomplete_time_based
+
+    def mark_forms_complete(self, user=None, only_pending=True):
+        """
+        Flag every complete form selection of the template as completed.
+
+        Args:
+            user: User credited with the completion; if None, the most recent
+                submitter of a metric in the form is used
+            only_pending: Leave already-completed selections untouched
+
+        Returns:
+            int: Number of form selections updated
+        """
+        now = timezone.now()
+        to_update = []
+
+        selections = TemplateFormSelection.objects.filter(
+            template_id=self.assignment.template_id
+        )
+        for form_selection in selections:
+            if not self.is_form_complete(form_selection.form_id):
+                continue
+            if only_pending and form_selection.is_completed:
+                continue
+
+            form_selection.is_completed = True
+            form_selection.completed_at = now
+            if user:
+                form_selection.completed_by = user
+            else:
+                latest = self.latest_submitter_by_form.get(form_selection.form_id)
+                if latest:
+                    form_selection.completed_by_id = latest[1]
+            to_update.append(form_selection)
+
+        if to_update:
+            TemplateFormSelection.objects.bulk_update(
+                to_update, ['is_completed', 'completed_at', 'completed_by']
+            )
+        return len(to_update)
+
+
+def update_assignment_completion(assignment, submitter=None):
+    """
+    Re-evaluate an assignment after its submissions changed.
+
+    Marks the assignment SUBMITTED and completes its form selections once all
+    required metrics are reported, mirroring the checks previously done per
+    metric in the submission views.
+
+    Args:
+        assignment: TemplateAssignment to check
+        submitter: User to credit with form completion, if known
+
+    Returns:
+        AssignmentCompletion: The computed completion state
+    """
+    completion = AssignmentCompletion(assignment)
+
+    if completion.is_complete and assignment.status in ['PENDING', 'IN_PROGRESS']:
+        assignment.status = 'SUBMITTED'
+        assignment.completed_at = timezone.now()
+        assignment.save()
+
+        completion.mark_forms_complete(submitter, only_pending=True)
+
+    return completion
+
+
+def build_completion_matrix(assignments):
+    """
+    Per-form and per-metric completion of many assignments at once.
+
+    Uses the check_completion rules: a regular metric is complete with one
+    submission, a time-based metric once it has as many submissions as its
+    reporting frequency requires; only required metrics that apply to the
+    form selection's regions count. Submissions are counted with a single
+    grouped query, so the number of queries does not grow with the number
+    of assignments, forms or metrics.
+
+    Args:
+        assignments: TemplateAssignment instances with template and layer loaded
+
+    Returns:
+        list: One completion dict per assignment, in the given order
+    """
+    assignments = list(assignments)
+    if not assignments:
+        return []
+
+    selections_by_template = defaultdict(list)
+    for selection in TemplateFormSelection.objects.filter(
+        template_id__in={assignment.template_id for assignment in assignments}
+    ).select_related('form', 'completed_by').order_by('template_id', 'order', 'id'):
+        selections_by_template[selection.template_id].append(selection)
+
+    form_ids = {
+        selection.form_id
+        for selections in selections_by_template.values()
+        for selection in selections
+    }
+    metrics_by_form = defaultdict(list)
+    for metric in ESGMetric.objects.filter(form_id__in=form_ids, is_required=True).only(
+        'id', 'form_id', 'name', 'location', 'order', 'requires_time_reporting', 'reporting_frequency'
+    ).order_by('order', 'id'):
+        metrics_by_form[metric.form_id].append(metric)
+
+    # (assignment_id, metric_id) -> number of submissions
+    submission_counts = {
+        (assignment_id, metric_id): count
+        for assignment_id, metric_id, count in ESGMetricSubmission.objects.filter(
+            assignment_id__in=[assignment.id for assignment in assignments],
+            metric__form_id__in=form_ids,
+            metric__is_required=True
+        ).values_list('assignment_id', 'metric_id').annotate(count=Count('id')).order_by()
+    }
+
+    matrix = []
+    for assignment in assignments:
+        forms = []
+        for selection in selections_by_template[assignment.template_id]:
+            metrics = []
+            for metric in metrics_by_form[selection.form_id]:
+                if metric.location != 'ALL' and metric.location not in selection.regions:
+                    continue
+                submitted_count = submission_counts.get((assignment.id, metric.id), 0)
+                required_count = required_submission_count(
+                    metric.requires_time_reporting, metric.reporting_frequency
+                )
+                metrics.append({
+                    'id': metric.id,
+                    'name': metric.name,
+                    'location': metric.location,
+                    'reporting_frequency': metric.reporting_frequency,
+                    'submitted_count': submitted_count,
+                    'required_count': required_count,
+                    'is_complete': submitted_count >= required_count,
+                })
+
+            total_required = sum(metric['required_count'] for metric in metrics)
+            total_submitted = sum(min(metric['submitted_count'], metric['required_count']) for metric in metrics)
+            is_actually_complete = bool(metrics) and all(metric['is_complete'] for metric in metrics)
+            forms.append({
+                'form_id': selection.form_id,
+                'form_code': selection.form.code,
+                'form_name': selection.form.name,
+                'is_completed': selection.is_completed,
+                'is_actually_complete': is_actually_complete,
+                'completed_at': selection.completed_at,
+                'completed_by': selection.completed_by.email if selection.completed_by else None,
+                'completion_percentage': (total_submitted / total_required) * 100 if total_required else 0,
+                'total_required_metrics': len(metrics),
+                'total_submitted_metrics': sum(1 for metric in metrics if metric['submitted_count']),
+                'metrics': metrics,
+            })
+
+        completed_forms = sum(1 for form in forms if form['is_completed'])
+        matrix.append({
+            'assignment_id': assignment.id,
+            'template_id': assignment.template_id,
+            'template_name': assignment.template.name,
+            'layer_id': assignment.layer_id,
+            'layer_name': assignment.layer.company_name,
+            'status': assignment.status,
+            'reporting_year': assignment.reporting_year,
+            'due_date': assignment.due_date,
+            'completed_at': assignment.completed_at,
+            'total_forms': len(forms),
+            'completed_forms': completed_forms,
+            'overall_completion_percentage': (completed_forms / len(forms)) * 100 if forms else 0,
+            'forms': forms,
+        })
+    return matrix
@@ -0,0 +1,269 @@
+"""
+Shareholding-weighted consolidation of metric values up the
+Group -> Subsidiary -> Branch hierarchy.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import LayerClosure, LayerProfile, LayerTypeChoices
+from ..models.consolidation import ConsolidatedMetricValue
+from ..models.templates import ESGMetric, ESGMetricSubmission
+from .periods import iter_period_values
+
+logger = logging.getLogger(__name__)
+
+# Children are consolidated before their parents
+LEVEL_ORDER = [LayerTypeChoices.BRANCH, LayerTypeChoices.SUBSIDIARY, LayerTypeChoices.GROUP]
+
+# Columns rewritten when a consolidated row is recomputed
+CONSOLIDATED_VALUE_FIELDS = ['unit', 'own_value', 'total_value', 'equity_value', 'submission_count', 'updated_at']
+
+
+def get_reporting_year(assignment):
+    """Year a template assignment's figures are consolidated under."""
+    # Instances created with an ISO string keep it until reloaded
+    field = assignment._meta.get_field('reporting_period_end')
+    return field.to_python(assignment.reporting_period_end).year
+
+
+def consolidation_key(submission):
+    """
+    (layer_id, metric_id, reporting_year) a submission counts towards.
+    Submissions without a layer count towards their assignment's layer.
+    """
+    assignment = submission.assignment
+    return (
+        submission.layer_id or assignment.layer_id,
+        submission.metric_id,
+        get_reporting_year(assignment)
+    )
+
+
+def consolidation_keys(submissions):
+    """Consolidation keys of a submission queryset, read in one query."""
+    return {
+        (layer_id or assignment_layer_id, metric_id, period_end.year)
+        for layer_id, assignment_layer_id, metric_id, period_end in submissions.values_list(
+            'layer_id', 'assignment__layer_id', 'metric_id', 'assignment__reporting_period_end'
+        ).distinct()
+    }
+
+
+def refresh_consolidation_for_submissions(submissions):
+    """Refresh the consolidated values affected by the given submissions."""
+    return refresh_consolidated_values({consolidation_key(submission) for submission in submissions})
+
+
+def refresh_consolidated_values(keys):
+    """
+    Recompute consolidated values for the given layers and every layer above them.
+
+    Each affected level of the hierarchy is recomputed from the layers' own
+    submissions plus their children's stored rows, a few queries per level
+    and reporting year, however many metrics, layers or submissions below
+    a group are involved. Rows are upserted in place, and the affected
+    layers stay locked until the surrounding transaction ends.
+
+    Args:
+        keys: Iterable of (layer_id, metric_id, reporting_year)
+
+    Returns:
+        int: Number of consolidated rows written
+    """
+    metric_ids_by_year = defaultdict(set)
+    layer_ids_by_year = defaultdict(set)
+    for layer_id, metric_id, year in keys:
+        if layer_id is not None:
+            metric_ids_by_year[year].add(metric_id)
+            layer_ids_by_year[year].add(layer_id)
+    if not layer_ids_by_year:
+        return 0
+
+    touched = set().union(*layer_ids_by_year.values())
+    ancestors = defaultdict(set)
+    for ancestor_id, descendant_id in LayerClosure.objects.filter(
+        descendant_id__in=touched
+    ).values_list('ancestor_id', 'descendant_id'):
+        ancestors[descendant_id].add(ancestor_id)
+    metrics = ESGMetric.objects.in_bulk(set().union(*metric_ids_by_year.values()))
+
+    written = 0
+    with transaction.atomic():
+        # Locking every affected layer serialises refreshes that share a
+        # parent, so their rows are read and written one refresh at a time
+        layer_types = dict(
+            LayerProfile.objects.select_for_update().filter(
+                id__in=touched.union(*ancestors.values())
+            ).order_by('id').values_list('id', 'layer_type')
+        )
+        for year, layer_ids in layer_ids_by_year.items():
+            year_metrics = [metrics[metric_id] for metric_id in metric_ids_by_year[year] if metric_id in metrics]
+            if not year_metrics:
+                continue
+            affected = set()
+            for layer_id in layer_ids:
+                affected |= ancestors.get(layer_id) or {layer_id}
+            for level in LEVEL_ORDER:
+                level_layer_ids = [layer_id for layer_id in affected if layer_types.get(layer_id) == level]
+                if level_layer_ids:
+                    written += _consolidate_layers(year_metrics, year, level_layer_ids)
+    return written
+
+
+# Keys changed during the current transaction, refreshed once it commits
+_pending = threading.local()
+
+
+def schedule_consolidation_refresh(keys):
+    """
+    Refresh the given consolidated values once the current transaction
+    commits (immediately outside a transaction).
+
+    Keys recorded during one transaction are refreshed together, before
+    any callback registered after them, such as the dashboard refresh.
+
+    Args:
+        keys: Iterable of (layer_id, metric_id, reporting_year)
+    """
+    if getattr(_pending, 'keys', None) is None:
+        _pending.keys = set()
+    _pending.keys.update(keys)
+    # Registered for every change: a rolled-back transaction drops its
+    # callbacks, and later callbacks of a transaction find nothing to flush
+    transaction.on_commit(flush_consolidation_refreshes, robust=True)
+
+
+def flush_consolidation_refreshes():
+    """Refresh the consolidated values of the keys recorded so far."""
+    keys = getattr(_pending, 'keys', None)
+    _pending.keys = None
+    return refresh_consolidated_values(keys) if keys else 0
+
+
+def _consolidate_layers(metrics, year, layer_ids):
+    """Rebuild the rows of the given metrics and year for layers on the same level."""
+    primary_paths = {metric.id: metric.primary_path for metric in metrics}
+    # (layer_id, metric_id, period) -> row values
+    rows = defaultdict(lambda: {
+        'unit': '', 'own_value': 0.0, 'total_value': 0.0, 'equity_value': 0.0, 'submission_count': 0
+    })
+
+    submissions = ESGMetricSubmission.objects.filter(
+        Q(layer_id__in=layer_ids) | Q(layer__isnull=True, assignment__layer_id__in=layer_ids),
+        metric_id__in=primary_paths,
+        assignment__reporting_period_end__year=year
+    ).values_list('layer_id', 'assignment__layer_id', 'metric_id', 'data')
+    for layer_id, assignment_layer_id, metric_id, data in submissions:
+        counted = set()
+        for period, _, value, unit in iter_period_values(data, primary_paths[metric_id]):
+            row = rows[layer_id or assignment_layer_id, metric_id, period]
+            row['own_value'] += value
+            row['total_value'] += value
+            row['equity_value'] += value
+            row['unit'] = row['unit'] or unit
+            if period not in counted:
+                counted.add(period)
+                row['submission_count'] += 1
+
+    # Children's rows; each child is weighted by its own shareholding ratio
+    children = ConsolidatedMetricValue.objects.filter(
+        metric_id__in=primary_paths,
+        reporting_year=year,
+        layer__ancestor_links__ancestor_id__in=layer_ids,
+        layer__ancestor_links__depth=1
+    ).values_list(
+        'layer__ancestor_links__ancestor_id', 'layer__shareholding_ratio', 'metric_id',
+        'period', 'unit', 'total_value', 'equity_value', 'submission_count'
+    )
+    for parent_id, ratio, metric_id, period, unit, total_value, equity_value, submission_count in children:
+        row = rows[parent_id, metric_id, period]
+        row['total_value'] += total_value
+        row['equity_value'] += equity_value * float(ratio) / 100
+        row['unit'] = row['unit'] or unit
+        row['submission_count'] += submission_count
+
+    # Upsert the recomputed rows and drop the periods no longer reported
+    ConsolidatedMetricValue.objects.bulk_create(
+        [
+            ConsolidatedMetricValue(
+                layer_id=layer_id, metric_id=metric_id, reporting_year=year, period=period, **values
+            )
+            for (layer_id, metric_id, period), values in rows.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['layer', 'metric', 'reporting_year', 'period'],
+        update_fields=CONSOLIDATED_VALUE_FIELDS
+    )
+    stale = [
+        pk for pk, *key in ConsolidatedMetricValue.objects.filter(
+            metric_id__in=primary_paths, reporting_year=year, layer_id__in=layer_ids
+        ).values_list('pk', 'layer_id', 'metric_id', 'period')
+        if tuple(key) not in rows
+    ]
+    if stale:
+        ConsolidatedMetricValue.objects.filter(pk__in=stale).delete()
+    return len(rows)
+
+
+def rebuild_consolidated_values(metric_ids=None):
+    """
+    Recompute every consolidated value from scratch.
+
+    Needed after changes the signals do not follow, such as moving a layer
+    to another parent.
+
+    Args:
+        metric_ids: Limit the rebuild to these metrics
+
+    Returns:
+        int: Number of consolidated rows written
+    """
+    submissions = ESGMetricSubmission.objects.all()
+    existing = ConsolidatedMetricValue.objects.all()
+    if metric_ids:
+        submissions = submissions.filter(metric_id__in=metric_ids)
+        existing = existing.filter(metric_id__in=metric_ids)
+
+    with transaction.atomic():
+        existing.delete()
+        return refresh_consolidated_values(consolidation_keys(submissions))
+
+
+def get_consolidated_values(layer_id, metric_ids=None, reporting_year=None, weighting='total'):
+    """
+    Read consolidated values for a layer.
+
+    Args:
+        layer_id: Layer to read
+        metric_ids: Optional metric ids to include
+        reporting_year: Optional reporting year
+        weighting: 'total' for full consolidation, 'equity' for equity-share
+            weighting, 'own' for the layer's own submissions only
+
+    Returns:
+        list: Dicts with metric_id, reporting_year, period, unit, value and submission_count
+    """
+    field = {'total': 'total_value', 'equity': 'equity_value', 'own': 'own_value'}[weighting]
+    rows = ConsolidatedMetricValue.objects.filter(layer_id=layer_id)
+    if metric_ids:
+        rows = rows.filter(metric_id__in=metric_ids)
+    if reporting_year:
+        rows = rows.filter(reporting_year=reporting_year)
+    return [
+        {
+            'metric_id': row['metric_id'],
+            'reporting_year': row['reporting_year'],
+            'period': row['period'],
+            'unit': row['unit'],
+            'value': row[field],
+            'submission_count': row['submission_count'],
+        }
+        for row in rows.order_by('metric_id', 'reporting_year', 'period').values(
+            'metric_id', 'reporting_year', 'period', 'unit', field, 'submission_count'
+        )
+    ]
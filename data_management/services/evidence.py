@@ -1,6 +1,12 @@
-from ..models.templates import ESGMetricEvidence
+"""
+Matching of standalone evidence files to metric submissions.
+"""
+
 import logging
 
+from ..models.templates import ESGMetric, ESGMetricEvidence, ESGMetricSubmission
+from ..dispatch import submissions_bulk_changed
+
 # Configure logging to show in console
 logging.basicConfig(
     level=logging.INFO,
@@ -8,6 +14,79 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+EVIDENCE_MATCH_FIELDS = (
+    'id', 'layer_id', 'intended_metric_id', 'submission_identifier',
+    'reference_path', 'supports_multiple_periods',
+)
+
+
+def _path_exists(data, reference_path):
+    """True if a dotted reference path exists in submission data."""
+    current = data
+    for part in reference_path.split('.'):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        else:
+            return False
+    return True
+
+
+class _SubmissionIndex:
+    """
+    Lookups over the submissions of one (metric, layer) group, in matching
+    order: submissions with an identifier first, otherwise as given.
+    """
+
+    def __init__(self, submissions):
+        self.submissions = sorted(submissions, key=lambda s: s.submission_identifier != '', reverse=True)
+        self.by_identifier = {}
+        self.by_layer = {}
+        for sub in self.submissions:
+            self.by_identifier.setdefault(sub.submission_identifier, sub)
+            if sub.layer_id:
+                self.by_layer.setdefault(sub.layer_id, sub)
+        # (reference_path, supports_multiple_periods) -> (first match, {layer_id: first match})
+        self._path_matches = {}
+
+    def match_path(self, reference_path, supports_multiple_periods, layer_id):
+        """Best submission whose data has the path: same layer first, else the first one."""
+        key = (reference_path, supports_multiple_periods)
+        if key not in self._path_matches:
+            first = None
+            by_layer = {}
+            for sub in self.submissions:
+                if not sub.data:
+                    continue
+                if supports_multiple_periods:
+                    # The base path where periods are stored, e.g. 'periods'
+                    found = reference_path in sub.data
+                else:
+                    found = _path_exists(sub.data, reference_path)
+                if found:
+                    first = first or sub
+                    if sub.layer_id:
+                        by_layer.setdefault(sub.layer_id, sub)
+            self._path_matches[key] = (first, by_layer)
+
+        first, by_layer = self._path_matches[key]
+        if layer_id and layer_id in by_layer:
+            return by_layer[layer_id]
+        return first
+
+
+def _load_deferred_data(submissions):
+    """Read the data of submissions loaded without it, in one query."""
+    deferred = [sub for sub in submissions if 'data' in sub.get_deferred_fields()]
+    if not deferred:
+        return
+    data_by_id = dict(
+        ESGMetricSubmission.objects.filter(pk__in=[sub.pk for sub in deferred]).values_list('id', 'data')
+    )
+    for sub in deferred:
+        sub.data = data_by_id.get(sub.pk)
+
+
 def attach_evidence_to_submissions(submissions, user):
     """
     Automatically attach relevant standalone evidence to the given submissions.
@@ -18,6 +97,11 @@ def attach_evidence_to_submissions(submissions, user):
     - For submissions with identifiers: Uses the identifier for precise matching
     - For time-based metrics: Uses reference_path to match with the correct period in the JSON data
     - For all metrics: Matches primarily on layer and metric
+
+    All standalone evidence of the user for the submitted metrics is read in
+    one query, matched in memory and attached with a single bulk_update.
+    Submissions may be loaded without their data; it is read only when
+    evidence has to be matched on a reference path.
     
     Args:
         submissions: List of ESGMetricSubmission objects
@@ -29,162 +113,86 @@ def attach_evidence_to_submissions(submissions, user):
     if not submissions:
         return 0
     
-    # Track number of attached files
-    attached_count = 0
-    
     # Group submissions by metric and layer
     submissions_by_metric_and_layer = {}
     for submission in submissions:
-        metric_id = submission.metric.id
-        layer_id = submission.layer.id if submission.layer else None
-        
-        key = (metric_id, layer_id)
-        if key not in submissions_by_metric_and_layer:
-            submissions_by_metric_and_layer[key] = []
-        submissions_by_metric_and_layer[key].append(submission)
-    
-    # Find all standalone evidence files for these metrics
-    for (metric_id, layer_id), subs in submissions_by_metric_and_layer.items():
-        logger.info(f"Processing submissions for metric {metric_id}, layer {layer_id}")
-        logger.info(f"Number of submissions: {len(subs)}")
-        
-        # Get the metric to check if it's time-based
-        try:
-            from ..models.templates import ESGMetric
-            metric = ESGMetric.objects.get(id=metric_id)
-            is_time_based = metric.requires_time_reporting
-        except ESGMetric.DoesNotExist:
-            logger.warning(f"Metric {metric_id} not found, assuming not time-based")
-            is_time_based = False
-        
-        # Get standalone evidence for this metric
-        evidence_query = ESGMetricEvidence.objects.filter(
-            submission__isnull=True,
-            uploaded_by=user,
-            intended_metric__id=metric_id
+        key = (submission.metric_id, submission.layer_id)
+        submissions_by_metric_and_layer.setdefault(key, []).append(submission)
+
+    metric_ids = {metric_id for metric_id, _ in submissions_by_metric_and_layer}
+    time_based_metric_ids = set(
+        ESGMetric.objects.filter(id__in=metric_ids, requires_time_reporting=True).values_list('id', flat=True)
+    )
+
+    # Standalone evidence for these metrics, in upload order
+    evidence_by_metric = {}
+    for evidence in ESGMetricEvidence.objects.filter(
+        submission__isnull=True,
+        uploaded_by=user,
+        intended_metric_id__in=metric_ids
+    ).only(*EVIDENCE_MATCH_FIELDS).order_by('id'):
+        evidence_by_metric.setdefault(evidence.intended_metric_id, []).append(evidence)
+    if not evidence_by_metric:
+        return 0
+
+    # Submission data is only needed for reference path matching
+    _load_deferred_data([
+        sub for (metric_id, _), subs in submissions_by_metric_and_layer.items()
+        if any(
+            evidence.reference_path and (evidence.supports_multiple_periods or metric_id in time_based_metric_ids)
+            for evidence in evidence_by_metric.get(metric_id, ())
         )
-        
-        # If the submission has a layer, prefer evidence from the same layer
+        for sub in subs
+    ])
+
+    attached = []
+    attached_ids = set()
+    for (metric_id, layer_id), subs in submissions_by_metric_and_layer.items():
+        # Evidence attached for an earlier layer of the same metric is no longer standalone
+        candidates = [e for e in evidence_by_metric.get(metric_id, ()) if e.id not in attached_ids]
+        if not candidates:
+            continue
+        is_time_based = metric_id in time_based_metric_ids
+
+        # If the submissions have a layer, prefer evidence from the same layer
         if layer_id:
-            # First try exact layer match
-            layer_evidence = evidence_query.filter(layer_id=layer_id)
-            
-            if layer_evidence.exists():
-                evidence_files = layer_evidence
-                logger.info(f"Found {evidence_files.count()} evidence files with exact layer match")
-            else:
-                # Fall back to any evidence for this metric
-                evidence_files = evidence_query
-                logger.info(f"No evidence with layer match, using all {evidence_files.count()} evidence files")
-        else:
-            # If submission doesn't have a layer, use any evidence
-            evidence_files = evidence_query
-            logger.info(f"Submission has no layer, using all {evidence_files.count()} evidence files")
-        
-        # Process each evidence file
-        for evidence in evidence_files:
-            # First, sort submissions by those with identifiers (most specific) first
-            sorted_subs = sorted(subs, key=lambda s: s.submission_identifier != '', reverse=True)
-            
-            # Check if any evidence has a matching submission_identifier
-            if hasattr(evidence, 'submission_identifier') and evidence.submission_identifier:
-                identifier_matches = [s for s in sorted_subs if s.submission_identifier == evidence.submission_identifier]
-                if identifier_matches:
-                    # Perfect match on identifier - use this submission
-                    best_match = identifier_matches[0]
-                    logger.info(f"Found identifier match for evidence {evidence.id}")
-                    evidence.submission = best_match
-                    evidence.save()
-                    attached_count += 1
-                    logger.info(f"Attached evidence {evidence.id} to submission {best_match.id} (identifier match)")
-                    continue
-            
-            # If we reach here, there was no identifier match, try reference path next
-            if evidence.reference_path:
-                # For time-based metrics or any evidence with supports_multiple_periods flag, use path-based matching
-                if evidence.supports_multiple_periods or is_time_based:
-                    # If evidence supports multiple periods, its reference_path contains the base path
-                    # where periods are stored (e.g., 'periods')
-                    
-                    # Find matching submission by checking if reference_path exists in JSON data
-                    best_match = None
-                    for sub in sorted_subs:
-                        # Skip submissions without data
-                        if not sub.data:
-                            continue
-                        
-                        if evidence.supports_multiple_periods:
-                            # For multiple periods evidence, just check if the base path exists
-                            if evidence.reference_path in sub.data:
-                                if sub.layer and evidence.layer and sub.layer.id == evidence.layer.id:
-                                    # Perfect match: base path exists and layer matches
-                                    best_match = sub
-                                    logger.info(f"Found perfect match for multi-period evidence {evidence.id}")
-                                    break
-                                elif not best_match:
-                                    # Path match but layer doesn't match - use as fallback
-                                    best_match = sub
-                                    logger.info(f"Found base path match for multi-period evidence {evidence.id}")
-                        else:
-                            # For regular reference_path matching (specific period or value)
-                            # Check if the reference path exists in the JSON data
-                            parts = evidence.reference_path.split('.')
-                            current = sub.data
-                            path_exists = True
-                            
-                            for part in parts:
-                                if isinstance(current, dict) and part in current:
-                                    current = current[part]
-                                else:
-                                    path_exists = False
-                                    break
-                            
-                            if path_exists:
-                                # Found a submission with matching reference path in data
-                                if sub.layer and evidence.layer and sub.layer.id == evidence.layer.id:
-                                    # Perfect match: reference path exists and layer matches
-                                    best_match = sub
-                                    logger.info(f"Found perfect match (path+layer) for evidence {evidence.id}")
-                                    break
-                                elif not best_match:
-                                    # Path match but layer doesn't match - use as fallback
-                                    best_match = sub
-                                    logger.info(f"Found path match for evidence {evidence.id}")
-                                    # Keep looking for better match with matching layer
-                    
-                    # If no matching path found, skip this evidence
-                    if not best_match:
-                        logger.info(f"No path match found for evidence {evidence.id}, skipping")
-                        continue
-                    
-                    # Attach evidence to the best matching submission
-                    evidence.submission = best_match
-                    evidence.save()
-                    attached_count += 1
-                    logger.info(f"Attached evidence {evidence.id} to submission {best_match.id} (path match)")
-                    continue
-            
-            # If we reach here, there was no identifier or path match
-            # For non-time-based metrics or evidence without reference path, match primarily on layer
+            candidates = [e for e in candidates if e.layer_id == layer_id] or candidates
+
+        index = _SubmissionIndex(subs)
+        for evidence in candidates:
             best_match = None
-            
-            # First try to find a submission with matching layer
-            for sub in sorted_subs:
-                if sub.layer and evidence.layer and sub.layer.id == evidence.layer.id:
-                    best_match = sub
-                    logger.info(f"Found layer match for evidence {evidence.id}")
-                    break
-            
-            # If no layer match, use first submission
-            if not best_match and sorted_subs:
-                best_match = sorted_subs[0]
-                logger.info(f"No layer match found, using first submission for evidence {evidence.id}")
-            
-            # Attach evidence to submission if match was found
-            if best_match:
-                evidence.submission = best_match
-                evidence.save()
-                attached_count += 1
-                logger.info(f"Attached evidence {evidence.id} to submission {best_match.id}")
-    
-    return attached_count 
\ No newline at end of file
+            if evidence.submission_identifier:
+                # Perfect match on identifier
+                best_match = index.by_identifier.get(evidence.submission_identifier)
+
+            if best_match is None and evidence.reference_path and (
+                evidence.supports_multiple_periods or is_time_based
+            ):
+                best_match = index.match_path(
+                    evidence.reference_path, evidence.supports_multiple_periods, evidence.layer_id
+                )
+                if best_match is None:
+                    logger.info(f"No path match found for evidence {evidence.id}, skipping")
+                    continue
+
+            if best_match is None:
+                # Match on layer, else use the first submission
+                best_match = index.by_layer.get(evidence.layer_id) if evidence.layer_id else None
+                best_match = best_match or index.submissions[0]
+
+            evidence.submission = best_match
+            attached.append(evidence)
+            attached_ids.add(evidence.id)
+
+    if not attached:
+        return 0
+
+    ESGMetricEvidence.objects.bulk_update(attached, ['submission'])
+    logger.info(f"Attached {len(attached)} evidence files to {len(submissions)} submissions")
+
+    # bulk_update sends no post_save; refresh evidence coverage of the affected groups
+    submissions_bulk_changed.send(
+        sender=ESGMetricEvidence, submission_ids={evidence.submission_id for evidence in attached}
+    )
+
+    return len(attached)
@@ -0,0 +1,86 @@
+"""
+Maintenance of the ESGMetricFact table from submission data.
+"""
+
+import logging
+
+from django.db import transaction
+
+from ..models.facts import ESGMetricFact
+from ..models.templates import ESGMetricSubmission
+from .periods import iter_period_values, parse_period
+
+logger = logging.getLogger(__name__)
+
+
+def build_facts(submission):
+    """
+    Fact rows for a submission's data, without saving them.
+
+    Periods whose label cannot be parsed, and data without periods, are
+    dated with the assignment's reporting period.
+    """
+    assignment = submission.assignment
+    layer_id = submission.layer_id or assignment.layer_id
+    facts = []
+    for period, region, value, unit in iter_period_values(submission.data, submission.metric.primary_path):
+        period_start, period_end = parse_period(period) if period else (None, None)
+        if period_start is None:
+            period_start, period_end = assignment.reporting_period_start, assignment.reporting_period_end
+        facts.append(ESGMetricFact(
+            submission_id=submission.pk,
+            assignment_id=assignment.pk,
+            layer_id=layer_id,
+            metric_id=submission.metric_id,
+            period_label=period[:50],
+            period_start=period_start,
+            period_end=period_end,
+            region=region,
+            value=value,
+            unit=(unit or '')[:50]
+        ))
+    return facts
+
+
+def refresh_facts(submissions):
+    """
+    Replace the fact rows of the given saved submissions.
+
+    Uses one delete and one insert however many submissions are passed;
+    the submissions' assignment and metric should already be loaded.
+
+    Returns:
+        int: Number of fact rows written
+    """
+    submissions = [submission for submission in submissions if submission.pk]
+    if not submissions:
+        return 0
+    facts = [fact for submission in submissions for fact in build_facts(submission)]
+    with transaction.atomic():
+        ESGMetricFact.objects.filter(submission_id__in=[s.pk for s in submissions]).delete()
+        ESGMetricFact.objects.bulk_create(facts)
+    return len(facts)
+
+
+def rebuild_facts(chunk_size=2000):
+    """
+    Recreate every fact row from the stored submissions.
+
+    Returns:
+        tuple: (submissions read, fact rows written)
+    """
+    submissions = ESGMetricSubmission.objects.select_related('assignment', 'metric').order_by('id')
+    scanned = written = 0
+    with transaction.atomic():
+        ESGMetricFact.objects.all().delete()
+        chunk = []
+        for submission in submissions.iterator(chunk_size=chunk_size):
+            scanned += 1
+            chunk.extend(build_facts(submission))
+            if len(chunk) >= chunk_size:
+                ESGMetricFact.objects.bulk_create(chunk)
+                written += len(chunk)
+                chunk = []
+        ESGMetricFact.objects.bulk_create(chunk)
+        written += len(chunk)
+    return scanned, written
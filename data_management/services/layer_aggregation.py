@@ -0,0 +1,185 @@
+"""
+Pivot metric submissions into a metric x layer grid, with optional
+aggregation of the submitted values and roll-up over layer subtrees.
+"""
+
+import logging
+from collections import defaultdict
+
+from accounts.models import LayerClosure
+from ..models.templates import ESGMetricSubmission
+from .calculations.utils import resolve_calculation_path
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES = {
+    'sum': sum,
+    'avg': lambda values: sum(values) / len(values),
+    'min': min,
+    'max': max,
+}
+
+# Used when neither the request nor the metric names a value path
+PERIODS_VALUE_PATH = 'periods[*].value'
+
+
+def get_value_from_data(data, path=None):
+    """
+    Value at a dotted path in submission data, as returned by sum_by_layer
+    without aggregation. A {'value': ...} object at the path yields its value.
+    """
+    if not isinstance(data, dict):
+        return None
+    if not path:
+        return data.get('value')
+
+    current = data
+    for part in path.split('.'):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        else:
+            return None
+
+    if isinstance(current, dict) and 'value' in current:
+        return current['value']
+    return current
+
+
+def get_numeric_values(data, path=None):
+    """
+    Numbers found at a path in submission data.
+
+    The path may use wildcards ('periods[*].value'). Without a path the
+    period values are used for time-based data and the root 'value'
+    otherwise. Non-numeric values are skipped.
+
+    Returns:
+        list: float values
+    """
+    if not isinstance(data, dict):
+        return []
+    if not path:
+        path = PERIODS_VALUE_PATH if isinstance(data.get('periods'), dict) else 'value'
+
+    numbers = []
+    for value in resolve_calculation_path(data, path):
+        if isinstance(value, dict):
+            value = value.get('value')
+        if isinstance(value, bool) or value is None or value == '':
+            continue
+        try:
+            numbers.append(float(value))
+        except (TypeError, ValueError):
+            continue
+    return numbers
+
+
+def get_layer_members(layer_ids, rollup=False, allowed_layer_ids=None):
+    """
+    Map each layer to the layers whose submissions count towards it.
+
+    Args:
+        layer_ids: Requested layer ids
+        rollup: Include every layer below each requested layer
+        allowed_layer_ids: If given, descendants outside this set are left out
+
+    Returns:
+        dict: layer_id -> set of layer ids
+    """
+    members = {layer_id: {layer_id} for layer_id in layer_ids}
+    if not rollup:
+        return members
+
+    for ancestor_id, descendant_id in LayerClosure.objects.filter(
+        ancestor_id__in=layer_ids
+    ).values_list('ancestor_id', 'descendant_id'):
+        if allowed_layer_ids is None or descendant_id in allowed_layer_ids:
+            members[ancestor_id].add(descendant_id)
+    return members
+
+
+def aggregate_by_layer(assignment_id, metrics, layer_ids, period_path=None,
+                       value_path=None, aggregate=None, rollup=False, allowed_layer_ids=None):
+    """
+    Build the sum_by_layer grid for an assignment with a constant number of
+    queries: one for the submissions and, when rolling up, one for the
+    layer subtrees.
+
+    Without `aggregate`, each cell holds the value at `period_path` (or the
+    whole data) of the first submission, as before. With `aggregate` (one of
+    AGGREGATES), each cell combines the numbers at the value path across all
+    of the layer's submissions - and those of its sub-layers with `rollup`.
+    The value path is `value_path`, then `period_path`, then the metric's
+    primary_path, then the period values.
+
+    Args:
+        assignment_id: TemplateAssignment id
+        metrics: ESGMetric instances, in output order
+        layer_ids: Layer ids, in output order
+        period_path: Dotted path to a specific period (e.g. "periods.Q1-2024")
+        value_path: Path to the values to aggregate (e.g. "periods[*].value")
+        aggregate: 'sum', 'avg', 'min' or 'max'
+        rollup: Include submissions from every layer below each layer
+        allowed_layer_ids: Layers the caller may read; limits the roll-up
+
+    Returns:
+        list: One entry per metric with 'metric_id' and 'values_by_layer'
+    """
+    if aggregate is None and rollup:
+        aggregate = 'sum'
+    members = get_layer_members(layer_ids, rollup, allowed_layer_ids)
+    all_layer_ids = set().union(*members.values()) if members else set()
+
+    submissions_by_cell = defaultdict(list)
+    submissions = ESGMetricSubmission.objects.filter(
+        assignment_id=assignment_id,
+        metric_id__in=[metric.id for metric in metrics],
+        layer_id__in=all_layer_ids
+    ).order_by('id').values('id', 'metric_id', 'layer_id', 'data')
+    for submission in submissions:
+        submissions_by_cell[submission['metric_id'], submission['layer_id']].append(submission)
+
+    aggregation = []
+    for metric in metrics:
+        values_by_layer = {}
+        for layer_id in layer_ids:
+            if aggregate is None:
+                cell_submissions = submissions_by_cell.get((metric.id, layer_id), [])
+                submission = cell_submissions[0] if cell_submissions else None
+                if submission is None:
+                    value = None
+                elif period_path:
+                    value = get_value_from_data(submission['data'], period_path)
+                else:
+                    value = submission['data']
+                values_by_layer[layer_id] = {
+                    'value': value,
+                    'submission_id': submission['id'] if submission else None,
+                    'data': submission['data'] if submission else None
+                }
+                continue
+
+            path = value_path or period_path or metric.primary_path
+            numbers = []
+            submission_ids = []
+            contributing_layers = set()
+            for member_id in members[layer_id]:
+                for submission in submissions_by_cell.get((metric.id, member_id), []):
+                    submission_numbers = get_numeric_values(submission['data'], path)
+                    submission_ids.append(submission['id'])
+                    if submission_numbers:
+                        numbers.extend(submission_numbers)
+                        contributing_layers.add(member_id)
+
+            values_by_layer[layer_id] = {
+                'value': AGGREGATES[aggregate](numbers) if numbers else None,
+                'count': len(numbers),
+                'submission_ids': sorted(submission_ids),
+                'layer_ids': sorted(contributing_layers)
+            }
+
+        aggregation.append({
+            'metric_id': metric.id,
+            'values_by_layer': values_by_layer
+        })
+    return aggregation
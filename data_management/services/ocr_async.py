@@ -0,0 +1,196 @@
+"""
+Concurrent OCR analysis of many evidence files on one asyncio event loop.
+"""
+
+import asyncio
+import copy
+import logging
+import time
+from contextlib import ExitStack
+
+import requests
+
+from ..models.templates import ESGMetricEvidence
+from .bill_analyzer import UtilityBillAnalyzer
+from .ocr_jobs import RETRYABLE_STATUS_CODES, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncContentUnderstandingClient:
+    """
+    asyncio front end for AzureContentUnderstandingClient.
+
+    Each HTTP call is a short blocking request run in the loop's thread
+    pool; all waiting between polls happens on the event loop, so hundreds
+    of operations can be in flight without a thread per operation. Polling
+    starts at min_interval and backs off by `backoff` up to max_interval
+    while an operation is still running; a Retry-After header always wins.
+    """
+
+    def __init__(self, client, min_interval=1.0, max_interval=10.0, backoff=1.5,
+                 timeout_seconds=300, max_retries=5):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+
+    async def _call(self, func, *args):
+        """Run a blocking client call, retrying throttled or unavailable responses."""
+        retries = 0
+        while True:
+            try:
+                return await asyncio.to_thread(func, *args)
+            except requests.HTTPError as e:
+                response = e.response
+                if response is None or response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise
+                if retries >= self.max_retries:
+                    raise
+                retries += 1
+                delay = retry_after_seconds(response)
+                if delay is None:
+                    delay = min(self.min_interval * (2 ** retries), self.max_interval)
+                logger.warning(f"Content Understanding returned {response.status_code}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def begin_analyze(self, analyzer_id, file_location):
+        """Start an analysis and return its operation-location URL."""
+        response = await self._call(self.client.begin_analyze, analyzer_id, file_location)
+        operation_location = response.headers.get('operation-location', '')
+        if not operation_location:
+            raise ValueError("Operation location not found in response headers.")
+        return operation_location
+
+    async def poll_result(self, operation_location):
+        """Poll an operation until it succeeds, fails or times out."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        interval = self.min_interval
+        while True:
+            response = await self._call(self.client.get_result_response, operation_location)
+            result = response.json()
+            status = result.get('status', '').lower()
+            if status == 'succeeded':
+                return result
+            if status == 'failed':
+                raise RuntimeError(f"Analysis failed: {result}")
+
+            elapsed = loop.time() - start
+            if elapsed > self.timeout_seconds:
+                raise TimeoutError(f"Operation timed out after {self.timeout_seconds:.2f} seconds.")
+
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = interval
+                interval = min(interval * self.backoff, self.max_interval)
+            await asyncio.sleep(delay)
+
+    async def analyze(self, analyzer_id, file_location):
+        operation_location = await self.begin_analyze(analyzer_id, file_location)
+        return await self.poll_result(operation_location)
+
+
+async def analyze_many(client, requests_by_key, max_concurrency=8):
+    """
+    Analyze many files concurrently.
+
+    Args:
+        client: AsyncContentUnderstandingClient
+        requests_by_key: Dict of key -> (analyzer_id, file_location)
+        max_concurrency: Maximum number of analyses in flight at once
+
+    Returns:
+        dict: key -> Content Understanding result, or the exception raised
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(key, analyzer_id, file_location):
+        async with semaphore:
+            try:
+                return key, await client.analyze(analyzer_id, file_location)
+            except Exception as e:
+                logger.warning(f"OCR analysis for {key} failed: {str(e)}")
+                return key, e
+
+    results = await asyncio.gather(*(
+        run(key, analyzer_id, file_location)
+        for key, (analyzer_id, file_location) in requests_by_key.items()
+    ))
+    return dict(results)
+
+
+def process_evidence_many(evidence_ids, analyzer=None, max_concurrency=8, **client_options):
+    """
+    Run OCR for many evidence files at once and store the results.
+
+    Files are loaded and results saved synchronously; only the HTTP work
+    runs on the event loop, so the ORM is never used from async code.
+
+    Args:
+        evidence_ids: IDs of the ESGMetricEvidence files to process
+        analyzer: UtilityBillAnalyzer providing credentials (default: from settings)
+        max_concurrency: Maximum number of analyses in flight at once
+        **client_options: Passed to AsyncContentUnderstandingClient (intervals, timeout)
+
+    Returns:
+        dict: evidence_id -> (success, result) as returned by process_evidence
+    """
+    analyzer = analyzer or UtilityBillAnalyzer()
+    evidence_by_id = ESGMetricEvidence.objects.select_related('submission__metric').in_bulk(evidence_ids)
+    outcomes = {
+        evidence_id: (False, {"error": "Evidence not found"})
+        for evidence_id in evidence_ids if evidence_id not in evidence_by_id
+    }
+
+    with ExitStack() as stack:
+        pending = {}
+        leaders = {}
+        duplicates = {}
+        for evidence_id, evidence in evidence_by_id.items():
+            try:
+                analyzer_id = analyzer.resolve_analyzer_id(evidence)
+                cached = analyzer.get_cached_result(evidence, analyzer_id)
+                if cached is not None:
+                    outcomes[evidence_id] = analyzer.apply_result(evidence, cached)
+                    continue
+                # Duplicate files in the same batch are analyzed once
+                content_key = (evidence.content_hash, analyzer_id)
+                if evidence.content_hash and content_key in leaders:
+                    duplicates[evidence_id] = leaders[content_key]
+                    continue
+                file_location = stack.enter_context(analyzer.evidence_source(evidence))
+                pending[evidence_id] = (analyzer_id, file_location)
+                # Registered once its file is open, so a failed leader leaves
+                # the next duplicate to take its place
+                leaders[content_key] = evidence_id
+            except Exception as e:
+                logger.exception(f"Error preparing evidence {evidence_id}: {str(e)}")
+                outcomes[evidence_id] = (False, {"error": f"Error processing evidence: {str(e)}"})
+
+        client = AsyncContentUnderstandingClient(analyzer.get_client(), **client_options)
+        started = time.monotonic()
+        results = asyncio.run(analyze_many(client, pending, max_concurrency=max_concurrency))
+        logger.info(f"Analyzed {len(pending)} evidence files in {time.monotonic() - started:.1f}s")
+
+    shared_results = set(duplicates.values())
+    for evidence_id, result in results.items():
+        evidence = evidence_by_id[evidence_id]
+        if isinstance(result, Exception):
+            outcomes[evidence_id] = analyzer.mark_failed(evidence, f"OCR processing failed: {str(result)}")
+        else:
+            # apply_result stores the dict on the evidence, so shared results are copied
+            if evidence_id in shared_results:
+                result = copy.deepcopy(result)
+            outcomes[evidence_id] = analyzer.apply_result(evidence, result, analyzer_id=pending[evidence_id][0])
+
+    for evidence_id, leader_id in duplicates.items():
+        evidence = evidence_by_id[evidence_id]
+        result = results[leader_id]
+        if isinstance(result, Exception):
+            outcomes[evidence_id] = analyzer.mark_failed(evidence, f"OCR processing failed: {str(result)}")
+        else:
+            outcomes[evidence_id] = analyzer.apply_result(evidence, copy.deepcopy(results[leader_id]))
+    return outcomes
@@ -0,0 +1,123 @@
+"""
+OCR result cache keyed by file content, analyzer and API version.
+"""
+
+import copy
+import hashlib
+import logging
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ..models.ocr import OCRResultCache
+
+logger = logging.getLogger(__name__)
+
+HITS_KEY = 'ocr_cache:hits'
+MISSES_KEY = 'ocr_cache:misses'
+
+
+def compute_content_hash(file_obj):
+    """
+    SHA-256 of a file's contents, read in chunks.
+
+    Args:
+        file_obj: Django File / UploadedFile
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def ensure_content_hash(evidence):
+    """Return the evidence file's content hash, computing and saving it for older uploads."""
+    if not evidence.content_hash and evidence.file:
+        with evidence.file.open('rb') as file_obj:
+            evidence.content_hash = compute_content_hash(file_obj)
+        if evidence.pk:
+            type(evidence).objects.filter(pk=evidence.pk).update(content_hash=evidence.content_hash)
+    return evidence.content_hash
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_cached_ocr_result(evidence, analyzer_id, api_version):
+    """
+    Look up a stored result for the evidence file's contents.
+
+    Returns:
+        dict or None: A copy of the raw analyze result on a hit
+    """
+    try:
+        content_hash = ensure_content_hash(evidence)
+    except Exception as e:
+        logger.warning(f"Could not hash evidence {evidence.id}: {str(e)}")
+        content_hash = ''
+
+    entry = None
+    if content_hash:
+        entry = OCRResultCache.objects.filter(
+            content_hash=content_hash, analyzer_id=analyzer_id, api_version=api_version or ''
+        ).first()
+
+    if entry is None:
+        _increment(MISSES_KEY)
+        return None
+
+    _increment(HITS_KEY)
+    OCRResultCache.objects.filter(pk=entry.pk).update(hit_count=F('hit_count') + 1, last_hit_at=timezone.now())
+    logger.info(f"OCR cache hit for evidence {evidence.id} ({analyzer_id})")
+    return copy.deepcopy(entry.result)
+
+
+def store_ocr_result(evidence, analyzer_id, api_version, result):
+    """Remember a successful analyze result for later uploads of the same file."""
+    if not evidence.content_hash:
+        return
+    try:
+        with transaction.atomic():
+            OCRResultCache.objects.update_or_create(
+                content_hash=evidence.content_hash,
+                analyzer_id=analyzer_id,
+                api_version=api_version or '',
+                defaults={'result': result}
+            )
+    except IntegrityError:
+        # Stored concurrently by another worker
+        pass
+
+
+def get_ocr_cache_stats():
+    """
+    Hit/miss counters for the OCR result cache.
+
+    hits and misses count lookups since the cache backend was last cleared
+    (per process with the default LocMemCache); stored_hits is the total
+    recorded on the cache entries in the database.
+    """
+    totals = OCRResultCache.objects.aggregate(stored_hits=Sum('hit_count'))
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+        'entries': OCRResultCache.objects.count(),
+        'stored_hits': totals['stored_hits'] or 0,
+    }
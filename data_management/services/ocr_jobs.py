@@ -0,0 +1,295 @@
+"""
+Queued OCR processing of evidence files.
+"""
+
+import logging
+import os
+import socket
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models.ocr import OCRJob
+from ..models.templates import ESGMetricEvidence
+from .bill_analyzer import UtilityBillAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# Overridden per key by settings.OCR_JOBS
+DEFAULT_OCR_JOB_SETTINGS = {
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 10,
+    'MAX_BACKOFF_SECONDS': 600,
+    'POLL_INTERVAL_SECONDS': 2,
+    'TIMEOUT_SECONDS': 300,
+    'LEASE_SECONDS': 120,
+    'REQUEST_TIMEOUT_SECONDS': 30,
+    'CONCURRENCY_PER_ANALYZER': 4,
+    'ANALYZER_CONCURRENCY': {},
+}
+
+# HTTP statuses from Content Understanding that are worth retrying
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def get_ocr_job_settings():
+    return {**DEFAULT_OCR_JOB_SETTINGS, **getattr(settings, 'OCR_JOBS', {})}
+
+
+class RetryableOCRError(Exception):
+    """A transient failure; the job is retried after a backoff delay."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(response):
+    """Seconds requested by a Retry-After header, or None."""
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return None
+
+
+def _raise_for_http_error(error):
+    """Turn a transient HTTP error into a RetryableOCRError, re-raise anything else."""
+    response = error.response
+    if response is not None and response.status_code in RETRYABLE_STATUS_CODES:
+        raise RetryableOCRError(str(error), retry_after_seconds(response)) from error
+    raise error
+
+
+def backoff_delay(attempts, config, retry_after=None):
+    """Exponential backoff for the given attempt number, at least retry_after seconds."""
+    delay = min(
+        config['BACKOFF_SECONDS'] * (2 ** max(attempts - 1, 0)),
+        config['MAX_BACKOFF_SECONDS']
+    )
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def enqueue_ocr_job(evidence, user=None, analyzer=None):
+    """
+    Queue OCR processing for an evidence file.
+
+    Args:
+        evidence: ESGMetricEvidence to analyze
+        user: User requesting the analysis
+        analyzer: UtilityBillAnalyzer used to pick the analyzer id
+
+    Returns:
+        tuple: (job, created) - an already queued or running job is reused
+    """
+    analyzer = analyzer or UtilityBillAnalyzer()
+    with transaction.atomic():
+        # Serialise concurrent requests for the same evidence file
+        ESGMetricEvidence.objects.select_for_update().filter(pk=evidence.pk).first()
+        existing = evidence.ocr_jobs.filter(status__in=OCRJob.ACTIVE_STATUSES).order_by('id').first()
+        if existing:
+            return existing, False
+        job = OCRJob.objects.create(
+            evidence=evidence,
+            analyzer_id=analyzer.resolve_analyzer_id(evidence),
+            requested_by=user,
+            max_attempts=get_ocr_job_settings()['MAX_ATTEMPTS'],
+            next_attempt_at=timezone.now()
+        )
+    logger.info(f"Queued OCR job {job.id} for evidence {evidence.id} with analyzer {job.analyzer_id}")
+    return job, True
+
+
+class OCRJobWorker:
+    """
+    Advances queued OCR jobs one short step at a time.
+
+    A step either starts an analysis (one POST) or polls a running one
+    (one GET); nothing waits on Content Understanding, so one worker can
+    drive many analyses. Jobs are claimed with a lease so several worker
+    processes can run side by side. At most CONCURRENCY_PER_ANALYZER
+    analyses (or the ANALYZER_CONCURRENCY override) run per analyzer id;
+    with several workers claiming at the same moment the limit may briefly
+    be exceeded by the number of workers.
+    """
+
+    def __init__(self, worker_id=None, analyzer=None, config=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.analyzer = analyzer or UtilityBillAnalyzer()
+        self.config = config or get_ocr_job_settings()
+        self.client = None
+
+    def get_client(self):
+        if self.client is None:
+            self.client = self.analyzer.get_client(request_timeout=self.config['REQUEST_TIMEOUT_SECONDS'])
+        return self.client
+
+    def concurrency_limit(self, analyzer_id):
+        return self.config['ANALYZER_CONCURRENCY'].get(analyzer_id, self.config['CONCURRENCY_PER_ANALYZER'])
+
+    def run_once(self, limit=10):
+        """
+        Claim up to `limit` due jobs and advance each by one step.
+
+        Returns:
+            int: Number of jobs processed
+        """
+        jobs = self.claim_jobs(limit)
+        for job in jobs:
+            self.step(job)
+        return len(jobs)
+
+    def claim_jobs(self, limit):
+        """Lease due jobs: running jobs to poll first, then queued jobs within the concurrency limits."""
+        now = timezone.now()
+        lease = now + timedelta(seconds=self.config['LEASE_SECONDS'])
+        unlocked = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+
+        with transaction.atomic():
+            due = OCRJob.objects.filter(unlocked, next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+
+            claimed = list(due.filter(status=OCRJob.Status.RUNNING)[:limit])
+
+            running = dict(
+                OCRJob.objects.filter(status=OCRJob.Status.RUNNING)
+                .values('analyzer_id').annotate(count=Count('id'))
+                .values_list('analyzer_id', 'count')
+            )
+            saturated = [a for a, count in running.items() if count >= self.concurrency_limit(a)]
+            queued = due.filter(status=OCRJob.Status.QUEUED).exclude(analyzer_id__in=saturated)
+
+            # Over-fetch so jobs for a nearly saturated analyzer do not hide others
+            for job in queued[:max(limit - len(claimed), 0) * 4]:
+                if len(claimed) >= limit:
+                    break
+                if running.get(job.analyzer_id, 0) >= self.concurrency_limit(job.analyzer_id):
+                    continue
+                running[job.analyzer_id] = running.get(job.analyzer_id, 0) + 1
+                job.status = OCRJob.Status.RUNNING
+                claimed.append(job)
+
+            for job in claimed:
+                job.locked_by = self.worker_id
+                job.locked_until = lease
+            OCRJob.objects.bulk_update(claimed, ['status', 'locked_by', 'locked_until'])
+        return claimed
+
+    def step(self, job):
+        """Start or poll one claimed job, recording the outcome."""
+        try:
+            if job.operation_location:
+                self._poll(job)
+            else:
+                self._begin(job)
+        except RetryableOCRError as e:
+            self._retry(job, str(e), e.retry_after, restart=not job.operation_location)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self._retry(job, str(e), restart=not job.operation_location)
+        except Exception as e:
+            logger.exception(f"OCR job {job.id} failed: {str(e)}")
+            self._fail(job, f"OCR processing failed: {str(e)}")
+
+    def _begin(self, job):
+        evidence = job.evidence
+        if job.attempts == 0:
+            cached = self.analyzer.get_cached_result(evidence, job.analyzer_id)
+            if cached is not None:
+                self._complete(job, cached, from_cache=True)
+                return
+
+        job.attempts += 1
+        job.started_at = timezone.now()
+
+        try:
+            with self.analyzer.evidence_source(evidence) as file_location:
+                response = self.get_client().begin_analyze(job.analyzer_id, file_location)
+        except requests.HTTPError as e:
+            _raise_for_http_error(e)
+
+        operation_location = response.headers.get('operation-location')
+        if not operation_location:
+            raise RetryableOCRError('Operation location not found in response headers')
+
+        logger.info(f"OCR job {job.id} started analysis (attempt {job.attempts}): {operation_location}")
+        job.operation_location = operation_location
+        self._schedule(job, self.config['POLL_INTERVAL_SECONDS'])
+
+    def _poll(self, job):
+        elapsed = (timezone.now() - job.started_at).total_seconds() if job.started_at else 0
+        if elapsed > self.config['TIMEOUT_SECONDS']:
+            job.operation_location = ''
+            raise RetryableOCRError(f"Analysis timed out after {elapsed:.0f} seconds")
+
+        try:
+            result = self.get_client().get_result(job.operation_location)
+        except requests.HTTPError as e:
+            _raise_for_http_error(e)
+
+        status = result.get('status', '').lower()
+        if status == 'failed':
+            job.operation_location = ''
+            raise RetryableOCRError(f"Analysis failed: {result.get('error') or result}")
+        if status != 'succeeded':
+            self._schedule(job, self.config['POLL_INTERVAL_SECONDS'])
+            return
+
+        self._complete(job, result)
+
+    def _complete(self, job, result, from_cache=False):
+        """Store a finished analyze result on the evidence and close the job."""
+        success, payload = self.analyzer.apply_result(
+            job.evidence, result, analyzer_id=None if from_cache else job.analyzer_id
+        )
+        if not success:
+            # The document was read but held no usable data; retrying will not help
+            self._finish(job, OCRJob.Status.FAILED, error=payload.get('error', ''))
+            return
+
+        self._finish(job, OCRJob.Status.SUCCEEDED, result={
+            'extracted_value': payload.get('extracted_value'),
+            'period': payload['period'].isoformat() if payload.get('period') else None,
+            'additional_periods': payload.get('additional_periods', []),
+            'from_cache': from_cache,
+        })
+
+    def _retry(self, job, error, retry_after=None, restart=True):
+        if restart:
+            job.operation_location = ''
+        if restart and job.attempts >= job.max_attempts:
+            self._fail(job, f"OCR processing failed after {job.attempts} attempts: {error}")
+            return
+
+        delay = backoff_delay(max(job.attempts, 1), self.config, retry_after)
+        logger.warning(f"OCR job {job.id} will retry in {delay:.0f}s: {error}")
+        job.last_error = error
+        if restart:
+            job.status = OCRJob.Status.QUEUED
+        self._schedule(job, delay)
+
+    def _fail(self, job, error):
+        self.analyzer.mark_failed(job.evidence, error)
+        self._finish(job, OCRJob.Status.FAILED, error=error)
+
+    def _schedule(self, job, delay):
+        job.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        job.locked_by = ''
+        job.locked_until = None
+        job.save()
+
+    def _finish(self, job, status, result=None, error=''):
+        job.status = status
+        job.result = result
+        job.last_error = error
+        job.operation_location = ''
+        job.finished_at = timezone.now()
+        job.locked_by = ''
+        job.locked_until = None
+        job.save()
+        logger.info(f"OCR job {job.id} finished with status {status}")
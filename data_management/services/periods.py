@@ -0,0 +1,136 @@
+"""
+Reading period values out of submission JSON data.
+"""
+
+import calendar
+import re
+from datetime import date
+
+from .layer_aggregation import get_numeric_values
+
+# Keys of the per-region objects nested inside a period
+REGION_KEYS = ('HK', 'PRC', 'CLP', 'HKE')
+
+# Keys naming the period of an entry in a list of periods
+PERIOD_LABEL_KEYS = ('month', 'period', 'label')
+
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_abbr) if name}
+
+MONTH_NUMBER_RE = re.compile(r'^(\d{1,2})[/-](\d{4})$')          # 03/2024, 3-2024
+YEAR_MONTH_RE = re.compile(r'^(\d{4})[/-](\d{1,2})(?:[/-]\d{1,2})?$')  # 2024-03, 2024-03-01
+MONTH_NAME_RE = re.compile(r'^([A-Za-z]{3})[A-Za-z]*\.?[\s/-]*(\d{4})$')  # Jan-2025, March 2024
+QUARTER_RE = re.compile(r'^Q([1-4])[\s/-]*(\d{4})$|^(\d{4})[\s/-]*Q([1-4])$', re.IGNORECASE)
+YEAR_RE = re.compile(r'^(?:FY)?\s*(\d{4})$', re.IGNORECASE)
+
+
+def _month_range(year, first_month, last_month):
+    return date(year, first_month, 1), date(year, last_month, calendar.monthrange(year, last_month)[1])
+
+
+def parse_period(label):
+    """
+    Date range of a period label.
+
+    Understands months ("03/2024", "2024-03", "Jan-2025"), quarters
+    ("Q1-2024", "2024 Q1") and years ("2024", "FY2024").
+
+    Returns:
+        tuple: (start, end) dates, or (None, None) if the label is not recognised
+    """
+    label = str(label or '').strip()
+    try:
+        match = MONTH_NUMBER_RE.match(label)
+        if match:
+            month, year = int(match.group(1)), int(match.group(2))
+            return _month_range(year, month, month)
+        match = YEAR_MONTH_RE.match(label)
+        if match:
+            year, month = int(match.group(1)), int(match.group(2))
+            return _month_range(year, month, month)
+        match = MONTH_NAME_RE.match(label)
+        if match and match.group(1).lower() in MONTHS:
+            month, year = MONTHS[match.group(1).lower()], int(match.group(2))
+            return _month_range(year, month, month)
+        match = QUARTER_RE.match(label)
+        if match:
+            quarter = int(match.group(1) or match.group(4))
+            year = int(match.group(2) or match.group(3))
+            return _month_range(year, quarter * 3 - 2, quarter * 3)
+        match = YEAR_RE.match(label)
+        if match:
+            return _month_range(int(match.group(1)), 1, 12)
+    except ValueError:
+        # e.g. month 13
+        pass
+    return None, None
+
+
+def _as_number(value):
+    if isinstance(value, bool) or value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _entry_values(entry):
+    """(region, value, unit) for a period entry, which may be split by region."""
+    if not isinstance(entry, dict):
+        return
+    if 'value' in entry:
+        yield '', _as_number(entry.get('value')), entry.get('unit') or ''
+        return
+    for region, region_data in entry.items():
+        if region in REGION_KEYS and isinstance(region_data, dict) and 'value' in region_data:
+            yield region, _as_number(region_data.get('value')), region_data.get('unit') or ''
+
+
+def iter_period_values(data, primary_path=None):
+    """
+    Yield (period, region, value, unit) for every value in submission data.
+
+    Handles periods stored as a dict keyed by label ("MM/YYYY", "Q1-2024"),
+    as a list of {"month": ..., "value": ...} entries, and per-region objects
+    (HK/PRC/CLP/HKE) inside a period. Data without periods yields one entry
+    with a blank period, read from primary_path or the root 'value'.
+    Missing and non-numeric values are skipped.
+    """
+    if not isinstance(data, dict):
+        return
+
+    periods = data.get('periods')
+    if isinstance(periods, dict) and periods:
+        entries = periods.items()
+    elif isinstance(periods, list) and periods:
+        entries = (
+            (next((str(item[key]) for key in PERIOD_LABEL_KEYS if item.get(key)), str(index)), item)
+            for index, item in enumerate(periods) if isinstance(item, dict)
+        )
+    else:
+        entries = None
+
+    if entries is not None:
+        for period, entry in entries:
+            for region, value, unit in _entry_values(entry):
+                if value is not None:
+                    yield str(period), region, value, unit
+        return
+
+    if primary_path:
+        # The unit sits next to the value, or inside the object the path names
+        unit = ''
+        current = data
+        for part in primary_path.split('.'):
+            if isinstance(current, dict) and isinstance(current.get('unit'), str):
+                unit = current['unit']
+            current = current.get(part) if isinstance(current, dict) else None
+        if isinstance(current, dict) and isinstance(current.get('unit'), str):
+            unit = current['unit']
+        for value in get_numeric_values(data, primary_path):
+            yield '', '', value, unit
+        return
+
+    value = _as_number(data.get('value'))
+    if value is not None:
+        yield '', '', value, data.get('unit') or ''
@@ -0,0 +1,112 @@
+"""
+Denormalised primary value, unit and total of a submission's JSON data.
+"""
+
+import logging
+
+from .calculations.utils import get_calculation_metadata
+from .layer_aggregation import get_numeric_values
+from .periods import iter_period_values
+
+logger = logging.getLogger(__name__)
+
+# Columns written by populate_primary_values, for bulk_update
+PRIMARY_VALUE_FIELDS = ['primary_value', 'primary_unit', 'total_value']
+
+
+def get_primary_unit(data, primary_path=None):
+    """
+    Unit of a submission's primary value.
+
+    Looks along the metric's primary_path first, then in
+    "_metadata.primary_measurement", then for a root level unit.
+
+    Returns:
+        str or None
+    """
+    if not isinstance(data, dict):
+        return None
+
+    if primary_path:
+        path_parts = primary_path.split('.')
+        current = data
+        for i, part in enumerate(path_parts):
+            if not isinstance(current, dict) or part not in current:
+                break
+            current = current[part]
+            if i == len(path_parts) - 1:
+                # A {'value', 'unit'} object, or a 'value' whose parent holds the unit
+                if isinstance(current, dict) and 'unit' in current:
+                    return current['unit']
+                if part == 'value':
+                    parent = data
+                    for parent_part in path_parts[:-1]:
+                        parent = parent.get(parent_part) if isinstance(parent, dict) else None
+                    if isinstance(parent, dict) and 'unit' in parent:
+                        return parent['unit']
+
+    primary = data.get('_metadata', {}).get('primary_measurement') if isinstance(data.get('_metadata'), dict) else None
+    if isinstance(primary, dict) and 'unit' in primary:
+        return primary['unit']
+
+    if 'unit' in data:
+        return data['unit']
+    return None
+
+
+def _first_number(data, path):
+    numbers = get_numeric_values(data, path)
+    return numbers[0] if numbers else None
+
+
+def extract_primary_values(data, metric):
+    """
+    Primary value, unit and total of a submission's data.
+
+    primary_value is the number at the metric's primary_path, falling back
+    to "_metadata.primary_measurement" and the root 'value'. total_value is
+    the schema's first calculated field (e.g. total_consumption.value),
+    falling back to the sum of the period values and then primary_value.
+
+    Returns:
+        dict: primary_value, primary_unit and total_value
+    """
+    primary_value = None
+    if isinstance(data, dict):
+        for path in (metric.primary_path, '_metadata.primary_measurement', 'value'):
+            if path:
+                primary_value = _first_number(data, path)
+                if primary_value is not None:
+                    break
+
+    total_value = None
+    if isinstance(data, dict):
+        try:
+            calculated_fields = get_calculation_metadata(metric).get('calculated_fields') or []
+        except Exception as e:
+            logger.warning(f"Could not read calculated fields of metric {metric.id}: {e}")
+            calculated_fields = []
+        for field in calculated_fields:
+            if field.get('path'):
+                total_value = _first_number(data, field['path'])
+                break
+        if total_value is None and data.get('periods'):
+            period_values = [value for _, _, value, _ in iter_period_values(data)]
+            if period_values:
+                total_value = sum(period_values)
+    if total_value is None:
+        total_value = primary_value
+
+    unit = get_primary_unit(data, metric.primary_path)
+    return {
+        'primary_value': primary_value,
+        'primary_unit': unit if isinstance(unit, str) else '',
+        'total_value': total_value,
+    }
+
+
+def populate_primary_values(submission, metric=None):
+    """Set the primary value columns of a submission from its data, without saving."""
+    for field, value in extract_primary_values(submission.data, metric or submission.metric).items():
+        setattr(submission, field, value)
+    return submission
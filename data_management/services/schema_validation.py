@@ -0,0 +1,96 @@
+"""
+Cached JSON Schema validators for metric submission data.
+"""
+
+import copy
+import logging
+import threading
+
+try:
+    import jsonschema
+    from jsonschema.exceptions import SchemaError, ValidationError as SchemaValidationError, best_match
+    from jsonschema.validators import validator_for
+except ImportError:
+    # jsonschema is optional
+    jsonschema = None
+
+    class SchemaValidationError(Exception):
+        """Stand-in so callers can always catch schema validation errors."""
+
+logger = logging.getLogger(__name__)
+
+# (registry id, updated_at) -> compiled validator, or the SchemaError of an invalid schema
+_VALIDATOR_CACHE = {}
+_VALIDATOR_CACHE_LOCK = threading.Lock()
+
+
+def _compile(schema):
+    cls = validator_for(schema)
+    try:
+        cls.check_schema(schema)
+    except SchemaError as e:
+        return e
+    return cls(schema)
+
+
+def get_schema_validator(registry):
+    """
+    Get the compiled validator of a MetricSchemaRegistry, building it on first use.
+
+    The schema is checked against its metaschema once per (id, updated_at)
+    instead of on every validation.
+
+    Raises:
+        ImportError: If jsonschema is not installed
+        SchemaError: If the registry schema is not a valid JSON Schema
+    """
+    if jsonschema is None:
+        raise ImportError('jsonschema is required for schema validation')
+
+    key = (registry.pk, registry.updated_at)
+    compiled = _VALIDATOR_CACHE.get(key) if registry.pk else None
+    if compiled is None:
+        compiled = _compile(registry.schema)
+        if registry.pk:
+            with _VALIDATOR_CACHE_LOCK:
+                # Older versions of the same registry are stale
+                for stale_key in [k for k in _VALIDATOR_CACHE if k[0] == registry.pk]:
+                    del _VALIDATOR_CACHE[stale_key]
+                _VALIDATOR_CACHE[key] = compiled
+            logger.debug(f"Compiled schema validator for registry {registry.pk}")
+
+    if isinstance(compiled, SchemaError):
+        # A fresh copy, so tracebacks do not pile up on the cached error
+        raise copy.copy(compiled)
+    return compiled
+
+
+def validate_against_registry(data, registry):
+    """
+    Validate submission data against a registry schema.
+
+    Behaves like jsonschema.validate(instance=data, schema=registry.schema),
+    raising the same best-matching error, with the validator reused.
+
+    Raises:
+        ImportError: If jsonschema is not installed
+        SchemaError: If the registry schema is not a valid JSON Schema
+        SchemaValidationError: If the data does not match the schema
+    """
+    error = best_match(get_schema_validator(registry).iter_errors(data))
+    if error is not None:
+        raise error
+
+
+def invalidate_schema_validators(*registry_ids):
+    """
+    Drop cached validators for the given registries, or all validators if none are given.
+
+    Called when a MetricSchemaRegistry row is saved or deleted.
+    """
+    with _VALIDATOR_CACHE_LOCK:
+        if not registry_ids:
+            _VALIDATOR_CACHE.clear()
+            return
+        for key in [k for k in _VALIDATOR_CACHE if k[0] in registry_ids]:
+            del _VALIDATOR_CACHE[key]
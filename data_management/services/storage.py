@@ -42,11 +42,14 @@ class ESGAzureStorage(AzureStorage):
             start_time = datetime.now(timezone.utc)
             expiry_time = start_time + timedelta(seconds=expire)
             
+            # The blob name includes AZURE_LOCATION, as in AzureStorage.url
+            blob_name = self._get_valid_path(name)
+            
             # Generate SAS token with read permission
             sas_token = generate_blob_sas(
                 account_name=account_name,
                 container_name=self.azure_container,
-                blob_name=name,
+                blob_name=blob_name,
                 account_key=account_key,
                 permission=BlobSasPermissions(read=True),
                 start=start_time,
@@ -54,7 +57,7 @@ class ESGAzureStorage(AzureStorage):
             )
             
             # Create the full URL with SAS token
-            blob_url = f"https://{account_name}.blob.core.windows.net/{self.azure_container}/{name}?{sas_token}"
+            blob_url = f"https://{account_name}.blob.core.windows.net/{self.azure_container}/{blob_name}?{sas_token}"
             return blob_url
             
         except Exception as e:
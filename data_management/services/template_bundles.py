@@ -0,0 +1,146 @@
+"""
+Compiled and cached form/metric structure of templates.
+"""
+
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Prefetch
+from django.utils.http import parse_etags
+
+from ..models.templates import ESGMetric, TemplateFormSelection
+
+logger = logging.getLogger(__name__)
+
+def get_template_bundle_state(template):
+    """
+    Fingerprint of everything a template's bundle is built from, read with
+    one aggregate query.
+
+    Combines the template's own version and update time with the latest
+    update time and the row counts of its selections, forms, categories,
+    metrics and schemas. Every edit saved to any of them, and every row
+    added or removed, changes the fingerprint. It is read from the database,
+    so all workers agree on it whatever cache backend is configured.
+    """
+    state = TemplateFormSelection.objects.filter(template=template).aggregate(
+        selections=Count('id', distinct=True),
+        selections_updated=Max('updated_at'),
+        forms_updated=Max('form__updated_at'),
+        categories_updated=Max('form__category__updated_at'),
+        metrics=Count('form__metrics', distinct=True),
+        metrics_updated=Max('form__metrics__updated_at'),
+        schemas=Count('form__metrics__schema_registry', distinct=True),
+        schemas_updated=Max('form__metrics__schema_registry__updated_at'),
+    )
+    parts = [template.pk, template.version, template.updated_at] + [state[name] for name in sorted(state)]
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+def compute_etag(data):
+    """Strong ETag of JSON-serialisable data."""
+    content = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return '"%s"' % hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def etag_matches(request, etag):
+    """True if the request's If-None-Match header lists the given ETag."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag in etags
+
+
+def build_template_forms(template):
+    """
+    Forms of a template with the metrics that apply to each form's regions,
+    in selection order, read with a fixed number of queries.
+
+    Returns:
+        list: Form dicts as served by the user template and preview endpoints
+    """
+    selections = TemplateFormSelection.objects.filter(template=template).select_related(
+        'form', 'form__category'
+    ).prefetch_related(
+        Prefetch('form__metrics', queryset=ESGMetric.objects.select_related('schema_registry'))
+    ).order_by('order', 'id')
+
+    forms_data = []
+    for selection in selections:
+        form = selection.form
+        form_data = {
+            'form_id': form.id,
+            'form_code': form.code,
+            'form_name': form.name,
+            'regions': selection.regions,
+            'category': {
+                'id': form.category.id,
+                'name': form.category.name,
+                'code': form.category.code,
+                'icon': form.category.icon,
+                'order': form.category.order
+            },
+            'order': form.order,
+            'metrics': []
+        }
+
+        for metric in form.metrics.all():
+            # Only include metrics that match the form's regions or are for ALL locations
+            if metric.location == 'ALL' or metric.location in selection.regions:
+                metric_data = {
+                    'id': metric.id,
+                    'name': metric.name,
+                    'requires_evidence': metric.requires_evidence,
+                    'location': metric.location,
+                    'is_required': metric.is_required,
+                    'order': metric.order,
+                    'requires_time_reporting': metric.requires_time_reporting,
+                    'reporting_frequency': metric.reporting_frequency,
+                    'form_component': metric.form_component,
+                    'primary_path': metric.primary_path,
+                    'schema_registry_id': metric.schema_registry_id,
+                }
+                if metric.schema_registry:
+                    metric_data['schema_registry'] = {
+                        'id': metric.schema_registry.id,
+                        'name': metric.schema_registry.name,
+                        'version': metric.schema_registry.version,
+                        'schema': metric.schema_registry.schema
+                    }
+                form_data['metrics'].append(metric_data)
+
+        form_data['metrics'].sort(key=lambda metric_data: metric_data['order'])
+        forms_data.append(form_data)
+    return forms_data
+
+
+def get_template_bundle(template):
+    """
+    Get the compiled structure of a template, building it on a cache miss.
+
+    Bundles are cached under the template's get_template_bundle_state, so
+    a change to any row the bundle is built from moves it to a new key.
+
+    Returns:
+        dict: 'etag' and 'data' (template id, name, description and forms)
+    """
+    key = f'template_bundle:{template.pk}:{get_template_bundle_state(template)}'
+    bundle = cache.get(key)
+    if bundle is not None:
+        return bundle
+
+    data = {
+        'template_id': template.id,
+        'template_name': template.name,
+        'description': template.description,
+        'forms': build_template_forms(template),
+    }
+    bundle = {'etag': compute_etag(data), 'data': data}
+    cache.set(key, bundle, getattr(settings, 'TEMPLATE_BUNDLE_CACHE_TIMEOUT', 24 * 60 * 60))
+    logger.debug(f"Compiled template bundle {template.pk} (version {template.version})")
+    return bundle
@@ -0,0 +1,89 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from accounts.models import SubsidiaryLayer, BranchLayer
+from .models import (
+    MetricSchemaRegistry, ESGMetricSubmission, TemplateAssignment, ConsolidatedMetricValue
+)
+from .services.calculations.plans import invalidate_calculation_plans
+from .services.schema_validation import invalidate_schema_validators
+from .services.consolidation import consolidation_key, consolidation_keys, schedule_consolidation_refresh
+from .services.primary_values import populate_primary_values
+from .services.facts import refresh_facts
+
+@receiver([post_save, post_delete], sender=MetricSchemaRegistry)
+def invalidate_schema_caches(sender, instance, **kwargs):
+    """
+    Signal handler to drop compiled calculation plans and schema validators
+    for a schema whenever its registry row is saved or deleted, so the next
+    calculation or validation recompiles against the current definition.
+    """
+    invalidate_calculation_plans(instance.name, f'registry:{instance.pk}')
+    invalidate_schema_validators(instance.pk)
+
+@receiver(pre_save, sender=ESGMetricSubmission)
+def update_primary_values(sender, instance, raw=False, **kwargs):
+    """
+    Signal handler to refresh a submission's primary_value, primary_unit
+    and total_value columns from its data before it is saved. Bulk writes
+    call populate_primary_values themselves.
+    """
+    if not raw:
+        populate_primary_values(instance)
+
+@receiver(pre_save, sender=ESGMetricSubmission)
+def remember_consolidation_key(sender, instance, raw=False, **kwargs):
+    """
+    Signal handler to note which consolidated values a submission counted
+    towards before it is saved, so moving it to another layer or metric
+    also refreshes the old figures.
+    """
+    instance._previous_consolidation_keys = set()
+    if instance.pk and not raw:
+        instance._previous_consolidation_keys = consolidation_keys(
+            ESGMetricSubmission.objects.filter(pk=instance.pk)
+        )
+
+@receiver(post_save, sender=ESGMetricSubmission)
+def refresh_submission_facts(sender, instance, raw=False, **kwargs):
+    """
+    Signal handler to rewrite a submission's rows in the metric fact table.
+    Deleted submissions lose their facts through the foreign key cascade.
+    """
+    if not raw:
+        refresh_facts([instance])
+
+@receiver(post_save, sender=ESGMetricSubmission)
+@receiver(post_delete, sender=ESGMetricSubmission)
+def refresh_submission_consolidation(sender, instance, raw=False, **kwargs):
+    """
+    Signal handler to update the materialised consolidated values of the
+    submission's layer and every layer above it once the transaction
+    commits. Bulk writes bypass signals and refresh through the
+    consolidation service themselves.
+    """
+    if raw:
+        return
+    keys = getattr(instance, '_previous_consolidation_keys', set())
+    try:
+        keys.add(consolidation_key(instance))
+    except TemplateAssignment.DoesNotExist:
+        # Deleted together with its assignment
+        pass
+    schedule_consolidation_refresh(keys)
+
+@receiver(post_save, sender=SubsidiaryLayer)
+@receiver(post_save, sender=BranchLayer)
+def refresh_layer_consolidation(sender, instance, created, raw=False, **kwargs):
+    """
+    Signal handler to re-weight a layer's parents after its shareholding
+    ratio (or parent) changes. Use the rebuild_consolidation command after
+    restructuring the hierarchy, as the previous parents are not refreshed.
+    """
+    if created or raw:
+        return
+    schedule_consolidation_refresh(
+        (instance.pk, metric_id, year)
+        for metric_id, year in ConsolidatedMetricValue.objects.filter(
+            layer_id=instance.pk
+        ).values_list('metric_id', 'reporting_year').distinct()
+    )
@@ -1,3 +1,1680 @@
-from django.test import TestCase
+import copy
+import hashlib
+import json
+import jsonschema
+import os
+import shutil
+import tempfile
+import threading
+import tracemalloc
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage, Storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from io import StringIO
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, GroupLayer, SubsidiaryLayer, BranchLayer, AppUser, RoleChoices
+from .models import (
+    ESGFormCategory, ESGForm, ESGMetric, Template, TemplateFormSelection,
+    TemplateAssignment, ESGMetricSubmission, MetricSchemaRegistry,
+    ESGMetricEvidence, OCRJob, ConsolidatedMetricValue, ESGMetricFact
+)
+from .services.bill_analyzer import UtilityBillAnalyzer
+from .services.ocr_cache import get_ocr_cache_stats
+from .services.ocr_jobs import OCRJobWorker, enqueue_ocr_job
+from .serializers.esg import ESGMetricSubmissionSerializer
+from .services.evidence import attach_evidence_to_submissions
+from .services.completion import AssignmentCompletion, build_completion_matrix, update_assignment_completion
+from .services.calculations import CALCULATION_HANDLERS, register_calculation_handler
+from .services.calculations.plans import CalculationPlan, get_calculation_plan, _PLAN_CACHE
+from .services.calculations.utils import apply_schema_calculations_interpreted
+from .services.schema_validation import get_schema_validator, validate_against_registry
+
+
+class CompletionEngineTest(TestCase):
+    """Tests for the set-based assignment completion engine"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='operator@test.com', password='TestPass123!', is_active=True
+        )
+        self.layer = GroupLayer.objects.create(
+            company_name='Test Group',
+            company_industry='Utilities',
+            company_location='Hong Kong',
+            layer_type='GROUP'
+        )
+        self.category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+
+    def _build_assignment(self, forms, metrics_per_form, submit=True):
+        """Create a template with the given shape and optionally fill every metric"""
+        template = Template.objects.create(name=f'Template {forms}x{metrics_per_form}')
+        assignment = TemplateAssignment.objects.create(
+            template=template,
+            layer=self.layer,
+            reporting_period_start=date(2024, 1, 1),
+            reporting_period_end=date(2024, 12, 31),
+            reporting_year=2024
+        )
+        for f in range(forms):
+            form = ESGForm.objects.create(
+                category=self.category,
+                code=f'T{template.id}-F{f}',
+                name=f'Form {f}'
+            )
+            TemplateFormSelection.objects.create(template=template, form=form, order=f)
+            for m in range(metrics_per_form):
+                time_based = m % 2 == 0
+                metric = ESGMetric.objects.create(
+                    form=form,
+                    name=f'Metric {f}.{m}',
+                    requires_time_reporting=time_based,
+                    reporting_frequency='monthly' if time_based else None
+                )
+                if submit:
+                    data = {'periods': {'01/2024': {'value': 1}}} if time_based else {'value': 1}
+                    ESGMetricSubmission.objects.create(
+                        assignment=assignment, metric=metric, data=data,
+                        submitted_by=self.user, layer=self.layer
+                    )
+        return assignment
+
+    def _count_queries(self, assignment):
+        assignment = TemplateAssignment.objects.get(id=assignment.id)
+        with CaptureQueriesContext(connection) as ctx:
+            update_assignment_completion(assignment, self.user)
+        return len(ctx.captured_queries)
+
+    def test_query_count_independent_of_metric_count(self):
+        """Checking completion costs the same number of queries for 2 or 80 metrics"""
+        small = self._build_assignment(forms=1, metrics_per_form=2)
+        large = self._build_assignment(forms=4, metrics_per_form=20)
+
+        self.assertEqual(self._count_queries(small), self._count_queries(large))
+
+    def test_query_count_is_constant(self):
+        """A completing check loads template, metrics, submissions and selections once"""
+        assignment = self._build_assignment(forms=3, metrics_per_form=10)
+        assignment = TemplateAssignment.objects.get(id=assignment.id)
+
+        # template, metrics, submissions, assignment save, selections, bulk update;
+        # the group dashboard is refreshed once the transaction commits
+        with self.assertNumQueries(6):
+            update_assignment_completion(assignment, self.user)
+
+    def test_complete_assignment_marks_forms(self):
+        assignment = self._build_assignment(forms=2, metrics_per_form=3)
+
+        update_assignment_completion(assignment)
+
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.status, 'SUBMITTED')
+        selections = TemplateFormSelection.objects.filter(template=assignment.template)
+        self.assertTrue(all(s.is_completed for s in selections))
+        # Without an explicit submitter the latest submitter is credited
+        self.assertTrue(all(s.completed_by_id == self.user.id for s in selections))
+
+    def test_incomplete_metrics_are_reported(self):
+        assignment = self._build_assignment(forms=1, metrics_per_form=2, submit=False)
+        time_metric, regular_metric = ESGMetric.objects.filter(
+            form__in=assignment.template.selected_forms.all()
+        ).order_by('order', 'id')
+        # A periods dict without any value does not count as complete
+        ESGMetricSubmission.objects.create(
+            assignment=assignment, metric=time_metric,
+            data={'periods': {'01/2024': {'unit': 'kWh'}}}, submitted_by=self.user
+        )
+
+        completion = AssignmentCompletion(assignment)
+        missing, incomplete_time_based = completion.get_missing_metrics()
+
+        self.assertFalse(completion.is_complete)
+        self.assertEqual([m['id'] for m in missing], [regular_metric.id])
+        self.assertEqual(incomplete_time_based[0]['id'], time_metric.id)
+        self.assertIn('issue', incomplete_time_based[0])
+
+        update_assignment_completion(assignment, self.user)
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.status, 'PENDING')
+
+
+class BatchSubmitTest(TestCase):
+    """Tests for the bulk batch_submit write path"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='operator@test.com', password='TestPass123!', is_active=True
+        )
+        self.layer = GroupLayer.objects.create(
+            company_name='Test Group',
+            company_industry='Utilities',
+            company_location='Hong Kong',
+            layer_type='GROUP'
+        )
+        AppUser.objects.create(user=self.user, layer=self.layer, name='Operator')
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        self.form = ESGForm.objects.create(category=category, code='HKEX-A1', name='Emissions')
+        self.template = Template.objects.create(name='Annual')
+        TemplateFormSelection.objects.create(template=self.template, form=self.form)
+        self.assignment = TemplateAssignment.objects.create(
+            template=self.template,
+            layer=self.layer,
+            reporting_period_start=date(2024, 1, 1),
+            reporting_period_end=date(2024, 12, 31)
+        )
+        self.metrics = [
+            ESGMetric.objects.create(form=self.form, name=f'Metric {i}', is_required=False)
+            for i in range(50)
+        ]
+        # Never submitted, so the assignment stays open across posts
+        ESGMetric.objects.create(form=self.form, name='Required metric', is_required=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('metric-submission-batch-submit')
+
+    def _payload(self, metrics, **extra):
+        return {
+            'assignment_id': self.assignment.id,
+            'submissions': [
+                {'metric_id': metric.id, 'data': {'value': i}, **extra}
+                for i, metric in enumerate(metrics)
+            ]
+        }
+
+    def _post(self, payload):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, payload, format='json')
+        return response, len(ctx.captured_queries)
+
+    def test_creates_then_updates(self):
+        response, _ = self._post(self._payload(self.metrics[:3], submission_identifier='meter-1'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], 'Created 3 and updated 0 submissions')
+
+        response, _ = self._post(self._payload(self.metrics[:3], submission_identifier='meter-1'))
+        self.assertEqual(response.data['message'], 'Created 0 and updated 3 submissions')
+        self.assertEqual(ESGMetricSubmission.objects.filter(assignment=self.assignment).count(), 3)
+        self.assertEqual(
+            ESGMetricSubmission.objects.get(metric=self.metrics[2]).data, {'value': 2}
+        )
+        self.assertEqual(ESGMetricSubmission.objects.get(metric=self.metrics[2]).primary_value, 2)
+
+    def test_unknown_layer_is_reported_per_row(self):
+        payload = self._payload(self.metrics[:2])
+        payload['submissions'][1]['layer_id'] = 999999
+
+        response, _ = self._post(payload)
+
+        self.assertEqual(response.data['message'], 'Created 1 and updated 0 submissions')
+        self.assertEqual(response.data['failed_submissions'], [{
+            'metric_id': self.metrics[1].id,
+            'error': 'Layer with ID 999999 not found'
+        }])
+
+    def test_update_id_of_other_assignment_is_not_matched_by_later_rows(self):
+        other_assignment = TemplateAssignment.objects.create(
+            template=self.template, layer=self.layer,
+            reporting_period_start=date(2023, 1, 1), reporting_period_end=date(2023, 12, 31)
+        )
+        metric = self.metrics[0]
+        other = ESGMetricSubmission.objects.create(
+            assignment=other_assignment, metric=metric, layer=self.layer, data={'value': 'other'}
+        )
+
+        response, _ = self._post({'assignment_id': self.assignment.id, 'submissions': [
+            {'metric_id': metric.id, 'data': {'value': 1}, 'update_id': other.id},
+            {'metric_id': metric.id, 'data': {'value': 2}},
+        ]})
+
+        self.assertEqual(response.data['message'], 'Created 1 and updated 1 submissions')
+        self.assertEqual(ESGMetricSubmission.objects.get(pk=other.pk).data, {'value': 1})
+        self.assertEqual(
+            ESGMetricSubmission.objects.get(assignment=self.assignment, metric=metric).data, {'value': 2}
+        )
+
+    def test_moved_submission_is_not_matched_under_its_old_key(self):
+        subsidiary = SubsidiaryLayer.objects.create(
+            company_name='Sub', company_industry='Utilities', company_location='Hong Kong',
+            layer_type='SUBSIDIARY', group_layer=self.layer
+        )
+        AppUser.objects.create(user=self.user, layer=subsidiary, name='Operator')
+        metric = self.metrics[0]
+        moved = ESGMetricSubmission.objects.create(
+            assignment=self.assignment, metric=metric, layer=self.layer, data={'value': 0}
+        )
+
+        response, _ = self._post({'assignment_id': self.assignment.id, 'submissions': [
+            {'metric_id': metric.id, 'data': {'value': 1}, 'update_id': moved.id, 'layer_id': subsidiary.id},
+            {'metric_id': metric.id, 'data': {'value': 2}},
+        ]})
+
+        self.assertEqual(response.data['message'], 'Created 1 and updated 1 submissions')
+        moved.refresh_from_db()
+        self.assertEqual((moved.layer_id, moved.data), (subsidiary.id, {'value': 1}))
+        self.assertEqual(ESGMetricSubmission.objects.get(layer=self.layer, metric=metric).data, {'value': 2})
+
+    def test_query_count_independent_of_row_count(self):
+        _, small_create = self._post(self._payload(self.metrics[:5]))
+        _, large_create = self._post(self._payload(self.metrics[5:]))
+        self.assertEqual(small_create, large_create)
+
+        _, small_update = self._post(self._payload(self.metrics[:5]))
+        _, large_update = self._post(self._payload(self.metrics[5:]))
+        self.assertEqual(small_update, large_update)
+
+
+class SumByLayerTest(TestCase):
+    """Tests for the sum_by_layer comparison grid"""
+
+    def setUp(self):
+        layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **layer_fields)
+        self.subsidiaries = [
+            SubsidiaryLayer.objects.create(
+                company_name=f'Sub {i}', layer_type='SUBSIDIARY', group_layer=self.group, **layer_fields
+            )
+            for i in range(3)
+        ]
+        self.branch = BranchLayer.objects.create(
+            company_name='Branch', layer_type='BRANCH', subsidiary_layer=self.subsidiaries[0], **layer_fields
+        )
+        self.user = CustomUser.objects.create_user(
+            email='manager@test.com', password='TestPass123!', is_active=True, role=RoleChoices.MANAGEMENT
+        )
+        AppUser.objects.create(user=self.user, layer=self.group, name='Manager')
+
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        template = Template.objects.create(name='Annual')
+        self.assignment = TemplateAssignment.objects.create(
+            template=template, layer=self.group,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+        self.metrics = [
+            ESGMetric.objects.create(form=form, name=f'Metric {i}', requires_time_reporting=True)
+            for i in range(3)
+        ]
+        for metric in self.metrics:
+            for layer, values in [(self.subsidiaries[0], [10, 20]), (self.branch, [5, '7']),
+                                  (self.subsidiaries[1], [1, None])]:
+                ESGMetricSubmission.objects.create(
+                    assignment=self.assignment, metric=metric, layer=layer,
+                    data={'periods': {
+                        f'{month:02d}/2024': {'value': value, 'unit': 'kWh'}
+                        for month, value in enumerate(values, start=1)
+                    }}
+                )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('metric-submission-sum-by-layer')
+
+    def _get(self, metrics, layers, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {
+                'assignment_id': self.assignment.id,
+                'metric_ids': ','.join(str(metric.id) for metric in metrics),
+                'layer_ids': ','.join(str(layer.id) for layer in layers),
+                **params
+            })
+        self.assertEqual(response.status_code, 200, response.data)
+        return response, len(ctx.captured_queries)
+
+    def _cell(self, response, metric, layer):
+        entry = next(e for e in response.data['aggregation'] if e['metric_id'] == metric.id)
+        return entry['values_by_layer'][layer.id]
+
+    def test_aggregates_period_values(self):
+        sub = self.subsidiaries[0]
+        expected = {'sum': 30, 'avg': 15, 'min': 10, 'max': 20}
+        for aggregate, value in expected.items():
+            response, _ = self._get(self.metrics[:1], [sub], aggregate=aggregate)
+            self.assertEqual(self._cell(response, self.metrics[0], sub)['value'], value)
+
+        response, _ = self._get(self.metrics[:1], [self.subsidiaries[1]], aggregate='sum')
+        self.assertEqual(self._cell(response, self.metrics[0], self.subsidiaries[1])['count'], 1)
+
+        response, _ = self._get(self.metrics[:1], [sub], aggregate='sum', path='periods.02/2024.value')
+        self.assertEqual(self._cell(response, self.metrics[0], sub)['value'], 20)
+
+    def test_rollup_includes_subtree(self):
+        response, _ = self._get(self.metrics[:1], [self.group, self.subsidiaries[0]], rollup='true')
+
+        self.assertEqual(response.data['aggregate'], 'sum')
+        self.assertEqual(self._cell(response, self.metrics[0], self.group)['value'], 43)
+        cell = self._cell(response, self.metrics[0], self.subsidiaries[0])
+        self.assertEqual(cell['value'], 42)
+        self.assertEqual(cell['layer_ids'], sorted([self.subsidiaries[0].id, self.branch.id]))
+
+    def test_without_aggregate_returns_first_submission(self):
+        response, _ = self._get(self.metrics[:1], [self.subsidiaries[0], self.subsidiaries[2]],
+                                period='periods.01/2024')
+
+        self.assertEqual(self._cell(response, self.metrics[0], self.subsidiaries[0])['value'], 10)
+        self.assertEqual(self._cell(response, self.metrics[0], self.subsidiaries[2]),
+                         {'value': None, 'submission_id': None, 'data': None})
+
+    def test_query_count_independent_of_grid_size(self):
+        _, small = self._get(self.metrics[:1], [self.group], rollup='true')
+        _, large = self._get(self.metrics, [self.group] + self.subsidiaries + [self.branch], rollup='true')
+        self.assertEqual(small, large)
+
+        _, small = self._get(self.metrics[:1], [self.group])
+        _, large = self._get(self.metrics, [self.group] + self.subsidiaries + [self.branch])
+        self.assertEqual(small, large)
+
+    def test_invalid_aggregate(self):
+        response = self.client.get(self.url, {
+            'assignment_id': self.assignment.id, 'metric_ids': self.metrics[0].id,
+            'layer_ids': self.group.id, 'aggregate': 'median'
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class ConsolidationTest(TestCase):
+    """Tests for the materialised shareholding-weighted consolidation"""
+
+    def setUp(self):
+        layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **layer_fields)
+        self.subsidiary = SubsidiaryLayer.objects.create(
+            company_name='Sub', layer_type='SUBSIDIARY', group_layer=self.group,
+            shareholding_ratio=60, **layer_fields
+        )
+        self.branch = BranchLayer.objects.create(
+            company_name='Branch', layer_type='BRANCH', subsidiary_layer=self.subsidiary,
+            shareholding_ratio=50, **layer_fields
+        )
+        self.user = CustomUser.objects.create_user(
+            email='manager@test.com', password='TestPass123!', is_active=True, role=RoleChoices.MANAGEMENT
+        )
+        AppUser.objects.create(user=self.user, layer=self.group, name='Manager')
+
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        template = Template.objects.create(name='Annual')
+        self.assignment = TemplateAssignment.objects.create(
+            template=template, layer=self.group,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+        self.metric = ESGMetric.objects.create(form=form, name='Electricity', requires_time_reporting=True)
+
+    def _submit(self, layer, values):
+        return ESGMetricSubmission.objects.create(
+            assignment=self.assignment, metric=self.metric, layer=layer, data=self._data(values)
+        )
+
+    def _data(self, values):
+        return {'periods': {period: {'value': value, 'unit': 'kWh'} for period, value in values.items()}}
+
+    def _values(self, layer, field='total_value'):
+        return dict(ConsolidatedMetricValue.objects.filter(
+            layer=layer, metric=self.metric, reporting_year=2024
+        ).values_list('period', field))
+
+    def _populate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch_submission = self._submit(self.branch, {'01/2024': 100, '02/2024': 100})
+            self._submit(self.subsidiary, {'01/2024': 10})
+            self._submit(self.group, {'01/2024': 1})
+
+    def test_consolidates_up_the_hierarchy(self):
+        self._populate()
+
+        self.assertEqual(self._values(self.group), {'01/2024': 111, '02/2024': 100})
+        self.assertEqual(self._values(self.group, 'equity_value'), {'01/2024': 37, '02/2024': 30})
+        self.assertEqual(self._values(self.subsidiary, 'own_value'), {'01/2024': 10, '02/2024': 0})
+        self.assertEqual(self._values(self.group, 'submission_count'), {'01/2024': 3, '02/2024': 1})
+
+    def test_updates_and_deletes_are_incremental(self):
+        self._populate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch_submission.data = self._data({'01/2024': 200})
+            self.branch_submission.save()
+        self.assertEqual(self._values(self.group), {'01/2024': 211})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch_submission.delete()
+        self.assertEqual(self._values(self.group), {'01/2024': 11})
+        self.assertEqual(self._values(self.branch), {})
+
+    def test_refresh_runs_on_commit_and_updates_rows_in_place(self):
+        self._populate()
+        row = ConsolidatedMetricValue.objects.get(layer=self.group, metric=self.metric, period='01/2024')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.branch_submission.data = self._data({'01/2024': 200, '02/2024': 100})
+            self.branch_submission.save()
+        self.assertEqual(self._values(self.group)['01/2024'], 111)
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self._values(self.group), {'01/2024': 211, '02/2024': 100})
+        self.assertEqual(
+            ConsolidatedMetricValue.objects.get(layer=self.group, metric=self.metric, period='01/2024').id, row.id
+        )
+
+    def test_moving_submission_refreshes_old_layer(self):
+        self._populate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch_submission.layer = self.subsidiary
+            self.branch_submission.save()
+
+        self.assertEqual(self._values(self.branch), {})
+        self.assertEqual(self._values(self.subsidiary, 'own_value'), {'01/2024': 110, '02/2024': 100})
+        self.assertEqual(self._values(self.group, 'equity_value'), {'01/2024': 67, '02/2024': 60})
+
+    def test_shareholding_change_reweights_parents(self):
+        self._populate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.branch.shareholding_ratio = 100
+            self.branch.save()
+
+        self.assertEqual(self._values(self.group, 'equity_value'), {'01/2024': 67, '02/2024': 60})
+
+    def test_batch_submit_refreshes_consolidation(self):
+        self._populate()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(reverse('metric-submission-batch-submit'), {
+            'assignment_id': self.assignment.id,
+            'submissions': [{'metric_id': self.metric.id, 'data': self._data({'01/2024': 5, '03/2024': 2})}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._values(self.group), {'01/2024': 115, '02/2024': 100, '03/2024': 2})
+
+    def test_rebuild_command_matches_signals(self):
+        self._populate()
+        expected = set(ConsolidatedMetricValue.objects.values_list(
+            'layer_id', 'period', 'total_value', 'equity_value', 'submission_count'
+        ))
+        ConsolidatedMetricValue.objects.all().delete()
+
+        call_command('rebuild_consolidation', stdout=StringIO())
+
+        self.assertEqual(set(ConsolidatedMetricValue.objects.values_list(
+            'layer_id', 'period', 'total_value', 'equity_value', 'submission_count'
+        )), expected)
+
+    def test_endpoint_reads_materialised_values(self):
+        self._populate()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with self.assertNumQueries(3):
+            response = client.get(reverse('layer-consolidated', args=[self.group.id]), {
+                'weighting': 'equity', 'year': 2024
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['period'], row['value'], row['unit']) for row in response.data['values']],
+            [('01/2024', 37, 'kWh'), ('02/2024', 30, 'kWh')]
+        )
+
+
+class ListingQueryCountTest(TestCase):
+    """Submission and evidence listings run a fixed number of queries however many rows they return"""
+
+    def setUp(self):
+        self.layer = GroupLayer.objects.create(
+            company_name='Group', company_industry='Utilities', company_location='Hong Kong', layer_type='GROUP'
+        )
+        self.user = CustomUser.objects.create_user(
+            email='manager@test.com', password='TestPass123!', is_active=True, role=RoleChoices.MANAGEMENT
+        )
+        AppUser.objects.create(user=self.user, layer=self.layer, name='Manager')
+        self.verifier = CustomUser.objects.create_user(email='verifier@test.com', password='TestPass123!')
+
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        self.metric = ESGMetric.objects.create(form=form, name='Electricity', primary_path='value')
+        self.assignment = TemplateAssignment.objects.create(
+            template=Template.objects.create(name='Annual'), layer=self.layer,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _add_rows(self, count):
+        """Add submissions, each verified and carrying one evidence file"""
+        submissions = ESGMetricSubmission.objects.bulk_create([
+            ESGMetricSubmission(
+                assignment=self.assignment, metric=self.metric, layer=self.layer, data={'value': index},
+                submitted_by=self.user, verified_by=self.verifier, submission_identifier=str(index)
+            )
+            for index in range(count)
+        ])
+        ESGMetricEvidence.objects.bulk_create([
+            ESGMetricEvidence(
+                submission=submission, layer=self.layer, file='esg_evidence/bill.pdf', filename='bill.pdf',
+                file_type='application/pdf', uploaded_by=self.user, edited_by=self.verifier
+            )
+            for submission in submissions
+        ])
+        return submissions
+
+    def _assert_constant_queries(self, expected, get_response):
+        total = 0
+        for rows in (1, 10, 500):
+            submissions = self._add_rows(rows - total)
+            total = rows
+            with self.subTest(rows=rows):
+                with CaptureQueriesContext(connection) as queries:
+                    response = get_response(submissions)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(queries), expected)
+
+    def test_submission_list(self):
+        def get_list(submissions):
+            response = self.client.get(reverse('metric-submission-list'))
+            self.assertEqual(response.data['results'][0]['evidence'][0]['uploaded_by_name'], 'manager@test.com')
+            self.assertEqual(response.data['results'][0]['verified_by_name'], 'verifier@test.com')
+            return response
+
+        # layer memberships, submissions, evidence
+        self._assert_constant_queries(3, get_list)
+
+    def test_evidence_list(self):
+        def get_list(submissions):
+            response = self.client.get(reverse('metric-evidence-list'))
+            self.assertEqual(response.data['results'][0]['edited_by_name'], 'verifier@test.com')
+            self.assertEqual(response.data['results'][0]['layer_name'], 'Group')
+            return response
+
+        # layer memberships, evidence
+        self._assert_constant_queries(2, get_list)
+
+    def test_batch_evidence(self):
+        def get_batch(submissions):
+            ids = ','.join(str(submission.id) for submission in submissions[:100])
+            response = self.client.get(reverse('metric-evidence-batch-evidence'), {'submission_ids': ids})
+            self.assertEqual(len(response.data), min(len(submissions), 100))
+            self.assertEqual(len(response.data[str(submissions[0].id)]['evidence']), 1)
+            return response
+
+        # layer memberships, submissions, evidence
+        self._assert_constant_queries(3, get_batch)
+
+
+class KeysetPaginationTest(TestCase):
+    """Tests for cursor pagination of list endpoints"""
+
+    def setUp(self):
+        self.layer = GroupLayer.objects.create(
+            company_name='Group', company_industry='Utilities', company_location='Hong Kong', layer_type='GROUP'
+        )
+        self.user = CustomUser.objects.create_user(
+            email='manager@test.com', password='TestPass123!', is_active=True, role=RoleChoices.MANAGEMENT
+        )
+        AppUser.objects.create(user=self.user, layer=self.layer, name='Manager')
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        metric = ESGMetric.objects.create(form=form, name='Electricity')
+        self.assignment = TemplateAssignment.objects.create(
+            template=Template.objects.create(name='Annual'), layer=self.layer,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+        submissions = ESGMetricSubmission.objects.bulk_create([
+            ESGMetricSubmission(assignment=self.assignment, metric=metric, data={'value': index})
+            for index in range(25)
+        ])
+        # Ties on submitted_at are broken by id
+        ESGMetricSubmission.objects.filter(id__in=[s.id for s in submissions[:12]]).update(
+            submitted_at=submissions[0].submitted_at
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _walk(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                return ids
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(response.data['next'])
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = list(ESGMetricSubmission.objects.order_by('-submitted_at', '-id').values_list('id', flat=True))
+
+        self.assertEqual(self._walk(reverse('metric-submission-list'), {'page_size': 10}), expected)
+        self.assertEqual(self._walk(reverse('metric-submission-by-assignment'), {
+            'assignment_id': self.assignment.id, 'page_size': 7, 'sort_direction': 'asc'
+        }), expected[::-1])
+
+    def test_count_is_optional(self):
+        response = self.client.get(reverse('metric-submission-list'), {'page_size': 10})
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get(reverse('metric-submission-list'), {'page_size': 10, 'include_count': 'true'})
+        self.assertEqual(response.data['count'], 25)
+        self.assertNotIn('include_count', response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('metric-submission-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class PrimaryValuesTest(TestCase):
+    """Tests for the extracted primary value columns of submissions"""
+
+    def setUp(self):
+        self.layer = GroupLayer.objects.create(
+            company_name='Group', company_industry='Utilities', company_location='Hong Kong', layer_type='GROUP'
+        )
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        self.assignment = TemplateAssignment.objects.create(
+            template=Template.objects.create(name='Annual'), layer=self.layer,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+        self.single = ESGMetric.objects.create(form=form, name='Headcount', primary_path='staff.value')
+        self.periodic = ESGMetric.objects.create(
+            form=form, name='Electricity', requires_time_reporting=True,
+            schema_registry=MetricSchemaRegistry.objects.create(name='electricity_prc', schema={})
+        )
+
+    def _submit(self, metric, data):
+        return ESGMetricSubmission.objects.create(assignment=self.assignment, metric=metric, data=data)
+
+    def test_values_extracted_on_save(self):
+        single = self._submit(self.single, {'staff': {'value': '42', 'unit': 'people'}})
+        periodic = self._submit(self.periodic, {
+            'periods': [{'month': 'Jan-2024', 'value': 100, 'unit': 'kWh'},
+                        {'month': 'Feb-2024', 'value': 50, 'unit': 'kWh'}],
+            'total_consumption': {'value': 150, 'unit': 'kWh'}
+        })
+
+        self.assertEqual((single.primary_value, single.primary_unit, single.total_value), (42, 'people', 42))
+        self.assertEqual((periodic.primary_value, periodic.total_value), (None, 150))
+
+        periodic.data['periods'].append({'month': 'Mar-2024', 'value': 25, 'unit': 'kWh'})
+        del periodic.data['total_consumption']
+        periodic.save()
+        self.assertEqual(periodic.total_value, 175)
+
+        self.assertEqual(
+            ESGMetricSubmission.objects.filter(assignment=self.assignment).aggregate(Sum('total_value')),
+            {'total_value__sum': 217}
+        )
+
+    def test_serializer_uses_extracted_unit(self):
+        submission = self._submit(self.single, {'staff': {'value': 3, 'unit': 'people'}})
+        submission = ESGMetricSubmission.objects.select_related('metric').get(pk=submission.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(ESGMetricSubmissionSerializer().get_metric_unit(submission), 'people')
+
+        # Rows saved before the columns existed still walk the JSON
+        ESGMetricSubmission.objects.filter(pk=submission.pk).update(primary_unit=None)
+        submission.refresh_from_db()
+        self.assertEqual(ESGMetricSubmissionSerializer().get_metric_unit(submission), 'people')
+
+    def test_backfill_command(self):
+        submissions = [self._submit(self.single, {'staff': {'value': i, 'unit': 'people'}}) for i in range(3)]
+        ESGMetricSubmission.objects.update(primary_value=None, primary_unit=None, total_value=None)
+
+        out = StringIO()
+        call_command('backfill_primary_values', '--missing-only', stdout=out)
+
+        self.assertIn('Updated 3 of 3 submissions', out.getvalue())
+        for i, submission in enumerate(submissions):
+            submission.refresh_from_db()
+            self.assertEqual((submission.primary_value, submission.primary_unit), (i, 'people'))
+
+        call_command('backfill_primary_values', stdout=out)
+        self.assertIn('Updated 0 of 3 submissions', out.getvalue())
+
+
+class MetricFactTest(TestCase):
+    """Tests for the flattened metric fact table"""
+
+    def setUp(self):
+        self.layer = GroupLayer.objects.create(
+            company_name='Group', company_industry='Utilities', company_location='Hong Kong', layer_type='GROUP'
+        )
+        self.user = CustomUser.objects.create_user(
+            email='operator@test.com', password='TestPass123!', is_active=True
+        )
+        AppUser.objects.create(user=self.user, layer=self.layer, name='Operator')
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        self.assignment = TemplateAssignment.objects.create(
+            template=Template.objects.create(name='Annual'), layer=self.layer,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+        self.metric = ESGMetric.objects.create(form=form, name='Electricity', requires_time_reporting=True)
+
+    def _submit(self, data):
+        return ESGMetricSubmission.objects.create(assignment=self.assignment, metric=self.metric, data=data)
+
+    def _facts(self, submission):
+        return list(submission.facts.order_by('period_start', 'region').values_list(
+            'period_start', 'period_end', 'region', 'value', 'unit'
+        ))
+
+    def test_period_shapes_are_flattened(self):
+        keyed = self._submit({'periods': {'02/2024': {'value': 5, 'unit': 'kWh'}}})
+        listed = self._submit({'periods': [
+            {'month': 'Jan-2024', 'value': 10, 'unit': 'kWh'},
+            {'month': 'Feb-2024', 'value': None, 'unit': 'kWh'},
+        ]})
+        regional = self._submit({'periods': {'Q2-2024': {
+            'HK': {'value': 1, 'unit': 'm3'}, 'PRC': {'value': '2', 'unit': 'm3'}
+        }}})
+        single = self._submit({'value': 7, 'unit': 'tonnes'})
+
+        self.assertEqual(self._facts(keyed), [(date(2024, 2, 1), date(2024, 2, 29), '', 5, 'kWh')])
+        self.assertEqual(self._facts(listed), [(date(2024, 1, 1), date(2024, 1, 31), '', 10, 'kWh')])
+        self.assertEqual(self._facts(regional), [
+            (date(2024, 4, 1), date(2024, 6, 30), 'HK', 1, 'm3'),
+            (date(2024, 4, 1), date(2024, 6, 30), 'PRC', 2, 'm3'),
+        ])
+        self.assertEqual(self._facts(single), [(date(2024, 1, 1), date(2024, 12, 31), '', 7, 'tonnes')])
+
+        # Period-range scans are plain SQL
+        self.assertEqual(
+            ESGMetricFact.objects.filter(
+                metric=self.metric, period_start__gte=date(2024, 1, 1), period_end__lt=date(2024, 4, 1)
+            ).aggregate(Sum('value')),
+            {'value__sum': 15}
+        )
+
+    def test_facts_follow_updates_and_deletes(self):
+        submission = self._submit({'periods': {'01/2024': {'value': 1}, '02/2024': {'value': 2}}})
+
+        submission.data = {'periods': {'03/2024': {'value': 3}}}
+        submission.save()
+        self.assertEqual([fact[0] for fact in self._facts(submission)], [date(2024, 3, 1)])
+
+        submission.delete()
+        self.assertFalse(ESGMetricFact.objects.exists())
+
+    def test_batch_submit_writes_facts(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(reverse('metric-submission-batch-submit'), {
+            'assignment_id': self.assignment.id,
+            'submissions': [{'metric_id': self.metric.id, 'data': {'periods': {'05/2024': {'value': 9}}}}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        fact = ESGMetricFact.objects.get()
+        self.assertEqual((fact.layer_id, fact.period_start, fact.value), (self.layer.id, date(2024, 5, 1), 9))
+
+    def test_rebuild_command(self):
+        self._submit({'periods': {'01/2024': {'value': 1}}})
+        self._submit({'value': 4})
+        ESGMetricFact.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_metric_facts', stdout=out)
+
+        self.assertIn('2 rows from 2 submissions', out.getvalue())
+        self.assertEqual(ESGMetricFact.objects.aggregate(Sum('value')), {'value__sum': 5})
+
+
+class CalculationPlanTest(TestCase):
+    """Compiled calculation plans must match the interpreted calculations"""
+
+    METADATA = {
+        'requires_calculation': True,
+        'calculated_fields': [
+            {'path': 'total_consumption.value', 'calculation': 'sum(periods[*].value)',
+             'dependency_paths': ['periods[*].value']},
+            {'path': 'average', 'calculation': 'avg(periods.*.value)'},
+            {'path': 'peak', 'calculation': 'max(periods[*].value)'},
+            # Reads the output of the first calculation, so it runs in a later stage
+            {'path': 'copied_total', 'calculation': 'sum(total_consumption.value)'},
+            {'path': 'broken', 'calculation': 'not an expression'},
+            {'path': 'unknown', 'calculation': 'median(periods[*].value)'},
+            {'path': 'skipped', 'calculation': 'count(readings[*])', 'dependency_paths': ['readings[*]']},
+        ]
+    }
+
+    SAMPLES = [
+        {'periods': [{'month': 'Jan-2025', 'value': 10, 'unit': 'kWh'},
+                     {'month': 'Feb-2025', 'value': 5.5, 'unit': 'kWh'},
+                     {'month': 'Mar-2025', 'value': None, 'unit': 'kWh'}]},
+        {'periods': {'01/2025': {'value': 3, 'unit': 'm3'}, '02/2025': {'value': 4}},
+         'total_consumption': {'value': 0, 'unit': 'm3'}},
+        {'periods': [], 'readings': [None]},
+        {'periods': {'HK': {'CLP': {'value': 1}}}},
+    ]
+
+    def test_results_identical_to_interpreted(self):
+        plan = CalculationPlan('test_schema', self.METADATA)
+        for sample in self.SAMPLES:
+            expected = apply_schema_calculations_interpreted(
+                copy.deepcopy(sample), 'test_schema', metadata=self.METADATA
+            )
+            self.assertEqual(plan.apply(copy.deepcopy(sample)), expected)
+
+    def test_plan_is_cached_and_invalidated_on_registry_save(self):
+        _PLAN_CACHE.clear()
+        plan = get_calculation_plan('electricity_prc')
+        self.assertIs(get_calculation_plan('electricity_prc'), plan)
+
+        MetricSchemaRegistry.objects.create(name='electricity_prc', schema={})
+
+        self.assertIsNot(get_calculation_plan('electricity_prc'), plan)
+
+
+class SchemaValidatorCacheTest(TestCase):
+    """Cached schema validators must report what jsonschema.validate reports"""
+
+    SCHEMA = {
+        'type': 'object',
+        'properties': {
+            'periods': {'type': 'array', 'items': {'type': 'object', 'required': ['value']}},
+            'value': {'type': 'number'},
+        },
+    }
+
+    def setUp(self):
+        self.registry = MetricSchemaRegistry.objects.create(name='test_validation', schema=self.SCHEMA)
+
+    def _error(self, validate):
+        try:
+            validate()
+        except (jsonschema.ValidationError, jsonschema.SchemaError) as e:
+            return type(e), str(e)
+        return None
+
+    def test_errors_match_jsonschema_validate(self):
+        for data in ({'value': 1}, {'value': 'high'}, {'periods': [{'unit': 'kWh'}, 3]}):
+            with self.subTest(data=data):
+                self.assertEqual(
+                    self._error(lambda: validate_against_registry(data, self.registry)),
+                    self._error(lambda: jsonschema.validate(instance=data, schema=self.SCHEMA))
+                )
+
+        # Schemas that fail the metaschema keep raising SchemaError
+        self.registry.schema = {'type': 'electricity_hk_clp'}
+        self.registry.save()
+        self.assertEqual(
+            self._error(lambda: validate_against_registry({}, self.registry)),
+            self._error(lambda: jsonschema.validate(instance={}, schema=self.registry.schema))
+        )
+
+    def test_validator_is_cached_and_evicted_on_save(self):
+        validator = get_schema_validator(self.registry)
+        self.assertIs(get_schema_validator(self.registry), validator)
+
+        self.registry.schema = {'type': 'object', 'required': ['value']}
+        self.registry.save()
+
+        self.assertIsNot(get_schema_validator(self.registry), validator)
+        with self.assertRaises(jsonschema.ValidationError):
+            validate_against_registry({}, self.registry)
+
+    def test_serializer_reports_schema_errors(self):
+        layer = GroupLayer.objects.create(
+            company_name='Group', company_industry='Utilities', company_location='Hong Kong', layer_type='GROUP'
+        )
+        form = ESGForm.objects.create(
+            category=ESGFormCategory.objects.create(name='Environmental', code='environmental'),
+            code='HKEX-A2', name='Resources'
+        )
+        metric = ESGMetric.objects.create(form=form, name='Electricity', schema_registry=self.registry)
+        assignment = TemplateAssignment.objects.create(
+            template=Template.objects.create(name='Annual'), layer=layer,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+
+        serializer = ESGMetricSubmissionSerializer(data={
+            'assignment': assignment.id, 'metric': metric.id, 'data': {'value': 'high'}
+        })
+
+        self.assertFalse(serializer.is_valid())
+        _, message = self._error(lambda: jsonschema.validate(instance={'value': 'high'}, schema=self.SCHEMA))
+        self.assertEqual(serializer.errors['non_field_errors'][0], f"JSON data validation error: {message}")
+
+
+class CompletionMatrixTest(TestCase):
+    """Tests for the assignment-wide completion matrix"""
+
+    def setUp(self):
+        layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **layer_fields)
+        self.subsidiary = SubsidiaryLayer.objects.create(
+            company_name='Sub', layer_type='SUBSIDIARY', group_layer=self.group,
+            shareholding_ratio=100, **layer_fields
+        )
+        self.other_group = GroupLayer.objects.create(company_name='Other', layer_type='GROUP', **layer_fields)
+        self.admin = CustomUser.objects.create_user(
+            email='admin@test.com', password='TestPass123!', is_active=True, is_baker_tilly_admin=True
+        )
+
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        self.form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        self.template = Template.objects.create(name='Annual')
+        TemplateFormSelection.objects.create(template=self.template, form=self.form, regions=['HK'])
+        self.water = ESGMetric.objects.create(form=self.form, name='Water', location='ALL', order=1)
+        self.electricity = ESGMetric.objects.create(
+            form=self.form, name='Electricity', location='HK', order=2,
+            requires_time_reporting=True, reporting_frequency='quarterly'
+        )
+        # Neither counts towards completion
+        ESGMetric.objects.create(form=self.form, name='PRC water', location='PRC', order=3)
+        ESGMetric.objects.create(form=self.form, name='Optional', is_required=False, order=4)
+
+        self.group_assignment = self._assign(self.group)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('template-completion-matrix')
+
+    def _assign(self, layer, status='PENDING', reporting_year=2024):
+        return TemplateAssignment.objects.create(
+            template=self.template, layer=layer, status=status, reporting_year=reporting_year,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+
+    def _submit(self, assignment, metric, count=1):
+        for index in range(count):
+            ESGMetricSubmission.objects.create(
+                assignment=assignment, metric=metric, layer=assignment.layer,
+                data={'value': index}, submission_identifier=str(index)
+            )
+
+    def test_matrix_counts_region_filtered_required_metrics(self):
+        self._submit(self.group_assignment, self.water)
+        self._submit(self.group_assignment, self.electricity, count=2)
+
+        [row] = build_completion_matrix(
+            TemplateAssignment.objects.filter(pk=self.group_assignment.pk).select_related('template', 'layer')
+        )
+
+        [form] = row['forms']
+        self.assertEqual(
+            [(m['name'], m['submitted_count'], m['required_count'], m['is_complete']) for m in form['metrics']],
+            [('Water', 1, 1, True), ('Electricity', 2, 4, False)]
+        )
+        self.assertEqual(form['completion_percentage'], 60.0)
+        self.assertFalse(form['is_actually_complete'])
+
+        self._submit(self.group_assignment, self.electricity, count=4)
+        [row] = build_completion_matrix([self.group_assignment])
+        self.assertTrue(row['forms'][0]['is_actually_complete'])
+
+    def test_matches_check_completion(self):
+        self._submit(self.group_assignment, self.electricity, count=3)
+
+        expected = self.client.get(
+            reverse('esg-form-check-completion', args=[self.form.id]),
+            {'assignment_id': self.group_assignment.id}
+        ).data
+        [form] = build_completion_matrix([self.group_assignment])[0]['forms']
+
+        self.assertEqual(form['completion_percentage'], expected['completion_percentage'])
+        self.assertEqual(form['total_required_metrics'], expected['total_required_metrics'])
+        self.assertEqual(form['total_submitted_metrics'], expected['total_submitted_metrics'])
+        self.assertEqual(form['is_actually_complete'], expected['is_actually_complete'])
+
+    def test_endpoint_filters_and_constant_queries(self):
+        self._submit(self.group_assignment, self.water)
+        self._assign(self.subsidiary, status='SUBMITTED')
+        self._assign(self.other_group)
+        self._assign(self.group, reporting_year=2023)
+
+        response = self.client.get(self.url, {'group_id': self.group.id, 'reporting_year': 2024})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {(row['layer_name'], row['status']) for row in response.data['results']},
+            {('Group', 'PENDING'), ('Sub', 'SUBMITTED')}
+        )
+
+        response = self.client.get(self.url, {'status': 'SUBMITTED'})
+        self.assertEqual([row['layer_name'] for row in response.data['results']], ['Sub'])
+
+        response = self.client.get(self.url, {'status': 'DONE'})
+        self.assertEqual(response.status_code, 400)
+
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url, {'group_id': self.other_group.id})
+        for _ in range(10):
+            self._submit(self._assign(self.subsidiary), self.water)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 14)
+        self.assertEqual(len(many), len(few))
+
+
+class EvidenceAutoAttachTest(TestCase):
+    """Tests for matching standalone evidence to submissions"""
+
+    def setUp(self):
+        layer_fields = {'company_industry': 'Utilities', 'company_location': 'Hong Kong'}
+        self.group = GroupLayer.objects.create(company_name='Group', layer_type='GROUP', **layer_fields)
+        self.subsidiary = SubsidiaryLayer.objects.create(
+            company_name='Sub', layer_type='SUBSIDIARY', group_layer=self.group,
+            shareholding_ratio=100, **layer_fields
+        )
+        self.user = CustomUser.objects.create_user(email='operator@test.com', password='TestPass123!')
+        self.other_user = CustomUser.objects.create_user(email='other@test.com', password='TestPass123!')
+
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        self.electricity = ESGMetric.objects.create(
+            form=form, name='Electricity', requires_time_reporting=True, reporting_frequency='monthly'
+        )
+        self.water = ESGMetric.objects.create(form=form, name='Water')
+        self.assignment = TemplateAssignment.objects.create(
+            template=Template.objects.create(name='Annual'), layer=self.group,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+
+        self.january = self._submit(self.electricity, self.group, {'periods': {'01/2024': {'value': 1}}})
+        self.meter = self._submit(
+            self.electricity, self.group, {'periods': {'02/2024': {'value': 2}}}, identifier='meter-2'
+        )
+        self.march = self._submit(self.electricity, self.subsidiary, {'periods': {'03/2024': {'value': 3}}})
+        self.group_water = self._submit(self.water, self.group, {'value': 1})
+        self.subsidiary_water = self._submit(self.water, self.subsidiary, {'value': 2})
+
+    def _submit(self, metric, layer, data, identifier=''):
+        return ESGMetricSubmission.objects.create(
+            assignment=self.assignment, metric=metric, layer=layer, data=data, submission_identifier=identifier
+        )
+
+    def _evidence(self, metric, layer=None, user=None, **fields):
+        return ESGMetricEvidence.objects.create(
+            file='esg_evidence/bill.pdf', filename='bill.pdf', file_type='application/pdf',
+            uploaded_by=user or self.user, intended_metric=metric, layer=layer, **fields
+        )
+
+    def _submissions(self):
+        return list(ESGMetricSubmission.objects.filter(assignment=self.assignment).only(
+            'id', 'metric', 'layer', 'submission_identifier'
+        ).order_by('id'))
+
+    def test_matching_rules(self):
+        by_identifier = self._evidence(self.electricity, self.group, submission_identifier='meter-2')
+        by_path = self._evidence(self.electricity, self.group, reference_path='periods.01/2024')
+        unmatched_path = self._evidence(self.electricity, self.group, reference_path='periods.12/2024')
+        other_layer = self._evidence(self.electricity, self.subsidiary, reference_path='periods.03/2024')
+        multi_period = self._evidence(
+            self.electricity, self.group, reference_path='periods', supports_multiple_periods=True
+        )
+        without_layer = self._evidence(self.water)
+        # Matched by the group's submissions before the subsidiary's are considered
+        subsidiary_water = self._evidence(self.water, self.subsidiary)
+        other_user = self._evidence(self.water, self.group, user=self.other_user)
+
+        self.assertEqual(attach_evidence_to_submissions(self._submissions(), self.user), 6)
+
+        attached = dict(ESGMetricEvidence.objects.values_list('id', 'submission_id'))
+        self.assertEqual(attached[by_identifier.id], self.meter.id)
+        self.assertEqual(attached[by_path.id], self.january.id)
+        self.assertIsNone(attached[unmatched_path.id])
+        self.assertEqual(attached[other_layer.id], self.march.id)
+        self.assertEqual(attached[multi_period.id], self.meter.id)
+        self.assertEqual(attached[without_layer.id], self.group_water.id)
+        self.assertEqual(attached[subsidiary_water.id], self.group_water.id)
+        self.assertIsNone(attached[other_user.id])
+
+        # Attached evidence is no longer standalone
+        self.assertEqual(attach_evidence_to_submissions(self._submissions(), self.user), 0)
+
+    def test_query_count_is_constant(self):
+        self._evidence(self.electricity, self.group, reference_path='periods.01/2024')
+        submissions = self._submissions()
+        with CaptureQueriesContext(connection) as few:
+            attach_evidence_to_submissions(submissions, self.user)
+
+        for _ in range(20):
+            self._evidence(self.electricity, self.group, reference_path='periods.01/2024')
+            self._evidence(self.water, self.subsidiary)
+        submissions = self._submissions()
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(attach_evidence_to_submissions(submissions, self.user), 40)
+
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(ESGMetricEvidence.objects.filter(submission=self.january).count(), 21)
+
+
+class TemplateBundleTest(TestCase):
+    """Tests for the cached template bundle behind user-templates and preview"""
+
+    def setUp(self):
+        cache.clear()
+        layer = GroupLayer.objects.create(
+            company_name='Group', company_industry='Utilities', company_location='Hong Kong', layer_type='GROUP'
+        )
+        self.user = CustomUser.objects.create_user(
+            email='operator@test.com', password='TestPass123!', is_active=True
+        )
+        AppUser.objects.create(user=self.user, layer=layer, name='Operator')
+        self.admin = CustomUser.objects.create_user(
+            email='admin@test.com', password='TestPass123!', is_active=True, is_baker_tilly_admin=True
+        )
+
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        self.template = Template.objects.create(name='Annual')
+        self.schema = MetricSchemaRegistry.objects.create(name='electricity', schema={'type': 'object'})
+        for order, code in ((2, 'HKEX-A1'), (1, 'HKEX-A2')):
+            form = ESGForm.objects.create(category=category, code=code, name=code)
+            TemplateFormSelection.objects.create(template=self.template, form=form, regions=['HK'], order=order)
+            ESGMetric.objects.create(form=form, name=f'{code} PRC', location='PRC', order=1)
+            ESGMetric.objects.create(form=form, name=f'{code} HK', location='HK', order=2,
+                                     schema_registry=self.schema)
+            self.metric = ESGMetric.objects.create(form=form, name=f'{code} all', order=0)
+        self.assignment = TemplateAssignment.objects.create(
+            template=self.template, layer=layer,
+            reporting_period_start=date(2024, 1, 1), reporting_period_end=date(2024, 12, 31)
+        )
+        self.url = reverse('user-template-detail', args=[self.assignment.id])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_bundle_lists_forms_in_selection_order(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([form['form_code'] for form in response.data['forms']], ['HKEX-A2', 'HKEX-A1'])
+        metrics = response.data['forms'][0]['metrics']
+        self.assertEqual([metric['name'] for metric in metrics], ['HKEX-A2 all', 'HKEX-A2 HK'])
+        self.assertEqual(metrics[1]['schema_registry']['schema'], {'type': 'object'})
+        self.assertEqual(response.data['status'], 'PENDING')
+
+    def test_repeated_opens_are_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+
+        # The structure comes from the cache and the body is not sent again;
+        # only the freshness aggregate reads the template's selections
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(
+            sum('templateformselection' in query['sql'] for query in queries.captured_queries), 1
+        )
+
+        # Assignment fields are part of the ETag
+        self.assignment.status = 'IN_PROGRESS'
+        self.assignment.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_changes_invalidate_the_bundle(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.metric.name = 'Renamed'
+        self.metric.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Renamed', [metric['name'] for metric in response.data['forms'][0]['metrics']])
+        etag = response['ETag']
+
+        self.schema.schema = {'type': 'object', 'required': ['periods']}
+        self.schema.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_changes_without_signals_invalidate_the_bundle(self):
+        etag = self.client.get(self.url)['ETag']
+
+        # As written by another worker: no signal reaches this process
+        ESGMetric.objects.filter(pk=self.metric.pk).update(name='Renamed', updated_at=timezone.now())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Renamed', [metric['name'] for metric in response.data['forms'][0]['metrics']])
+        etag = response['ETag']
+
+        ESGMetric.objects.filter(pk=self.metric.pk).delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Renamed', [metric['name'] for metric in response.data['forms'][0]['metrics']])
+
+    def test_preview_serves_bundle_with_etag(self):
+        self.client.force_authenticate(user=self.admin)
+        url = reverse('template-preview', args=[self.template.id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['template_name'], 'Annual')
+        self.assertEqual(len(response.data['forms']), 2)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class RecalculateSubmissionsCommandTest(TestCase):
+    """Tests for the recalculate_submissions management command"""
+
+    SCHEMA = 'test_recalculation'
+
+    @staticmethod
+    def _sum_periods(data):
+        data['total'] = sum(p['value'] for p in data.get('periods', []))
+        return data
+
+    def setUp(self):
+        register_calculation_handler(self.SCHEMA, self._sum_periods)
+        self.addCleanup(CALCULATION_HANDLERS.pop, self.SCHEMA, None)
+
+        layer = GroupLayer.objects.create(
+            company_name='Test Group', company_industry='Utilities',
+            company_location='Hong Kong', layer_type='GROUP'
+        )
+        registry = MetricSchemaRegistry.objects.create(name=self.SCHEMA, schema={})
+        category = ESGFormCategory.objects.create(name='Environmental', code='environmental')
+        form = ESGForm.objects.create(category=category, code='HKEX-A2', name='Resources')
+        metric = ESGMetric.objects.create(form=form, name='Water', schema_registry=registry)
+        other_metric = ESGMetric.objects.create(form=form, name='Other')
+        assignment = TemplateAssignment.objects.create(
+            template=Template.objects.create(name='Annual'),
+            layer=layer,
+            reporting_period_start=date(2024, 1, 1),
+            reporting_period_end=date(2024, 12, 31)
+        )
+        periods = [{'value': 1}, {'value': 2}]
+        self.stale = ESGMetricSubmission.objects.create(
+            assignment=assignment, metric=metric, data={'periods': periods, 'total': 0}
+        )
+        self.current = ESGMetricSubmission.objects.create(
+            assignment=assignment, metric=metric, data={'periods': periods, 'total': 3}
+        )
+        self.unrelated = ESGMetricSubmission.objects.create(
+            assignment=assignment, metric=other_metric, data={'periods': periods, 'total': 0}
+        )
+
+    def test_dry_run_reports_without_saving(self):
+        out = StringIO()
+        call_command('recalculate_submissions', '--dry-run', '--diff', stdout=out)
+
+        self.assertIn('scanned=2 changed=1', out.getvalue())
+        self.assertIn(f'Submission {self.stale.id}', out.getvalue())
+        self.stale.refresh_from_db()
+        self.assertEqual(self.stale.data['total'], 0)
+
+    def test_updates_changed_rows_only(self):
+        ESGMetricFact.objects.all().delete()
+        call_command('recalculate_submissions', '--schema', self.SCHEMA, '--chunk-size', '1', stdout=StringIO())
+
+        self.stale.refresh_from_db()
+        self.unrelated.refresh_from_db()
+        self.assertEqual(self.stale.data['total'], 3)
+        self.assertEqual(self.unrelated.data['total'], 0)
+        # Only the rewritten row's facts are rebuilt
+        self.assertEqual(
+            list(ESGMetricFact.objects.order_by('period_label').values_list('submission_id', 'value')),
+            [(self.stale.id, 1), (self.stale.id, 2)]
+        )
+
+
+class FakeContentUnderstanding:
+    """
+    Local stand-in for the Content Understanding analyze API.
+
+    Each POST to an analyzer pops the next status code from post_statuses
+    (default 202); each result GET pops the next operation status (or HTTP
+    error code) from result_statuses (default Succeeded). max_active records
+    the most analyses that were running at the same time, and uploads the
+    content type and SHA-256 of each POST body (read in chunks).
+    """
+
+    FIELDS = {
+        'MultipleBillingPeriods': {
+            'valueString': json.dumps([{'period': '03/2024', 'consumption': '1234.5'}])
+        },
+    }
+
+    def __init__(self):
+        self.post_statuses = []
+        self.result_statuses = []
+        self.requests = []
+        self.uploads = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=None, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps(body or {}).encode())
+
+            def do_POST(self):
+                remaining = int(self.headers.get('Content-Length', 0))
+                digest = hashlib.sha256()
+                body = b''
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, 64 * 1024))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    digest.update(chunk)
+                    if self.headers.get('Content-Type') == 'application/json':
+                        body += chunk
+                with fake.lock:
+                    fake.requests.append(('POST', self.path))
+                    fake.uploads.append({
+                        'content_type': self.headers.get('Content-Type'),
+                        'sha256': digest.hexdigest(),
+                        'json': json.loads(body) if body else None,
+                    })
+                    status = fake.post_statuses.pop(0) if fake.post_statuses else 202
+                if status == 202:
+                    with fake.lock:
+                        fake.active += 1
+                        fake.max_active = max(fake.max_active, fake.active)
+                    location = f'{fake.endpoint}/results/{len(fake.requests)}'
+                    self._send(202, {'status': 'Running'}, {'Operation-Location': location})
+                else:
+                    self._send(status, {'error': 'throttled'}, {'Retry-After': '0'})
+
+            def do_GET(self):
+                with fake.lock:
+                    fake.requests.append(('GET', self.path))
+                    status = fake.result_statuses.pop(0) if fake.result_statuses else 'Succeeded'
+                    if status in ('Succeeded', 'Failed'):
+                        fake.active -= 1
+                if isinstance(status, int):
+                    self._send(status, {'error': 'throttled'}, {'Retry-After': '0'})
+                    return
+                body = {'status': status}
+                if status == 'Succeeded':
+                    body['result'] = {'contents': [{'fields': FakeContentUnderstanding.FIELDS}]}
+                self._send(200, body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RemoteFileSystemStorage(Storage):
+    """Files kept on disk but, like Azure Blob Storage, without local paths."""
+
+    def __init__(self, location, base_url):
+        self.local = FileSystemStorage(location=location, base_url=base_url)
+
+    def _open(self, name, mode='rb'):
+        return self.local._open(name, mode)
+
+    def _save(self, name, content):
+        return self.local._save(name, content)
+
+    def exists(self, name):
+        return self.local.exists(name)
+
+    def size(self, name):
+        return self.local.size(name)
+
+    def delete(self, name):
+        self.local.delete(name)
+
+    def url(self, name):
+        return self.local.url(name)
+
+
+def remote_storages(location, base_url):
+    return {
+        'default': {
+            'BACKEND': 'data_management.tests.RemoteFileSystemStorage',
+            'OPTIONS': {'location': location, 'base_url': base_url},
+        },
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    }
+
+
+@override_settings(OCR_JOBS={
+    'BACKOFF_SECONDS': 0, 'POLL_INTERVAL_SECONDS': 0, 'MAX_ATTEMPTS': 3, 'CONCURRENCY_PER_ANALYZER': 1
+})
+class OCRJobTest(TestCase):
+    """Tests for queued OCR processing against a fake Content Understanding server"""
+
+    def setUp(self):
+        self.media_root = media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media_root, USE_AZURE_STORAGE=False)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = CustomUser.objects.create_user(
+            email='operator@test.com', password='TestPass123!', is_active=True
+        )
+        self.fake = FakeContentUnderstanding().__enter__()
+        self.addCleanup(self.fake.__exit__)
+
+    def _evidence(self, name='bill.pdf'):
+        return ESGMetricEvidence.objects.create(
+            file=SimpleUploadedFile(name, b'%PDF-1.4 fake bill ' + name.encode()),
+            filename=name, file_type='application/pdf', uploaded_by=self.user
+        )
+
+    def _analyzer(self):
+        return UtilityBillAnalyzer(endpoint=self.fake.endpoint, api_version='2024-12-01-preview',
+                                   subscription_key='test-key')
+
+    def _worker(self):
+        return OCRJobWorker(worker_id='test-worker', analyzer=self._analyzer())
+
+    def _run_until_finished(self, worker, job, max_steps=10):
+        for _ in range(max_steps):
+            worker.run_once()
+            job.refresh_from_db()
+            if job.is_finished:
+                return job
+        self.fail(f'OCR job still {job.status} after {max_steps} steps')
+
+    def test_process_ocr_returns_job_and_status(self):
+        evidence = self._evidence()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(reverse('metric-evidence-process-ocr', args=[evidence.id]))
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['job_id']
+
+        # A second request reuses the queued job
+        response = client.post(reverse('metric-evidence-process-ocr', args=[evidence.id]))
+        self.assertEqual(response.data['job_id'], job_id)
+
+        response = client.get(reverse('ocr-job-detail', args=[job_id]))
+        self.assertEqual(response.data['status'], 'QUEUED')
+
+    def test_worker_polls_until_succeeded(self):
+        self.fake.result_statuses = ['Running', 'Running']
+        evidence = self._evidence()
+        job, _ = enqueue_ocr_job(evidence, user=self.user)
+
+        job = self._run_until_finished(self._worker(), job)
+
+        self.assertEqual(job.status, OCRJob.Status.SUCCEEDED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.result['extracted_value'], 1234.5)
+        evidence.refresh_from_db()
+        self.assertTrue(evidence.is_processed_by_ocr)
+        self.assertEqual(evidence.extracted_value, 1234.5)
+        self.assertEqual([method for method, _ in self.fake.requests], ['POST', 'GET', 'GET', 'GET'])
+
+    def test_throttled_requests_are_retried(self):
+        self.fake.post_statuses = [429, 503]
+        job, _ = enqueue_ocr_job(self._evidence(), user=self.user)
+
+        job = self._run_until_finished(self._worker(), job)
+
+        self.assertEqual(job.status, OCRJob.Status.SUCCEEDED)
+        self.assertEqual(job.attempts, 3)
+
+    def test_fails_after_max_attempts(self):
+        self.fake.result_statuses = ['Failed'] * 3
+        evidence = self._evidence()
+        job, _ = enqueue_ocr_job(evidence, user=self.user)
+
+        job = self._run_until_finished(self._worker(), job)
+
+        self.assertEqual(job.status, OCRJob.Status.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertIn('after 3 attempts', job.last_error)
+        evidence.refresh_from_db()
+        self.assertTrue(evidence.is_processed_by_ocr)
+
+    def test_concurrency_limit_per_analyzer(self):
+        jobs = [enqueue_ocr_job(self._evidence(f'bill-{i}.pdf'))[0] for i in range(3)]
+
+        claimed = self._worker().claim_jobs(limit=10)
+
+        self.assertEqual([job.id for job in claimed], [jobs[0].id])
+        self.assertEqual(OCRJob.objects.filter(status=OCRJob.Status.RUNNING).count(), 1)
+
+    def test_upload_layer_requires_membership_even_for_admins(self):
+        layer = GroupLayer.objects.create(
+            company_name='Client', company_industry='Utilities', company_location='Hong Kong', layer_type='GROUP'
+        )
+        AppUser.objects.create(user=self.user, layer=layer, name='Operator')
+        admin = CustomUser.objects.create_user(
+            email='admin@test.com', password='TestPass123!', is_active=True, is_baker_tilly_admin=True
+        )
+        client = APIClient()
+
+        def upload(user):
+            client.force_authenticate(user=user)
+            return client.post(reverse('metric-evidence-list'), {
+                'file': SimpleUploadedFile('bill.pdf', b'%PDF-1.4 bill', content_type='application/pdf'),
+                'layer_id': layer.id
+            }, format='multipart')
+
+        self.assertEqual(upload(admin).status_code, 400)
+        self.assertEqual(upload(self.user).status_code, 201)
+
+    def test_duplicate_upload_reuses_cached_result(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        cache.clear()
+
+        def upload(name):
+            response = client.post(reverse('metric-evidence-list'), {
+                'file': SimpleUploadedFile(name, b'%PDF-1.4 same bill', content_type='application/pdf')
+            }, format='multipart')
+            self.assertEqual(response.status_code, 201)
+            return ESGMetricEvidence.objects.get(id=response.data['id'])
+
+        first, second = upload('bill.pdf'), upload('bill-copy.pdf')
+        self.assertEqual(first.content_hash, second.content_hash)
+        self.assertEqual(len(first.content_hash), 64)
+
+        job, _ = enqueue_ocr_job(first, user=self.user, analyzer=self._analyzer())
+        self._run_until_finished(self._worker(), job)
+        requests_made = len(self.fake.requests)
+
+        with override_settings(AZURE_CONTENT_UNDERSTANDING={
+            'ENDPOINT': self.fake.endpoint, 'API_VERSION': '2024-12-01-preview', 'KEY': 'test-key'
+        }):
+            response = client.post(reverse('metric-evidence-process-ocr', args=[second.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['extracted_value'], 1234.5)
+        self.assertEqual(len(self.fake.requests), requests_made)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(second.is_processed_by_ocr)
+        self.assertEqual(second.ocr_period, first.ocr_period)
+        stats = get_ocr_cache_stats()
+        self.assertEqual((stats['hits'], stats['entries'], stats['stored_hits']), (1, 1, 1))
+
+    def test_process_evidence_many_bounds_concurrency(self):
+        self.fake.result_statuses = [429, 'Running', 'Running', 503]
+        evidence = [self._evidence(f'bill-{i}.pdf') for i in range(6)]
+
+        outcomes = self._analyzer().process_evidence_many(
+            [e.id for e in evidence] + [999999], max_concurrency=2, min_interval=0, max_interval=0.01
+        )
+
+        self.assertTrue(all(outcomes[e.id][0] for e in evidence))
+        self.assertEqual(outcomes[999999], (False, {'error': 'Evidence not found'}))
+        self.assertEqual(self.fake.max_active, 2)
+        self.assertEqual(
+            set(ESGMetricEvidence.objects.filter(id__in=[e.id for e in evidence])
+                .values_list('extracted_value', flat=True)),
+            {1234.5}
+        )
+
+    def test_duplicate_takes_over_from_unreadable_leader(self):
+        first, second = self._evidence('bill.pdf'), self._evidence('bill-copy.pdf')
+        ESGMetricEvidence.objects.filter(id__in=[first.id, second.id]).update(content_hash='a' * 64)
+
+        class UnreadableFirstAnalyzer(UtilityBillAnalyzer):
+            def evidence_source(self, evidence):
+                if evidence.id == first.id:
+                    raise OSError('File missing from storage')
+                return super().evidence_source(evidence)
+
+        analyzer = UnreadableFirstAnalyzer(endpoint=self.fake.endpoint, api_version='2024-12-01-preview',
+                                           subscription_key='test-key')
+        outcomes = analyzer.process_evidence_many([first.id, second.id], min_interval=0, max_interval=0.01)
+
+        self.assertFalse(outcomes[first.id][0])
+        self.assertIn('File missing from storage', outcomes[first.id][1]['error'])
+        self.assertTrue(outcomes[second.id][0])
+
+    def test_remote_file_is_streamed_to_analyzer(self):
+        contents = os.urandom(8 * 1024 * 1024)
+        with override_settings(STORAGES=remote_storages(self.media_root, '/media/')):
+            evidence = ESGMetricEvidence.objects.create(
+                file=SimpleUploadedFile('large-bill.pdf', contents),
+                filename='large-bill.pdf', file_type='application/pdf', uploaded_by=self.user
+            )
+            job, _ = enqueue_ocr_job(evidence, user=self.user)
+
+            tracemalloc.start()
+            try:
+                self._worker().run_once()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        upload = self.fake.uploads[0]
+        self.assertEqual(upload['content_type'], 'application/octet-stream')
+        self.assertEqual(upload['sha256'], hashlib.sha256(contents).hexdigest())
+        self.assertLess(peak, len(contents) // 4)
+        job.refresh_from_db()
+        self.assertEqual(job.status, OCRJob.Status.RUNNING)
+
+    def test_remote_file_url_is_sent_to_analyzer(self):
+        with override_settings(STORAGES=remote_storages(self.media_root, 'https://blob.example.test/evidence/')):
+            evidence = self._evidence()
+            job, _ = enqueue_ocr_job(evidence, user=self.user)
+            job = self._run_until_finished(self._worker(), job)
+
+        self.assertEqual(job.status, OCRJob.Status.SUCCEEDED)
+        upload = self.fake.uploads[0]
+        self.assertEqual(upload['content_type'], 'application/json')
+        self.assertEqual(upload['json'], {'url': f'https://blob.example.test/evidence/{evidence.file.name}'})
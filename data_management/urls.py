@@ -4,7 +4,7 @@ from .views import (
     ESGFormViewSet, ESGFormCategoryViewSet, TemplateViewSet, 
     ESGMetricSubmissionViewSet, ESGMetricEvidenceViewSet, ESGMetricViewSet, 
     UserTemplateAssignmentView, TemplateAssignmentView,
-    SchemaRegistryViewSet
+    SchemaRegistryViewSet, OCRJobViewSet, ConsolidatedValuesView
 )
 
 # Create a router for ViewSets
@@ -18,6 +18,7 @@ router.register(r'metric-submissions', ESGMetricSubmissionViewSet, basename='met
 router.register(r'metric-evidence', ESGMetricEvidenceViewSet, basename='metric-evidence')
 router.register(r'esg-metrics', ESGMetricViewSet, basename='esg-metric')
 router.register(r'schemas', SchemaRegistryViewSet, basename='schema-registry')
+router.register(r'ocr-jobs', OCRJobViewSet, basename='ocr-job')
 
 # Export the router's URLs
 urlpatterns = router.urls
@@ -27,6 +28,7 @@ urlpatterns += [
     path('user-templates/', UserTemplateAssignmentView.as_view(), name='user-templates'),
     path('user-templates/<int:assignment_id>/', UserTemplateAssignmentView.as_view(), name='user-template-detail'),
     path('layer/<int:layer_id>/templates/', TemplateAssignmentView.as_view(), name='layer-templates'),
+    path('layer/<int:layer_id>/consolidated/', ConsolidatedValuesView.as_view(), name='layer-consolidated'),
     # The batch_evidence action is now directly accessible via the router-generated URL:
     # /metric-evidence/batch_evidence/
 ] 
\ No newline at end of file
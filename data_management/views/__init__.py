@@ -5,6 +5,8 @@ This package is being refactored to be more modular.
 
 # Import classes from the modules for backward compatibility
 from .modules.evidence import ESGMetricEvidenceViewSet
+from .modules.ocr_jobs import OCRJobViewSet
+from .modules.consolidation import ConsolidatedValuesView
 
 # Import refactored views
 from .metrics import ESGMetricViewSet
@@ -19,6 +21,8 @@ from .schema_registry import SchemaRegistryViewSet
 # Re-export all classes for backward compatibility
 __all__ = [
     'ESGMetricEvidenceViewSet',
+    'OCRJobViewSet',
+    'ConsolidatedValuesView',
     'ESGFormViewSet',
     'ESGFormCategoryViewSet',
     'ESGMetricViewSet',
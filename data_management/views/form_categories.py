@@ -3,7 +3,6 @@ Views for managing ESG form categories.
 """
 
 from rest_framework import viewsets
-from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
 from accounts.permissions import BakerTillyAdmin
@@ -20,6 +19,7 @@ class ESGFormCategoryViewSet(viewsets.ModelViewSet):
     queryset = ESGFormCategory.objects.all()
     serializer_class = ESGFormCategorySerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('order', 'id')
 
     def get_permissions(self):
         """
@@ -37,5 +37,6 @@ class ESGFormCategoryViewSet(viewsets.ModelViewSet):
         categories = categories.prefetch_related(
             'forms__metrics'
         )
-        serializer = self.get_serializer(categories, many=True)
-        return Response(serializer.data) 
\ No newline at end of file
+        page = self.paginate_queryset(categories)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data) 
\ No newline at end of file
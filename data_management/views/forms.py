@@ -7,6 +7,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 
 from accounts.permissions import BakerTillyAdmin
@@ -33,6 +34,7 @@ class ESGFormViewSet(viewsets.ModelViewSet):
     queryset = ESGForm.objects.filter(is_active=True)
     serializer_class = ESGFormSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('category_id', 'order', 'id')
 
     def get_permissions(self):
         """
@@ -104,25 +106,28 @@ class ESGFormViewSet(viewsets.ModelViewSet):
                 
                 # Get all required metrics for this form that apply to the selected regions
                 required_metrics = []
-                time_based_metrics = []
+                time_based_metrics = {}
                 for metric in form.metrics.filter(is_required=True):
                     if metric.location == 'ALL' or metric.location in form_selection.regions:
                         required_metrics.append(metric.id)
                         if metric.requires_time_reporting:
-                            time_based_metrics.append(metric.id)
+                            time_based_metrics[metric.id] = metric
                         
                 # Get submitted metrics for this form
                 submissions = ESGMetricSubmission.objects.filter(
                     assignment=assignment,
                     metric__form=form
                 )
-                submitted_metrics = submissions.values_list('metric_id', flat=True)
+                # One grouped query: metric_id -> number of submissions
+                submission_counts = dict(
+                    submissions.values_list('metric_id').annotate(count=Count('id')).order_by()
+                )
+                submitted_metrics = list(submission_counts)
                 
                 # For time-based metrics, check if we have the required number of submissions
                 time_based_status = {}
-                for metric_id in time_based_metrics:
-                    metric = ESGMetric.objects.get(id=metric_id)
-                    submissions_count = submissions.filter(metric=metric).count()
+                for metric_id, metric in time_based_metrics.items():
+                    submissions_count = submission_counts.get(metric_id, 0)
                     required_count = get_required_submission_count(metric, assignment)
                     time_based_status[metric_id] = {
                         "submitted_count": submissions_count,
@@ -160,7 +165,7 @@ class ESGFormViewSet(viewsets.ModelViewSet):
                 incomplete_time_based = []
                 for metric_id, status in time_based_status.items():
                     if not status["is_complete"]:
-                        metric = ESGMetric.objects.get(id=metric_id)
+                        metric = time_based_metrics[metric_id]
                         incomplete_time_based.append({
                             'id': metric.id,
                             'name': metric.name,
@@ -331,7 +336,10 @@ class ESGFormViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Automatically attach evidence files related to this form's submissions
-            evidence_count = attach_evidence_to_submissions(list(submissions), request.user)
+            # Data is read by the matcher only when evidence needs a reference path match
+            evidence_count = attach_evidence_to_submissions(
+                list(submissions.only('id', 'metric', 'layer', 'submission_identifier')), request.user
+            )
                 
             # Mark the form as completed
             was_already_completed = form_selection.is_completed
@@ -19,6 +19,7 @@ class ESGMetricViewSet(viewsets.ModelViewSet):
     queryset = ESGMetric.objects.all()
     serializer_class = ESGMetricSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('form_id', 'order', 'id')
 
     def get_permissions(self):
         """
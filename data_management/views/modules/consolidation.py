@@ -0,0 +1,55 @@
+from rest_framework import views, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from accounts.models import LayerProfile
+from accounts.services import get_layer_access
+from ...services.consolidation import get_consolidated_values
+
+WEIGHTINGS = ('total', 'equity', 'own')
+
+
+class ConsolidatedValuesView(views.APIView):
+    """
+    Consolidated metric values for a layer and everything below it.
+    Values are read from the materialised consolidation table.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, layer_id):
+        """
+        Query parameters:
+            metric_ids: Optional comma-separated metric IDs
+            year: Optional reporting year
+            weighting: 'total' (default), 'equity' to weight each child layer
+                by its shareholding_ratio, or 'own' for the layer's own submissions
+        """
+        access = get_layer_access(request)
+        if not (access.is_admin or layer_id in access.accessible_layer_ids):
+            return Response({'error': 'You do not have access to this layer'}, status=status.HTTP_403_FORBIDDEN)
+
+        layer = LayerProfile.objects.filter(id=layer_id).first()
+        if layer is None:
+            return Response({'error': 'Layer not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        weighting = request.query_params.get('weighting', 'total')
+        if weighting not in WEIGHTINGS:
+            return Response({'error': f'weighting must be one of: {", ".join(WEIGHTINGS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            metric_ids = [
+                int(metric_id) for metric_id in request.query_params.get('metric_ids', '').split(',')
+                if metric_id.strip()
+            ]
+            year = int(request.query_params['year']) if request.query_params.get('year') else None
+        except ValueError:
+            return Response({'error': 'metric_ids and year must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'layer_id': layer.id,
+            'layer_name': layer.company_name,
+            'layer_type': layer.layer_type,
+            'weighting': weighting,
+            'values': get_consolidated_values(layer.id, metric_ids, year, weighting)
+        })
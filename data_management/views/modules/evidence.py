@@ -7,10 +7,16 @@ from django.db import models
 from django.conf import settings
 
 from ...models.templates import ESGMetricEvidence, ESGMetricSubmission, ESGMetric
-from ...serializers.esg import ESGMetricEvidenceSerializer, ESGMetricSubmissionSerializer
+from ...serializers.esg import (
+    ESGMetricEvidenceSerializer, ESGMetricEvidenceListSerializer, ESGMetricSubmissionListSerializer
+)
 from ...services.bill_analyzer import UtilityBillAnalyzer
+from ...services.ocr_cache import compute_content_hash
+from ...services.ocr_jobs import enqueue_ocr_job
+from ...services.schema_validation import validate_against_registry
 from accounts.permissions import BakerTillyAdmin
 from accounts.models import LayerProfile
+from accounts.services import get_layer_access
 
 
 class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
@@ -19,25 +25,33 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ESGMetricEvidenceSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-uploaded_at', '-id')
 
     def get_queryset(self):
         # Base queryset
         queryset = ESGMetricEvidence.objects.all()
+        if self.action in ('list', 'retrieve'):
+            queryset = ESGMetricEvidenceListSerializer.setup_eager_loading(queryset)
         
         # Filter by user's permissions
         user = self.request.user
         
         # Admin users can see all evidence
-        if user.is_staff or user.is_superuser or user.is_baker_tilly_admin:
+        access = get_layer_access(self.request)
+        if access.is_admin:
             return queryset
         
         # Other users can only see their own evidence or evidence for their group's submissions
-        user_layers = LayerProfile.objects.filter(app_users__user=user)
         return queryset.filter(
             models.Q(uploaded_by=user) | 
-            models.Q(submission__assignment__layer__in=user_layers)
+            models.Q(submission__assignment__layer_id__in=access.member_layer_ids)
         )
 
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve', 'by_submission', 'by_metric'):
+            return ESGMetricEvidenceListSerializer
+        return self.serializer_class
+
     def create(self, request, *args, **kwargs):
         """
         Universal upload endpoint for evidence files.
@@ -56,12 +70,11 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
         
         if layer_id:
             try:
-                # Verify user has access to this layer
-                layer = LayerProfile.objects.get(
-                    id=layer_id,
-                    app_users__user=request.user
-                )
-            except LayerProfile.DoesNotExist:
+                # Verify the user belongs to this layer; admins get no bypass here
+                if int(layer_id) not in get_layer_access(request).member_layer_ids:
+                    raise LayerProfile.DoesNotExist
+                layer = LayerProfile.objects.get(id=layer_id)
+            except (LayerProfile.DoesNotExist, TypeError, ValueError):
                 return Response({'error': 'Layer not found or you do not have access to it'}, status=400)
         else:
             # Default to layer 7 for backward compatibility
@@ -100,6 +113,7 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
         # Create standalone evidence record
         evidence = ESGMetricEvidence.objects.create(
             file=file_obj,
+            content_hash=compute_content_hash(file_obj),  # Lets OCR reuse results for duplicate bills
             filename=file_obj.name,
             file_type=file_obj.content_type,
             uploaded_by=request.user,
@@ -131,14 +145,14 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Submission not found'}, status=404)
         
         # Check permissions
-        if not (request.user.is_staff or request.user.is_superuser or 
-                request.user.is_baker_tilly_admin or 
-                request.user == submission.submitted_by or
-                LayerProfile.objects.filter(id=submission.assignment.layer.id, app_users__user=request.user).exists()):
+        if not (get_layer_access(request).can_access_layer(submission.assignment.layer_id) or
+                request.user.id == submission.submitted_by_id):
             return Response({'error': 'You do not have permission to view this submission'}, status=403)
         
         # Get evidence for this submission
-        evidence = ESGMetricEvidence.objects.filter(submission=submission).select_related('layer')
+        evidence = ESGMetricEvidenceListSerializer.setup_eager_loading(
+            ESGMetricEvidence.objects.filter(submission=submission)
+        )
         serializer = self.get_serializer(evidence, many=True)
         return Response(serializer.data)
 
@@ -160,52 +174,31 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
         if not submission_ids:
             return Response({"error": "No valid submission IDs provided"}, status=400)
         
-        # Get all submissions and evidence items for these IDs
-        submissions = ESGMetricSubmission.objects.filter(id__in=submission_ids).select_related(
-            'metric', 'assignment', 'submitted_by'
+        # Submissions with their metric, users, layer and evidence, in a fixed number of queries
+        submissions = ESGMetricSubmissionListSerializer.setup_eager_loading(
+            ESGMetricSubmission.objects.filter(id__in=submission_ids).order_by('id')
         )
-        evidence_items = ESGMetricEvidence.objects.filter(submission_id__in=submission_ids)
         
         # Check permissions
-        user = request.user
-        if not (user.is_staff or user.is_superuser or user.is_baker_tilly_admin):
+        access = get_layer_access(request)
+        if not access.is_admin:
             # Regular users can only see evidence for submissions they have access to
-            user_layers = LayerProfile.objects.filter(app_users__user=user)
-            accessible_submissions = submissions.filter(
-                assignment__layer__in=user_layers
-            ).values_list('id', flat=True)
-            
-            submissions = submissions.filter(id__in=accessible_submissions)
-            evidence_items = evidence_items.filter(submission_id__in=accessible_submissions)
-        
-        # Group evidence by submission ID
-        evidence_by_submission = {}
-        evidence_serializer = ESGMetricEvidenceSerializer
-        
-        for evidence in evidence_items:
-            submission_id = str(evidence.submission_id)
-            if submission_id not in evidence_by_submission:
-                evidence_by_submission[submission_id] = []
-            
-            evidence_by_submission[submission_id].append(evidence_serializer(evidence).data)
+            submissions = submissions.filter(assignment__layer_id__in=access.member_layer_ids)
         
         # Create response with submission data and evidence
-        response_data = {}
-        submission_serializer = ESGMetricSubmissionSerializer
-        
-        for submission in submissions:
-            submission_id = str(submission.id)
-            submission_data = submission_serializer(submission).data
-            submission_data['evidence'] = evidence_by_submission.get(submission_id, [])
-            response_data[submission_id] = submission_data
+        response_data = {
+            str(submission['id']): submission
+            for submission in ESGMetricSubmissionListSerializer(submissions, many=True).data
+        }
         
         return Response(response_data)
 
     @action(detail=True, methods=['post'])
     def process_ocr(self, request, pk=None):
         """
-        Process evidence file with OCR to extract data.
-        Sets extracted_value and period information on the evidence record.
+        Queue OCR processing of an evidence file.
+        Returns 202 with the job id; poll status_url until the job has finished,
+        then read the extracted value and periods from ocr_results_url.
         """
         evidence = self.get_object()
         
@@ -216,26 +209,38 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
                                 reverse('metric-evidence-ocr-results', args=[evidence.id])
                             )}, status=200)
         
-        # Initialize bill analyzer service
+        # A bill with the same contents may already have been analyzed
         analyzer = UtilityBillAnalyzer()
+        cached = analyzer.get_cached_result(evidence, analyzer.resolve_analyzer_id(evidence))
+        if cached is not None:
+            success, result = analyzer.apply_result(evidence, cached)
+            if not success:
+                return Response({'error': result.get('error', 'Unknown error during OCR processing')},
+                               status=400)
+            return Response({
+                'message': 'OCR results reused from an identical file',
+                'ocr_results_url': request.build_absolute_uri(
+                    reverse('metric-evidence-ocr-results', args=[evidence.id])
+                ),
+                'extracted_value': evidence.extracted_value,
+                'period': evidence.ocr_period.isoformat() if evidence.ocr_period else None,
+                'multiple_periods': len(result.get('additional_periods', [])) > 0
+            }, status=200)
+        
+        # Queue the analysis; the process_ocr_jobs worker runs it
+        job, created = enqueue_ocr_job(evidence, user=request.user, analyzer=analyzer)
         
-        # Process the evidence
-        success, result = analyzer.process_evidence(evidence)
-        
-        if not success:
-            return Response({'error': result.get('error', 'Unknown error during OCR processing')}, 
-                           status=400)
-        
-        # Return success with results URL
         return Response({
-            'message': 'OCR processing successful',
+            'message': 'OCR processing queued' if created else 'OCR processing already in progress',
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': request.build_absolute_uri(
+                reverse('ocr-job-detail', args=[job.id])
+            ),
             'ocr_results_url': request.build_absolute_uri(
                 reverse('metric-evidence-ocr-results', args=[evidence.id])
-            ),
-            'extracted_value': evidence.extracted_value,
-            'period': evidence.period.isoformat() if evidence.period else None,
-            'multiple_periods': len(result.get('additional_periods', [])) > 0
-        }, status=200)
+            )
+        }, status=202)
 
     @action(detail=True, methods=['get'])
     def ocr_results(self, request, pk=None):
@@ -371,10 +376,8 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
             submission = ESGMetricSubmission.objects.get(id=submission_id)
             
             # Check permissions
-            if not (request.user.is_staff or request.user.is_superuser or 
-                    request.user.is_baker_tilly_admin or 
-                    request.user == submission.submitted_by or
-                    LayerProfile.objects.filter(id=submission.assignment.layer.id, app_users__user=request.user).exists()):
+            if not (get_layer_access(request).can_access_layer(submission.assignment.layer_id) or
+                    request.user.id == submission.submitted_by_id):
                 return Response({'error': 'You do not have permission to modify this submission'}, status=403)
                 
         except ESGMetricSubmission.DoesNotExist:
@@ -422,9 +425,6 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
                 
                 if submission.metric and submission.metric.schema_registry and hasattr(submission.metric.schema_registry, 'schema'):
                     try:
-                        # Import jsonschema validation if needed
-                        import jsonschema
-                        
                         # Create a temporary copy of the data to validate the change
                         import copy
                         temp_data = copy.deepcopy(submission.data) if submission.data else {}
@@ -447,8 +447,8 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
                         data_pointer[parts[-1]] = evidence.extracted_value
                         
                         # Validate against schema
-                        jsonschema.validate(instance=temp_data, schema=submission.metric.schema_registry.schema)
-                    except (jsonschema.exceptions.ValidationError, Exception) as e:
+                        validate_against_registry(temp_data, submission.metric.schema_registry)
+                    except Exception as e:
                         schema_valid = False
                         error_message = str(e)
                 
@@ -664,10 +664,8 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
             submission = ESGMetricSubmission.objects.get(id=submission_id)
             
             # Check permissions
-            if not (request.user.is_staff or request.user.is_superuser or 
-                    request.user.is_baker_tilly_admin or 
-                    request.user == submission.submitted_by or
-                    LayerProfile.objects.filter(id=submission.assignment.layer.id, app_users__user=request.user).exists()):
+            if not (get_layer_access(request).can_access_layer(submission.assignment.layer_id) or
+                    request.user.id == submission.submitted_by_id):
                 return Response({'error': 'You do not have permission to modify this submission'}, status=403)
                 
         except ESGMetricSubmission.DoesNotExist:
@@ -788,9 +786,8 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
         
         if submission.metric and submission.metric.schema_registry and hasattr(submission.metric.schema_registry, 'schema'):
             try:
-                import jsonschema
-                jsonschema.validate(instance=submission.data, schema=submission.metric.schema_registry.schema)
-            except (jsonschema.exceptions.ValidationError, Exception) as e:
+                validate_against_registry(submission.data, submission.metric.schema_registry)
+            except Exception as e:
                 schema_valid = False
                 error_message = str(e)
                 
@@ -840,7 +837,7 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Metric not found'}, status=404)
         
         # Find evidence for this metric (both directly attached and standalone with intended_metric)
-        user_layers = LayerProfile.objects.filter(app_users__user=request.user)
+        access = get_layer_access(request)
         
         # Base query
         evidence_query = ESGMetricEvidence.objects.filter(
@@ -851,7 +848,7 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
             )
         ).filter(
             models.Q(uploaded_by=request.user) | 
-            models.Q(submission__assignment__layer__in=user_layers)
+            models.Q(submission__assignment__layer_id__in=access.member_layer_ids)
         )
         
         # Apply layer filter if provided
@@ -860,9 +857,7 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
             try:
                 # Verify that the layer exists and user has access to it
                 layer = LayerProfile.objects.get(id=layer_id)
-                if not (request.user.is_staff or request.user.is_superuser or 
-                        request.user.is_baker_tilly_admin or
-                        layer in user_layers):
+                if not access.can_access_layer(layer):
                     return Response({'error': 'You do not have access to this layer'}, status=403)
                 
                 # Filter evidence by the selected layer
@@ -871,6 +866,7 @@ class ESGMetricEvidenceViewSet(viewsets.ModelViewSet):
                 return Response({'error': f'Layer with ID {layer_id} not found'}, status=404)
         
         # Execute query and serialize results
-        evidence = evidence_query.select_related('layer', 'intended_metric')
-        serializer = self.get_serializer(evidence, many=True)
-        return Response(serializer.data) 
\ No newline at end of file
+        evidence = ESGMetricEvidenceListSerializer.setup_eager_loading(evidence_query)
+        page = self.paginate_queryset(evidence)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data) 
\ No newline at end of file
@@ -0,0 +1,44 @@
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from django.db import models
+
+from ...models.ocr import OCRJob
+from ...serializers.esg import OCRJobSerializer
+from ...services.ocr_cache import get_ocr_cache_stats
+from accounts.permissions import BakerTillyAdmin
+from accounts.services import get_layer_access
+
+
+class OCRJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only status of queued OCR jobs.
+    Jobs are created by the evidence process_ocr action and run by the process_ocr_jobs worker.
+    """
+    serializer_class = OCRJobSerializer
+    permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-created_at', '-id')
+
+    def get_queryset(self):
+        queryset = OCRJob.objects.all()
+
+        # Optional filter by evidence file
+        evidence_id = self.request.query_params.get('evidence_id')
+        if evidence_id:
+            queryset = queryset.filter(evidence_id=evidence_id)
+
+        access = get_layer_access(self.request)
+        if access.is_admin:
+            return queryset
+
+        # Same visibility as the evidence files themselves
+        return queryset.filter(
+            models.Q(evidence__uploaded_by=self.request.user) |
+            models.Q(evidence__submission__assignment__layer_id__in=access.member_layer_ids)
+        )
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, BakerTillyAdmin])
+    def cache_stats(self, request):
+        """Hit/miss counters of the content-hash OCR result cache."""
+        return Response(get_ocr_cache_stats())
@@ -16,6 +16,7 @@ class SchemaRegistryViewSet(viewsets.ModelViewSet):
     """ViewSet for managing metric schema registry"""
     serializer_class = MetricSchemaRegistrySerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('name', 'id')
     
     def get_queryset(self):
         """Get all schemas, or filter by active status"""
@@ -15,50 +15,59 @@ import logging
 # Configure logger
 logger = logging.getLogger(__name__)
 
-from accounts.models import CustomUser, AppUser, LayerProfile
-from accounts.services import get_accessible_layers, has_layer_access
+from accounts.models import CustomUser, AppUser, LayerProfile, LayerClosure
+from accounts.services import LayerTree, get_accessible_layers, has_layer_access, get_layer_access
 from ..models import (
     ESGForm, ESGMetric, 
     Template, TemplateAssignment, TemplateFormSelection
 )
 from ..models.templates import ESGMetricSubmission, ESGMetricEvidence, ESGMetricBatchSubmission
 from ..serializers.esg import (
-    ESGMetricSubmissionSerializer, ESGMetricSubmissionCreateSerializer,
+    ESGMetricSubmissionSerializer, ESGMetricSubmissionListSerializer, ESGMetricSubmissionCreateSerializer,
     ESGMetricEvidenceSerializer, ESGMetricBatchSubmissionSerializer,
     ESGMetricSubmissionVerifySerializer
 )
 from .utils import get_required_submission_count, attach_evidence_to_submissions
 from ..services.calculations import validate_and_update_totals
+from ..services.batch_submissions import apply_batch_submissions
+from ..services.completion import AssignmentCompletion, update_assignment_completion
+from ..services.layer_aggregation import AGGREGATES, aggregate_by_layer
 from django.contrib.contenttypes.models import ContentType
 
 
+# Columns by_assignment can be sorted on
+BY_ASSIGNMENT_SORT_FIELDS = ('submitted_at', 'updated_at', 'id')
+
+
 class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing ESG metric submissions.
     """
     serializer_class = ESGMetricSubmissionSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-submitted_at', '-id')
 
     def get_queryset(self):
         # Base queryset
         queryset = ESGMetricSubmission.objects.all()
+        if self.action in ('list', 'retrieve'):
+            queryset = ESGMetricSubmissionListSerializer.setup_eager_loading(queryset)
         
         # Filter by user's permissions
-        user = self.request.user
-        
-        # Admin users can see all submissions
-        if user.is_staff or user.is_superuser or user.is_baker_tilly_admin:
+        access = get_layer_access(self.request)
+        if access.is_admin:
             return queryset
         
         # Other users can only see submissions for their layers
-        user_layers = LayerProfile.objects.filter(app_users__user=user)
         return queryset.filter(
-            assignment__layer__in=user_layers
+            assignment__layer_id__in=access.member_layer_ids
         )
 
     def get_serializer_class(self):
         if self.action == 'create':
             return ESGMetricSubmissionCreateSerializer
+        elif self.action in ('list', 'retrieve', 'by_assignment'):
+            return ESGMetricSubmissionListSerializer
         elif self.action == 'verify':
             return ESGMetricSubmissionVerifySerializer
         return self.serializer_class
@@ -129,125 +138,8 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             assignment = submission_or_assignment
             submitter = None  # We don't know who to attribute the completion to
         
-        # Get all metrics for the forms in this template
-        metrics = ESGMetric.objects.filter(
-            form__in=assignment.template.selected_forms.all()
-        )
-        
-        # Get all submissions for this assignment
-        submissions = ESGMetricSubmission.objects.filter(
-            assignment=assignment
-        )
-        
-        # Check if all required metrics have submissions
-        all_required_metrics_submitted = True
-        for metric in metrics:
-            if metric.is_required:
-                # For time-based metrics, check the structure of the JSON data
-                if metric.requires_time_reporting:
-                    # Get submissions for this metric
-                    metric_submissions = submissions.filter(metric=metric)
-                    
-                    if not metric_submissions.exists():
-                        all_required_metrics_submitted = False
-                        break
-                    
-                    # For simplicity, consider any submission with a 'periods' object containing data as complete
-                    # In a more complex implementation, you could check for specific required periods
-                    submission_is_complete = False
-                    for sub in metric_submissions:
-                        if sub.data and isinstance(sub.data, dict) and 'periods' in sub.data:
-                            periods = sub.data['periods']
-                            if isinstance(periods, dict) and len(periods) > 0:
-                                # Check that at least one period has a value
-                                for period_key, period_data in periods.items():
-                                    if isinstance(period_data, dict) and 'value' in period_data:
-                                        submission_is_complete = True
-                                        break
-                        
-                        if submission_is_complete:
-                            break
-                    
-                    if not submission_is_complete:
-                        all_required_metrics_submitted = False
-                        break
-                else:
-                    # For regular metrics, we need at least one submission with a value
-                    has_valid_submission = False
-                    for sub in submissions.filter(metric=metric):
-                        if sub.data and isinstance(sub.data, dict) and 'value' in sub.data:
-                            has_valid_submission = True
-                            break
-                    
-                    if not has_valid_submission:
-                        all_required_metrics_submitted = False
-                        break
-        
-        # Update assignment status if all required metrics are submitted
-        if all_required_metrics_submitted and assignment.status in ['PENDING', 'IN_PROGRESS']:
-            assignment.status = 'SUBMITTED'
-            assignment.completed_at = timezone.now()
-            assignment.save()
-            
-            # Update any form selection completions
-            for form_selection in assignment.template.templateformselection_set.all():
-                form_metrics = metrics.filter(form=form_selection.form)
-                form_metrics_submitted = True
-                
-                for metric in form_metrics:
-                    if metric.is_required:
-                        if metric.requires_time_reporting:
-                            # For time-based metrics, check the structure of the JSON data
-                            metric_submissions = submissions.filter(metric=metric)
-                            
-                            if not metric_submissions.exists():
-                                form_metrics_submitted = False
-                                break
-                            
-                            # Look for a submission with a valid periods structure
-                            submission_is_complete = False
-                            for sub in metric_submissions:
-                                if sub.data and isinstance(sub.data, dict) and 'periods' in sub.data:
-                                    periods = sub.data['periods']
-                                    if isinstance(periods, dict) and len(periods) > 0:
-                                        # Check that at least one period has a value
-                                        for period_key, period_data in periods.items():
-                                            if isinstance(period_data, dict) and 'value' in period_data:
-                                                submission_is_complete = True
-                                                break
-                                
-                                if submission_is_complete:
-                                    break
-                            
-                            if not submission_is_complete:
-                                form_metrics_submitted = False
-                                break
-                        else:
-                            # For regular metrics, check if any submission has a valid value
-                            has_valid_submission = False
-                            for sub in submissions.filter(metric=metric):
-                                if sub.data and isinstance(sub.data, dict) and 'value' in sub.data:
-                                    has_valid_submission = True
-                                    break
-                            
-                            if not has_valid_submission:
-                                form_metrics_submitted = False
-                                break
-                
-                if form_metrics_submitted and not form_selection.is_completed:
-                    form_selection.is_completed = True
-                    form_selection.completed_at = timezone.now()
-                    # If we have a submitter, use that, otherwise try to find a recent submitter
-                    if submitter:
-                        form_selection.completed_by = submitter
-                    else:
-                        # Try to get the most recent submitter for a metric in this form
-                        recent_submission = submissions.filter(
-                            metric__form=form_selection.form
-                        ).order_by('-submitted_at').first()
-                        if recent_submission:
-                            form_selection.completed_by = recent_submission.submitted_by
-                    form_selection.save()
+        # Submissions are loaded and classified once; query count does not grow with metrics
+        return update_assignment_completion(assignment, submitter)
 
     def perform_destroy(self, instance):
         # Store assignment before deleting
@@ -296,10 +188,8 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Assignment not found'}, status=404)
         
         # Check permissions
-        if not (request.user.is_staff or request.user.is_superuser or 
-                request.user.is_baker_tilly_admin or 
-                request.user == assignment.assigned_to or
-                LayerProfile.objects.filter(id=assignment.layer.id, app_users__user=request.user).exists()):
+        if not (get_layer_access(request).can_access_layer(assignment.layer_id) or
+                request.user.id == assignment.assigned_to_id):
             return Response({'error': 'You do not have permission to submit for this assignment'}, status=403)
         
         # Get default layer if provided
@@ -308,9 +198,7 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             try:
                 default_layer = LayerProfile.objects.get(id=layer_id)
                 # Check if user has access
-                if not (request.user.is_staff or request.user.is_superuser or 
-                        request.user.is_baker_tilly_admin or 
-                        LayerProfile.objects.filter(id=layer_id, app_users__user=request.user).exists()):
+                if not get_layer_access(request).can_access_layer(layer_id):
                     return Response({'error': 'You do not have access to the specified layer'}, status=403)
             except LayerProfile.DoesNotExist:
                 return Response({'error': f'Layer with ID {layer_id} not found'}, status=404)
@@ -327,180 +215,18 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             layer=default_layer
         )
         
-        # Process each submission
-        created_submissions = []
-        updated_submissions = []
-        failed_submissions = []
-        
-        for sub_data in submissions_data:
-            metric_id = sub_data.get('metric_id')
-            data = sub_data.get('data')
-            notes = sub_data.get('notes', '')
-            sub_identifier = sub_data.get('submission_identifier', submission_identifier)
-            sub_force_new = sub_data.get('force_new_submission', force_new_submission)
-            data_source = sub_data.get('data_source', '')
-            
-            # Validate metric exists
-            try:
-                metric = ESGMetric.objects.get(id=metric_id)
-            except ESGMetric.DoesNotExist:
-                failed_submissions.append({
-                    'metric_id': metric_id,
-                    'error': f'Metric with ID {metric_id} not found'
-                })
-                continue
-            
-            # Calculate and validate totals
-            if data and isinstance(data, dict):
-                try:
-                    # Calculate totals for the data
-                    data = validate_and_update_totals(data, metric)
-                except Exception as e:
-                    # Log error but continue with original data
-                    logger.warning(f"Calculation error for metric {metric_id}: {e}")
-                    failed_submissions.append({
-                        'metric_id': metric_id,
-                        'error': f'Calculation error: {str(e)}'
-                    })
-                    # Continue with the original data
-            
-            # Get layer for this submission (submission-specific or default)
-            layer = default_layer
-            submission_layer_id = sub_data.get('layer_id')
-            if submission_layer_id:
-                try:
-                    layer = LayerProfile.objects.get(id=submission_layer_id)
-                    # Check if user has access
-                    if not (request.user.is_staff or request.user.is_superuser or 
-                            request.user.is_baker_tilly_admin or 
-                            LayerProfile.objects.filter(id=submission_layer_id, app_users__user=request.user).exists()):
-                        failed_submissions.append({
-                            'metric_id': metric_id,
-                            'error': f'No access to layer with ID {submission_layer_id}'
-                        })
-                        continue
-                except LayerProfile.DoesNotExist:
-                    failed_submissions.append({
-                        'metric_id': metric_id,
-                        'error': f'Layer with ID {submission_layer_id} not found'
-                    })
-                    continue
-            
-            # Handle updates if an explicit update_id was provided
-            if 'update_id' in sub_data:
-                try:
-                    submission = ESGMetricSubmission.objects.get(id=sub_data['update_id'])
-                    
-                    # Update fields
-                    submission.data = data
-                    submission.notes = notes
-                    submission.batch_submission = batch
-                    
-                    # Update metadata fields if provided
-                    if sub_identifier:
-                        submission.submission_identifier = sub_identifier
-                    if data_source:
-                        submission.data_source = data_source
-                    
-                    # Update timestamp if requested
-                    if update_timestamp:
-                        submission.submitted_at = timezone.now()
-                    
-                    # Only update layer if specified
-                    if layer:
-                        submission.layer = layer
-                        
-                    submission.save()
-                    updated_submissions.append(submission)
-                    
-                except ESGMetricSubmission.DoesNotExist:
-                    # If submission no longer exists, create a new one
-                    submission = ESGMetricSubmission.objects.create(
-                        assignment=assignment,
-                        metric=metric,
-                        data=data,
-                        notes=notes,
-                        submitted_by=request.user,
-                        layer=layer,
-                        batch_submission=batch,
-                        submission_identifier=sub_identifier,
-                        data_source=data_source
-                    )
-                    created_submissions.append(submission)
-            else:
-                # If force_new_submission is True, always create a new submission
-                if sub_force_new:
-                    submission = ESGMetricSubmission.objects.create(
-                        assignment=assignment,
-                        metric=metric,
-                        data=data,
-                        notes=notes,
-                        submitted_by=request.user,
-                        layer=layer,
-                        batch_submission=batch,
-                        submission_identifier=sub_identifier,
-                        data_source=data_source
-                    )
-                    created_submissions.append(submission)
-                else:
-                    # Try to find an exact match by identifier if one is provided
-                    existing_submission = None
-                    if sub_identifier:
-                        try:
-                            existing_submission = ESGMetricSubmission.objects.get(
-                                assignment=assignment,
-                                metric=metric,
-                                layer=layer,
-                                submission_identifier=sub_identifier
-                            )
-                        except ESGMetricSubmission.DoesNotExist:
-                            pass
-                    
-                    # If no identifier match but we're not forcing a new submission,
-                    # look for any submission with the same metric/layer and no identifier
-                    if not existing_submission and not sub_identifier and not sub_force_new:
-                        try:
-                            existing_submission = ESGMetricSubmission.objects.filter(
-                                assignment=assignment,
-                                metric=metric,
-                                layer=layer,
-                                submission_identifier=''
-                            ).first()
-                        except ESGMetricSubmission.DoesNotExist:
-                            pass
-                    
-                    # Update existing submission if found
-                    if existing_submission:
-                        existing_submission.data = data
-                        existing_submission.notes = notes
-                        existing_submission.batch_submission = batch
-                        
-                        # Update metadata fields if provided
-                        if sub_identifier:
-                            existing_submission.submission_identifier = sub_identifier
-                        if data_source:
-                            existing_submission.data_source = data_source
-                        
-                        # Update timestamp if requested
-                        if update_timestamp:
-                            existing_submission.submitted_at = timezone.now()
-                        
-                        existing_submission.save()
-                        updated_submissions.append(existing_submission)
-                    else:
-                        # Create new submission if no existing found or if using identifier
-                        submission = ESGMetricSubmission.objects.create(
-                            assignment=assignment,
-                            metric=metric,
-                            data=data,
-                            notes=notes,
-                            submitted_by=request.user,
-                            layer=layer,
-                            batch_submission=batch,
-                            submission_identifier=sub_identifier,
-                            data_source=data_source
-                        )
-                        created_submissions.append(submission)
+        # Resolve every row in memory and write them with bulk operations
+        created_submissions, updated_submissions, failed_submissions = apply_batch_submissions(
+            assignment,
+            submissions_data,
+            request.user,
+            batch,
+            default_layer,
+            submission_identifier=submission_identifier,
+            update_timestamp=update_timestamp,
+            force_new_submission=force_new_submission,
+            access=get_layer_access(request)
+        )
         
         # Update assignment status
         if assignment.status in ['PENDING', 'IN_PROGRESS']:
@@ -546,10 +272,8 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Assignment not found'}, status=404)
         
         # Check permissions
-        if not (request.user.is_staff or request.user.is_superuser or 
-                request.user.is_baker_tilly_admin or 
-                request.user == assignment.assigned_to or
-                LayerProfile.objects.filter(id=assignment.layer.id, app_users__user=request.user).exists()):
+        if not (get_layer_access(request).can_access_layer(assignment.layer_id) or
+                request.user.id == assignment.assigned_to_id):
             return Response({'error': 'You do not have permission to view this assignment'}, status=403)
         
         # Get all submissions for this assignment
@@ -570,9 +294,7 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             try:
                 # Verify user has access to the layer
                 layer = LayerProfile.objects.get(id=layer_id)
-                if not (request.user.is_staff or request.user.is_superuser or 
-                        request.user.is_baker_tilly_admin or
-                        LayerProfile.objects.filter(id=layer_id, app_users__user=request.user).exists()):
+                if not get_layer_access(request).can_access_layer(layer_id):
                     return Response({'error': 'You do not have access to this layer'}, status=403)
                 
                 submissions = submissions.filter(layer=layer)
@@ -593,35 +315,21 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
         if submitted_before:
             submissions = submissions.filter(submitted_at__lte=submitted_before)
             
-        # Sorting
+        # Sorting; the keyset paginator appends id as a tie breaker
         sort_by = request.query_params.get('sort_by', 'submitted_at')
+        if sort_by not in BY_ASSIGNMENT_SORT_FIELDS:
+            return Response({'error': f'sort_by must be one of: {", ".join(BY_ASSIGNMENT_SORT_FIELDS)}'}, status=400)
         sort_direction = request.query_params.get('sort_direction', 'desc')
         
         if sort_direction.lower() == 'desc':
             sort_by = f'-{sort_by}'
         
-        # Optimize query with select_related
-        submissions = submissions.select_related('metric', 'layer', 'submitted_by').order_by(sort_by)
-        
-        # Pagination
-        page_size = int(request.query_params.get('page_size', 50))
-        page = int(request.query_params.get('page', 1))
-        
-        start = (page - 1) * page_size
-        end = start + page_size
-        
-        total_count = submissions.count()
-        submissions = submissions[start:end]
-        
-        serializer = self.get_serializer(submissions, many=True)
+        # Keyset pagination: ?cursor=... for the next page, ?include_count=true for the total
+        submissions = ESGMetricSubmissionListSerializer.setup_eager_loading(submissions).order_by(sort_by)
+        page = self.paginate_queryset(submissions)
+        serializer = self.get_serializer(page, many=True)
         
-        return Response({
-            'total_count': total_count,
-            'page': page,
-            'page_size': page_size,
-            'total_pages': (total_count + page_size - 1) // page_size,
-            'results': serializer.data
-        })
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'])
     @transaction.atomic
@@ -668,80 +376,13 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Assignment not found'}, status=404)
         
         # Check permissions
-        if not (request.user.is_staff or request.user.is_superuser or 
-                request.user.is_baker_tilly_admin or 
-                request.user == assignment.assigned_to or
-                LayerProfile.objects.filter(id=assignment.layer.id, app_users__user=request.user).exists()):
+        if not (get_layer_access(request).can_access_layer(assignment.layer_id) or
+                request.user.id == assignment.assigned_to_id):
             return Response({'error': 'You do not have permission to submit this template'}, status=403)
         
-        # Get all metrics for the forms in this template
-        metrics = ESGMetric.objects.filter(
-            form__in=assignment.template.selected_forms.all()
-        )
-        
-        # Get all submissions for this assignment
-        submissions = ESGMetricSubmission.objects.filter(
-            assignment=assignment
-        )
-        
         # Check if all required metrics have submissions
-        missing_metrics = []
-        incomplete_time_based = []
-        
-        for metric in metrics:
-            if metric.is_required:
-                if metric.requires_time_reporting:
-                    # For time-based metrics, check the structure of the JSON data
-                    metric_submissions = submissions.filter(metric=metric)
-                    
-                    if not metric_submissions.exists():
-                        incomplete_time_based.append({
-                            'id': metric.id,
-                            'name': metric.name,
-                            'form': metric.form.name,
-                            'reporting_frequency': metric.reporting_frequency,
-                            'submitted_count': 0,
-                            'required_count': 1  # At least one submission with periods
-                        })
-                        continue
-                    
-                    # Look for a submission with a valid periods structure
-                    submission_is_complete = False
-                    for sub in metric_submissions:
-                        if sub.data and isinstance(sub.data, dict) and 'periods' in sub.data:
-                            periods = sub.data['periods']
-                            if isinstance(periods, dict) and len(periods) > 0:
-                                # Check that at least one period has a value
-                                for period_key, period_data in periods.items():
-                                    if isinstance(period_data, dict) and 'value' in period_data:
-                                        submission_is_complete = True
-                                        break
-                        
-                        if submission_is_complete:
-                            break
-                    
-                    if not submission_is_complete:
-                        incomplete_time_based.append({
-                            'id': metric.id,
-                            'name': metric.name,
-                            'form': metric.form.name,
-                            'reporting_frequency': metric.reporting_frequency,
-                            'issue': 'Missing or incomplete periods data in JSON'
-                        })
-                else:
-                    # For regular metrics, check if any submission has a valid value
-                    has_valid_submission = False
-                    for sub in submissions.filter(metric=metric):
-                        if sub.data and isinstance(sub.data, dict) and 'value' in sub.data:
-                            has_valid_submission = True
-                            break
-                    
-                    if not has_valid_submission:
-                        missing_metrics.append({
-                            'id': metric.id,
-                            'name': metric.name,
-                            'form': metric.form.name
-                        })
+        completion = AssignmentCompletion(assignment)
+        missing_metrics, incomplete_time_based = completion.get_missing_metrics()
         
         errors = {}
         if missing_metrics:
@@ -763,55 +404,7 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
         assignment.save()
         
         # Update form selections
-        for form_selection in assignment.template.templateformselection_set.all():
-            form_metrics = metrics.filter(form=form_selection.form)
-            form_metrics_submitted = True
-            
-            for metric in form_metrics:
-                if metric.is_required:
-                    if metric.requires_time_reporting:
-                        # For time-based metrics, check the structure of the JSON data
-                        metric_submissions = submissions.filter(metric=metric)
-                        
-                        if not metric_submissions.exists():
-                            form_metrics_submitted = False
-                            break
-                        
-                        # Look for a submission with a valid periods structure
-                        submission_is_complete = False
-                        for sub in metric_submissions:
-                            if sub.data and isinstance(sub.data, dict) and 'periods' in sub.data:
-                                periods = sub.data['periods']
-                                if isinstance(periods, dict) and len(periods) > 0:
-                                    # Check that at least one period has a value
-                                    for period_key, period_data in periods.items():
-                                        if isinstance(period_data, dict) and 'value' in period_data:
-                                            submission_is_complete = True
-                                            break
-                            
-                            if submission_is_complete:
-                                break
-                        
-                        if not submission_is_complete:
-                            form_metrics_submitted = False
-                            break
-                    else:
-                        # For regular metrics, check if any submission has a valid value
-                        has_valid_submission = False
-                        for sub in submissions.filter(metric=metric):
-                            if sub.data and isinstance(sub.data, dict) and 'value' in sub.data:
-                                has_valid_submission = True
-                                break
-                        
-                        if not has_valid_submission:
-                            form_metrics_submitted = False
-                            break
-            
-            if form_metrics_submitted:
-                form_selection.is_completed = True
-                form_selection.completed_at = timezone.now()
-                form_selection.completed_by = request.user
-                form_selection.save()
+        completion.mark_forms_complete(request.user, only_pending=False)
         
         return Response({
             'status': 'success',
@@ -828,195 +421,67 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
         Optional parameters:
             assignment_id: Filter layers to those relevant for a specific assignment
         """
-        # Get all layers the user has access to using the existing utility function
-        user_layers = get_accessible_layers(request.user)
+        # All layers the user has access to, with their parents, in one query
+        tree = LayerTree(get_accessible_layers(request.user))
+
+        def layer_data(layer, parent=None):
+            return {
+                'id': layer.id,
+                'name': layer.company_name,
+                'type': layer.layer_type,
+                'location': layer.company_location,
+                'parent': {'id': parent.id, 'name': parent.company_name} if parent else None
+            }
         
         # Filter by assignment if provided
         assignment_id = request.query_params.get('assignment_id')
         if assignment_id:
             try:
-                assignment = TemplateAssignment.objects.get(id=assignment_id)
+                assignment = TemplateAssignment.objects.select_related('layer').get(id=assignment_id)
                 
                 # For assignments, we should include:
                 # 1. The assignment's own layer
                 # 2. Any child layers of the assignment's layer
                 
                 # Add the assignment's layer
-                assignment_layer = assignment.layer
-                if assignment_layer not in user_layers:
+                assignment_layer = tree.get(assignment.layer_id)
+                if assignment_layer is None:
+                    assignment_layer = assignment.layer
                     if not has_layer_access(request.user, assignment_layer):
                         return Response({
                             'error': f'You do not have access to layer {assignment_layer.id}'
                         }, status=403)
+                    assignment_layer.parent_layer_id = LayerClosure.objects.filter(
+                        descendant=assignment_layer, depth=1
+                    ).values_list('ancestor_id', flat=True).first()
                 
-                # Get all layers the user has access to that are related to this assignment
-                available_layers = []
-                
-                # Include the assignment's own layer
-                available_layers.append({
-                    'id': assignment_layer.id,
-                    'name': assignment_layer.company_name,
-                    'type': assignment_layer.layer_type,
-                    'location': assignment_layer.company_location,
-                    'parent': None
-                })
+                # Parent layers (e.g., the group of a subsidiary) come first, top-level parent at the beginning
+                ancestors = tree.get_ancestors(assignment_layer)
+                available_layers = [
+                    layer_data(layer, ancestors[index - 1] if index else None)
+                    for index, layer in enumerate(ancestors)
+                ]
+                available_layers.append(layer_data(assignment_layer, ancestors[-1] if ancestors else None))
                 
                 # Include child layers if the assignment layer is a group
                 if assignment_layer.layer_type == 'GROUP':
-                    # Get subsidiaries
-                    for subsidiary in user_layers.filter(
-                        layer_type='SUBSIDIARY',
-                        subsidiarylayer__group_layer=assignment_layer
-                    ):
-                        available_layers.append({
-                            'id': subsidiary.id,
-                            'name': subsidiary.company_name,
-                            'type': subsidiary.layer_type,
-                            'location': subsidiary.company_location,
-                            'parent': {
-                                'id': assignment_layer.id,
-                                'name': assignment_layer.company_name
-                            }
-                        })
+                    for subsidiary in tree.get_children(assignment_layer, 'SUBSIDIARY'):
+                        available_layers.append(layer_data(subsidiary, assignment_layer))
                         
                         # Get branches of this subsidiary
-                        for branch in user_layers.filter(
-                            layer_type='BRANCH',
-                            branchlayer__subsidiary_layer__id=subsidiary.id
-                        ):
-                            available_layers.append({
-                                'id': branch.id,
-                                'name': branch.company_name,
-                                'type': branch.layer_type,
-                                'location': branch.company_location,
-                                'parent': {
-                                    'id': subsidiary.id,
-                                    'name': subsidiary.company_name
-                                }
-                            })
-                
-                # Include parent layers (e.g., if assignment is for a subsidiary, include its group)
-                if assignment_layer.layer_type == 'SUBSIDIARY':
-                    try:
-                        group_layer = assignment_layer.subsidiarylayer.group_layer
-                        if group_layer in user_layers:
-                            # Add at the beginning as it's the top-level parent
-                            available_layers.insert(0, {
-                                'id': group_layer.id,
-                                'name': group_layer.company_name,
-                                'type': group_layer.layer_type,
-                                'location': group_layer.company_location,
-                                'parent': None
-                            })
-                            # Update the assignment layer's parent reference
-                            available_layers[1]['parent'] = {
-                                'id': group_layer.id,
-                                'name': group_layer.company_name
-                            }
-                    except Exception:
-                        # Just continue if we can't get the parent
-                        pass
-                
-                # If it's a branch, include both its subsidiary and group
-                elif assignment_layer.layer_type == 'BRANCH':
-                    try:
-                        subsidiary_layer = assignment_layer.branchlayer.subsidiary_layer
-                        if subsidiary_layer in user_layers:
-                            # Add before the assignment layer
-                            available_layers.insert(0, {
-                                'id': subsidiary_layer.id,
-                                'name': subsidiary_layer.company_name,
-                                'type': subsidiary_layer.layer_type,
-                                'location': subsidiary_layer.company_location,
-                                'parent': None
-                            })
-                            # Update the assignment layer's parent reference
-                            available_layers[1]['parent'] = {
-                                'id': subsidiary_layer.id,
-                                'name': subsidiary_layer.company_name
-                            }
-                            
-                            # Also add the group
-                            try:
-                                group_layer = subsidiary_layer.subsidiarylayer.group_layer
-                                if group_layer in user_layers:
-                                    # Add at the very beginning
-                                    available_layers.insert(0, {
-                                        'id': group_layer.id,
-                                        'name': group_layer.company_name,
-                                        'type': group_layer.layer_type,
-                                        'location': group_layer.company_location,
-                                        'parent': None
-                                    })
-                                    # Update the subsidiary layer's parent reference
-                                    available_layers[1]['parent'] = {
-                                        'id': group_layer.id,
-                                        'name': group_layer.company_name
-                                    }
-                            except Exception:
-                                pass
-                    except Exception:
-                        # Just continue if we can't get the parent
-                        pass
+                        for branch in tree.get_children(subsidiary, 'BRANCH'):
+                            available_layers.append(layer_data(branch, subsidiary))
                 
                 return Response(available_layers)
             except TemplateAssignment.DoesNotExist:
                 return Response({'error': f'Assignment with ID {assignment_id} not found'}, status=404)
         
-        # Prepare all accessible layers
+        # All GROUP layers, then SUBSIDIARY and BRANCH layers with parent information
         result = []
-        
-        # First, include all GROUP layers
-        for layer in user_layers.filter(layer_type='GROUP').order_by('company_name'):
-            result.append({
-                'id': layer.id,
-                'name': layer.company_name,
-                'type': layer.layer_type,
-                'location': layer.company_location,
-                'parent': None
-            })
-        
-        # Then include all SUBSIDIARY layers with parent information
-        for layer in user_layers.filter(layer_type='SUBSIDIARY').order_by('company_name'):
-            parent = None
-            try:
-                group_layer = layer.subsidiarylayer.group_layer
-                if group_layer in user_layers:
-                    parent = {
-                        'id': group_layer.id,
-                        'name': group_layer.company_name
-                    }
-            except Exception:
-                pass
-            
-            result.append({
-                'id': layer.id,
-                'name': layer.company_name,
-                'type': layer.layer_type,
-                'location': layer.company_location,
-                'parent': parent
-            })
-        
-        # Finally, include all BRANCH layers with parent information
-        for layer in user_layers.filter(layer_type='BRANCH').order_by('company_name'):
-            parent = None
-            try:
-                subsidiary_layer = layer.branchlayer.subsidiary_layer
-                if subsidiary_layer in user_layers:
-                    parent = {
-                        'id': subsidiary_layer.id,
-                        'name': subsidiary_layer.company_name
-                    }
-            except Exception:
-                pass
-            
-            result.append({
-                'id': layer.id,
-                'name': layer.company_name,
-                'type': layer.layer_type,
-                'location': layer.company_location,
-                'parent': parent
-            })
+        for layer_type in ('GROUP', 'SUBSIDIARY', 'BRANCH'):
+            layers = [layer for layer in tree.layers.values() if layer.layer_type == layer_type]
+            for layer in sorted(layers, key=lambda layer: layer.company_name):
+                result.append(layer_data(layer, tree.get_parent(layer)))
         
         return Response(result)
 
@@ -1031,6 +496,11 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             metric_ids: Comma-separated list of metric IDs to include in the aggregation.
             layer_ids: Comma-separated list of layer IDs to include in the aggregation.
             period: Optional. JSON path to specific period within data (e.g. "periods.Q1-2024")
+            aggregate: Optional. sum, avg, min or max of the numeric values in each cell.
+            path: Optional. Path to the values to aggregate (e.g. "periods[*].value");
+                defaults to period, then the metric's primary_path, then the period values.
+            rollup: Optional. "true" to include submissions from each layer's sub-layers
+                (implies aggregate=sum when no aggregate is given).
             
         Returns:
             Aggregated values for each metric by layer
@@ -1046,7 +516,7 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             return Response({'error': 'metric_ids is required'}, status=400)
         
         try:
-            metric_ids = [int(id.strip()) for id in metric_ids_param.split(',') if id.strip()]
+            metric_ids = list(dict.fromkeys(int(id.strip()) for id in metric_ids_param.split(',') if id.strip()))
             if not metric_ids:
                 return Response({'error': 'No valid metric IDs provided'}, status=400)
         except ValueError:
@@ -1058,52 +528,53 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             return Response({'error': 'layer_ids is required'}, status=400)
             
         try:
-            layer_ids = [int(id.strip()) for id in layer_ids_param.split(',') if id.strip()]
+            layer_ids = list(dict.fromkeys(int(id.strip()) for id in layer_ids_param.split(',') if id.strip()))
             if not layer_ids:
                 return Response({'error': 'No valid layer IDs provided'}, status=400)
         except ValueError:
             return Response({'error': 'Invalid layer_ids format. Use comma-separated integers.'}, status=400)
+        
+        aggregate = request.query_params.get('aggregate') or None
+        if aggregate is not None and aggregate not in AGGREGATES:
+            return Response({
+                'error': f'Invalid aggregate. Use one of: {", ".join(AGGREGATES)}'
+            }, status=400)
+        rollup = request.query_params.get('rollup', '').lower() == 'true'
             
         # Validate assignment
         try:
             assignment = TemplateAssignment.objects.get(id=assignment_id)
-        except TemplateAssignment.DoesNotExist:
+        except (TemplateAssignment.DoesNotExist, ValueError):
             return Response({'error': f'Assignment with ID {assignment_id} not found'}, status=404)
             
         # Check permissions
-        user_layers = get_accessible_layers(request.user)
-        accessible_layer_ids = set(user_layers.values_list('id', flat=True))
+        accessible_layer_ids = get_layer_access(request).accessible_layer_ids
         
         # Check if user has access to all requested layers
-        inaccessible_layers = set(layer_ids) - accessible_layer_ids
+        inaccessible_layers = [layer_id for layer_id in layer_ids if layer_id not in accessible_layer_ids]
         if inaccessible_layers:
             return Response({
                 'error': f'You do not have access to the following layers: {", ".join(map(str, inaccessible_layers))}'
             }, status=403)
             
         # Validate metrics
-        metrics = ESGMetric.objects.filter(id__in=metric_ids)
-        if metrics.count() != len(metric_ids):
-            found_ids = set(metrics.values_list('id', flat=True))
-            missing_ids = set(metric_ids) - found_ids
+        metrics_by_id = ESGMetric.objects.select_related('form').in_bulk(metric_ids)
+        missing_ids = [metric_id for metric_id in metric_ids if metric_id not in metrics_by_id]
+        if missing_ids:
             return Response({
                 'error': f'The following metrics were not found: {", ".join(map(str, missing_ids))}'
             }, status=404)
+        metrics = [metrics_by_id[metric_id] for metric_id in metric_ids]
         
         # Optional period filter
         period_path = request.query_params.get('period')
         
-        # Fetch submissions that match the criteria
-        submissions = ESGMetricSubmission.objects.filter(
-            assignment_id=assignment_id,
-            metric_id__in=metric_ids,
-            layer_id__in=layer_ids
-        ).select_related('metric', 'layer')
-        
         # Prepare the result structure
         result = {
             'assignment_id': assignment_id,
             'period_path': period_path,
+            'aggregate': aggregate or ('sum' if rollup else None),
+            'rollup': rollup,
             'metrics': {},
             'layers': {},
             'aggregation': []
@@ -1114,80 +585,30 @@ class ESGMetricSubmissionViewSet(viewsets.ModelViewSet):
             result['metrics'][metric.id] = {
                 'id': metric.id,
                 'name': metric.name,
-                'unit_type': metric.unit_type,
-                'custom_unit': metric.custom_unit,
+                'primary_path': metric.primary_path,
                 'requires_time_reporting': metric.requires_time_reporting,
+                'reporting_frequency': metric.reporting_frequency,
                 'form_code': metric.form.code
             }
             
+        layers_by_id = LayerProfile.objects.in_bulk(layer_ids)
         for layer_id in layer_ids:
-            layer = user_layers.get(id=layer_id)
+            layer = layers_by_id.get(layer_id)
             result['layers'][layer_id] = {
                 'id': layer_id,
-                'name': layer.company_name,
-                'type': layer.layer_type,
-                'location': layer.company_location
+                'name': layer.company_name if layer else None,
+                'type': layer.layer_type if layer else None,
+                'location': layer.company_location if layer else None
             }
-            
-        # Helper function to extract value from JSON data using path
-        def get_value_from_data(data, path=None):
-            if not path:
-                # If no path specified, try to get the 'value' field at the root level
-                return data.get('value')
-                
-            # Navigate through the path to get the value
-            parts = path.split('.')
-            current = data
-            for part in parts:
-                if isinstance(current, dict) and part in current:
-                    current = current[part]
-                else:
-                    return None
-            
-            # If we reached a dict with a 'value' key, return that
-            if isinstance(current, dict) and 'value' in current:
-                return current['value']
-            return current  # Otherwise return the object at the path
         
-        # Build aggregation data structure
-        for metric_id in metric_ids:
-            metric_data = {
-                'metric_id': metric_id,
-                'values_by_layer': {}
-            }
-            
-            for layer_id in layer_ids:
-                # Filter submissions for this metric and layer
-                layer_submissions = submissions.filter(
-                    metric_id=metric_id,
-                    layer_id=layer_id
-                )
-                
-                # Calculate aggregated value
-                if period_path:
-                    # For period-specific query, get the specified period data
-                    submission = layer_submissions.first()
-                    if submission and submission.data:
-                        value = get_value_from_data(submission.data, period_path)
-                    else:
-                        value = None
-                    submission_id = submission.id if submission else None
-                else:
-                    # For metrics with time reporting without a specific period, get the whole data structure
-                    submission = layer_submissions.first()
-                    if submission:
-                        value = submission.data
-                    else:
-                        value = None
-                    submission_id = submission.id if submission else None
-                
-                metric_data['values_by_layer'][layer_id] = {
-                    'value': value,
-                    'submission_id': submission_id,
-                    'data': submission.data if submission else None
-                }
-                
-            result['aggregation'].append(metric_data)
+        result['aggregation'] = aggregate_by_layer(
+            assignment.id, metrics, layer_ids,
+            period_path=period_path,
+            value_path=request.query_params.get('path'),
+            aggregate=aggregate,
+            rollup=rollup,
+            allowed_layer_ids=accessible_layer_ids
+        )
             
         return Response(result)
 
@@ -9,6 +9,7 @@ from rest_framework.permissions import IsAuthenticated
 
 from accounts.permissions import BakerTillyAdmin
 from accounts.models import CustomUser, AppUser, LayerProfile
+from ..services.completion import build_completion_matrix
 from ..models import (
     ESGFormCategory, ESGForm, ESGMetric,
     Template, TemplateFormSelection, TemplateAssignment
@@ -18,6 +19,7 @@ from ..serializers.templates import (
     ESGFormCategorySerializer, ESGFormSerializer, ESGMetricSerializer,
     TemplateSerializer, TemplateAssignmentSerializer
 )
+from ..services.template_bundles import etag_matches, get_template_bundle
 from .utils import get_required_submission_count
 
 
@@ -28,6 +30,7 @@ class TemplateViewSet(viewsets.ModelViewSet):
     queryset = Template.objects.all()
     serializer_class = TemplateSerializer
     permission_classes = [IsAuthenticated, BakerTillyAdmin]
+    keyset_ordering = ('-created_at', '-id')
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -36,71 +39,51 @@ class TemplateViewSet(viewsets.ModelViewSet):
     def preview(self, request, pk=None):
         """Preview a template with all its forms and metrics"""
         template = self.get_object()
-        # Update to include form__category in select_related
-        form_selections = template.templateformselection_set.select_related('form', 'form__category').prefetch_related('form__metrics')
-        
-        # Create a flat list of forms with their metrics
-        forms_data = []
-        for selection in form_selections:
-            form_data = {
-                'form_id': selection.form.id,
-                'form_code': selection.form.code,
-                'form_name': selection.form.name,
-                'regions': selection.regions,  # Keep the regions info at form level
-                # Add category information to match the user-templates endpoint
-                'category': {
-                    'id': selection.form.category.id,
-                    'name': selection.form.category.name,
-                    'code': selection.form.category.code,
-                    'icon': selection.form.category.icon,
-                    'order': selection.form.category.order
-                },
-                'order': selection.form.order,
-                'metrics': []
-            }
-            
-            for metric in selection.form.metrics.all():
-                # Only include metrics that match the form's regions or are for ALL locations
-                if metric.location == 'ALL' or metric.location in selection.regions:
-                    metric_data = {
-                        'id': metric.id,
-                        'name': metric.name,
-                        'requires_evidence': metric.requires_evidence,
-                        'location': metric.location,
-                        'is_required': metric.is_required,
-                        'order': metric.order,
-                        'requires_time_reporting': metric.requires_time_reporting,
-                        'reporting_frequency': metric.reporting_frequency,
-                        # Add new JSON schema related fields
-                        'form_component': metric.form_component,
-                        'primary_path': metric.primary_path,
-                        'schema_registry_id': metric.schema_registry_id if metric.schema_registry else None,
-                    }
-                    
-                    # Include schema details if available
-                    if metric.schema_registry:
-                        metric_data['schema_registry'] = {
-                            'id': metric.schema_registry.id,
-                            'name': metric.schema_registry.name,
-                            'version': metric.schema_registry.version,
-                            'schema': metric.schema_registry.schema
-                        }
-                        
-                    form_data['metrics'].append(metric_data)
-            
-            # Sort metrics by order
-            form_data['metrics'].sort(key=lambda x: x['order'])
-            forms_data.append(form_data)
-        
-        # Sort forms by their selection order
-        forms_data.sort(key=lambda x: next((s.order for s in form_selections if s.form.id == x['form_id']), 0))
-        
-        return Response({
-            'template_id': template.id,
-            'template_name': template.name,
-            'description': template.description,
-            'forms': forms_data
-        })
+        bundle = get_template_bundle(template)
+        headers = {'ETag': bundle['etag'], 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request, bundle['etag']):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(bundle['data'], headers=headers)
+
+    @action(detail=False, methods=['get'])
+    def completion_matrix(self, request):
+        """
+        Per-form and per-metric completion of many assignments at once.
+
+        Query parameters (all optional):
+            group_id: Assignments of a group layer and every layer below it
+            status: Assignment status, e.g. SUBMITTED
+            reporting_year: Reporting year of the assignments
+            template_id: Assignments of one template
+        """
+        assignments = TemplateAssignment.objects.select_related('template', 'layer')
+
+        group_id = request.query_params.get('group_id')
+        assignment_status = request.query_params.get('status')
+        reporting_year = request.query_params.get('reporting_year')
+        template_id = request.query_params.get('template_id')
+        try:
+            if group_id:
+                assignments = assignments.filter(layer__ancestor_links__ancestor_id=int(group_id))
+            if reporting_year:
+                assignments = assignments.filter(reporting_year=int(reporting_year))
+            if template_id:
+                assignments = assignments.filter(template_id=int(template_id))
+        except ValueError:
+            return Response(
+                {"error": "group_id, reporting_year and template_id must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if assignment_status:
+            if assignment_status not in dict(TemplateAssignment.STATUS_CHOICES):
+                return Response(
+                    {"error": f"Invalid status: {assignment_status}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            assignments = assignments.filter(status=assignment_status)
+
+        page = self.paginate_queryset(assignments.order_by('-assigned_at', '-id'))
+        return self.get_paginated_response(build_completion_matrix(page))
 
     @action(detail=True, methods=['get'])
     def completion_status(self, request, pk=None):
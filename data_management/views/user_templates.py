@@ -8,6 +8,7 @@ from rest_framework.permissions import IsAuthenticated
 
 from accounts.models import AppUser, LayerProfile
 from ..models import TemplateAssignment
+from ..services.template_bundles import compute_etag, etag_matches, get_template_bundle
 
 
 class UserTemplateAssignmentView(views.APIView):
@@ -45,74 +46,17 @@ class UserTemplateAssignmentView(views.APIView):
         if assignment_id:
             # Get specific template assignment
             try:
-                assignment = TemplateAssignment.objects.get(
+                assignment = TemplateAssignment.objects.select_related('template', 'layer').get(
                     id=assignment_id,
                     layer_id__in=accessible_layer_ids
                 )
                 
-                # Get template with forms and metrics
-                template = assignment.template
-                form_selections = template.templateformselection_set.select_related('form', 'form__category').prefetch_related('form__metrics')
-                
-                # Create a flat list of forms with their metrics
-                forms_data = []
-                for selection in form_selections:
-                    form_data = {
-                        'form_id': selection.form.id,
-                        'form_code': selection.form.code,
-                        'form_name': selection.form.name,
-                        'regions': selection.regions,
-                        'category': {
-                            'id': selection.form.category.id,
-                            'name': selection.form.category.name,
-                            'code': selection.form.category.code,
-                            'icon': selection.form.category.icon,
-                            'order': selection.form.category.order
-                        },
-                        'order': selection.form.order,
-                        'metrics': []
-                    }
-                    
-                    for metric in selection.form.metrics.all():
-                        # Only include metrics that match the form's regions or are for ALL locations
-                        if metric.location == 'ALL' or metric.location in selection.regions:
-                            metric_data = {
-                                'id': metric.id,
-                                'name': metric.name,
-                                'requires_evidence': metric.requires_evidence,
-                                'location': metric.location,
-                                'is_required': metric.is_required,
-                                'order': metric.order,
-                                'requires_time_reporting': metric.requires_time_reporting,
-                                'reporting_frequency': metric.reporting_frequency,
-                                # Add schema-related fields
-                                'form_component': metric.form_component,
-                                'primary_path': metric.primary_path,
-                                'schema_registry_id': metric.schema_registry_id if metric.schema_registry else None,
-                            }
-                            
-                            # Include schema details if available
-                            if metric.schema_registry:
-                                metric_data['schema_registry'] = {
-                                    'id': metric.schema_registry.id,
-                                    'name': metric.schema_registry.name,
-                                    'version': metric.schema_registry.version,
-                                    'schema': metric.schema_registry.schema
-                                }
-                                
-                            form_data['metrics'].append(metric_data)
-                    
-                    # Sort metrics by order
-                    form_data['metrics'].sort(key=lambda x: x['order'])
-                    forms_data.append(form_data)
-                
-                # Sort forms by their selection order
-                forms_data.sort(key=lambda x: next((s.order for s in form_selections if s.form.id == x['form_id']), 0))
-                
-                response_data = {
+                # Form structure comes from the cached template bundle
+                bundle = get_template_bundle(assignment.template)
+                assignment_data = {
                     'assignment_id': assignment.id,
-                    'template_id': template.id,
-                    'template_name': template.name,
+                    'template_id': assignment.template.id,
+                    'template_name': assignment.template.name,
                     'layer_id': assignment.layer.id,
                     'layer_name': assignment.layer.company_name,
                     'status': assignment.status,
@@ -120,10 +64,14 @@ class UserTemplateAssignmentView(views.APIView):
                     'reporting_period_start': assignment.reporting_period_start,
                     'reporting_period_end': assignment.reporting_period_end,
                     'reporting_year': assignment.reporting_year,
-                    'forms': forms_data
                 }
+                etag = compute_etag([bundle['etag'], assignment_data])
+                headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+                if etag_matches(request, etag):
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
                 
-                return Response(response_data)
+                response_data = {**assignment_data, 'forms': bundle['data']['forms']}
+                return Response(response_data, headers=headers)
                 
             except TemplateAssignment.DoesNotExist:
                 return Response(
@@ -4,6 +4,7 @@ These are helper functions used across multiple view classes.
 """
 
 from accounts.models import LayerProfile
+from ..services.completion import required_submission_count
 
 
 def get_required_submission_count(metric, assignment):
@@ -17,18 +18,7 @@ def get_required_submission_count(metric, assignment):
     Returns:
         int: The number of required submissions
     """
-    if not metric.requires_time_reporting or not metric.reporting_frequency:
-        return 1
-        
-    # For simplicity, use fixed counts based on reporting frequency
-    if metric.reporting_frequency == 'monthly':
-        return 12
-    elif metric.reporting_frequency == 'quarterly':
-        return 4
-    elif metric.reporting_frequency == 'annual':
-        return 1
-    
-    return 1  # Default fallback
+    return required_submission_count(metric.requires_time_reporting, metric.reporting_frequency)
 
 
 def attach_evidence_to_submissions(submissions, user):
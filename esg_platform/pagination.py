@@ -0,0 +1,144 @@
+"""
+Keyset (cursor) pagination for API list endpoints.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _cursor_value(value):
+    if isinstance(value, (datetime, date, time)):
+        # isoformat keeps microseconds, so the position is exact
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique ordering such as (submitted_at, id).
+
+    Each page is read with a WHERE clause comparing the ordering columns to
+    the last row of the previous page instead of an OFFSET, so a deep page
+    costs the same as the first one when the ordering is indexed. The
+    ordering is the queryset's explicit order_by, else the view's
+    keyset_ordering, with the primary key appended as a tie breaker;
+    ordering columns must not be nullable.
+
+    Query parameters:
+        cursor: Opaque position returned in 'next'
+        page_size: Rows per page, up to max_page_size
+        include_count: 'true' to also count all matching rows
+    """
+    page_size = api_settings.PAGE_SIZE or 100
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'include_count'
+    default_ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+
+        queryset = queryset.order_by(*self.ordering)
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('true', '1', 'yes'):
+            self.count = queryset.count()
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        self.next_position = self.get_position(page[-1]) if self.has_next else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset, view):
+        """Ordering fields of the page, ending with the primary key."""
+        ordering = list(queryset.query.order_by)
+        if not ordering or not all(isinstance(field, str) for field in ordering):
+            ordering = list(getattr(view, 'keyset_ordering', self.default_ordering))
+        names = {field.lstrip('-') for field in ordering}
+        if not names & {'id', 'pk'}:
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return ordering
+
+    def get_position(self, instance):
+        return [_cursor_value(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+
+    def keyset_filter(self, position):
+        """
+        Rows after the given position:
+        (a > x) OR (a = x AND b > y) OR ..., with < for descending fields.
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{field.lstrip("-")}__{lookup}': position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link()}
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
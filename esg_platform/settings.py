@@ -172,7 +172,11 @@ USE_AZURE_STORAGE = os.getenv('USE_AZURE_STORAGE', 'False') == 'True'
 
 if USE_AZURE_STORAGE:
     INSTALLED_APPS += ['storages']
-    DEFAULT_FILE_STORAGE = 'data_management.services.storage.ESGAzureStorage'
+    # DEFAULT_FILE_STORAGE is ignored since Django 5.1; the backend is set through STORAGES
+    STORAGES = {
+        'default': {'BACKEND': 'data_management.services.storage.ESGAzureStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    }
     AZURE_ACCOUNT_NAME = os.getenv('AZURE_STORAGE_ACCOUNT_NAME', 'esgplatformstore')
     AZURE_ACCOUNT_KEY = os.getenv('AZURE_STORAGE_ACCOUNT_KEY')
     AZURE_CONTAINER = os.getenv('AZURE_STORAGE_CONTAINER', 'esg-evidence')
@@ -180,6 +184,9 @@ if USE_AZURE_STORAGE:
     AZURE_LOCATION = 'esg_evidence'
     AZURE_SSL = True
 
+# Send OCR the signed blob URL of remote evidence files instead of streaming the bytes
+OCR_SUBMIT_FILE_URLS = os.getenv('OCR_SUBMIT_FILE_URLS', 'True') == 'True'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -200,6 +207,8 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'esg_platform.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
 }
 
 # JWT settings
@@ -245,3 +254,15 @@ AZURE_CONTENT_UNDERSTANDING = {
 # Default layer for submissions without a specific layer
 # Set to None to use the first available Group layer
 DEFAULT_LAYER_ID = 1  # Currently using layer 1 for existing data
+
+# Seconds to cache each user's accessible layer ids across requests (0 disables).
+# Only enable with a shared cache backend: the default LocMemCache is per process,
+# so a version bump in one worker would not invalidate entries held by another.
+LAYER_ACCESS_CACHE_TIMEOUT = int(os.getenv('LAYER_ACCESS_CACHE_TIMEOUT', '0'))
+
+# Queued OCR jobs, run by `python manage.py process_ocr_jobs`.
+# See data_management.services.ocr_jobs.DEFAULT_OCR_JOB_SETTINGS for all keys.
+OCR_JOBS = {
+    'MAX_ATTEMPTS': int(os.getenv('OCR_JOB_MAX_ATTEMPTS', '5')),
+    'CONCURRENCY_PER_ANALYZER': int(os.getenv('OCR_JOB_CONCURRENCY_PER_ANALYZER', '4')),
+}
@@ -23,6 +23,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('accounts.urls')),  # All accounts URLs under /api/
     path('api/', include('data_management.urls')),  # All data management URLs under /api/
+    path('api/', include('dashboard.urls')),  # Group dashboards under /api/dashboard/
 ]
 
 # Add media serving for development